@@ -0,0 +1,130 @@
+"""Battle Codec Benchmark.
+
+This module compares our binary battle codec with the pickle format that was
+previously used to store battles, for dense, sparse and array boards, with
+and without compression. For each board size it will measure the time to
+encode and decode a battle and the size of the stored data.
+
+Usage: python -m benchmarks.battle_codec [--repeat N]
+
+"""
+import argparse
+import pickle
+import random
+import timeit
+
+from dino_extinction.blueprints.battles import (boards, codec)
+
+BOARD_SIZES = [50, 200, 1000]
+ENTITIES_PER_BOARD = 100
+
+
+def create_battle(board_size, total_entities, engine_name='dense', seed=42):
+    """Create a battle populated with random entities.
+
+    ...
+
+    Parameters
+    ----------
+    board_size : int
+        The size of the board that will be created.
+
+    total_entities : int
+        How many entities (half robots, half dinossaurs) will be placed.
+
+    engine_name : str
+        The engine that will store the board state.
+
+    seed : int
+        The seed used to place the entities.
+
+    Returns
+    -------
+    battle : dict
+        A battle in the same shape that our models work with.
+
+    """
+    rng = random.Random(seed)
+    board = boards.create(board_size, engine_name)
+    cells = rng.sample(range(board_size * board_size),
+                       min(total_entities, board_size * board_size))
+
+    entities = dict()
+    for index, cell in enumerate(cells):
+        row, col = divmod(cell, board_size)
+        is_robot = index % 2 == 0
+        entity_id = '{0}-{1:04d}'.format('R' if is_robot else 'D', index)
+
+        entity = dict()
+        entity['id'] = entity_id
+        entity['type'] = 'ROBOT' if is_robot else 'DINOSSAUR'
+        if is_robot:
+            entity['direction'] = rng.choice(['north', 'east', 'south',
+                                              'west'])
+        entity['position'] = [row + 1, col + 1]
+
+        entities[entity_id] = entity
+        boards.put_cell(board, row, col, entity_id)
+
+    battle = dict()
+    battle['board'] = board
+    battle['entities'] = entities
+
+    return battle
+
+
+def measure(encode, decode, battle, repeat):
+    """Measure the encode and decode time of a format.
+
+    ...
+
+    Returns
+    -------
+    results : tuple
+        The best encode time, the best decode time (both in milliseconds)
+        and the size of the encoded data in bytes.
+
+    """
+    raw_data = encode(battle)
+    encode_time = min(timeit.repeat(lambda: encode(battle),
+                                    number=1,
+                                    repeat=repeat))
+    decode_time = min(timeit.repeat(lambda: decode(raw_data),
+                                    number=1,
+                                    repeat=repeat))
+
+    return encode_time * 1000, decode_time * 1000, len(raw_data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    formats = dict()
+    formats.setdefault('pickle', ('dense', pickle.dumps, pickle.loads))
+    formats.setdefault('codec', ('dense', codec.encode, codec.decode))
+    formats.setdefault('sparse', ('sparse', codec.encode, codec.decode))
+    formats.setdefault('array', ('array', codec.encode, codec.decode))
+    formats.setdefault('zlib', ('dense',
+                                lambda battle: codec.encode(battle, 0),
+                                codec.decode))
+
+    header = '{:>6} {:>8} {:>12} {:>12} {:>12}'
+    print(header.format('size', 'format', 'encode (ms)', 'decode (ms)',
+                        'bytes'))
+    for board_size in BOARD_SIZES:
+        for name, (engine_name, encode, decode) in formats.items():
+            battle = create_battle(board_size,
+                                   ENTITIES_PER_BOARD,
+                                   engine_name)
+            encode_time, decode_time, size = measure(encode,
+                                                     decode,
+                                                     battle,
+                                                     args.repeat)
+            print('{:>6} {:>8} {:>12.3f} {:>12.3f} {:>12}'.format(
+                board_size, name, encode_time, decode_time, size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Battle Renders Benchmark.
+
+This module compares the render modes of our battle state page: the grid
+mode, with an element for each cell of the board, and the entities mode,
+with an element for each entity only. For each board size and density of
+entities it will measure the time to render the page, its size and how many
+elements the browser has to build.
+
+Usage: python -m benchmarks.battle_renders [--repeat N]
+
+"""
+import argparse
+import timeit
+
+from dino_extinction import create_app
+from dino_extinction.blueprints.battles import (boards, renders)
+from .battle_codec import create_battle
+
+BOARD_SIZES = [50, 200, 500]
+DENSITIES = [0.001, 0.01, 0.1]
+ELEMENT_TAGS = ['<div', '<span', '<figure', '<img']
+
+
+def render(render_mode, battle_id, battle):
+    """Render the whole state page of a battle on a given mode.
+
+    ...
+
+    Parameters
+    ----------
+    render_mode : str
+        The render mode: GRID or ENTITIES.
+
+    battle_id : int
+        The ID of the battle.
+
+    battle : dict
+        The battle that will be rendered.
+
+    Returns
+    -------
+    page : str
+        The rendered page.
+
+    """
+    entities = battle.get('entities')
+    if render_mode == renders.ENTITIES:
+        size = battle.get('board').get('size')
+        parts = renders.render_entities(battle_id, entities, size, size)
+    else:
+        rows = boards.rows(battle.get('board'))
+        parts = renders.render_grid(battle_id, rows, entities)
+
+    return ''.join(parts)
+
+
+def measure(render_mode, battle, repeat):
+    """Measure the render time of a mode.
+
+    ...
+
+    Parameters
+    ----------
+    render_mode : str
+        The render mode: GRID or ENTITIES.
+
+    battle : dict
+        The battle that will be rendered.
+
+    repeat : int
+        How many times the page will be rendered.
+
+    Returns
+    -------
+    results : tuple
+        The best render time (in milliseconds), the size of the page in
+        bytes and how many elements it has.
+
+    """
+    page = render(render_mode, 1, battle)
+    render_time = min(timeit.repeat(lambda: render(render_mode, 1, battle),
+                                    number=1,
+                                    repeat=repeat))
+    elements = sum(page.count(tag) for tag in ELEMENT_TAGS)
+
+    return render_time * 1000, len(page.encode('utf-8')), elements
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app = create_app('TESTING')
+
+    header = '{:>6} {:>8} {:>9} {:>9} {:>12} {:>12} {:>10}'
+    print(header.format('size', 'density', 'entities', 'mode',
+                        'render (ms)', 'bytes', 'elements'))
+    with app.test_request_context():
+        for board_size in BOARD_SIZES:
+            for density in DENSITIES:
+                total_entities = max(int(board_size ** 2 * density), 1)
+                battle = create_battle(board_size, total_entities, 'sparse')
+                for render_mode in renders.MODES:
+                    render_time, size, elements = measure(render_mode,
+                                                          battle,
+                                                          args.repeat)
+                    print('{:>6} {:>8} {:>9} {:>9} {:>12.3f} {:>12} {:>10}'
+                          .format(board_size, density, total_entities,
+                                  render_mode, render_time, size, elements))
+
+
+if __name__ == '__main__':
+    main()
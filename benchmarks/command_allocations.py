@@ -0,0 +1,149 @@
+"""Command Allocations Benchmark.
+
+This module measures the memory that each robot command allocates to build
+the new state of a battle. It compares the deep copy of the whole battle,
+that our commands used to do, with the copy-on-write of our battle models,
+that only copies the rows and entities that change.
+
+Usage: python -m benchmarks.command_allocations
+
+"""
+import argparse
+import tracemalloc
+
+from copy import deepcopy
+from dino_extinction.blueprints.battles import boards
+from dino_extinction.blueprints.battles.models import BattleSchema
+from .battle_codec import create_battle
+
+BOARD_SIZES = [50, 500, 2000]
+ENTITIES_PER_BOARD = 100
+ROBOT_ID = 'R-BENCH'
+DINO_ID = 'D-BENCH'
+
+
+def create_command_battle(board_size):
+    """Create a battle with a robot that is able to run every command.
+
+    The robot is placed on the middle of the board, facing north, with an
+    empty cell in front of it and a dinossaur by its side.
+
+    """
+    battle = create_battle(board_size, ENTITIES_PER_BOARD)
+    board = battle.get('board')
+    entities = battle.get('entities')
+    middle = board_size // 2
+
+    for row, col in [(middle - 1, middle), (middle, middle),
+                     (middle, middle + 1)]:
+        entity_id = boards.get_cell(board, row, col)
+        if entity_id:
+            entities.pop(entity_id, None)
+            boards.clear_cell(board, row, col)
+
+    robot = dict()
+    robot['id'] = ROBOT_ID
+    robot['type'] = 'ROBOT'
+    robot['direction'] = 'north'
+    robot['position'] = [middle + 1, middle + 1]
+
+    dino = dict()
+    dino['id'] = DINO_ID
+    dino['type'] = 'DINOSSAUR'
+    dino['position'] = [middle + 1, middle + 2]
+
+    entities[ROBOT_ID] = robot
+    entities[DINO_ID] = dino
+    boards.put_cell(board, middle, middle, ROBOT_ID)
+    boards.put_cell(board, middle, middle + 1, DINO_ID)
+
+    return battle
+
+
+def deepcopy_command(command):
+    """Run a command over a deep copy of the battle, as we used to do."""
+    def run(model, battle):
+        updated_battle = deepcopy(battle)
+        board = updated_battle.get('board')
+        robot = updated_battle.get('entities').get(ROBOT_ID)
+        row, col = robot.get('position')
+
+        if command == 'turn':
+            robot['direction'] = 'east'
+
+        if command == 'move':
+            boards.clear_cell(board, row - 1, col - 1)
+            boards.put_cell(board, row - 2, col - 1, ROBOT_ID)
+            robot['position'] = (row - 1, col)
+
+        if command == 'attack':
+            del updated_battle.get('entities')[DINO_ID]
+            boards.clear_cell(board, row - 1, col)
+
+        return updated_battle
+
+    return run
+
+
+COPY_ON_WRITE_COMMANDS = dict()
+COPY_ON_WRITE_COMMANDS.setdefault(
+    'turn',
+    lambda model, battle: model.robot_turn(battle, ROBOT_ID, 'east'))
+COPY_ON_WRITE_COMMANDS.setdefault(
+    'move',
+    lambda model, battle: model.robot_move(battle, ROBOT_ID, 'move-forward'))
+COPY_ON_WRITE_COMMANDS.setdefault(
+    'attack',
+    lambda model, battle: model.robot_attack(battle, ROBOT_ID))
+
+
+def measure(run, battle):
+    """Measure the memory allocated by a command.
+
+    ...
+
+    Returns
+    -------
+    results : tuple
+        The number of memory blocks and the bytes that are still allocated
+        by the new state of the battle.
+
+    """
+    model = BattleSchema()
+    run(model, battle)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    updated_battle = run(model, battle)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, 'filename')
+    blocks = sum(stat.count_diff for stat in stats if stat.count_diff > 0)
+    size = sum(stat.size_diff for stat in stats if stat.size_diff > 0)
+    del updated_battle
+
+    return blocks, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+
+    header = '{:>6} {:>8} {:>14} {:>12} {:>14} {:>12}'
+    print(header.format('size', 'command', 'deepcopy blk', 'deepcopy KiB',
+                        'cow blk', 'cow KiB'))
+    for board_size in BOARD_SIZES:
+        battle = create_command_battle(board_size)
+        for command, copy_on_write in COPY_ON_WRITE_COMMANDS.items():
+            deepcopy_blocks, deepcopy_size = measure(
+                deepcopy_command(command),
+                battle)
+            cow_blocks, cow_size = measure(copy_on_write, battle)
+            print('{:>6} {:>8} {:>14} {:>12.1f} {:>14} {:>12.1f}'.format(
+                board_size, command, deepcopy_blocks, deepcopy_size / 1024,
+                cow_blocks, cow_size / 1024))
+
+
+if __name__ == '__main__':
+    main()
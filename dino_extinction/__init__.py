@@ -54,11 +54,16 @@ def create_app(env='DEVELOPMENT'):
         from dino_extinction.blueprints import battles
         from dino_extinction.blueprints import dinossaurs
         from dino_extinction.blueprints import robots
+        from dino_extinction.blueprints import metrics
 
         app.register_blueprint(healthcheck.bp, url_prefix='/healthcheck')
         app.register_blueprint(battles.bp, url_prefix='/battles')
         app.register_blueprint(dinossaurs.bp, url_prefix='/dinossaurs')
         app.register_blueprint(robots.bp, url_prefix='/robots')
+        app.register_blueprint(metrics.bp, url_prefix='/metrics')
+
+        robots.scheduler.start(app)
+        battles.archiver.start(app)
 
         @app.errorhandler(404)
         def page_not_found(error):
@@ -1,12 +1,16 @@
 """Dinossaurs Blueprint.
 
 This module will initialize the Dinossaurs Blueprint. Creating the
-Blueprint, setting it up and also creating it's routes.
+Blueprint, setting it up and also creating it's routes and the archiver
+of its idle battles.
 
 """
 from flask import Blueprint
 from . import routes
 from . import handlers
+from . import archive
+from . import storage
 
 bp = Blueprint('battles', __name__)
 routes.set_routes(bp, handlers)
+archiver = archive.Archiver(storage.archive_idle)
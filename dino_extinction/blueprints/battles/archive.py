@@ -0,0 +1,203 @@
+"""Battle Archive.
+
+This module stores the battles that are idle for too long on a local SQLite
+database, always compressed by our codec, so they do not take the memory of
+Redis. Archived battles are moved back to Redis the first time that they are
+loaded or mutated, so they keep working as if they were never archived.
+
+The archive is only enabled when the BATTLE_ARCHIVE_PATH configuration is
+set. Every worker runs an archiver, once per BATTLE_ARCHIVE_INTERVAL seconds,
+that archives the battles that were not loaded or saved for
+BATTLE_ARCHIVE_IDLE seconds, but a lock makes only one of them run on each
+interval. How long a battle is idle is measured by its expiration, so the
+battles are only archived when the BATTLE_TTL configuration is set, and the
+idle threshold should be shorter than it.
+
+The database is local to each host, so every worker that serves the same
+battles must share it.
+
+"""
+import sqlite3
+import time
+
+from contextlib import closing
+from threading import (Event, Thread)
+from redis.exceptions import RedisError
+from dino_extinction.infrastructure import (metrics, redis, settings)
+from . import codec
+
+DEFAULT_IDLE = 3600
+DEFAULT_INTERVAL = 60
+COMPRESSION_LEVEL = 9
+LOCK_KEY = 'battles:archive'
+
+SCHEMA = ('CREATE TABLE IF NOT EXISTS battles ('
+          'id INTEGER PRIMARY KEY, '
+          'version INTEGER NOT NULL, '
+          'archived_at REAL NOT NULL, '
+          'data BLOB NOT NULL)')
+
+
+def enabled():
+    """Check if idle battles must be archived."""
+    return bool(_path())
+
+
+def idle():
+    """Get the seconds that a battle must be idle to be archived."""
+    return int(settings.get('BATTLE_ARCHIVE_IDLE', DEFAULT_IDLE))
+
+
+def store(battle_id, battle):
+    """Store a battle on the archive, replacing its previous copy.
+
+    ...
+
+    Parameters
+    ----------
+    battle_id : int
+        The ID of the battle that you are archiving.
+
+    battle : dict
+        The battle that will be archived.
+
+    Returns
+    -------
+    size : int
+        The compressed size of the battle, in bytes.
+
+    """
+    raw_data = codec.encode(battle, 0, COMPRESSION_LEVEL)
+    with closing(_connect()) as connection, connection:
+        connection.execute('INSERT OR REPLACE INTO battles '
+                           '(id, version, archived_at, data) '
+                           'VALUES (?, ?, ?, ?)',
+                           (int(battle_id),
+                            battle.get('version', 0),
+                            time.time(),
+                            raw_data))
+
+    return len(raw_data)
+
+
+def fetch(battle_id):
+    """Fetch an archived battle, returning None if it was not archived."""
+    with closing(_connect()) as connection:
+        row = connection.execute('SELECT data FROM battles WHERE id = ?',
+                                 (int(battle_id),)).fetchone()
+
+    if not row:
+        return None
+
+    return codec.decode(row[0])
+
+
+def discard(battle_id, version=None):
+    """Remove a battle from the archive.
+
+    If a version is given, the battle is only removed if its archived copy
+    has that exact version.
+
+    """
+    query = 'DELETE FROM battles WHERE id = ?'
+    params = (int(battle_id),)
+    if version is not None:
+        query += ' AND version = ?'
+        params += (version,)
+
+    with closing(_connect()) as connection, connection:
+        connection.execute(query, params)
+
+
+def count():
+    """Count how many battles are archived."""
+    with closing(_connect()) as connection:
+        return connection.execute('SELECT COUNT(*) FROM battles').fetchone()[0]
+
+
+class Archiver:
+    """Archiver Class.
+
+    This class archives our idle battles on a background thread, once per
+    interval.
+
+    ...
+
+    Attributes
+    ----------
+    archive : function
+        A function that receives the idle threshold, in seconds, archives
+        every battle that is idle for that long and returns how many battles
+        were archived.
+
+    """
+
+    def __init__(self, archive):
+        self.archive = archive
+        self.thread = None
+        self.stopped = Event()
+
+    def start(self, app):
+        """Start archiving, if the archive is enabled for the given app."""
+        interval = int(app.config.get('BATTLE_ARCHIVE_INTERVAL',
+                                      DEFAULT_INTERVAL) or 0)
+        if not app.config.get('BATTLE_ARCHIVE_PATH') or not interval:
+            return
+
+        if self.thread:
+            return
+
+        self.stopped.clear()
+        self.thread = Thread(target=self._run,
+                             args=(app, interval),
+                             daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop archiving."""
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+
+        self.thread = None
+
+    def run_once(self, interval):
+        """Archive the idle battles, unless another worker already did it.
+
+        ...
+
+        Parameters
+        ----------
+        interval : int
+            The seconds until the battles can be archived again.
+
+        Returns
+        -------
+        archived : int
+            How many battles were archived, or None if another worker already
+            archived them on the current interval.
+
+        """
+        if not redis.instance.set(LOCK_KEY, 1, nx=True, ex=interval):
+            return None
+
+        return self.archive(idle())
+
+    def _run(self, app, interval):
+        while not self.stopped.wait(interval):
+            with app.app_context():
+                try:
+                    self.run_once(interval)
+                except (RedisError, sqlite3.Error):
+                    metrics.increment('battle_archive_errors')
+
+
+def _path():
+    return settings.get('BATTLE_ARCHIVE_PATH') or ''
+
+
+def _connect():
+    connection = sqlite3.connect(_path())
+    connection.execute(SCHEMA)
+
+    return connection
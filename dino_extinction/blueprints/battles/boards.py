@@ -0,0 +1,568 @@
+"""Battle Boards.
+
+This module contains the engines that we can use to store the state of a
+battle board. Every engine works over a board dict with the size of the board
+and its state, but each one of them stores that state in a different way:
+
+    dense  : a list of rows, where each row is a list with the ID of the
+             entity on each cell (or None if the cell is empty).
+    sparse : a dict mapping the (row, col) position of each occupied cell to
+             the ID of the entity on it.
+    array  : a NumPy array with an integer code on each cell (or 0 if the
+             cell is empty), and a side table with the ID of each code. A
+             copy shares the array and only records its changed cells.
+
+Every position handled by this module is zero-based.
+
+"""
+import numpy
+
+from dino_extinction.infrastructure import settings
+
+DEFAULT_ENGINE = 'dense'
+CODE_TYPE = numpy.uint32
+
+
+class DenseBoard:
+    """DenseBoard Class.
+
+    This class handles boards that store every cell of the grid. Its memory
+    grows with the square of the board size.
+
+    """
+    name = 'dense'
+
+    def create(self, board_size):
+        """Create the state of an empty board."""
+        return [[None] * board_size for _ in range(board_size)]
+
+    def get(self, board, row, col):
+        """Get the ID of the entity in a given cell."""
+        return board.get('state')[row][col]
+
+    def put(self, board, row, col, entity_id):
+        """Put an entity in a given cell."""
+        board.get('state')[row][col] = entity_id
+
+    def clear(self, board, row, col):
+        """Remove any entity from a given cell."""
+        board.get('state')[row][col] = None
+
+    def occupied(self, board):
+        """Iterate over every occupied cell as ((row, col), entity_id)."""
+        for row, cells in enumerate(board.get('state')):
+            if cells.count(None) == len(cells):
+                continue
+
+            for col, entity_id in enumerate(cells):
+                if entity_id:
+                    yield (row, col), entity_id
+
+    def rows(self, board):
+        """Iterate over the rows of the board."""
+        return board.get('state')
+
+    def copy(self, board, rows):
+        """Copy the state of a board, sharing the rows that are not given."""
+        state = list(board.get('state'))
+        for row in rows:
+            state[row] = list(state[row])
+
+        return state
+
+    def neighbours(self, board, row, col):
+        """List the occupied cells around a cell as ((row, col), entity_id)."""
+        return _probe_neighbours(self, board, row, col)
+
+    def adjacent(self, board, is_source, is_target):
+        """List the target cells that are adjacent to any source cell."""
+        return _probe_adjacent(self, board, is_source, is_target)
+
+
+class SparseBoard:
+    """SparseBoard Class.
+
+    This class handles boards that only store their occupied cells. Its
+    memory grows with the number of entities on the board.
+
+    """
+    name = 'sparse'
+
+    def create(self, board_size):
+        """Create the state of an empty board."""
+        return dict()
+
+    def get(self, board, row, col):
+        """Get the ID of the entity in a given cell."""
+        return board.get('state').get((row, col))
+
+    def put(self, board, row, col, entity_id):
+        """Put an entity in a given cell."""
+        board.get('state')[(row, col)] = entity_id
+
+    def clear(self, board, row, col):
+        """Remove any entity from a given cell."""
+        board.get('state').pop((row, col), None)
+
+    def occupied(self, board):
+        """Iterate over every occupied cell as ((row, col), entity_id)."""
+        return iter(board.get('state').items())
+
+    def rows(self, board):
+        """Iterate over the rows of the board."""
+        state = board.get('state')
+        board_size = board.get('size')
+
+        for row in range(board_size):
+            yield [state.get((row, col)) for col in range(board_size)]
+
+    def copy(self, board, rows):
+        """Copy the state of a board."""
+        return dict(board.get('state'))
+
+    def neighbours(self, board, row, col):
+        """List the occupied cells around a cell as ((row, col), entity_id)."""
+        return _probe_neighbours(self, board, row, col)
+
+    def adjacent(self, board, is_source, is_target):
+        """List the target cells that are adjacent to any source cell."""
+        return _probe_adjacent(self, board, is_source, is_target)
+
+
+class ArrayState:
+    """ArrayState Class.
+
+    This class holds the state of an array board. A copied state shares the
+    grid of its original state and only records the cells that changed on
+    it, so a command does not copy the whole grid. The grid is only copied,
+    with every changed cell, when all of its cells are read.
+
+    ...
+
+    Attributes
+    ----------
+    base : numpy array
+        A board size by board size array with the code of the entity on
+        each cell, or 0 if the cell is empty, before the changed cells. It
+        may be a read-only view over the data that the battle was decoded
+        from, or the grid of another state.
+
+    changes : dict
+        The code of each (row, col) cell that changed over the base.
+
+    is_shared : bool
+        If the base may be read by another state, so it must not be changed.
+
+    ids : list
+        The ID of the entity of each code. The first item is always None,
+        the "code" of the empty cells.
+
+    codes : dict
+        The code of each entity ID.
+
+    """
+
+    def __init__(self, grid, ids=None, changes=None, is_shared=True):
+        self.base = grid
+        self.changes = changes or dict()
+        self.is_shared = is_shared
+        self.ids = ids or [None]
+        self.codes = {entity_id: code
+                      for code, entity_id in enumerate(self.ids)
+                      if entity_id is not None}
+
+    @property
+    def grid(self):
+        """Get the whole grid, copying its base once if any cell changed."""
+        if self.changes:
+            grid = numpy.array(self.base, CODE_TYPE)
+            rows, cols = zip(*self.changes)
+            grid[list(rows), list(cols)] = list(self.changes.values())
+            self.base = grid
+            self.changes = dict()
+            self.is_shared = False
+
+        return self.base
+
+    def cell(self, row, col):
+        """Get the code of a given cell."""
+        code = self.changes.get((row, col))
+        if code is None:
+            code = self.base[row, col]
+
+        return code
+
+    def set_cell(self, row, col, code):
+        """Set the code of a given cell, without changing a shared base."""
+        if self.is_shared:
+            self.changes[(row, col)] = code
+        else:
+            self.base[row, col] = code
+
+    def zone(self, top, bottom, left, right):
+        """Copy the codes of the cells between the given rows and cols."""
+        zone = numpy.array(self.base[top:bottom, left:right], CODE_TYPE)
+        for (row, col), code in self.changes.items():
+            if top <= row < bottom and left <= col < right:
+                zone[row - top, col - left] = code
+
+        return zone
+
+    def code(self, entity_id):
+        """Get the code of an entity ID, adding it to the table if needed."""
+        code = self.codes.get(entity_id)
+        if code is None:
+            code = len(self.ids)
+            self.ids.append(entity_id)
+            self.codes[entity_id] = code
+
+        return code
+
+    def lookup(self, codes):
+        """Get the entity IDs of an array of codes."""
+        return numpy.array(self.ids, dtype=object)[codes]
+
+    def __eq__(self, other):
+        return (isinstance(other, ArrayState) and
+                numpy.array_equal(self.lookup(self.grid),
+                                  other.lookup(other.grid)))
+
+
+class ArrayBoard:
+    """ArrayBoard Class.
+
+    This class handles boards that store their grid as a NumPy array of
+    entity codes, so the queries over many cells are array operations. Its
+    memory grows with the square of the board size, but each cell only
+    takes a few bytes.
+
+    """
+    name = 'array'
+
+    def create(self, board_size):
+        """Create the state of an empty board."""
+        return ArrayState(numpy.zeros((board_size, board_size), CODE_TYPE),
+                          is_shared=False)
+
+    def get(self, board, row, col):
+        """Get the ID of the entity in a given cell."""
+        state = board.get('state')
+
+        return state.ids[state.cell(row, col)]
+
+    def put(self, board, row, col, entity_id):
+        """Put an entity in a given cell."""
+        state = board.get('state')
+        state.set_cell(row, col, state.code(entity_id))
+
+    def clear(self, board, row, col):
+        """Remove any entity from a given cell."""
+        board.get('state').set_cell(row, col, 0)
+
+    def occupied(self, board):
+        """Iterate over every occupied cell as ((row, col), entity_id)."""
+        state = board.get('state')
+        rows, cols = numpy.nonzero(state.grid)
+        codes = state.grid[rows, cols]
+
+        return (((row, col), state.ids[code]) for row, col, code
+                in zip(rows.tolist(), cols.tolist(), codes.tolist()))
+
+    def rows(self, board):
+        """Iterate over the rows of the board."""
+        state = board.get('state')
+        for row in state.grid.tolist():
+            yield [state.ids[code] for code in row]
+
+    def copy(self, board, rows):
+        """Copy the state of a board, sharing its grid with the copy.
+
+        Both states only record their changed cells from now on, so neither
+        of them changes the grid that they share.
+
+        """
+        state = board.get('state')
+        state.is_shared = True
+
+        return ArrayState(state.base, list(state.ids), dict(state.changes))
+
+    def neighbours(self, board, row, col):
+        """List the occupied cells around a cell as ((row, col), entity_id).
+
+        The cells are found slicing the grid around the given cell, instead
+        of probing each one of them.
+
+        """
+        state = board.get('state')
+        top, left = max(row - 1, 0), max(col - 1, 0)
+        zone = state.zone(top, row + 2, left, col + 2)
+        rows, cols = numpy.nonzero(zone)
+        codes = zone[rows, cols]
+
+        return [((top + y, left + x), state.ids[code])
+                for y, x, code in zip(rows.tolist(), cols.tolist(),
+                                      codes.tolist())
+                if (top + y, left + x) != (row, col)]
+
+    def adjacent(self, board, is_source, is_target):
+        """List the target cells that are adjacent to any source cell.
+
+        Every cell is found at once, dilating the mask of the source cells
+        with a 3x3 kernel and crossing it with the mask of the target cells.
+        The mask is padded before being shifted, so the cells of one edge of
+        the board are never adjacent to the cells of the opposite edge.
+
+        """
+        state = board.get('state')
+        board_size = board.get('size')
+        sources = numpy.array([entity_id is not None and is_source(entity_id)
+                               for entity_id in state.ids])
+        targets = numpy.array([entity_id is not None and is_target(entity_id)
+                               for entity_id in state.ids])
+
+        padded_sources = numpy.pad(sources[state.grid], 1, 'constant')
+        zone = numpy.zeros((board_size, board_size), bool)
+        for y in range(3):
+            for x in range(3):
+                if (y, x) != (1, 1):
+                    zone |= padded_sources[y:y + board_size,
+                                           x:x + board_size]
+
+        rows, cols = numpy.nonzero(zone & targets[state.grid])
+        codes = state.grid[rows, cols]
+
+        return [((row, col), state.ids[code]) for row, col, code
+                in zip(rows.tolist(), cols.tolist(), codes.tolist())]
+
+
+ENGINES = dict()
+ENGINES.setdefault(DenseBoard.name, DenseBoard())
+ENGINES.setdefault(SparseBoard.name, SparseBoard())
+ENGINES.setdefault(ArrayBoard.name, ArrayBoard())
+
+
+def create(board_size, engine_name=None):
+    """Create a new empty board.
+
+    This function will create a new board using the given engine, or the
+    engine set on the BOARD_ENGINE configuration if none was given.
+
+    ...
+
+    Parameters
+    ----------
+    board_size : int
+        The size of the board that will be created.
+
+    engine_name : str
+        The name of the engine that will store the board state.
+
+    Returns
+    -------
+    board : dict
+        The new board, with its size and its state.
+
+    Raises
+    ------
+    ValueError
+        If the engine does not exist.
+
+    """
+    engine_name = engine_name or settings.get('BOARD_ENGINE', DEFAULT_ENGINE)
+    engine = ENGINES.get(engine_name)
+    if not engine:
+        raise ValueError(f"Unknown board engine: {engine_name}")
+
+    board = dict()
+    board['size'] = board_size
+    board['state'] = engine.create(board_size)
+
+    return board
+
+
+def engine_for(board):
+    """Get the engine of an existing board.
+
+    ...
+
+    Parameters
+    ----------
+    board : dict
+        The board that you are working on.
+
+    Returns
+    -------
+    engine : class
+        The engine that handles the state of the given board.
+
+    """
+    if isinstance(board.get('state'), dict):
+        return ENGINES.get(SparseBoard.name)
+
+    if isinstance(board.get('state'), ArrayState):
+        return ENGINES.get(ArrayBoard.name)
+
+    return ENGINES.get(DenseBoard.name)
+
+
+def is_inside(board, row, col):
+    """Check if a position is inside of the board.
+
+    ...
+
+    Parameters
+    ----------
+    board : dict
+        The board that you are working on.
+
+    row : int
+        The zero-based row of the position.
+
+    col : int
+        The zero-based column of the position.
+
+    """
+    board_size = board.get('size')
+
+    return 0 <= row < board_size and 0 <= col < board_size
+
+
+def get_cell(board, row, col):
+    """Get the ID of the entity in a given cell of the board."""
+    return engine_for(board).get(board, row, col)
+
+
+def put_cell(board, row, col, entity_id):
+    """Put an entity in a given cell of the board."""
+    engine_for(board).put(board, row, col, entity_id)
+
+
+def clear_cell(board, row, col):
+    """Remove any entity from a given cell of the board."""
+    engine_for(board).clear(board, row, col)
+
+
+def occupied_cells(board):
+    """Iterate over every occupied cell of the board."""
+    return engine_for(board).occupied(board)
+
+
+def neighbours(board, row, col):
+    """List the occupied cells around a given cell of the board.
+
+    ...
+
+    Parameters
+    ----------
+    board : dict
+        The board that you are working on.
+
+    row : int
+        The zero-based row of the cell.
+
+    col : int
+        The zero-based column of the cell.
+
+    Returns
+    -------
+    cells : list
+        The ((row, col), entity_id) of each occupied cell that is adjacent
+        to the given one, including the diagonals, inside of the board.
+
+    """
+    return engine_for(board).neighbours(board, row, col)
+
+
+def adjacent_cells(board, is_source, is_target):
+    """List the target cells that are adjacent to any source cell.
+
+    This function will find, over the whole board at once, every cell with
+    a target entity that has a source entity on any of its neighbour cells,
+    including the diagonals.
+
+    ...
+
+    Parameters
+    ----------
+    board : dict
+        The board that you are working on.
+
+    is_source : function
+        A function that checks if an entity ID is a source.
+
+    is_target : function
+        A function that checks if an entity ID is a target.
+
+    Returns
+    -------
+    cells : list
+        The ((row, col), entity_id) of each target cell, row by row.
+
+    """
+    return engine_for(board).adjacent(board, is_source, is_target)
+
+
+def copy(board, rows=()):
+    """Copy a board that is about to be changed.
+
+    This function will copy only the parts of the board that may change,
+    sharing everything else with the original board. Since both boards
+    share their unchanged parts, only change the given rows of the copy.
+
+    ...
+
+    Parameters
+    ----------
+    board : dict
+        The board that you are copying.
+
+    rows : iterable
+        The zero-based rows that will be changed on the copy.
+
+    Returns
+    -------
+    board : dict
+        The copy of the board.
+
+    """
+    copied_board = dict(board)
+    copied_board['state'] = engine_for(board).copy(board, set(rows))
+
+    return copied_board
+
+
+def rows(board):
+    """Iterate over the rows of the board, whatever engine it uses.
+
+    This is the adapter that our templates use to render a board as a grid,
+    with None on every empty cell.
+
+    """
+    return engine_for(board).rows(board)
+
+
+def _probe_neighbours(engine, board, row, col):
+    cells = list()
+    for y in (row - 1, row, row + 1):
+        for x in (col - 1, col, col + 1):
+            if (y, x) == (row, col) or not is_inside(board, y, x):
+                continue
+
+            entity_id = engine.get(board, y, x)
+            if entity_id:
+                cells.append(((y, x), entity_id))
+
+    return cells
+
+
+def _probe_adjacent(engine, board, is_source, is_target):
+    cells = dict()
+    for (row, col), entity_id in list(engine.occupied(board)):
+        if not is_source(entity_id):
+            continue
+
+        for position, neighbour in engine.neighbours(board, row, col):
+            if is_target(neighbour):
+                cells[position] = neighbour
+
+    return sorted(cells.items())
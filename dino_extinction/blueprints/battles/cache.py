@@ -0,0 +1,246 @@
+"""Battle Cache.
+
+This module keeps the most recently used battles, already decoded, in the
+memory of each worker. Reading a battle that did not change since it was
+cached does not cost any Redis round trip.
+
+Every save of a battle publishes "<battle id>:<version>" on the
+INVALIDATION_CHANNEL of Redis (the Lua scripts publish on it too). Each
+worker listens to that channel and drops the copies that are older than the
+published version. The cache is disabled while the worker is not listening
+to it, and when the BATTLE_CACHE_SIZE configuration is 0.
+
+A battle can also be asked to be younger than a maximum age, so it is loaded
+again from time to time, refreshing the expiration of its keys.
+
+Cached battles are shared between requests, so they must never be changed.
+Copy them before doing so, as our models already do.
+
+"""
+import time
+
+from collections import OrderedDict
+from threading import Lock
+from redis.exceptions import RedisError
+from dino_extinction.infrastructure import (metrics, redis, settings)
+
+INVALIDATION_CHANNEL = 'battles:invalidate'
+DEFAULT_SIZE = 0
+LISTENER_SLEEP_TIME = 1
+
+
+class BattleCache:
+    """BattleCache Class.
+
+    This class is a size-bounded LRU of decoded battles, invalidated by the
+    messages of our invalidation channel.
+
+    ...
+
+    Attributes
+    ----------
+    battles : OrderedDict
+        The cached battles by ID, from the least to the most recently used.
+
+    versions : OrderedDict
+        The latest published version of each battle, so we do not cache a
+        battle that was loaded right before a newer one was saved.
+
+    cached_at : dict
+        When each battle was cached, in seconds of a monotonic clock.
+
+    size : int
+        The last BATTLE_CACHE_SIZE read inside an app context, so the
+        listener thread, that runs outside of it, keeps the same bound.
+
+    """
+
+    def __init__(self):
+        self.size = DEFAULT_SIZE
+        self.battles = OrderedDict()
+        self.versions = OrderedDict()
+        self.cached_at = dict()
+        self.lock = Lock()
+        self.listener_lock = Lock()
+        self.listener = None
+        self.client = None
+
+    def enabled(self):
+        """Check if the cache can be used, listening to invalidations."""
+        if not self._size():
+            return False
+
+        return self._listen()
+
+    def get(self, battle_id, version=None, max_age=None):
+        """Get a cached battle.
+
+        ...
+
+        Parameters
+        ----------
+        battle_id : int
+            The ID of the battle that you are trying to get.
+
+        version : int
+            If given, the battle will only be returned if it is cached on
+            this exact version.
+
+        max_age : float
+            If given, the battle will only be returned if it was cached at
+            most this many seconds ago.
+
+        Returns
+        -------
+        battle : dict
+            The cached battle, or None if it is not cached.
+
+        """
+        key = str(battle_id)
+        with self.lock:
+            battle = self.battles.get(key)
+            is_hit = battle is not None and (
+                version is None or battle.get('version', 0) == version)
+            is_hit = is_hit and (
+                max_age is None or
+                time.monotonic() - self.cached_at.get(key, 0) <= max_age)
+
+            if is_hit:
+                self.battles.move_to_end(key)
+
+        metrics.increment('battle_cache_hits' if is_hit
+                          else 'battle_cache_misses', battle_id)
+
+        return battle if is_hit else None
+
+    def put(self, battle_id, battle):
+        """Cache a battle, evicting the least recently used ones if needed.
+
+        The battle will not be cached if a newer version of it was already
+        published.
+
+        """
+        key = str(battle_id)
+        size = self._size()
+        evictions = 0
+
+        with self.lock:
+            if battle.get('version', 0) < self.versions.get(key, 0):
+                return
+
+            self.battles[key] = battle
+            self.battles.move_to_end(key)
+            self.cached_at[key] = time.monotonic()
+            while len(self.battles) > size:
+                evicted_key, _ = self.battles.popitem(last=False)
+                self.cached_at.pop(evicted_key, None)
+                evictions += 1
+
+        if evictions:
+            metrics.increment('battle_cache_evictions', amount=evictions)
+
+    def invalidate(self, battle_id, version=None):
+        """Drop a cached battle.
+
+        ...
+
+        Parameters
+        ----------
+        battle_id : int
+            The ID of the battle that has changed.
+
+        version : int
+            The new version of the battle. If given, the cached battle will
+            only be dropped if it is older than it.
+
+        """
+        key = str(battle_id)
+        with self.lock:
+            if version is not None:
+                latest_version = max(version, self.versions.get(key, 0))
+                self.versions[key] = latest_version
+                self.versions.move_to_end(key)
+                while len(self.versions) > self._size():
+                    self.versions.popitem(last=False)
+
+            battle = self.battles.get(key)
+            is_stale = battle is not None and (
+                version is None or battle.get('version', 0) < version)
+
+            if is_stale:
+                del self.battles[key]
+                self.cached_at.pop(key, None)
+
+        if is_stale:
+            metrics.increment('battle_cache_invalidations', battle_id)
+
+    def clear(self):
+        """Drop every cached battle."""
+        with self.lock:
+            self.battles.clear()
+            self.versions.clear()
+            self.cached_at.clear()
+
+    def _size(self):
+        self.size = settings.get('BATTLE_CACHE_SIZE', self.size)
+        return self.size
+
+    def _listen(self):
+        client = redis.instance
+        if self._is_listening(client):
+            return True
+
+        with self.listener_lock:
+            if self._is_listening(client):
+                return True
+
+            if self.listener:
+                self.listener.stop()
+
+            self.listener = None
+            self.clear()
+
+            try:
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{INVALIDATION_CHANNEL: self._on_message})
+            except RedisError:
+                return False
+
+            self.client = client
+            self.listener = pubsub.run_in_thread(
+                sleep_time=LISTENER_SLEEP_TIME,
+                daemon=True)
+
+        return True
+
+    def _is_listening(self, client):
+        return (self.listener is not None and
+                self.listener.is_alive() and
+                self.client is client)
+
+    def _on_message(self, message):
+        battle_id, version = message.get('data').decode('utf-8').rsplit(':', 1)
+        self.invalidate(battle_id, int(version))
+
+
+instance = BattleCache()
+
+
+def publish(client, battle_id, version):
+    """Publish that a battle was saved on a new version.
+
+    ...
+
+    Parameters
+    ----------
+    client : class
+        The Redis client or pipeline that is saving the battle.
+
+    battle_id : int
+        The ID of the battle that was saved.
+
+    version : int
+        The new version of the battle.
+
+    """
+    client.publish(INVALIDATION_CHANNEL, f"{battle_id}:{version}")
@@ -0,0 +1,579 @@
+"""Battle Codec.
+
+This module is responsible for serializing our battles into a compact and
+versioned binary format, and for loading them back as the Python dicts that
+the rest of our API works with.
+
+Every integer of the format is unsigned. The header and the entity table are
+big-endian, while the cells of the grid are little-endian.
+
+    header   : magic (4s) | version (B) | cell width (B) | board size (I) |
+               number of entities (I) | battle version (I) |
+               compression (B) | body size (I)
+    entities : id length (B) | id (utf-8) | type (B) | direction (B) |
+               row (I) | col (I)
+    grid     : board size * board size cells, row by row. Each cell holds
+               the 1-based index of the entity on the entity table, or 0
+               if the cell is empty.
+
+Sparse boards are stored with a cell width of 0. Instead of the grid, they
+only have their occupied cells: row (I) | col (I) | entity index (I).
+
+Array boards are stored with the same grid, but with the ARRAY_CELL_FLAG bit
+set on their cell width. Their grid is written straight from their array,
+and it is loaded back as a read-only array over the encoded data, without
+copying it.
+
+Entities with the NO_TYPE type are only known by the board, without a
+record inside the battle entities.
+
+The body of the battle (its entity table and its grid) may be compressed,
+when it is bigger than the threshold given to the encoder. The compression
+byte of the header tells how: NO_COMPRESSION or ZLIB_COMPRESSION. The header
+itself is never compressed, so the version of a battle is always read from
+its first bytes, and the body size is the size of the body before it was
+compressed.
+
+The first version of the format did not have the battle version on its
+header, and the second one did not have the compression. Those battles are
+still decoded, as if they were on version 0 and not compressed.
+
+"""
+import pickle
+import re
+import struct
+import zlib
+import numpy
+
+from . import boards
+
+MAGIC = b'DINO'
+VERSION = 3
+
+PREFIX = struct.Struct('>4sB')
+HEADERS = dict()
+HEADERS.setdefault(1, struct.Struct('>4sBBII'))
+HEADERS.setdefault(2, struct.Struct('>4sBBIII'))
+HEADERS.setdefault(3, struct.Struct('>4sBBIIIBI'))
+HEADER = HEADERS.get(VERSION)
+ENTITY_ID_LENGTH = struct.Struct('>B')
+ENTITY = struct.Struct('>BBII')
+SPARSE_CELL = struct.Struct('>III')
+MAX_ENTITY_SIZE = ENTITY_ID_LENGTH.size + 255 + ENTITY.size
+
+NO_TYPE = 0
+TYPES = [None, 'ROBOT', 'DINOSSAUR']
+DIRECTIONS = [None, 'north', 'east', 'south', 'west']
+
+SPARSE_CELL_WIDTH = 0
+ARRAY_CELL_FLAG = 0x80
+CELL_TYPECODES = {1: 'B', 2: 'H', 4: 'I'}
+PICKLE_PROTOCOL_MARK = b'\x80'
+FILLED_BYTE = re.compile(b'[^\x00]')
+
+NO_COMPRESSION = 0
+ZLIB_COMPRESSION = 1
+DEFAULT_COMPRESSION_LEVEL = 6
+
+
+def encode(battle, compress_above=None, level=DEFAULT_COMPRESSION_LEVEL):
+    """Encode a battle into our binary format.
+
+    This function will pack the entities of the battle into the entity table
+    and the board state into a small int grid that points to that table.
+
+    ...
+
+    Parameters
+    ----------
+    battle : dict
+        The battle that you are trying to encode.
+
+    compress_above : int
+        The size, in bytes, above which the body of the battle is compressed
+        with zlib. If it is None, the battle is never compressed. The body
+        is kept uncompressed if compressing it does not make it smaller.
+
+    level : int
+        The zlib compression level, from 1 (fastest) to 9 (smallest).
+
+    Returns
+    -------
+    raw_data : bytes
+        The encoded battle.
+
+    """
+    board = battle.get('board')
+    board_size = board.get('size')
+    board_state = board.get('state')
+    entities = battle.get('entities') or dict()
+
+    entity_ids = list(entities)
+    indexes = {entity_id: index + 1
+               for index, entity_id in enumerate(entity_ids)}
+    indexes[None] = 0
+
+    engine_name = boards.engine_for(board).name
+    is_sparse = engine_name == boards.SparseBoard.name
+    is_array = engine_name == boards.ArrayBoard.name
+    if is_sparse:
+        described = False
+        occupied = board_state.values()
+    elif is_array:
+        described = board_state.ids[1:] == entity_ids
+        occupied = (board_state.ids[code]
+                    for code in board_state.grid.ravel()[
+                        numpy.flatnonzero(board_state.grid)].tolist())
+    else:
+        described = _is_described_by_entities(board_state, entities)
+        occupied = (cell for row in board_state
+                    if row.count(None) != board_size for cell in row)
+
+    if not described:
+        for cell in occupied:
+            if cell not in indexes:
+                entity_ids.append(cell)
+                indexes[cell] = len(entity_ids)
+
+    table = bytearray()
+    for entity_id in entity_ids:
+        table += _encode_entity(entity_id, entities.get(entity_id))
+
+    if is_sparse:
+        cell_width = SPARSE_CELL_WIDTH
+        grid = _encode_sparse_cells(board_state, indexes)
+    elif is_array:
+        cell_width = _cell_width(len(entity_ids))
+        grid = _encode_array(board_state, indexes, cell_width, described)
+        cell_width |= ARRAY_CELL_FLAG
+    else:
+        cell_width = _cell_width(len(entity_ids))
+        grid = _encode_grid(board_state,
+                            entities,
+                            indexes,
+                            cell_width,
+                            described)
+
+    body = [bytes(table), grid]
+    body_size = len(table) + len(grid)
+    compression = NO_COMPRESSION
+    if compress_above is not None and body_size > compress_above:
+        compressed_body = zlib.compress(b''.join(body), level)
+        if len(compressed_body) < body_size:
+            body = [compressed_body]
+            compression = ZLIB_COMPRESSION
+
+    header = HEADER.pack(MAGIC,
+                         VERSION,
+                         cell_width,
+                         board_size,
+                         len(entity_ids),
+                         battle.get('version', 0),
+                         compression,
+                         body_size)
+
+    return b''.join([header] + body)
+
+
+def decode(raw_data):
+    """Decode a battle from our binary format.
+
+    This function will unpack a battle that was encoded by this module. It
+    is also able to load battles that were stored as pickles by the previous
+    versions of our API.
+
+    ...
+
+    Parameters
+    ----------
+    raw_data : bytes
+        The encoded battle.
+
+    Returns
+    -------
+    battle : dict
+        The decoded battle, always containing the board, the entities and
+        the version of the battle.
+
+    Raises
+    ------
+    ValueError
+        If the data is not a battle or was encoded by an unknown version.
+
+    """
+    if raw_data[:1] == PICKLE_PROTOCOL_MARK:
+        battle = pickle.loads(raw_data)
+        battle.setdefault('entities', dict())
+        battle.setdefault('version', 0)
+
+        return battle
+
+    (cell_width, board_size, total, battle_version, compression,
+     offset) = _read_header(raw_data)
+    if compression == ZLIB_COMPRESSION:
+        raw_data = zlib.decompress(memoryview(raw_data)[offset:])
+        offset = 0
+
+    entity_ids, entities, offset = _decode_entities(raw_data, offset, total)
+
+    board = dict()
+    board['size'] = board_size
+    if cell_width == SPARSE_CELL_WIDTH:
+        board['state'] = _decode_sparse_cells(raw_data[offset:], entity_ids)
+    elif cell_width & ARRAY_CELL_FLAG:
+        board['state'] = _decode_array(raw_data,
+                                       offset,
+                                       entity_ids,
+                                       board_size,
+                                       cell_width & ~ARRAY_CELL_FLAG)
+    else:
+        board['state'] = _decode_grid(raw_data[offset:],
+                                      entity_ids,
+                                      board_size,
+                                      cell_width)
+
+    battle = dict()
+    battle['board'] = board
+    battle['entities'] = entities
+    battle['version'] = battle_version
+
+    return battle
+
+
+def decode_state(raw_data):
+    """Decode the state of a battle from our binary format.
+
+    This function will only unpack the header and the entity table of a
+    battle, without its grid, so its cost grows with the number of entities
+    instead of the size of the board. If the battle is compressed, only the
+    start of its body that may hold the entity table is decompressed, and
+    nothing at all if it has no entities.
+
+    ...
+
+    Parameters
+    ----------
+    raw_data : bytes
+        The encoded battle.
+
+    Returns
+    -------
+    state : dict
+        The size of the board, the version and the entities of the battle.
+
+    Raises
+    ------
+    ValueError
+        If the data is not a battle or was encoded by an unknown version.
+
+    """
+    if raw_data[:1] == PICKLE_PROTOCOL_MARK:
+        battle = decode(raw_data)
+        state = dict()
+        state['size'] = battle.get('board').get('size')
+        state['version'] = battle.get('version')
+        state['entities'] = battle.get('entities')
+
+        return state
+
+    _, board_size, total, battle_version, compression, offset = _read_header(
+        raw_data)
+    if compression == ZLIB_COMPRESSION and total:
+        raw_data = zlib.decompressobj().decompress(
+            memoryview(raw_data)[offset:], total * MAX_ENTITY_SIZE)
+        offset = 0
+
+    _, entities, _ = _decode_entities(raw_data, offset, total)
+
+    state = dict()
+    state['size'] = board_size
+    state['version'] = battle_version
+    state['entities'] = entities
+
+    return state
+
+
+def decode_state_prefix(raw_prefix):
+    """Decode the state of a battle from the start of its encoded data.
+
+    This function works just like decode_state, but over only the first
+    bytes of a battle, so its grid does not have to be read at all.
+
+    ...
+
+    Parameters
+    ----------
+    raw_prefix : bytes
+        The first bytes of the encoded battle.
+
+    Returns
+    -------
+    state : dict
+        The size of the board, the version and the entities of the battle,
+        or None if the given bytes end before its entity table does.
+
+    Raises
+    ------
+    ValueError
+        If the data is not a battle or was encoded by an unknown version.
+
+    """
+    if raw_prefix[:1] == PICKLE_PROTOCOL_MARK:
+        return None
+
+    try:
+        return decode_state(raw_prefix)
+    except (IndexError, UnicodeDecodeError, struct.error):
+        return None
+
+
+def read_version(raw_header):
+    """Read the version of a battle from the start of its encoded data.
+
+    This function allows us to know the version of a battle reading only
+    the first HEADER.size bytes of it, without decoding the entire battle.
+
+    ...
+
+    Parameters
+    ----------
+    raw_header : bytes
+        The start of an encoded battle.
+
+    Returns
+    -------
+    version : int
+        The version of the battle, or 0 if its format does not store it.
+
+    Raises
+    ------
+    ValueError
+        If the data is not a battle or was encoded by an unknown version.
+
+    """
+    if raw_header[:1] == PICKLE_PROTOCOL_MARK:
+        return 0
+
+    magic, version = PREFIX.unpack_from(raw_header)
+    if magic != MAGIC:
+        raise ValueError('This data is not an encoded battle')
+
+    header = HEADERS.get(version)
+    if not header:
+        raise ValueError(f"Unknown battle codec version: {version}")
+
+    _, _, _, _, _, *battle_version = header.unpack_from(raw_header)
+
+    return battle_version[0] if battle_version else 0
+
+
+def compression_ratio(raw_data):
+    """Measure how much smaller an encoded battle is than its raw format.
+
+    ...
+
+    Parameters
+    ----------
+    raw_data : bytes
+        An encoded battle.
+
+    Returns
+    -------
+    ratio : float
+        The size of the battle without compression divided by its encoded
+        size, so 1.0 if it is not compressed.
+
+    """
+    magic, version = PREFIX.unpack_from(raw_data)
+    if magic != MAGIC or version < VERSION:
+        return 1.0
+
+    fields = HEADER.unpack_from(raw_data)
+    body_size = fields[-1]
+
+    return (HEADER.size + body_size) / len(raw_data)
+
+
+def _read_header(raw_data):
+    magic, version = PREFIX.unpack_from(raw_data)
+    if magic != MAGIC:
+        raise ValueError('This data is not an encoded battle')
+
+    header = HEADERS.get(version)
+    if not header:
+        raise ValueError(f"Unknown battle codec version: {version}")
+
+    fields = header.unpack_from(raw_data)
+    _, _, cell_width, board_size, total = fields[:5]
+    battle_version, compression = (fields[5:] + (0, NO_COMPRESSION))[:2]
+    if compression not in (NO_COMPRESSION, ZLIB_COMPRESSION):
+        raise ValueError(f"Unknown battle compression: {compression}")
+
+    return (cell_width, board_size, total, battle_version, compression,
+            header.size)
+
+
+def _decode_entities(raw_data, offset, total):
+    entity_ids = [None]
+    entities = dict()
+    for _ in range(total):
+        entity_id, entity, offset = _decode_entity(raw_data, offset)
+        entity_ids.append(entity_id)
+        if entity:
+            entities[entity_id] = entity
+
+    return entity_ids, entities, offset
+
+
+def _encode_entity(entity_id, entity):
+    raw_id = entity_id.encode('utf-8')
+    if not entity:
+        return (ENTITY_ID_LENGTH.pack(len(raw_id)) + raw_id +
+                ENTITY.pack(NO_TYPE, 0, 0, 0))
+
+    entity_type = TYPES.index(entity.get('type'))
+    direction = DIRECTIONS.index(entity.get('direction'))
+    row, col = entity.get('position')
+
+    return (ENTITY_ID_LENGTH.pack(len(raw_id)) + raw_id +
+            ENTITY.pack(entity_type, direction, row, col))
+
+
+def _decode_entity(raw_data, offset):
+    id_length = raw_data[offset]
+    offset += ENTITY_ID_LENGTH.size
+    entity_id = raw_data[offset:offset + id_length].decode('utf-8')
+    offset += id_length
+
+    entity_type, direction, row, col = ENTITY.unpack_from(raw_data, offset)
+    offset += ENTITY.size
+    if entity_type == NO_TYPE:
+        return entity_id, None, offset
+
+    entity = dict()
+    entity['id'] = entity_id
+    entity['type'] = TYPES[entity_type]
+    if direction:
+        entity['direction'] = DIRECTIONS[direction]
+    entity['position'] = [row, col]
+
+    return entity_id, entity, offset
+
+
+def _cell_width(total_entities):
+    if total_entities < 2 ** 8:
+        return 1
+
+    if total_entities < 2 ** 16:
+        return 2
+
+    return 4
+
+
+def _is_described_by_entities(board_state, entities):
+    board_size = len(board_state)
+    occupied_cells = sum(board_size - row.count(None) for row in board_state)
+    if occupied_cells != len(entities):
+        return False
+
+    for entity_id, entity in entities.items():
+        row, col = entity.get('position')
+        if board_state[row - 1][col - 1] != entity_id:
+            return False
+
+    return True
+
+
+def _encode_grid(board_state, entities, indexes, cell_width, described):
+    board_size = len(board_state)
+    grid = bytearray(board_size * board_size * cell_width)
+    cell = struct.Struct('<' + CELL_TYPECODES.get(cell_width))
+
+    if described:
+        for entity_id, entity in entities.items():
+            row, col = entity.get('position')
+            offset = ((row - 1) * board_size + col - 1) * cell_width
+            cell.pack_into(grid, offset, indexes[entity_id])
+
+        return bytes(grid)
+
+    for row_index, row in enumerate(board_state):
+        if row.count(None) == board_size:
+            continue
+
+        for col_index, entity_id in enumerate(row):
+            if not entity_id:
+                continue
+
+            offset = (row_index * board_size + col_index) * cell_width
+            cell.pack_into(grid, offset, indexes[entity_id])
+
+    return bytes(grid)
+
+
+def _encode_sparse_cells(board_state, indexes):
+    return b''.join(SPARSE_CELL.pack(row, col, indexes[entity_id])
+                    for (row, col), entity_id in board_state.items())
+
+
+def _decode_sparse_cells(raw_cells, entity_ids):
+    board_state = dict()
+    for row, col, entity_index in SPARSE_CELL.iter_unpack(raw_cells):
+        board_state[(row, col)] = entity_ids[entity_index]
+
+    return board_state
+
+
+def _encode_array(board_state, indexes, cell_width, described):
+    cell_type = _array_type(cell_width)
+    if described:
+        return board_state.grid.astype(cell_type).tobytes()
+
+    remap = numpy.zeros(len(board_state.ids), cell_type)
+    for code, entity_id in enumerate(board_state.ids):
+        remap[code] = indexes.get(entity_id, 0)
+
+    cells = board_state.grid.ravel()
+    filled = numpy.flatnonzero(cells)
+    grid = numpy.zeros(cells.size, cell_type)
+    grid[filled] = remap[cells[filled]]
+
+    return grid.tobytes()
+
+
+def _decode_array(raw_data, offset, entity_ids, board_size, cell_width):
+    grid = numpy.frombuffer(raw_data,
+                            dtype=_array_type(cell_width),
+                            count=board_size * board_size,
+                            offset=offset)
+
+    return boards.ArrayState(grid.reshape(board_size, board_size), entity_ids)
+
+
+def _array_type(cell_width):
+    return numpy.dtype(f"<u{cell_width}")
+
+
+def _decode_grid(raw_grid, entity_ids, board_size, cell_width):
+    cell = struct.Struct('<' + CELL_TYPECODES.get(cell_width))
+    row_length = board_size * cell_width
+    empty_raw_row = bytes(row_length)
+
+    board_state = list()
+    for start in range(0, board_size * row_length, row_length):
+        row = [None] * board_size
+        board_state.append(row)
+
+        raw_row = raw_grid[start:start + row_length]
+        if raw_row == empty_raw_row:
+            continue
+
+        for match in FILLED_BYTE.finditer(raw_row):
+            col_index = match.start() // cell_width
+            if row[col_index]:
+                continue
+
+            entity_index, = cell.unpack_from(raw_row, col_index * cell_width)
+            row[col_index] = entity_ids[entity_index]
+
+    return board_state
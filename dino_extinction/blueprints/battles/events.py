@@ -0,0 +1,289 @@
+"""Battle Events.
+
+This module pushes the changes of our battles to their live spectators.
+
+Every save of a battle publishes, on the battle's own channel, the version
+that it was saved on and the delta events that led to it: the entities that
+were created, moved, turned or destroyed (the Lua scripts publish them
+too). Entities are positioned by xPosition and yPosition, just like the
+state of the battle.
+
+Each worker listens to every battle channel on a single connection, and
+dispatches each message to the spectators of its battle. A spectator that
+falls MAX_PENDING messages behind is marked as lagged, so it can start over
+from a new snapshot of the battle instead of skipping deltas.
+
+"""
+import json
+import queue
+
+from threading import Lock
+from redis.exceptions import RedisError
+from dino_extinction.infrastructure import redis
+
+CHANNEL_PREFIX = 'battles:events:'
+LAGGED = 'lagged'
+MAX_PENDING = 256
+DEFAULT_KEEPALIVE = 15
+LISTENER_SLEEP_TIME = 1
+
+
+class EventListener:
+    """EventListener Class.
+
+    This class subscribes to the channels of every battle and keeps a queue
+    of pending messages for each spectator.
+
+    ...
+
+    Attributes
+    ----------
+    spectators : dict
+        The queues of the spectators of each battle.
+
+    """
+
+    def __init__(self):
+        self.spectators = dict()
+        self.lock = Lock()
+        self.listener_lock = Lock()
+        self.listener = None
+        self.client = None
+
+    def subscribe(self, battle_id):
+        """Start watching a battle.
+
+        ...
+
+        Parameters
+        ----------
+        battle_id : int
+            The ID of the battle that will be watched.
+
+        Returns
+        -------
+        subscription : Queue
+            The queue that receives each message of the battle, as a dict
+            with its version and its events, or LAGGED if the spectator fell
+            too far behind. None if we can not listen to the battles.
+
+        """
+        if not self._listen():
+            return None
+
+        subscription = queue.Queue(MAX_PENDING)
+        with self.lock:
+            self.spectators.setdefault(str(battle_id), set()).add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, battle_id, subscription):
+        """Stop watching a battle."""
+        key = str(battle_id)
+        with self.lock:
+            subscriptions = self.spectators.get(key, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self.spectators.pop(key, None)
+
+    def dispatch(self, battle_id, message):
+        """Send a message to every spectator of a battle."""
+        with self.lock:
+            subscriptions = list(self.spectators.get(str(battle_id), ()))
+
+        for subscription in subscriptions:
+            try:
+                subscription.put_nowait(message)
+            except queue.Full:
+                _mark_lagged(subscription)
+
+    def _listen(self):
+        client = redis.instance
+        if self._is_listening(client):
+            return True
+
+        with self.listener_lock:
+            if self._is_listening(client):
+                return True
+
+            if self.listener:
+                self.listener.stop()
+
+            self.listener = None
+
+            try:
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(**{CHANNEL_PREFIX + '*': self._on_message})
+            except RedisError:
+                return False
+
+            self.client = client
+            self.listener = pubsub.run_in_thread(
+                sleep_time=LISTENER_SLEEP_TIME,
+                daemon=True)
+
+        return True
+
+    def _is_listening(self, client):
+        return (self.listener is not None and
+                self.listener.is_alive() and
+                self.client is client)
+
+    def _on_message(self, message):
+        channel = message.get('channel').decode('utf-8')
+        battle_id = channel[len(CHANNEL_PREFIX):]
+        self.dispatch(battle_id, json.loads(message.get('data')))
+
+
+instance = EventListener()
+
+
+def channel(battle_id):
+    """Get the channel of the events of a battle."""
+    return f"{CHANNEL_PREFIX}{battle_id}"
+
+
+def deltas(battle, updated_battle):
+    """List the delta events between two states of a battle.
+
+    ...
+
+    Parameters
+    ----------
+    battle : dict
+        The previous state of the battle, or None if it is new.
+
+    updated_battle : dict
+        The new state of the battle.
+
+    Returns
+    -------
+    events : list
+        A dict for each entity that was created, moved, turned or destroyed.
+
+    """
+    entities = (battle or dict()).get('entities') or dict()
+    updated_entities = updated_battle.get('entities') or dict()
+    events = list()
+
+    for entity_id, entity in updated_entities.items():
+        previous_entity = entities.get(entity_id)
+        if previous_entity is entity:
+            continue
+
+        if previous_entity is None:
+            events.append(_created(entity_id, entity))
+            continue
+
+        if previous_entity.get('position') != entity.get('position'):
+            row, col = entity.get('position')
+            events.append(_event('moved', entity_id,
+                                 xPosition=col, yPosition=row))
+
+        if previous_entity.get('direction') != entity.get('direction'):
+            events.append(_event('turned', entity_id,
+                                 direction=entity.get('direction')))
+
+    for entity_id in entities:
+        if entity_id not in updated_entities:
+            events.append(_event('destroyed', entity_id))
+
+    return events
+
+
+def publish(client, battle_id, version, events):
+    """Publish the delta events of a battle.
+
+    ...
+
+    Parameters
+    ----------
+    client : class
+        The Redis client or pipeline that is saving the battle.
+
+    battle_id : int
+        The ID of the battle that was saved.
+
+    version : int
+        The new version of the battle.
+
+    events : list
+        The delta events that led the battle to its new version.
+
+    """
+    message = dict()
+    message['version'] = version
+    message['events'] = events
+
+    client.publish(channel(battle_id),
+                   json.dumps(message, separators=(',', ':')))
+
+
+def wait(subscription, timeout):
+    """Wait for the next message of a subscription, or None on a timeout."""
+    try:
+        return subscription.get(timeout=timeout)
+    except queue.Empty:
+        return None
+
+
+def format_event(name, data, event_id=None):
+    """Format an event of a Server-Sent Events stream.
+
+    ...
+
+    Parameters
+    ----------
+    name : str
+        The name of the event.
+
+    data : dict
+        The data of the event, that will be sent as JSON.
+
+    event_id : int
+        The ID of the event, sent back by the spectator when it reconnects.
+
+    Returns
+    -------
+    event : str
+        The formatted event.
+
+    """
+    lines = list()
+    lines.append(f"event: {name}")
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+
+    return '\n'.join(lines) + '\n\n'
+
+
+def _created(entity_id, entity):
+    row, col = entity.get('position')
+    data = dict()
+    data['type'] = entity.get('type')
+    if entity.get('direction'):
+        data['direction'] = entity.get('direction')
+    data['xPosition'] = col
+    data['yPosition'] = row
+
+    return _event('created', entity_id, **data)
+
+
+def _event(name, entity_id, **data):
+    event = dict()
+    event['event'] = name
+    event['id'] = entity_id
+    event.update(data)
+
+    return event
+
+
+def _mark_lagged(subscription):
+    while True:
+        try:
+            subscription.get_nowait()
+        except queue.Empty:
+            break
+
+    subscription.put_nowait(LAGGED)
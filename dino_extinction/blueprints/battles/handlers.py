@@ -6,7 +6,7 @@ Battle Module API. They will be used inside our routes.
 """
 import json
 
-from random import randint
+from dino_extinction.infrastructure import ids
 from . import models
 
 def new_battle(board_size=50):
@@ -39,10 +39,138 @@ def new_battle(board_size=50):
 
     """
     battle = dict()
-    battle['id'] = randint(999, 9999)
+    battle['id'] = ids.new_battle_id()
     battle['board_size'] = board_size
 
     model = models.BattleSchema()
     created_battle = model.dumps(battle)
 
     return created_battle.errors, battle
+
+
+def battle_state(battle_id, window=None):
+    """Get the state of a battle.
+
+    This handler gets the size of the board, the version and only the
+    occupied cells of a battle, with the entity on each one of them. The
+    board itself is never walked, so its cost grows with the number of
+    entities instead of the size of the board.
+
+    ...
+
+    Parameters
+    ----------
+    battle_id : int
+        The ID of the battle that you are trying to get.
+
+    window : tuple
+        The xPosition and yPosition of the first cell, the width and the
+        height of a window of the board. If given, only the entities inside
+        of it are returned.
+
+    Returns
+    -------
+    errors : str
+        The reason why the state was not found (if any).
+
+    state : dict
+        The state of the battle, with its entities positioned by xPosition
+        and yPosition just like our requests.
+
+    """
+    state = models.BattleSchema().get_state(battle_id)
+    if not state:
+        return 'This battle does not exist', None
+
+    entities = list()
+    for entity_id, entity in state.get('entities').items():
+        row, col = entity.get('position')
+        if window and not _is_inside(window, row, col):
+            continue
+
+        data = dict()
+        data['id'] = entity_id
+        data['type'] = entity.get('type')
+        if entity.get('direction'):
+            data['direction'] = entity.get('direction')
+        data['xPosition'] = col
+        data['yPosition'] = row
+
+        entities.append(data)
+
+    battle = dict()
+    battle['battleId'] = battle_id
+    battle['size'] = state.get('size')
+    battle['version'] = state.get('version')
+    battle['entities'] = entities
+
+    return None, battle
+
+
+def battle_window(battle_id, window):
+    """Get a window of the board of a battle.
+
+    This handler gets only the cells and the entities of a battle inside a
+    rectangular window of its board, clipped to the board. The cells are
+    filled from the entities of the battle, without decoding its board, so
+    its cost grows with the number of entities and the area of the window
+    instead of the size of the board.
+
+    ...
+
+    Parameters
+    ----------
+    battle_id : int
+        The ID of the battle that you are trying to get.
+
+    window : tuple
+        The xPosition and yPosition of the first cell, the width and the
+        height of the window.
+
+    Returns
+    -------
+    errors : str
+        The reason why the window was not found (if any).
+
+    window : dict
+        The size and the version of the battle, the clipped window, its
+        rows of cells, with the ID of the entity on each occupied one, and
+        the entities inside of it, by ID.
+
+    """
+    state = models.BattleSchema().get_state(battle_id)
+    if not state:
+        return 'This battle does not exist', None
+
+    size = state.get('size')
+    x_position, y_position, width, height = window
+    width = max(min(width, size - x_position + 1), 0)
+    height = max(min(height, size - y_position + 1), 0)
+    clipped_window = (x_position, y_position, width, height)
+
+    rows = [[None] * width for _ in range(height)]
+    entities = dict()
+    for entity_id, entity in state.get('entities').items():
+        row, col = entity.get('position')
+        if not _is_inside(clipped_window, row, col):
+            continue
+
+        rows[row - y_position][col - x_position] = entity_id
+        entities[entity_id] = entity
+
+    board_window = dict()
+    board_window['battleId'] = battle_id
+    board_window['size'] = size
+    board_window['version'] = state.get('version')
+    board_window['window'] = clipped_window
+    board_window['rows'] = rows
+    board_window['entities'] = entities
+
+    return None, board_window
+
+
+def _is_inside(window, row, col):
+    x_position, y_position, width, height = window
+
+    return (x_position <= col < x_position + width and
+            y_position <= row < y_position + height)
@@ -3,12 +3,16 @@
 This module contains all the classes and methods regarding our
 battles blueprint models.
 
-"""
-import pickle
+The methods that change a battle never change the battle that they receive.
+They return a new battle that shares every unchanged row, dict and entity
+with the original one, so only change a battle through these methods.
 
-from copy import deepcopy
+"""
 from marshmallow import (Schema, fields, validates, post_dump, ValidationError)
-from dino_extinction.infrastructure import redis
+from dino_extinction.infrastructure import ids
+from . import boards
+from . import scripts
+from . import storage
 
 
 class BattleSchema(Schema):
@@ -36,7 +40,8 @@ class BattleSchema(Schema):
         """Validate the length of battle ID.
 
         This validator checks if the number of digits of our current
-        battle ID is 4. If not, it will raise an error.
+        battle ID is between 4 and the ID_DIGITS configuration. If not, it
+        will raise an error.
 
         ...
 
@@ -44,14 +49,11 @@ class BattleSchema(Schema):
 
         ------
         ValidationError
-            If the number of digits of the ID is different than 4.
+            If the number of digits of the ID is out of that range.
 
         """
-        digits = str(data)
-        number_of_digits = len(digits)
-
-        if number_of_digits != 4:
-            raise ValidationError('The battle ID should be 4 digits long.')
+        if not ids.is_battle_id(data):
+            raise ValidationError(ids.battle_id_error())
 
     @post_dump
     def create_battle(self, data):
@@ -70,16 +72,11 @@ class BattleSchema(Schema):
 
         """
         board_size = data['board_size']
-        board_state = [[None] * board_size for _ in range(board_size)]
-
-        board = dict()
-        board['size'] = board_size
-        board['state'] = board_state
+        board = boards.create(board_size)
 
         battle = dict()
         battle['board'] = board
-        pickled_battle = pickle.dumps(battle)
-        redis.instance.set(data['id'], pickled_battle)
+        storage.get_storage().save(data['id'], battle)
 
     def get_battle(self, battle_id):
         """Get the data from an existing battle.
@@ -98,22 +95,62 @@ class BattleSchema(Schema):
         -------
         battle : dict
             The data of the desired battle (if exists) normalized as a
-            Python dict. If there is no battle, it should return None.
+            Python dict. If there is no battle, it should return None. It
+            may be shared with other requests, so copy it before changing it.
 
         """
-        raw_data = redis.instance.get(battle_id)
-        if not raw_data:
-            return None
+        return storage.load(battle_id)
+
+    def get_version(self, battle_id):
+        """Get the version of an existing battle.
+
+        This method will get only the version of a battle, that is
+        incremented every time that the battle changes, without loading it.
+
+        ...
+
+        Parameters
+        ----------
+        battle_id : str
+            The ID of the battle that you are trying to get.
+
+        Returns
+        -------
+        version : int
+            The version of the battle, or None if there is no battle.
+
+        """
+        return storage.load_version(battle_id)
+
+    def get_state(self, battle_id):
+        """Get the state of an existing battle, without its board.
+
+        This method will get the size, the version and the entities of an
+        existing battle, without decoding or walking its board, so it is
+        much cheaper than getting the entire battle of a big board.
+
+        ...
+
+        Parameters
+        ----------
+        battle_id : str
+            The ID of the battle that you are trying to get.
 
-        data = pickle.loads(raw_data)
+        Returns
+        -------
+        state : dict
+            The size of the board, the version and the entities of the
+            battle, or None if there is no battle.
 
-        return data
+        """
+        return storage.load_state(battle_id)
 
-    def update_battle(self, battle_id, new_data):
+    def update_battle(self, battle_id, new_data, previous_data=None):
         """Update the data of an existing battle.
 
         This method will use the new data to update and overwrite an existing
-        battle data.
+        battle data. If the previous data of the battle is provided, storage
+        layouts that support it will only write what has changed.
 
         ...
 
@@ -125,12 +162,272 @@ class BattleSchema(Schema):
         new_data : dict
             The entire battle new data that will overwrite the previous data.
 
+        previous_data : dict
+            The battle data as it was loaded, before any changes.
+
         """
-        raw_data = pickle.dumps(new_data)
-        redis.instance.set(battle_id, raw_data)
+        storage.get_storage().save(battle_id, new_data, previous_data)
 
         return True
 
+    def transaction(self, battle_id, mutate):
+        """Mutate an existing battle, retrying it on conflicts.
+
+        This method will load the battle, pass it to the mutate function and
+        save the updated battle that it returns. If another request changes
+        the battle in the meantime, the mutation will run again over the new
+        data.
+
+        ...
+
+        Parameters
+        ----------
+        battle_id : str
+            The ID of the battle that you are trying to mutate.
+
+        mutate : function
+            A function that receives the current battle (or None) and returns
+            a tuple with a result and the updated battle (or None to save
+            nothing).
+
+        Returns
+        -------
+        result : any
+            The result returned by the mutate function.
+
+        Raises
+        ------
+        ConflictError
+            If the battle kept changing after every retry.
+
+        """
+        return storage.transaction(battle_id, mutate)
+
+    def place_entity(self, battle, entity):
+        """Place a new entity inside the battlefield.
+
+        This method will add a new entity into the battle, on the position
+        that was set on the entity itself. It will not check if that
+        position is valid, so make sure to do it before.
+
+        ...
+
+        Parameters
+        ----------
+        battle : dict
+            The battle object that you are working on.
+
+        entity : dict
+            The entity that you are placing.
+
+        Returns
+        -------
+        battle : dict
+            A new battle object containing the new entity.
+
+        """
+        entity_id = entity.get('id')
+        yPos, xPos = entity.get('position')
+        updated_battle = self._copy_battle(battle, rows=[yPos - 1])
+
+        updated_battle.get('entities').update({entity_id: entity})
+        boards.put_cell(updated_battle.get('board'), yPos - 1, xPos - 1,
+                        entity_id)
+
+        return updated_battle
+
+    def place_entities(self, battle, entities):
+        """Place many new entities inside the battlefield at once.
+
+        This method will check the position of each entity and add the valid
+        ones into the battle, copying it only once. An entity is not placed
+        if its position is out of range or already taken, even if it was
+        taken by a previous entity of the same list.
+
+        ...
+
+        Parameters
+        ----------
+        battle : dict
+            The battle object that you are working on.
+
+        entities : list
+            The entities that you are placing.
+
+        Returns
+        -------
+        errors : list
+            The error of each entity, or None if it was placed.
+
+        battle : dict
+            A new battle object containing the new entities.
+
+        """
+        board = battle.get('board')
+        taken_positions = set()
+        errors = list()
+        placed = list()
+
+        for entity in entities:
+            yPos, xPos = entity.get('position')
+            position = (yPos - 1, xPos - 1)
+
+            if not boards.is_inside(board, *position):
+                errors.append('This position is out of range')
+                continue
+
+            if position in taken_positions or boards.get_cell(board,
+                                                              *position):
+                errors.append('This position is not empty')
+                continue
+
+            taken_positions.add(position)
+            placed.append(entity)
+            errors.append(None)
+
+        updated_battle = self._copy_battle(
+            battle,
+            rows=[yPos for yPos, _ in taken_positions])
+        updated_entities = updated_battle.get('entities')
+        updated_board = updated_battle.get('board')
+
+        for entity in placed:
+            yPos, xPos = entity.get('position')
+            updated_entities[entity.get('id')] = entity
+            boards.put_cell(updated_board, yPos - 1, xPos - 1,
+                            entity.get('id'))
+
+        return errors, updated_battle
+
+    def create_entity(self, battle_id, entity):
+        """Create a new entity inside of a stored battle.
+
+        This method will place a robot or a dinossaur on its position, with
+        our Lua scripts when they are enabled or on a transaction otherwise.
+
+        ...
+
+        Parameters
+        ----------
+        battle_id : int
+            The ID of the battle that you are handling.
+
+        entity : dict
+            The entity that you are creating.
+
+        Returns
+        -------
+        entity : dict
+            The created entity.
+
+        Raises
+        ------
+        ValidationError
+            If the battle does not exist, if the position is out of range or
+            already taken, or if the battle is too busy.
+
+        """
+        if scripts.enabled():
+            error = scripts.create_entity(battle_id, entity)
+            if error:
+                raise ValidationError(error)
+
+            return entity
+
+        yPos, xPos = entity.get('position')
+
+        def _place(battle):
+            if not battle:
+                raise ValidationError('Invalid battleId')
+
+            board = battle['board']
+            if not boards.is_inside(board, yPos - 1, xPos - 1):
+                raise ValidationError('This position is out of range')
+
+            if boards.get_cell(board, yPos - 1, xPos - 1):
+                raise ValidationError('This position is not empty')
+
+            return entity, self.place_entity(battle, entity)
+
+        try:
+            return self.transaction(battle_id, _place)
+        except storage.ConflictError:
+            raise ValidationError('This battle is too busy, try again')
+
+    def create_entities(self, battle_id, entities):
+        """Create many new entities inside of a stored battle at once.
+
+        This method will place every entity in a single transaction, writing
+        the battle only once.
+
+        ...
+
+        Parameters
+        ----------
+        battle_id : int
+            The ID of the battle that you are handling.
+
+        entities : list
+            The entities that you are creating.
+
+        Returns
+        -------
+        errors : list
+            The error of each entity, or None if it was created.
+
+        Raises
+        ------
+        ValidationError
+            If the battle does not exist or if it is too busy.
+
+        """
+        def _place(battle):
+            if not battle:
+                raise ValidationError('Invalid battleId')
+
+            errors, updated_battle = self.place_entities(battle, entities)
+            is_changed = any(error is None for error in errors)
+
+            return errors, updated_battle if is_changed else None
+
+        try:
+            return self.transaction(battle_id, _place)
+        except storage.ConflictError:
+            raise ValidationError('This battle is too busy, try again')
+
+    def robot_turn(self, battle, robot_id, direction):
+        """Turn the robot inside the battlefield.
+
+        This method will change the direction that the desired robot is
+        facing, without changing anything else.
+
+        ...
+
+        Parameters
+        ----------
+        battle : dict
+            The battle object that you are working on.
+
+        robot_id : str
+            The ID of the robot that you are trying to turn.
+
+        direction : str
+            The new direction of the robot.
+
+        Returns
+        -------
+        battle : dict
+            A new battle object containing the turned robot.
+
+        """
+        updated_battle = self._copy_battle(battle, entity_ids=[robot_id])
+
+        new_direction = dict()
+        new_direction.setdefault('direction', direction)
+        updated_battle.get('entities').get(robot_id).update(new_direction)
+
+        return updated_battle
+
     def robot_move(self, battle, robot_id, action):
         """Move the robot inside the battlefield.
 
@@ -172,7 +469,6 @@ class BattleSchema(Schema):
 
         original_position = robot.get('position')
         position_to_change = original_position[cardinal_point]
-        updated_battle = deepcopy(battle)
         changed_position = self._calculate_position(position_to_change,
                                                     action,
                                                     is_reversed)
@@ -185,16 +481,20 @@ class BattleSchema(Schema):
         old_xPos = original_position[1]
         new_yPos = new_robot_position[0]
         new_xPos = new_robot_position[1]
-        board = battle.get('board').get('state')
+        board = battle.get('board')
 
-        if self._is_not_valid_index(new_xPos - 1, new_yPos - 1, board):
+        if not boards.is_inside(board, new_yPos - 1, new_xPos - 1):
             return False
 
-        if board[new_yPos - 1][new_xPos - 1]:
+        if boards.get_cell(board, new_yPos - 1, new_xPos - 1):
             return False
 
-        updated_battle.get('board').get('state')[old_yPos - 1][old_xPos - 1] = None
-        updated_battle.get('board').get('state')[new_yPos - 1][new_xPos - 1] = robot_id
+        updated_battle = self._copy_battle(battle,
+                                           rows=[old_yPos - 1, new_yPos - 1],
+                                           entity_ids=[robot_id])
+        updated_board = updated_battle.get('board')
+        boards.clear_cell(updated_board, old_yPos - 1, old_xPos - 1)
+        boards.put_cell(updated_board, new_yPos - 1, new_xPos - 1, robot_id)
 
         new_position = dict()
         new_position.setdefault('position', new_robot_position)
@@ -221,28 +521,77 @@ class BattleSchema(Schema):
         """
         robot = battle.get('entities').get(robot_id)
         robot_position = robot.get('position')
-        entities = battle.get('entities')
 
+        board = battle.get('board')
         robot_yPos = robot_position[0]
         robot_xPos = robot_position[1]
-        yPositions = [robot_yPos + 1, robot_yPos - 1]
-        xPositions = [robot_xPos + 1, robot_xPos - 1]
 
-        corners = [(y, x) for x in xPositions for y in yPositions]
-        same_ver_axis = [(y, x) for x in robot_position for y in yPositions]
-        same_hor_axis = [(y, x) for x in xPositions for y in robot_position]
-        positions_to_attack = list(set().union(corners,
-                                               same_ver_axis,
-                                               same_hor_axis))
+        targets = [(yPos + 1, xPos + 1, entity)
+                   for (yPos, xPos), entity in boards.neighbours(
+                       board, robot_yPos - 1, robot_xPos - 1)
+                   if entity[:2] == 'D-']
 
-        for yPos, xPos in positions_to_attack:
-            entity = battle.get('board').get('state')[yPos - 1][xPos - 1]
+        updated_battle = self._copy_battle(
+            battle,
+            rows=[yPos - 1 for yPos, _, _ in targets])
+        entities = updated_battle.get('entities')
+        updated_board = updated_battle.get('board')
 
-            if entity and entity[:2] == 'D-':
-                del entities[entity]
-                battle.get('board').get('state')[yPos - 1][xPos - 1] = None
+        for yPos, xPos, entity in targets:
+            entities.pop(entity, None)
+            boards.clear_cell(updated_board, yPos - 1, xPos - 1)
 
-        return battle
+        return updated_battle
+
+    def robots_attack(self, battle):
+        """Attack with every robot of the battlefield at once.
+
+        This method will destroy every dino that is close to any robot,
+        finding all of them in a single pass over the whole board. It will
+        not attack any robot.
+
+        ...
+
+        Parameters
+        ----------
+        battle : dict
+            The battle object that you are working on.
+
+        Returns
+        -------
+        destroyed : int
+            How many dinos were destroyed.
+
+        battle : dict
+            A new battle object without the destroyed dinos.
+
+        """
+        targets = boards.adjacent_cells(battle.get('board'),
+                                        lambda entity: entity[:2] == 'R-',
+                                        lambda entity: entity[:2] == 'D-')
+
+        updated_battle = self._copy_battle(
+            battle,
+            rows=[yPos for (yPos, _), _ in targets])
+        entities = updated_battle.get('entities')
+        updated_board = updated_battle.get('board')
+
+        for (yPos, xPos), entity in targets:
+            entities.pop(entity, None)
+            boards.clear_cell(updated_board, yPos, xPos)
+
+        return len(targets), updated_battle
+
+    def _copy_battle(self, battle, rows=(), entity_ids=()):
+        updated_battle = dict(battle)
+        updated_battle['board'] = boards.copy(battle.get('board'), rows)
+        updated_battle['entities'] = dict(battle.get('entities') or dict())
+
+        for entity_id in entity_ids:
+            entity = updated_battle['entities'].get(entity_id)
+            updated_battle['entities'][entity_id] = dict(entity)
+
+        return updated_battle
 
     def _calculate_position(self, pos, act, rev):
         def move_forward(x, rev):
@@ -257,5 +606,13 @@ class BattleSchema(Schema):
 
         return dispatch.get(act)(pos, rev)
 
-    def _is_not_valid_index(self, x, y, board):
-        return x not in range(len(board[0])) or y not in range(len(board))
+
+def error_message(errors):
+    """Get the first message of the validation errors of a schema."""
+    if not errors:
+        return None
+
+    while isinstance(errors, dict):
+        errors = next(iter(errors.values()))
+
+    return errors[0]
@@ -0,0 +1,492 @@
+"""Battle Renders.
+
+This module renders the state pages of our battles and keeps the most
+recently rendered ones, in the memory of each worker, so an unchanged battle
+is only rendered once.
+
+The BATTLE_RENDER_MODE configuration chooses how a board is rendered:
+
+    grid : an element for each cell of the board, so the cost of the page,
+           on the server and on the browser, grows with the area of the
+           board.
+    entities : the size of the board is sent once, drawn by the style of
+               the page, plus an absolutely positioned element for each
+               occupied cell, so the cost of the page grows with the number
+               of entities and the board is never walked.
+
+Each page is cached by the ID and the version of its battle. Every change
+of a battle increments its version, so a page is never served for a newer
+version than the one that it was rendered from, and there is nothing to
+invalidate: each battle only keeps the page of its latest rendered version,
+replaced as soon as a newer one is rendered.
+
+Pages are encoded while they are rendered, in chunks of CHUNK_SIZE bytes,
+so they can be streamed without ever holding the whole page in memory. A
+page is only cached once it is fully rendered, and only if it takes at most
+1 / MAX_PAGE_SHARE of the cache: the chunks of bigger pages are dropped as
+soon as they are sent.
+
+A page is cached as it was rendered and, once it is asked compressed, also
+compressed with gzip. The cache holds at most BATTLE_RENDER_CACHE_BYTES
+bytes of pages and it is disabled when that configuration is 0.
+
+The tiles of a board, its windows of BATTLE_TILE_SIZE cells aligned to that
+size, have a cache of their own, that holds at most BATTLE_TILE_CACHE_BYTES
+bytes. Each tile is cached by the digest of the entities inside of it,
+instead of the version of its battle, so a tile is only rendered again when
+an entity inside of it changes. The digest of each window is also kept by
+the version of its battle, up to MAX_DIGESTS windows, so a window that was
+already seen on the current version is checked without loading its battle.
+
+"""
+import gzip
+import zlib
+
+from collections import OrderedDict
+from threading import Lock
+from flask import current_app
+from dino_extinction.infrastructure import (metrics, settings)
+
+GRID = 'grid'
+ENTITIES = 'entities'
+DEFAULT_MODE = GRID
+MODES = dict()
+MODES.setdefault(GRID, 'state.html')
+MODES.setdefault(ENTITIES, 'state_entities.html')
+
+IDENTITY = 'identity'
+GZIP = 'gzip'
+DEFAULT_BYTES = 0
+DEFAULT_TILE_SIZE = 64
+GZIP_LEVEL = 6
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+CHUNK_SIZE = 64 * 1024
+MAX_PAGE_SHARE = 4
+MAX_DIGESTS = 4096
+
+
+class RenderCache:
+    """RenderCache Class.
+
+    This class is a byte-bounded LRU of rendered pages, by battle.
+
+    ...
+
+    Attributes
+    ----------
+    setting : str
+        The configuration with the maximum size of the cache, in bytes.
+
+    metric : str
+        The prefix of the metrics of the cache.
+
+    pages : OrderedDict
+        The version and the encoded pages of each battle, or of each tile of
+        a battle, from the least to the most recently used.
+
+    total_bytes : int
+        The size of every cached page.
+
+    digests : OrderedDict
+        The version of the battle and the digest of each window, from the
+        least to the most recently used.
+
+    """
+
+    def __init__(self, setting='BATTLE_RENDER_CACHE_BYTES',
+                 metric='render_cache'):
+        self.setting = setting
+        self.metric = metric
+        self.pages = OrderedDict()
+        self.digests = OrderedDict()
+        self.total_bytes = 0
+        self.lock = Lock()
+
+    def enabled(self):
+        """Check if the rendered pages can be cached."""
+        return bool(self._max_bytes())
+
+    def get(self, battle_id, version, encoding=IDENTITY, tile=None):
+        """Get a cached page.
+
+        If the page is cached, but not on the given encoding, it is encoded
+        and cached on it too.
+
+        ...
+
+        Parameters
+        ----------
+        battle_id : int
+            The ID of the battle of the page.
+
+        version : int
+            The version of the battle that the page must have been rendered
+            from.
+
+        encoding : str
+            The content encoding of the page: IDENTITY or GZIP.
+
+        tile : tuple
+            The xPosition and yPosition of the first cell of the tile of the
+            page, or None if it is the page of the whole battle.
+
+        Returns
+        -------
+        page : bytes
+            The encoded page, or None if it is not cached.
+
+        """
+        key = _key(battle_id, tile)
+        with self.lock:
+            cached_version, variants = self.pages.get(key, (None, dict()))
+            page = variants.get(encoding)
+            is_hit = (version is not None and cached_version == version and
+                      IDENTITY in variants)
+            if is_hit:
+                self.pages.move_to_end(key)
+
+        if not is_hit:
+            if version is not None and self.enabled():
+                metrics.increment(f"{self.metric}_misses", battle_id)
+
+            return None
+
+        metrics.increment(f"{self.metric}_hits", battle_id)
+        if page is None:
+            page = _encode(variants.get(IDENTITY), encoding)
+            self._store(key, version, encoding, page, tile is None)
+
+        return page
+
+    def put(self, battle_id, version, html, encoding=IDENTITY, tile=None):
+        """Cache a rendered page.
+
+        ...
+
+        Parameters
+        ----------
+        battle_id : int
+            The ID of the battle of the page.
+
+        version : int
+            The version of the battle that the page was rendered from.
+
+        html : str
+            The rendered page.
+
+        encoding : str
+            The content encoding that the page will be returned on.
+
+        tile : tuple
+            The xPosition and yPosition of the first cell of the tile of the
+            page, or None if it is the page of the whole battle.
+
+        Returns
+        -------
+        page : bytes
+            The page on the given encoding, even if it was not cached.
+
+        """
+        return b''.join(self.stream(battle_id, version, [html], encoding,
+                                    tile))
+
+    def stream(self, battle_id, version, parts, encoding=IDENTITY,
+               tile=None):
+        """Encode a page while it is rendered, caching it once it is over.
+
+        A page without a version is only encoded, without being cached.
+
+        ...
+
+        Parameters
+        ----------
+        battle_id : int
+            The ID of the battle of the page.
+
+        version : int
+            The version of the battle that the page is rendered from.
+
+        parts : iterable
+            The parts of the page, as strings, while they are rendered.
+
+        encoding : str
+            The content encoding that the page will be returned on.
+
+        tile : tuple
+            The xPosition and yPosition of the first cell of the tile of the
+            page, or None if it is the page of the whole battle.
+
+        Yields
+        ------
+        chunk : bytes
+            The encoded chunks of the page.
+
+        """
+        max_page_bytes = 0
+        if version is not None:
+            max_page_bytes = self._max_bytes() // MAX_PAGE_SHARE
+        compressor = None
+        if encoding == GZIP:
+            compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED,
+                                          GZIP_WBITS)
+
+        raw_chunks = list() if max_page_bytes else None
+        page_chunks = list()
+        raw_size = 0
+
+        for raw_chunk in _chunks(parts):
+            page_chunk = raw_chunk
+            if compressor:
+                page_chunk = compressor.compress(raw_chunk)
+
+            if raw_chunks is not None:
+                raw_size += len(raw_chunk)
+                raw_chunks.append(raw_chunk)
+                page_chunks.append(page_chunk)
+                if raw_size > max_page_bytes:
+                    raw_chunks = None
+                    page_chunks = None
+
+            if page_chunk:
+                yield page_chunk
+
+        if compressor:
+            page_chunk = compressor.flush()
+            if page_chunks is not None:
+                page_chunks.append(page_chunk)
+
+            yield page_chunk
+
+        if raw_chunks is None:
+            return
+
+        key = _key(battle_id, tile)
+        is_ordered = tile is None
+        self._store(key, version, IDENTITY, b''.join(raw_chunks), is_ordered)
+        if encoding != IDENTITY:
+            self._store(key, version, encoding, b''.join(page_chunks),
+                        is_ordered)
+
+    def get_digest(self, battle_id, window, version):
+        """Get the digest of a window on a version of its battle.
+
+        The digest is only returned if it was kept for that same version, so
+        a window is checked without loading its battle while it has not
+        changed.
+
+        ...
+
+        Parameters
+        ----------
+        battle_id : int
+            The ID of the battle of the window.
+
+        window : tuple
+            The xPosition and yPosition of the first cell, the width and the
+            height of the window.
+
+        version : int
+            The current version of the battle.
+
+        Returns
+        -------
+        digest : str
+            The digest of the window, or None if it is not known for that
+            version of the battle.
+
+        """
+        key = (str(battle_id), window)
+        with self.lock:
+            cached_version, digest = self.digests.get(key, (None, None))
+            if version is None or cached_version != version:
+                return None
+
+            self.digests.move_to_end(key)
+
+        return digest
+
+    def put_digest(self, battle_id, window, version, digest):
+        """Keep the digest of a window on a version of its battle."""
+        key = (str(battle_id), window)
+        with self.lock:
+            self.digests[key] = (version, digest)
+            self.digests.move_to_end(key)
+            while len(self.digests) > MAX_DIGESTS:
+                self.digests.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached page and digest."""
+        with self.lock:
+            self.pages.clear()
+            self.digests.clear()
+            self.total_bytes = 0
+
+    def _store(self, key, version, encoding, page, is_ordered=True):
+        max_bytes = self._max_bytes()
+        if len(page) > max_bytes:
+            return
+
+        evictions = 0
+        with self.lock:
+            cached_version, variants = self.pages.get(key, (None, dict()))
+            is_older = (is_ordered and cached_version is not None and
+                        cached_version > version)
+            if is_older:
+                return
+
+            if cached_version != version:
+                self.total_bytes -= sum(len(cached_page)
+                                        for cached_page in variants.values())
+                variants = dict()
+
+            self.total_bytes += len(page) - len(variants.get(encoding, b''))
+            variants[encoding] = page
+            self.pages[key] = (version, variants)
+            self.pages.move_to_end(key)
+
+            while self.total_bytes > max_bytes:
+                _, (_, evicted_variants) = self.pages.popitem(last=False)
+                self.total_bytes -= sum(len(evicted_page) for evicted_page
+                                        in evicted_variants.values())
+                evictions += 1
+
+        if evictions:
+            metrics.increment(f"{self.metric}_evictions", amount=evictions)
+
+    def _max_bytes(self):
+        return int(settings.get(self.setting, DEFAULT_BYTES) or 0)
+
+
+def mode():
+    """Get how the boards are rendered: GRID or ENTITIES."""
+    render_mode = settings.get('BATTLE_RENDER_MODE', DEFAULT_MODE)
+
+    return render_mode if render_mode in MODES else DEFAULT_MODE
+
+
+def render_grid(battle_id, rows, entities, col_offset=0, row_offset=0):
+    """Render the state page of a board with an element for each cell.
+
+    ...
+
+    Parameters
+    ----------
+    battle_id : int
+        The ID of the battle of the board.
+
+    rows : list
+        The rows of the board, each one with the ID of the entity on each
+        cell, or an empty value if the cell is free.
+
+    entities : dict
+        The entities of the board, by ID.
+
+    col_offset : int
+        How many columns of the board come before the first one rendered.
+
+    row_offset : int
+        How many rows of the board come before the first one rendered.
+
+    Returns
+    -------
+    parts : iterable
+        The parts of the page, as strings, while they are rendered.
+
+    """
+    context = dict()
+    context['board'] = rows
+    context['entities'] = entities
+    context['col_offset'] = col_offset
+    context['row_offset'] = row_offset
+
+    return _render(GRID, battle_id, context)
+
+
+def render_entities(battle_id, entities, width, height, col_offset=0,
+                    row_offset=0):
+    """Render the state page of a board with an element for each entity.
+
+    ...
+
+    Parameters
+    ----------
+    battle_id : int
+        The ID of the battle of the board.
+
+    entities : dict
+        The entities of the board, by ID.
+
+    width : int
+        How many columns of the board are rendered.
+
+    height : int
+        How many rows of the board are rendered.
+
+    col_offset : int
+        How many columns of the board come before the first one rendered.
+
+    row_offset : int
+        How many rows of the board come before the first one rendered.
+
+    Returns
+    -------
+    parts : iterable
+        The parts of the page, as strings, while they are rendered.
+
+    """
+    context = dict()
+    context['entities'] = entities
+    context['width'] = width
+    context['height'] = height
+    context['col_offset'] = col_offset
+    context['row_offset'] = row_offset
+
+    return _render(ENTITIES, battle_id, context)
+
+
+def tile_size():
+    """Get how many cells wide and tall each tile of a board is."""
+    return int(settings.get('BATTLE_TILE_SIZE', DEFAULT_TILE_SIZE) or 0)
+
+
+def _render(render_mode, battle_id, context):
+    default_title = current_app.config.get('BATTLE_STATUS_TITLE_DEFAULT')
+    context['title'] = default_title.format(battle_id)
+    context['battle_id'] = battle_id
+    current_app.update_template_context(context)
+    template = current_app.jinja_env.get_template(MODES.get(render_mode))
+
+    return template.generate(context)
+
+
+def _key(battle_id, tile):
+    if tile is None:
+        return str(battle_id)
+
+    return '{0}:{1}:{2}'.format(battle_id, *tile)
+
+
+def _chunks(parts):
+    buffer = list()
+    buffer_size = 0
+    for part in parts:
+        buffer.append(part)
+        buffer_size += len(part)
+        if buffer_size >= CHUNK_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = list()
+            buffer_size = 0
+
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def _encode(raw_page, encoding):
+    if encoding == GZIP:
+        return gzip.compress(raw_page, GZIP_LEVEL)
+
+    return raw_page
+
+
+instance = RenderCache()
+tiles = RenderCache('BATTLE_TILE_CACHE_BYTES', 'tile_cache')
@@ -3,14 +3,44 @@
 This module is responsible for creating our API routes for our Battle
 service. We're using our Battles Blueprint to do so.
 
+The state routes answer with an ETag of the version of the battle. A request
+that sends that ETag back on its If-None-Match header receives a 304 Not
+Modified, after only looking up the version of the battle, while the battle
+has not changed. The state page is also cached by that version, so it is
+only rendered once while the battle does not change.
+
+The state page is streamed while it is rendered, so the first rows of a big
+board are sent right away and the whole page is never held in memory.
+
+The events route is a Server-Sent Events stream for live spectators: it
+starts with a snapshot of the state of the battle and then pushes the delta
+events of each version of the battle, so a spectator only has to apply them.
+A new snapshot is sent whenever the spectator could have missed a version.
+An archived battle is restored before it is watched, and the route answers
+503 Service Unavailable when the battles can not be listened to.
+
+Both state routes accept a window of the board, by the x0 and y0 of its
+first cell and its w and h, and only return the cells and entities inside of
+it. A window of a single tile is cached by the entities inside of it, and so
+is its ETag, so it is still fresh while only the rest of the board changes.
+The ETag of a window is kept by the version of its battle, so a window that
+did not change since it was last asked is answered, or found on the tile
+cache, after only looking up that version.
+
 Prefix: /battles
 
 """
+import hashlib
 import json
 
-from flask import (Response, request, render_template, abort, current_app)
+from flask import (Response, request, abort, current_app,
+                   stream_with_context)
+from dino_extinction.blueprints.battles import (boards, events, renders,
+                                                storage)
 from dino_extinction.blueprints.battles.models import BattleSchema
 
+WINDOW_ARGS = ('x0', 'y0', 'w', 'h')
+
 
 def set_routes(bp, handlers):
     """Set the routes for our Battles Blueprint.
@@ -41,23 +71,261 @@ def set_routes(bp, handlers):
                         status=status,
                         mimetype=mimetype)
 
+    @bp.route('/<int:battle_id>/state.json', methods=['GET'])
+    def route_state_json(battle_id):
+        window = _requested_window()
+        known_version = _known_version(battle_id)
+        if known_version is not None:
+            return _not_modified(_etag(known_version))
+
+        errors, battle = handlers.battle_state(battle_id, window)
+        parsed = json.dumps(False if errors else battle)
+        status = 404 if errors else 200
+        mimetype = 'application/json'
+
+        response = Response(parsed,
+                            status=status,
+                            mimetype=mimetype)
+        if not errors:
+            _set_etag(response, _etag(battle.get('version')))
+
+        return response
+
+    @bp.route('/<int:battle_id>/events', methods=['GET'])
+    def route_events(battle_id):
+        if (BattleSchema().get_version(battle_id) is None and
+                not storage.restore(battle_id)):
+            return Response(json.dumps(False),
+                            status=404,
+                            mimetype='application/json')
+
+        subscription = events.instance.subscribe(battle_id)
+        if subscription is None:
+            return Response(json.dumps(False),
+                            status=503,
+                            mimetype='application/json')
+
+        last_event_id = request.headers.get('Last-Event-ID')
+        stream = stream_with_context(
+            _stream_events(handlers, battle_id, subscription, last_event_id))
+
+        response = Response(stream, mimetype='text/event-stream')
+        response.cache_control.no_cache = True
+        response.headers['X-Accel-Buffering'] = 'no'
+        response.call_on_close(
+            lambda: events.instance.unsubscribe(battle_id, subscription))
+
+        return response
+
     @bp.route('/state', methods=['GET'])
     def route_state():
         battle_id = request.args.get('battleId')
         if not battle_id:
             abort(404)
 
+        window = _requested_window()
+        if window:
+            return _window_page(handlers, battle_id, window)
+
         battle_model = BattleSchema()
-        battle = battle_model.get_battle(battle_id=battle_id)
-        if not battle:
+        version = battle_model.get_version(battle_id)
+        if version is not None and _is_known(_etag(version)):
+            return _not_modified(_etag(version))
+
+        encoding = _accepted_encoding()
+        page = renders.instance.get(battle_id, version, encoding)
+        if page is None:
+            version, parts = _render_state(battle_model, battle_id)
+            page = stream_with_context(
+                renders.instance.stream(battle_id, version, parts, encoding))
+
+        return _page_response(page, encoding, _etag(version))
+
+
+def _window_page(handlers, battle_id, window):
+    version = BattleSchema().get_version(battle_id)
+    etag = renders.tiles.get_digest(battle_id, window, version)
+    board_window = None
+    if etag is None:
+        board_window = _load_window(handlers, battle_id, window)
+        etag = _window_etag(board_window)
+
+    if _is_known(etag):
+        return _not_modified(etag)
+
+    tile = _tile(window)
+    encoding = _accepted_encoding()
+    page = renders.tiles.get(battle_id, etag if tile else None, encoding,
+                             tile)
+    if page is None:
+        if board_window is None:
+            board_window = _load_window(handlers, battle_id, window)
+            etag = _window_etag(board_window)
+
+        parts = _render_window(battle_id, board_window)
+        page = stream_with_context(
+            renders.tiles.stream(battle_id, etag if tile else None, parts,
+                                 encoding, tile))
+
+    return _page_response(page, encoding, etag)
+
+
+def _load_window(handlers, battle_id, window):
+    errors, board_window = handlers.battle_window(battle_id, window)
+    if errors:
+        abort(404)
+
+    renders.tiles.put_digest(battle_id,
+                             window,
+                             board_window.get('version'),
+                             _window_etag(board_window))
+
+    return board_window
+
+
+def _page_response(page, encoding, etag):
+    response = Response(page, mimetype='text/html')
+    if encoding != renders.IDENTITY:
+        response.content_encoding = encoding
+    response.vary.add('Accept-Encoding')
+    _set_etag(response, etag)
+
+    return response
+
+
+def _requested_window():
+    if not any(name in request.args for name in WINDOW_ARGS):
+        return None
+
+    window = tuple(request.args.get(name, type=int) for name in WINDOW_ARGS)
+    if any(value is None or value < 1 for value in window):
+        abort(400)
+
+    return window
+
+
+def _tile(window):
+    x_position, y_position, width, height = window
+    tile_size = renders.tile_size()
+    is_tile = (tile_size and width == tile_size and height == tile_size and
+               (x_position - 1) % tile_size == 0 and
+               (y_position - 1) % tile_size == 0)
+
+    return (x_position, y_position) if is_tile else None
+
+
+def _render_state(battle_model, battle_id):
+    if renders.mode() == renders.ENTITIES:
+        state = battle_model.get_state(battle_id)
+        if not state:
             abort(404)
 
-        default_title = current_app.config.get('BATTLE_STATUS_TITLE_DEFAULT')
-        page_title = default_title.format(battle_id)
-        board = battle.get('board').get('state')
-        entities = battle.get('entities')
-        return render_template('state.html',
-                               title=page_title,
-                               battle_id=battle_id,
-                               board=board,
-                               entities=entities)
+        size = state.get('size')
+        parts = renders.render_entities(battle_id,
+                                        state.get('entities'),
+                                        size,
+                                        size)
+
+        return state.get('version'), parts
+
+    battle = battle_model.get_battle(battle_id=battle_id)
+    if not battle:
+        abort(404)
+
+    board = boards.rows(battle.get('board'))
+    parts = renders.render_grid(battle_id, board, battle.get('entities'))
+
+    return battle.get('version'), parts
+
+
+def _render_window(battle_id, board_window):
+    x_position, y_position, width, height = board_window.get('window')
+    if renders.mode() == renders.ENTITIES:
+        return renders.render_entities(battle_id,
+                                       board_window.get('entities'),
+                                       width,
+                                       height,
+                                       x_position - 1,
+                                       y_position - 1)
+
+    return renders.render_grid(battle_id,
+                               board_window.get('rows'),
+                               board_window.get('entities'),
+                               x_position - 1,
+                               y_position - 1)
+
+
+def _stream_events(handlers, battle_id, subscription, last_event_id):
+    keepalive = current_app.config.get('BATTLE_EVENTS_KEEPALIVE',
+                                       events.DEFAULT_KEEPALIVE)
+    version = None
+    message = events.LAGGED
+    while True:
+        if message is None:
+            yield ': keepalive\n\n'
+        elif message == events.LAGGED or (
+                message.get('version') > version + 1):
+            errors, state = handlers.battle_state(battle_id)
+            if errors:
+                return
+
+            is_known = version is None and last_event_id == str(
+                state.get('version'))
+            version = state.get('version')
+            if not is_known:
+                yield events.format_event('snapshot', state, version)
+        elif message.get('version') == version + 1:
+            version = message.get('version')
+            yield events.format_event('delta', message, version)
+
+        message = events.wait(subscription, keepalive)
+
+
+def _accepted_encoding():
+    if renders.GZIP in request.accept_encodings:
+        return renders.GZIP
+
+    return renders.IDENTITY
+
+
+def _etag(version):
+    return f"v{version}"
+
+
+def _window_etag(board_window):
+    entities = board_window.get('entities')
+    cells = sorted((entity_id,
+                    entity.get('direction') or '',
+                    *entity.get('position'))
+                   for entity_id, entity in entities.items())
+    content = json.dumps([board_window.get('window'), cells])
+    digest = hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    return f"w{digest}"
+
+
+def _known_version(battle_id):
+    if not request.if_none_match:
+        return None
+
+    version = BattleSchema().get_version(battle_id)
+    if version is None or not _is_known(_etag(version)):
+        return None
+
+    return version
+
+
+def _is_known(etag):
+    return request.if_none_match.contains(etag)
+
+
+def _not_modified(etag):
+    response = Response(status=304)
+    _set_etag(response, etag)
+
+    return response
+
+
+def _set_etag(response, etag):
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
@@ -0,0 +1,123 @@
+"""Battle Scripts.
+
+This module runs the commands of our battles as Lua scripts inside of Redis.
+Each script checks the board and changes the battle in a single round trip,
+so concurrent commands over the same battle can not overwrite each other.
+Each script also refreshes the expiration of the battle, and its score on the
+live battles of our metrics, publishes its new version on the invalidation
+channel of our battle cache and publishes its delta events to the spectators
+of the battle. If a script fails over an archived battle, the battle is moved
+back to Redis and the script runs again.
+
+The scripts work over the fields of the hash storage layout, so they are only
+enabled when the BATTLE_SCRIPTS configuration is set and the battles are
+stored as hashes.
+
+"""
+from dino_extinction.infrastructure import (redis, settings)
+from . import cache
+from . import storage
+
+OK = 'OK'
+
+ACTION_SCRIPTS = dict()
+ACTION_SCRIPTS.setdefault('turn-left', 'turn_robot')
+ACTION_SCRIPTS.setdefault('turn-right', 'turn_robot')
+ACTION_SCRIPTS.setdefault('move-forward', 'move_robot')
+ACTION_SCRIPTS.setdefault('move-backwards', 'move_robot')
+ACTION_SCRIPTS.setdefault('attack', 'robot_attack')
+
+
+def enabled():
+    """Check if our battles must be changed by the Lua scripts."""
+    if not settings.get('BATTLE_SCRIPTS', False):
+        return False
+
+    return storage.get_storage().name == storage.HashStorage.name
+
+
+def command_robot(battle_id, robot_id, action):
+    """Command a robot inside of Redis.
+
+    This function will run the script of a given action over a robot of a
+    battle.
+
+    ...
+
+    Parameters
+    ----------
+    battle_id : int
+        The ID of the battle that you are working on.
+
+    robot_id : str
+        The ID of the robot that will receive the action.
+
+    action : str
+        An action that can be: turn-left, turn-right, move-forward,
+        move-backwards or attack.
+
+    Returns
+    -------
+    error : str
+        The reason why the robot was not commanded, or None if it was.
+
+    """
+    script_name = ACTION_SCRIPTS.get(action)
+
+    return _run(script_name, battle_id, robot_id, action)
+
+
+def create_entity(battle_id, entity):
+    """Create a robot or a dinossaur inside of Redis.
+
+    This function will put a new entity on a battle, if its position is
+    inside of the board and empty.
+
+    ...
+
+    Parameters
+    ----------
+    battle_id : int
+        The ID of the battle that you are working on.
+
+    entity : dict
+        The entity that you are trying to create.
+
+    Returns
+    -------
+    error : str
+        The reason why the entity was not created, or None if it was.
+
+    """
+    row, col = entity.get('position')
+
+    return _run('create_entity',
+                battle_id,
+                entity.get('id'),
+                entity.get('type'),
+                entity.get('direction') or '',
+                row,
+                col)
+
+
+def _run(script_name, battle_id, *args):
+    result = _call(script_name, battle_id, *args)
+    if result != OK and storage.restore(battle_id):
+        result = _call(script_name, battle_id, *args)
+
+    if result != OK:
+        return result
+
+    cache.instance.invalidate(battle_id)
+
+    return None
+
+
+def _call(script_name, battle_id, *args):
+    script = redis.scripts.get(script_name)
+    result = script(keys=[storage.battle_key(battle_id), storage.LIVE_KEY],
+                    args=(battle_id, storage.ttl(), storage.expires_at()) +
+                    args,
+                    client=redis.instance)
+
+    return result.decode('utf-8')
@@ -0,0 +1,83 @@
+"""Battle Snapshots.
+
+This module runs the snapshots of the battles that are stored as event logs,
+on a background thread of each worker, so the requests that append the
+events never wait for them.
+
+Every save of a battle requests a check of its log. The same battle is only
+checked once while its check is pending, and the snapshot itself is only
+taken when the log grew beyond the BATTLE_SNAPSHOT_EVENTS or the
+BATTLE_SNAPSHOT_BYTES configurations. Each check runs inside the app
+context of the request that asked for it, so the snapshot is written with
+the same expiration and compression as any other save.
+
+"""
+from contextlib import nullcontext
+from queue import Queue
+from threading import (Lock, Thread)
+from flask import (current_app, has_app_context)
+from redis.exceptions import RedisError
+from dino_extinction.infrastructure import (metrics, settings)
+
+DEFAULT_MAX_EVENTS = 1000
+DEFAULT_MAX_BYTES = 1024 * 1024
+
+
+class Snapshotter:
+    """Snapshotter Class.
+
+    This class checks the logs of our battles on a background thread.
+
+    ...
+
+    Attributes
+    ----------
+    check : function
+        A function that receives a battle ID, the maximum number of events
+        and the maximum bytes of its log, and takes a snapshot of the battle
+        if its log is beyond any of them.
+
+    pending : set
+        The IDs of the battles that are waiting to be checked.
+
+    """
+
+    def __init__(self, check):
+        self.check = check
+        self.pending = set()
+        self.queue = Queue()
+        self.lock = Lock()
+        self.thread = None
+
+    def request(self, battle_id):
+        """Request a check of the log of a battle."""
+        max_events = int(settings.get('BATTLE_SNAPSHOT_EVENTS',
+                                      DEFAULT_MAX_EVENTS))
+        max_bytes = int(settings.get('BATTLE_SNAPSHOT_BYTES',
+                                     DEFAULT_MAX_BYTES))
+        key = str(battle_id)
+        app = current_app._get_current_object() if has_app_context() else None
+
+        with self.lock:
+            if key in self.pending:
+                return
+
+            self.pending.add(key)
+            if not self.thread or not self.thread.is_alive():
+                self.thread = Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+        self.queue.put((key, max_events, max_bytes, app))
+
+    def _run(self):
+        while True:
+            battle_id, max_events, max_bytes, app = self.queue.get()
+            with self.lock:
+                self.pending.discard(battle_id)
+
+            with app.app_context() if app else nullcontext():
+                try:
+                    if self.check(battle_id, max_events, max_bytes):
+                        metrics.increment('battle_snapshots', battle_id)
+                except RedisError:
+                    metrics.increment('battle_snapshot_errors', battle_id)
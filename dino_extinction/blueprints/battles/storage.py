@@ -0,0 +1,1153 @@
+"""Battle Storage.
+
+This module contains the layouts that we can use to store our battles on
+Redis. Every layout is able to create, load and save a battle, and the
+BATTLE_STORAGE configuration chooses which one our API will use:
+
+    blob : the whole battle is encoded by our codec and stored on a single
+           key, so every save rewrites the entire battle. Battles bigger
+           than the BATTLE_COMPRESSION_THRESHOLD configuration, in bytes,
+           are compressed on BATTLE_COMPRESSION_LEVEL. The state of a
+           battle is read by ranges of its key, without its grid.
+    hash : the battle is split into the fields of a Redis hash, so every
+           save only writes the fields that have changed.
+    stream : the battle is a snapshot, encoded by our codec, plus a Redis
+             Stream with an event for each save after it, so every save
+             only appends the fields that have changed. The snapshot is
+             taken again, in the background, when the stream grows, and it
+             is compressed just like the blobs.
+
+Every layout stores a version with each battle, that is incremented on every
+save. The keys of a battle are namespaced by KEY_PREFIX and, when the
+BATTLE_TTL configuration is set, they expire after that many seconds without
+being loaded or saved. The expiration is refreshed on the same round trip of
+each load and save. When the archive is enabled, the battles that are idle
+for too long are moved to it and they are moved back to Redis the first
+time that they are loaded or mutated.
+
+Every battle is also kept on the LIVE_KEY sorted set, by the time that its
+keys expire, so our metrics count the live battles without scanning every
+key. Archived battles leave it, and expired ones are dropped when counted.
+
+Battles stored by the versions before KEY_PREFIX, under their bare ID (and
+their events under LEGACY_EVENTS_PREFIX), are upgraded the same way: the
+first time that one of them is missed, its keys are renamed to the new ones
+and get their expiration, so no migration has to run before a deploy.
+
+Mutations should run through the transaction function, that watches the
+battle and retries the mutation if it has changed in the meantime, and
+reads should run through the load function, that uses our battle cache.
+
+The fields of the hash layout are:
+
+    size             : the size of the board.
+    engine           : the board engine of the battle.
+    version          : the version of the battle.
+    e:<entity id>    : type,direction,row,col of each entity.
+    c:<row>:<col>    : the ID of the entity on each occupied cell.
+
+The events of the stream layout have the same fields, but only the ones that
+changed on each save. A field with an empty value was removed. They are
+stored on the EVENTS_SUFFIX key of the battle.
+
+"""
+import time
+
+from redis.exceptions import (ResponseError, WatchError)
+from dino_extinction.infrastructure import (metrics, redis, settings)
+from . import archive
+from . import boards
+from . import cache
+from . import codec
+from . import events
+from . import snapshots
+
+DEFAULT_STORAGE = 'blob'
+DEFAULT_TRANSACTION_RETRIES = 5
+
+SIZE_FIELD = 'size'
+ENGINE_FIELD = 'engine'
+VERSION_FIELD = 'version'
+ENTITY_PREFIX = 'e:'
+CELL_PREFIX = 'c:'
+DEFAULT_TTL = 0
+DEFAULT_COMPRESSION_THRESHOLD = None
+KEY_PREFIX = 'battle:'
+EVENTS_SUFFIX = ':events'
+LEGACY_EVENTS_PREFIX = 'events:'
+LIVE_KEY = 'battles:live'
+STATE_RANGE = 4096
+STATE_RANGE_GROWTH = 4
+ARCHIVE_SCAN_COUNT = 1000
+
+
+class ConflictError(Exception):
+    """ConflictError Class.
+
+    This error is raised when a battle keeps changing while a transaction is
+    trying to mutate it, even after retrying it.
+
+    """
+
+
+class BlobStorage:
+    """BlobStorage Class.
+
+    This class stores each battle as a single encoded value.
+
+    """
+    name = 'blob'
+
+    def keys(self, battle_id):
+        """List the Redis keys of a battle."""
+        return [battle_key(battle_id)]
+
+    def legacy_keys(self, battle_id):
+        """List the Redis keys of a battle before they were namespaced."""
+        return [str(battle_id)]
+
+    def load(self, battle_id, client=None):
+        """Load a battle, returning None if it does not exist.
+
+        If no client is given, the expiration of the battle is refreshed on
+        the same round trip. Otherwise, it is refreshed when it is saved.
+
+        """
+        raw_data = self._read(battle_id, client)
+        if not raw_data:
+            return None
+
+        return codec.decode(raw_data)
+
+    def load_state(self, battle_id):
+        """Load the state of a battle, returning None if it does not exist.
+
+        Only the start of the battle is read, with GETRANGE, from STATE_RANGE
+        bytes and growing until it holds the whole entity table, so the grid
+        of a big board is never read. Each read starts from the first byte,
+        so it is never mixed with another version of the battle.
+
+        """
+        size = STATE_RANGE
+        should_expire = True
+        while True:
+            raw_data = self._read_range(battle_id, size, should_expire)
+            if not raw_data:
+                return None
+
+            if len(raw_data) < size:
+                return codec.decode_state(raw_data)
+
+            state = codec.decode_state_prefix(raw_data)
+            if state is not None:
+                return state
+
+            size *= STATE_RANGE_GROWTH
+            should_expire = False
+
+    def load_version(self, battle_id, client=None):
+        """Load the version of a battle, returning None if it does not exist.
+
+        Only the header of the battle is read, so it is much cheaper than
+        loading the entire battle.
+
+        """
+        client = client or redis.instance
+        raw_header = client.getrange(battle_key(battle_id), 0,
+                                     codec.HEADER.size - 1)
+        if not raw_header:
+            return None
+
+        return codec.read_version(raw_header)
+
+    def save(self, battle_id, battle, previous_battle=None, pipeline=None):
+        """Save the entire battle, overwriting its previous data.
+
+        The battle will be saved on its next version. If a pipeline is given,
+        the battle will be queued on it instead of being written right away.
+
+        """
+        battle['version'] = battle.get('version', 0) + 1
+        raw_data = _encode(battle_id, battle)
+        should_execute = pipeline is None
+        if should_execute:
+            pipeline = redis.instance.pipeline()
+
+        pipeline.set(battle_key(battle_id), raw_data)
+        _expire(pipeline, battle_id, [battle_key(battle_id)])
+        cache.publish(pipeline, battle_id, battle.get('version'))
+        if should_execute:
+            pipeline.execute()
+            cache.instance.invalidate(battle_id)
+
+    def _read(self, battle_id, client=None):
+        key = battle_key(battle_id)
+        if client is None and ttl():
+            with redis.instance.pipeline(transaction=False) as pipeline:
+                pipeline.get(key)
+                _expire(pipeline, battle_id, [key])
+                return pipeline.execute()[0]
+
+        return (client or redis.instance).get(key)
+
+    def _read_range(self, battle_id, size, should_expire):
+        key = battle_key(battle_id)
+        if should_expire and ttl():
+            with redis.instance.pipeline(transaction=False) as pipeline:
+                pipeline.getrange(key, 0, size - 1)
+                _expire(pipeline, battle_id, [key])
+                return pipeline.execute()[0]
+
+        return redis.instance.getrange(key, 0, size - 1)
+
+
+class HashStorage:
+    """HashStorage Class.
+
+    This class stores each battle as a Redis hash, with one field for each
+    entity and each occupied cell of the board.
+
+    """
+    name = 'hash'
+
+    def keys(self, battle_id):
+        """List the Redis keys of a battle."""
+        return [battle_key(battle_id)]
+
+    def legacy_keys(self, battle_id):
+        """List the Redis keys of a battle before they were namespaced."""
+        return [str(battle_id)]
+
+    def load(self, battle_id, client=None):
+        """Load a battle, returning None if it does not exist.
+
+        If no client is given, the expiration of the battle is refreshed on
+        the same round trip. Otherwise, it is refreshed when it is saved.
+
+        """
+        fields = self._read(battle_id, client)
+        if not fields:
+            return None
+
+        return _battle_from_fields(fields)
+
+    def load_state(self, battle_id):
+        """Load the state of a battle, returning None if it does not exist.
+
+        The cells of the battle are read, but they are not placed on a
+        board.
+
+        """
+        fields = self._read(battle_id)
+        if not fields:
+            return None
+
+        return _state_from_fields(fields)
+
+    def load_version(self, battle_id, client=None):
+        """Load the version of a battle, returning None if it does not exist.
+
+        Only the version field of the battle is read, so it is much cheaper
+        than loading the entire battle.
+
+        """
+        client = client or redis.instance
+        raw_version = client.hget(battle_key(battle_id), VERSION_FIELD)
+        if raw_version is None:
+            return None
+
+        return int(raw_version)
+
+    def save(self, battle_id, battle, previous_battle=None, pipeline=None):
+        """Save a battle, writing only what changed since its previous state.
+
+        If the previous state of the battle is not known, the entire battle
+        will be written. The battle will be saved on its next version and, if
+        a pipeline is given, it will be queued on it instead of being written
+        right away.
+
+        """
+        battle['version'] = battle.get('version', 0) + 1
+        fields = _fields_from_battle(battle)
+        key = battle_key(battle_id)
+        should_execute = pipeline is None
+        if should_execute:
+            pipeline = redis.instance.pipeline()
+
+        if previous_battle is None:
+            pipeline.delete(key)
+            pipeline.hmset(key, fields)
+            _expire(pipeline, battle_id, [key])
+            cache.publish(pipeline, battle_id, battle.get('version'))
+            if should_execute:
+                pipeline.execute()
+                cache.instance.invalidate(battle_id)
+            return
+
+        previous_fields = _fields_from_battle(previous_battle)
+        changed_fields = {key: value for key, value in fields.items()
+                          if previous_fields.get(key) != value}
+        removed_fields = [key for key in previous_fields
+                          if key not in fields]
+
+        if removed_fields:
+            pipeline.hdel(key, *removed_fields)
+
+        if changed_fields:
+            pipeline.hmset(key, changed_fields)
+
+        _expire(pipeline, battle_id, [key])
+        cache.publish(pipeline, battle_id, battle.get('version'))
+        if should_execute:
+            pipeline.execute()
+            cache.instance.invalidate(battle_id)
+
+    def _read(self, battle_id, client=None):
+        key = battle_key(battle_id)
+        if client is None and ttl():
+            with redis.instance.pipeline(transaction=False) as pipeline:
+                pipeline.hgetall(key)
+                _expire(pipeline, battle_id, [key])
+                raw_fields = pipeline.execute()[0]
+        else:
+            raw_fields = (client or redis.instance).hgetall(key)
+
+        return {key.decode('utf-8'): value.decode('utf-8')
+                for key, value in raw_fields.items()}
+
+
+class StreamStorage:
+    """StreamStorage Class.
+
+    This class stores each battle as an encoded snapshot, on the key of the
+    battle, plus a Redis Stream with the events that happened after it.
+
+    """
+    name = 'stream'
+
+    def __init__(self):
+        self.snapshotter = snapshots.Snapshotter(self.snapshot_if_needed)
+
+    def keys(self, battle_id):
+        """List the Redis keys of a battle."""
+        return [battle_key(battle_id), battle_key(battle_id) + EVENTS_SUFFIX]
+
+    def legacy_keys(self, battle_id):
+        """List the Redis keys of a battle before they were namespaced."""
+        return [str(battle_id), LEGACY_EVENTS_PREFIX + str(battle_id)]
+
+    def load(self, battle_id, client=None):
+        """Load a battle, returning None if it does not exist.
+
+        The battle is materialized from its snapshot plus its events. If no
+        client is given, both of them are read in a single transaction, so
+        a snapshot that is taken in the meantime can not be missed, and the
+        expiration of the battle is refreshed on it.
+
+        """
+        raw_data, raw_events = self._read(battle_id, client)
+        if not raw_data:
+            return None
+
+        return _apply_events(codec.decode(raw_data), raw_events)
+
+    def load_state(self, battle_id):
+        """Load the state of a battle, returning None if it does not exist.
+
+        Only the header and the entity table of the snapshot are decoded,
+        and only the entities of the events are applied over them.
+
+        """
+        raw_data, raw_events = self._read(battle_id)
+        if not raw_data:
+            return None
+
+        return _apply_state_events(codec.decode_state(raw_data), raw_events)
+
+    def load_version(self, battle_id, client=None):
+        """Load the version of a battle, returning None if it does not exist.
+
+        Only the last event of the battle, or the header of its snapshot if
+        there are no events after it, is read.
+
+        """
+        client = client or redis.instance
+        key, events_key = self.keys(battle_id)
+        raw_events = client.xrevrange(events_key, count=1)
+        if raw_events:
+            _, raw_event = raw_events[0]
+            return int(raw_event.get(VERSION_FIELD.encode('utf-8')))
+
+        raw_header = client.getrange(key, 0, codec.HEADER.size - 1)
+        if not raw_header:
+            return None
+
+        return codec.read_version(raw_header)
+
+    def save(self, battle_id, battle, previous_battle=None, pipeline=None):
+        """Save a battle, appending what changed since its previous state.
+
+        If the previous state of the battle is not known, the entire battle
+        will be written as a new snapshot. The battle will be saved on its
+        next version and, if a pipeline is given, it will be queued on it
+        instead of being written right away.
+
+        """
+        battle['version'] = battle.get('version', 0) + 1
+        key, events_key = self.keys(battle_id)
+        should_execute = pipeline is None
+        if should_execute:
+            pipeline = redis.instance.pipeline()
+
+        if previous_battle is None:
+            pipeline.set(key, _encode(battle_id, battle))
+            pipeline.delete(events_key)
+            _expire(pipeline, battle_id, [key])
+        else:
+            fields = _fields_from_battle(battle)
+            previous_fields = _fields_from_battle(previous_battle)
+            event = {key: value for key, value in fields.items()
+                     if previous_fields.get(key) != value}
+            event.update({key: '' for key in previous_fields
+                          if key not in fields})
+            pipeline.xadd(events_key, event)
+            _expire(pipeline, battle_id, [key, events_key])
+
+        cache.publish(pipeline, battle_id, battle.get('version'))
+        if should_execute:
+            pipeline.execute()
+            cache.instance.invalidate(battle_id)
+
+        if previous_battle is not None:
+            self.snapshotter.request(battle_id)
+
+    def _read(self, battle_id, client=None):
+        key, events_key = self.keys(battle_id)
+        if client is not None:
+            return client.get(key), client.xrange(events_key)
+
+        with redis.instance.pipeline() as pipeline:
+            pipeline.get(key)
+            pipeline.xrange(events_key)
+            _expire(pipeline, battle_id, [key, events_key])
+
+            return pipeline.execute()[:2]
+
+    def snapshot_if_needed(self, battle_id, max_events, max_bytes):
+        """Take a new snapshot of a battle if its stream is too big.
+
+        The snapshot and the deletion of the events that it contains run on
+        a transaction that watches the battle, so it is dropped if any event
+        is appended in the meantime.
+
+        ...
+
+        Parameters
+        ----------
+        battle_id : int
+            The ID of the battle that will be checked.
+
+        max_events : int
+            The number of events that triggers a snapshot.
+
+        max_bytes : int
+            The size of the stream, in bytes, that triggers a snapshot.
+
+        Returns
+        -------
+        taken : bool
+            If a snapshot was taken.
+
+        """
+        key, events_key = self.keys(battle_id)
+        with redis.instance.pipeline() as pipeline:
+            try:
+                pipeline.watch(*self.keys(battle_id))
+                total_events = pipeline.xlen(events_key)
+                if not total_events:
+                    return False
+
+                is_big = (total_events >= max_events or
+                          (pipeline.memory_usage(events_key) or 0) >=
+                          max_bytes)
+                if not is_big:
+                    return False
+
+                battle = self.load(battle_id, pipeline)
+                if battle is None:
+                    return False
+
+                pipeline.multi()
+                pipeline.set(key, _encode(battle_id, battle))
+                pipeline.delete(events_key)
+                _expire(pipeline, battle_id, [key])
+                pipeline.execute()
+            except WatchError:
+                return False
+
+        return True
+
+
+LAYOUTS = dict()
+LAYOUTS.setdefault(BlobStorage.name, BlobStorage())
+LAYOUTS.setdefault(HashStorage.name, HashStorage())
+LAYOUTS.setdefault(StreamStorage.name, StreamStorage())
+
+
+def battle_key(battle_id):
+    """Get the Redis key of a battle."""
+    return KEY_PREFIX + str(battle_id)
+
+
+def ttl():
+    """Get the seconds that an idle battle takes to expire, or 0 if never."""
+    return int(settings.get('BATTLE_TTL', DEFAULT_TTL) or 0)
+
+
+def expires_at():
+    """Get the time when a battle refreshed now expires, or inf if never."""
+    seconds = ttl()
+
+    return time.time() + seconds if seconds else float('inf')
+
+
+def get_storage():
+    """Get the storage layout that our API is using.
+
+    This function will return the layout set on the BATTLE_STORAGE
+    configuration.
+
+    ...
+
+    Returns
+    -------
+    storage : class
+        The storage layout of our battles.
+
+    Raises
+    ------
+    ValueError
+        If the configured layout does not exist.
+
+    """
+    name = settings.get('BATTLE_STORAGE', DEFAULT_STORAGE)
+    storage = LAYOUTS.get(name)
+    if not storage:
+        raise ValueError(f"Unknown battle storage: {name}")
+
+    return storage
+
+
+def load(battle_id):
+    """Load a battle, using our battle cache when it is enabled.
+
+    When the battles expire, a cached battle is only used for half of the
+    BATTLE_TTL configuration. After that, it is loaded again, refreshing its
+    expiration, so a battle that is only read from the cache does not expire
+    while it is still being read.
+
+    ...
+
+    Parameters
+    ----------
+    battle_id : int
+        The ID of the battle that you are trying to load.
+
+    Returns
+    -------
+    battle : dict
+        The battle, or None if it does not exist. It may be shared with other
+        requests, so copy it before changing it.
+
+    """
+    layout = get_storage()
+    if not cache.instance.enabled():
+        return _load_or_restore(layout, battle_id)
+
+    battle = cache.instance.get(battle_id, max_age=ttl() / 2 or None)
+    if battle is None:
+        battle = _load_or_restore(layout, battle_id)
+        if battle is not None:
+            cache.instance.put(battle_id, battle)
+
+    return battle
+
+
+def load_version(battle_id):
+    """Load only the version of a battle.
+
+    This function will read the version of a battle straight from Redis,
+    without loading it, so it is the cheapest way to know if a battle has
+    changed. It does not refresh the expiration of the battle, nor restore
+    an archived battle.
+
+    ...
+
+    Parameters
+    ----------
+    battle_id : int
+        The ID of the battle.
+
+    Returns
+    -------
+    version : int
+        The version of the battle, or None if it is not on Redis.
+
+    """
+    return get_storage().load_version(battle_id)
+
+
+def load_state(battle_id):
+    """Load the state of a battle, without its board.
+
+    This function will use the battle from our battle cache, when it is
+    there, or ask the storage layout for the state of the battle, which
+    does not decode its grid. An archived battle is moved back to Redis.
+
+    ...
+
+    Parameters
+    ----------
+    battle_id : int
+        The ID of the battle that you are trying to load.
+
+    Returns
+    -------
+    state : dict
+        The size of the board, the version and the entities of the battle,
+        or None if it does not exist. Its entities may be shared with other
+        requests, so copy them before changing them.
+
+    """
+    layout = get_storage()
+    if cache.instance.enabled():
+        battle = cache.instance.get(battle_id, max_age=ttl() / 2 or None)
+        if battle is not None:
+            return _state_from_battle(battle)
+
+    state = layout.load_state(battle_id)
+    if state is None and restore(battle_id):
+        state = layout.load_state(battle_id)
+
+    return state
+
+
+def transaction(battle_id, mutate):
+    """Mutate a battle with optimistic concurrency control.
+
+    This function will watch a battle, load it and pass it to the mutate
+    function. If the battle changes before the mutation is saved, the whole
+    mutation will run again, up to BATTLE_TRANSACTION_RETRIES times.
+
+    If the battle is archived, the mutation runs over its archived copy and
+    the whole battle is moved back to Redis when the mutation is saved. A
+    battle stored under its legacy keys is migrated before it is mutated.
+
+    Every saved mutation publishes its delta events, on the same round trip,
+    to the live spectators of the battle. Every transaction, conflict and
+    retry is counted on our metrics, by battle.
+
+    ...
+
+    Parameters
+    ----------
+    battle_id : int
+        The ID of the battle that you are trying to mutate.
+
+    mutate : function
+        A function that receives the current battle (or None if it does not
+        exist) and returns a tuple with a result and the updated battle. If
+        the updated battle is None, nothing will be saved. It must not change
+        the battle that it receives, since it may run more than once.
+
+    Returns
+    -------
+    result : any
+        The result returned by the last run of the mutate function.
+
+    Raises
+    ------
+    ConflictError
+        If the battle kept changing after every retry.
+
+    """
+    layout = get_storage()
+    retries = settings.get('BATTLE_TRANSACTION_RETRIES',
+                           DEFAULT_TRANSACTION_RETRIES)
+    is_cached = cache.instance.enabled()
+    metrics.increment('battle_transactions', battle_id)
+
+    for attempt in range(retries + 1):
+        if attempt:
+            metrics.increment('battle_retries', battle_id)
+
+        with redis.instance.pipeline() as pipeline:
+            try:
+                pipeline.watch(*layout.keys(battle_id))
+                battle = _load_watched(layout, battle_id, pipeline, is_cached)
+                if battle is None and migrate(battle_id):
+                    pipeline.unwatch()
+                    pipeline.watch(*layout.keys(battle_id))
+                    battle = _load_watched(layout, battle_id, pipeline,
+                                           is_cached)
+
+                is_restored = False
+                if battle is None and archive.enabled():
+                    battle = archive.fetch(battle_id)
+                    is_restored = battle is not None
+
+                result, updated_battle = mutate(battle)
+                if updated_battle is None:
+                    return result
+
+                deltas = events.deltas(battle, updated_battle)
+                pipeline.multi()
+                layout.save(battle_id,
+                            updated_battle,
+                            None if is_restored else battle,
+                            pipeline)
+                events.publish(pipeline,
+                               battle_id,
+                               updated_battle.get('version'),
+                               deltas)
+                pipeline.execute()
+
+                if is_restored:
+                    archive.discard(battle_id)
+                    metrics.increment('battle_restores', battle_id)
+
+                if is_cached:
+                    cache.instance.put(battle_id, updated_battle)
+
+                return result
+            except WatchError:
+                metrics.increment('battle_conflicts', battle_id)
+
+    metrics.increment('battle_failed_transactions', battle_id)
+    raise ConflictError(f"Battle {battle_id} is changing too fast")
+
+
+def restore(battle_id):
+    """Move an archived battle back to Redis.
+
+    This function will write the archived copy of a battle on Redis, on its
+    next version, unless the battle is already there, and remove it from
+    the archive. A battle stored under its legacy keys is migrated instead.
+
+    ...
+
+    Parameters
+    ----------
+    battle_id : int
+        The ID of the battle that you are trying to restore.
+
+    Returns
+    -------
+    restored : bool
+        If the battle was archived or migrated, so it is on Redis now.
+
+    """
+    if migrate(battle_id):
+        return True
+
+    if not archive.enabled():
+        return False
+
+    battle = archive.fetch(battle_id)
+    if battle is None:
+        return False
+
+    layout = get_storage()
+    with redis.instance.pipeline() as pipeline:
+        try:
+            pipeline.watch(*layout.keys(battle_id))
+            if layout.load_version(battle_id, pipeline) is None:
+                pipeline.multi()
+                layout.save(battle_id, battle, pipeline=pipeline)
+                pipeline.execute()
+                metrics.increment('battle_restores', battle_id)
+        except WatchError:
+            pass
+
+    archive.discard(battle_id)
+
+    return True
+
+
+def migrate(battle_id):
+    """Move a battle stored under its legacy keys to its namespaced keys.
+
+    The legacy keys are renamed on a transaction that watches every key of
+    the battle, so a battle that is already stored under its namespaced keys
+    is never overwritten. The renamed keys get the expiration of any other
+    battle.
+
+    ...
+
+    Parameters
+    ----------
+    battle_id : int
+        The ID of the battle that you are trying to migrate.
+
+    Returns
+    -------
+    migrated : bool
+        If the battle was stored under its legacy keys, so it is stored
+        under its namespaced keys now.
+
+    """
+    layout = get_storage()
+    keys = layout.keys(battle_id)
+    legacy_keys = layout.legacy_keys(battle_id)
+
+    with redis.instance.pipeline() as pipeline:
+        try:
+            pipeline.watch(*keys, *legacy_keys)
+            if pipeline.exists(keys[0]) or not pipeline.exists(legacy_keys[0]):
+                return False
+
+            renamed_keys = [(legacy_key, key)
+                            for legacy_key, key in zip(legacy_keys, keys)
+                            if pipeline.exists(legacy_key)]
+            pipeline.multi()
+            for legacy_key, key in renamed_keys:
+                pipeline.rename(legacy_key, key)
+            _expire(pipeline, battle_id, [key for _, key in renamed_keys])
+            pipeline.execute()
+        except WatchError:
+            return False
+
+    metrics.increment('battle_migrations', battle_id)
+
+    return True
+
+
+def archive_battle(battle_id):
+    """Move a battle from Redis to the archive.
+
+    The battle is stored on the archive before it is deleted from Redis, on
+    a transaction that watches it. If the battle changes in the meantime, it
+    is kept on Redis and its archived copy is dropped.
+
+    ...
+
+    Parameters
+    ----------
+    battle_id : int
+        The ID of the battle that you are trying to archive.
+
+    Returns
+    -------
+    archived : bool
+        If the battle was moved to the archive.
+
+    """
+    layout = get_storage()
+    with redis.instance.pipeline() as pipeline:
+        try:
+            pipeline.watch(*layout.keys(battle_id))
+            battle = layout.load(battle_id, pipeline)
+            if battle is None:
+                return False
+
+            archived_bytes = archive.store(battle_id, battle)
+            pipeline.multi()
+            pipeline.delete(*layout.keys(battle_id))
+            pipeline.zrem(LIVE_KEY, str(battle_id))
+            # The battle will be restored on its next version, so every
+            # worker drops the copy that it has cached.
+            cache.publish(pipeline, battle_id, battle.get('version', 0) + 1)
+            pipeline.execute()
+        except WatchError:
+            archive.discard(battle_id, battle.get('version', 0))
+            return False
+
+    cache.instance.invalidate(battle_id)
+    metrics.forget(battle_id)
+    metrics.increment('battle_archives')
+    metrics.increment('battle_archived_bytes', amount=archived_bytes)
+
+    return True
+
+
+def archive_idle(idle_seconds):
+    """Move every battle that is idle for too long to the archive.
+
+    How long a battle is idle is measured by how much of the BATTLE_TTL
+    configuration it has already waited to expire, so nothing is archived
+    when the battles never expire.
+
+    ...
+
+    Parameters
+    ----------
+    idle_seconds : int
+        The seconds that a battle must be idle to be archived.
+
+    Returns
+    -------
+    archived : int
+        How many battles were archived.
+
+    """
+    seconds = ttl()
+    if not seconds or not archive.enabled():
+        return 0
+
+    client = redis.instance
+    total_archived = 0
+    cursor = None
+
+    while cursor != 0:
+        cursor, keys = client.scan(cursor or 0,
+                                   match=KEY_PREFIX + '*',
+                                   count=ARCHIVE_SCAN_COUNT)
+        keys = [key for key in keys if key.count(b':') == 1]
+        if not keys:
+            continue
+
+        with client.pipeline(transaction=False) as pipeline:
+            for key in keys:
+                pipeline.ttl(key)
+            remaining_seconds = pipeline.execute()
+
+        for key, remaining in zip(keys, remaining_seconds):
+            if remaining is None or remaining < 0:
+                continue
+
+            if seconds - remaining < idle_seconds:
+                continue
+
+            battle_id = key.decode('utf-8')[len(KEY_PREFIX):]
+            if archive_battle(battle_id):
+                total_archived += 1
+
+    return total_archived
+
+
+def usage(client=None):
+    """Measure how many battles are stored on Redis and their size.
+
+    This function will count the battles of the LIVE_KEY sorted set, after
+    dropping the ones that have expired, so it does not scan our keys.
+
+    ...
+
+    Parameters
+    ----------
+    client : class
+        The Redis client that will be measured.
+
+    Returns
+    -------
+    battles : int
+        How many battles are stored.
+
+    bytes : int
+        The memory used by the dataset of the Redis server, or None if the
+        Redis server is not able to tell it.
+
+    """
+    client = client or redis.instance
+    with client.pipeline(transaction=False) as pipeline:
+        pipeline.zremrangebyscore(LIVE_KEY, '-inf', time.time())
+        pipeline.zcard(LIVE_KEY)
+        _, total_battles = pipeline.execute()
+
+    try:
+        total_bytes = client.info('memory').get('used_memory_dataset')
+    except ResponseError:
+        total_bytes = None
+
+    return total_battles, total_bytes
+
+
+def _encode(battle_id, battle):
+    threshold = settings.get('BATTLE_COMPRESSION_THRESHOLD',
+                             DEFAULT_COMPRESSION_THRESHOLD)
+    level = settings.get('BATTLE_COMPRESSION_LEVEL',
+                         codec.DEFAULT_COMPRESSION_LEVEL)
+    raw_data = codec.encode(battle, threshold, level)
+    metrics.gauge('battle_stored_bytes', battle_id, len(raw_data))
+    metrics.gauge('battle_compression_ratio',
+                  battle_id,
+                  codec.compression_ratio(raw_data))
+
+    return raw_data
+
+
+def _expire(pipeline, battle_id, keys):
+    seconds = ttl()
+    pipeline.zadd(LIVE_KEY, {str(battle_id): expires_at()})
+    if not seconds:
+        return
+
+    for key in keys:
+        pipeline.expire(key, seconds)
+
+
+def _load_or_restore(layout, battle_id):
+    battle = layout.load(battle_id)
+    if battle is None and restore(battle_id):
+        battle = layout.load(battle_id)
+
+    return battle
+
+
+def _load_watched(layout, battle_id, pipeline, is_cached):
+    if is_cached:
+        version = layout.load_version(battle_id, pipeline)
+        battle = None
+        if version is not None:
+            battle = cache.instance.get(battle_id, version)
+
+        if battle is not None:
+            return battle
+
+    return layout.load(battle_id, pipeline)
+
+
+def _fields_from_battle(battle):
+    board = battle.get('board')
+    entities = battle.get('entities') or dict()
+
+    fields = dict()
+    fields[SIZE_FIELD] = str(board.get('size'))
+    fields[ENGINE_FIELD] = boards.engine_for(board).name
+    fields[VERSION_FIELD] = str(battle.get('version', 0))
+
+    for entity_id, entity in entities.items():
+        row, col = entity.get('position')
+        value = [entity.get('type'),
+                 entity.get('direction') or '',
+                 str(row),
+                 str(col)]
+        fields[ENTITY_PREFIX + entity_id] = ','.join(value)
+
+    for (row, col), entity_id in boards.occupied_cells(board):
+        fields[f"{CELL_PREFIX}{row + 1}:{col + 1}"] = entity_id
+
+    return fields
+
+
+def _battle_from_fields(fields):
+    board = boards.create(int(fields.get(SIZE_FIELD)),
+                          fields.get(ENGINE_FIELD))
+    entities = dict()
+
+    for key, value in fields.items():
+        if key.startswith(ENTITY_PREFIX):
+            entity_id = key[len(ENTITY_PREFIX):]
+            entities[entity_id] = _entity_from_field(entity_id, value)
+
+        if key.startswith(CELL_PREFIX):
+            row, col = key[len(CELL_PREFIX):].split(':')
+            boards.put_cell(board, int(row) - 1, int(col) - 1, value)
+
+    battle = dict()
+    battle['board'] = board
+    battle['entities'] = entities
+    battle['version'] = int(fields.get(VERSION_FIELD, 0))
+
+    return battle
+
+
+def _state_from_battle(battle):
+    state = dict()
+    state['size'] = battle.get('board').get('size')
+    state['version'] = battle.get('version', 0)
+    state['entities'] = battle.get('entities')
+
+    return state
+
+
+def _state_from_fields(fields):
+    entities = dict()
+    for key, value in fields.items():
+        if key.startswith(ENTITY_PREFIX):
+            entity_id = key[len(ENTITY_PREFIX):]
+            entities[entity_id] = _entity_from_field(entity_id, value)
+
+    state = dict()
+    state['size'] = int(fields.get(SIZE_FIELD))
+    state['version'] = int(fields.get(VERSION_FIELD, 0))
+    state['entities'] = entities
+
+    return state
+
+
+def _entity_from_field(entity_id, value):
+    entity_type, direction, row, col = value.split(',')
+
+    entity = dict()
+    entity['id'] = entity_id
+    entity['type'] = entity_type
+    if direction:
+        entity['direction'] = direction
+    entity['position'] = [int(row), int(col)]
+
+    return entity
+
+
+def _apply_events(battle, raw_events):
+    events = list()
+    for _, raw_event in raw_events:
+        event = {key.decode('utf-8'): value.decode('utf-8')
+                 for key, value in raw_event.items()}
+        if int(event.get(VERSION_FIELD)) > battle.get('version', 0):
+            events.append(event)
+
+    if not events:
+        return battle
+
+    rows = [int(key[len(CELL_PREFIX):].split(':')[0]) - 1
+            for event in events for key in event
+            if key.startswith(CELL_PREFIX)]
+    board = boards.copy(battle.get('board'), rows)
+    entities = battle.get('entities')
+
+    for event in events:
+        for key, value in event.items():
+            if key == VERSION_FIELD:
+                battle['version'] = int(value)
+
+            if key.startswith(ENTITY_PREFIX):
+                entity_id = key[len(ENTITY_PREFIX):]
+                if value:
+                    entities[entity_id] = _entity_from_field(entity_id, value)
+                else:
+                    entities.pop(entity_id, None)
+
+            if key.startswith(CELL_PREFIX):
+                row, col = key[len(CELL_PREFIX):].split(':')
+                if value:
+                    boards.put_cell(board, int(row) - 1, int(col) - 1, value)
+                else:
+                    boards.clear_cell(board, int(row) - 1, int(col) - 1)
+
+    battle['board'] = board
+
+    return battle
+
+
+def _apply_state_events(state, raw_events):
+    entities = state.get('entities')
+    for _, raw_event in raw_events:
+        event = {key.decode('utf-8'): value.decode('utf-8')
+                 for key, value in raw_event.items()}
+        version = int(event.get(VERSION_FIELD))
+        if version <= state.get('version'):
+            continue
+
+        state['version'] = version
+        for key, value in event.items():
+            if not key.startswith(ENTITY_PREFIX):
+                continue
+
+            entity_id = key[len(ENTITY_PREFIX):]
+            if value:
+                entities[entity_id] = _entity_from_field(entity_id, value)
+            else:
+                entities.pop(entity_id, None)
+
+    return state
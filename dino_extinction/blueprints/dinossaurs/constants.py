@@ -1 +1,3 @@
 TYPE = 'DINOSSAUR'
+ID_PREFIX = 'D'
+ID_COUNTER = 'dinossaurs'
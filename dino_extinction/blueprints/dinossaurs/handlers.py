@@ -4,6 +4,8 @@ This module contains all handlers that we are going to use in our
 Dinossaurs Module API. They will be used inside our routes.
 
 """
+from marshmallow import ValidationError
+from dino_extinction.blueprints.battles.models import error_message
 from . import models
 
 
@@ -44,3 +46,68 @@ def new_dinossaur(battle_id, board_position):
     created_dinossaur = dinossaur_model.load(dinossaur)
 
     return created_dinossaur.errors, created_dinossaur
+
+
+def new_dinossaurs(battle_id, board_positions):
+    """Create many new dinossaurs at once.
+
+    This handler validates a list of positions and creates a dinossaur on
+    each valid one, placing all of them on a single state of the battle and
+    writing it only once. A dinossaur that fails does not stop the others.
+
+    ...
+
+    Parameters
+    ----------
+    battle_id : int
+        The ID of your current battle.
+
+    board_positions : list
+        A list of tuples with the X and Y positions of each dinossaur.
+
+    Returns
+    -------
+    errors : string
+        An error that prevented every dinossaur from being created (if any).
+
+    results : list
+        A dict for each dinossaur, with its ID (if created), its position,
+        whether it succeeded and a message about it.
+
+    """
+    dinossaur_model = models.DinossaurSchema(context={'bulk': True})
+    results = list()
+    built = list()
+
+    for board_position in board_positions:
+        dinossaur = dict()
+        dinossaur['battle_id'] = battle_id
+        dinossaur['position'] = board_position
+        built_dinossaur = dinossaur_model.load(dinossaur)
+
+        result = dict()
+        result['id'] = None
+        result['position'] = board_position
+        result['success'] = False
+        result['message'] = error_message(built_dinossaur.errors)
+        results.append(result)
+
+        if not built_dinossaur.errors:
+            built.append((result, built_dinossaur.data))
+
+    if not built:
+        return None, results
+
+    try:
+        errors = dinossaur_model.place_dinossaurs(
+            battle_id,
+            [dinossaur for _, dinossaur in built])
+    except ValidationError as error:
+        return error_message(error.messages), None
+
+    for (result, dinossaur), error in zip(built, errors):
+        result['id'] = None if error else dinossaur.get('id')
+        result['success'] = not error
+        result['message'] = error or 'Dinossaur created'
+
+    return None, results
@@ -4,11 +4,9 @@ This module contains all the classes and methods regarding our
 dinossaurs blueprint models.
 
 """
-import pickle
-
-from random import randint
 from marshmallow import (Schema, fields, validates, post_load, ValidationError)
-from dino_extinction.infrastructure import redis
+from dino_extinction.infrastructure import ids
+from dino_extinction.blueprints.battles.models import BattleSchema
 from . import constants
 
 
@@ -37,21 +35,19 @@ class DinossaurSchema(Schema):
         """Validate the length of battle ID.
 
         This validator checks if the number of digits of our current
-        battle ID is 4. If not, it will raise an error.
+        battle ID is between 4 and the ID_DIGITS configuration. If not, it
+        will raise an error.
 
         ...
 
         Raises
         ------
         ValidationError
-            If the number of digits of the ID is different than 4.
+            If the number of digits of the ID is out of that range.
 
         """
-        digits = str(data)
-        number_of_digits = len(digits)
-
-        if number_of_digits != 4:
-            raise ValidationError('The battle ID should be 4 digits long.')
+        if not ids.is_battle_id(data):
+            raise ValidationError(ids.battle_id_error())
 
     @validates('position')
     def validate_dinossaur_position(self, data):
@@ -78,6 +74,9 @@ class DinossaurSchema(Schema):
         This method will create a new dinossaur if you try to dump a new
         data and all the attributes are valid.
 
+        If the schema was created with a "bulk" context, the dinossaur will
+        only be built, so it can be placed together with many others.
+
         ...
 
         Parameters
@@ -89,8 +88,6 @@ class DinossaurSchema(Schema):
         """
         battle_id = data['battle_id']
         position = data['position']
-        xPos = position[0] - 1
-        yPos = position[1] - 1
 
         dinossaur_id = self._create_dino_id()
 
@@ -99,29 +96,39 @@ class DinossaurSchema(Schema):
         dinossaur['type'] = constants.TYPE
         dinossaur['position'] = position
 
-        raw_battle = redis.instance.get(battle_id)
-        if not raw_battle:
-            raise ValidationError('Invalid battleId')
+        if self.context.get('bulk'):
+            return dinossaur
+
+        return BattleSchema().create_entity(battle_id, dinossaur)
 
-        battle = pickle.loads(raw_battle)
-        board = battle['board']['state']
-        if self._is_not_valid_index(xPos, yPos, board):
-            raise ValidationError('This position is out of range')
+    def place_dinossaurs(self, battle_id, dinossaurs):
+        """Place many built dinossaurs inside of a battle at once.
 
-        if board[xPos][yPos]:
-            raise ValidationError('This position is not empty')
+        This method will place every dinossaur that was built by a "bulk"
+        schema in a single transaction, writing the battle only once.
 
-        battle.setdefault('entities', {}).update({dinossaur_id: dinossaur})
-        board[xPos][yPos] = dinossaur_id
+        ...
 
-        pickled_battle = pickle.dumps(battle)
-        redis.instance.set(battle_id, pickled_battle)
+        Parameters
+        ----------
+        battle_id : int
+            The ID of the battle that you are handling.
 
-        return dinossaur
+        dinossaurs : list
+            The dinossaurs that you are placing.
 
-    def _create_dino_id(self):
-        r = randint(0000, 9999)
-        return 'D-{0:04d}'.format(r)
+        Returns
+        -------
+        errors : list
+            The error of each dinossaur, or None if it was placed.
 
-    def _is_not_valid_index(self, x, y, board):
-        return x not in range(len(board[0])) or y not in range(len(board))
+        Raises
+        ------
+        ValidationError
+            If the battle does not exist or if it is too busy.
+
+        """
+        return BattleSchema().create_entities(battle_id, dinossaurs)
+
+    def _create_dino_id(self):
+        return ids.new_entity_id(constants.ID_PREFIX, constants.ID_COUNTER)
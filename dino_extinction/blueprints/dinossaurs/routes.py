@@ -43,3 +43,34 @@ def set_routes(bp, handlers):
         return Response(parsed,
                         status=status,
                         mimetype=mimetype)
+
+    @bp.route('/bulk', methods=['POST'])
+    def route_bulk():
+        mimetype = 'application/json'
+        status = dict()
+        status.setdefault('error', 500)
+        status.setdefault('success', 200)
+
+        data = request.get_json(silent=True) or dict()
+        battle_id = data.get('battleId')
+        dinossaurs = data.get('dinossaurs')
+
+        is_valid = (battle_id and
+                    isinstance(dinossaurs, list) and
+                    all(isinstance(dino, dict) for dino in dinossaurs))
+        if not is_valid:
+            return Response(json.dumps(False),
+                            status=status.get('error'),
+                            mimetype=mimetype)
+
+        board_positions = [(dino.get('yPosition'), dino.get('xPosition'))
+                           for dino in dinossaurs]
+        errors, results = handlers.new_dinossaurs(
+            battle_id=battle_id,
+            board_positions=board_positions)
+        parsed = json.dumps(False if errors else results)
+        status = status.get('error') if errors else status.get('success')
+
+        return Response(parsed,
+                        status=status,
+                        mimetype=mimetype)
@@ -0,0 +1,11 @@
+"""Metrics Blueprint.
+
+This module will initialize the Metrics Blueprint. Creating the
+Blueprint, setting it up and also creating it's routes.
+
+"""
+from flask import Blueprint
+from . import routes
+
+bp = Blueprint('metrics', __name__)
+routes.set_routes(bp)
@@ -0,0 +1,70 @@
+"""Metrics API routes.
+
+This module is responsible for creating our API routes for our Metrics
+service. We're using our Metrics Blueprint to do so.
+
+Prefix: /metrics
+
+"""
+import json
+import sqlite3
+
+from flask import Response
+from redis.exceptions import RedisError
+from dino_extinction.infrastructure import metrics
+from dino_extinction.blueprints.battles import (archive, storage)
+
+
+def set_routes(bp):
+    """Set the routes for our Metrics Blueprint.
+
+    This function sets the routes for our Metrics Blueprint. It will
+    start every route that is specified inside of this function.
+
+    ...
+
+    Parameters
+    ----------
+    bp : flask blueprint
+        A Flask Blueprint that will receive all routes.
+
+    """
+    @bp.route('/', methods=['GET'])
+    def index():
+        """Create the index route.
+
+        This route is responsible for all incoming GET requests into our
+        /metrics route. It returns every counter of the current worker, the
+        rate of transactions that had conflicts on each battle, how many
+        battles are stored on Redis with the memory of its dataset, and how
+        many battles are archived.
+
+        """
+        counters = metrics.snapshot()
+        transactions = counters.get('battle_transactions', dict())
+        conflicts = counters.get('battle_conflicts', dict())
+
+        conflict_rates = dict()
+        for key, total in transactions.items():
+            conflict_rates[key] = conflicts.get(key, 0) / total
+
+        counters['battle_conflict_rate'] = conflict_rates
+
+        try:
+            live_battles, live_bytes = storage.usage()
+        except RedisError:
+            live_battles, live_bytes = None, None
+
+        counters['battles_live'] = live_battles
+        counters['battles_live_bytes'] = live_bytes
+
+        try:
+            archived_battles = archive.count() if archive.enabled() else 0
+        except sqlite3.Error:
+            archived_battles = None
+
+        counters['battles_archived'] = archived_battles
+        parsed = json.dumps(counters)
+        mimetype = 'application/json'
+
+        return Response(parsed, mimetype=mimetype)
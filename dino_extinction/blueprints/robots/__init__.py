@@ -1,12 +1,15 @@
 """Robots Blueprint.
 
 This module will initialize the Robots Blueprint. Creating the
-Blueprint, setting it up and also creating it's routes.
+Blueprint, setting it up and also creating it's routes and the scheduler
+of its tick mode.
 
 """
 from flask import Blueprint
 from . import routes
 from . import handlers
+from . import ticks
 
 bp = Blueprint('robots', __name__)
 routes.set_routes(bp, handlers)
+scheduler = ticks.Scheduler(handlers.apply_commands)
@@ -1,5 +1,10 @@
 TYPE = 'ROBOT'
+ID_PREFIX = 'R'
+ID_COUNTER = 'robots'
 ACTIONS_TURNED = ['turn-left', 'turn-right']
 ACTIONS_MOVED = ['move-forward', 'move-backwards']
+ACTION_ATTACK = 'attack'
+ACTION_ATTACK_ALL = 'attack-all'
+ACTIONS = ACTIONS_TURNED + ACTIONS_MOVED + [ACTION_ATTACK]
 CARDINAL_CLOCKWISE = ['north', 'east', 'south', 'west']
 CARDINAL_COUNTERCLOCKWISE = ['north', 'west', 'south', 'east']
@@ -4,11 +4,15 @@ This module contains all handlers that we are going to use in our
 Robots Module API. They will be used inside our routes.
 
 """
-from copy import deepcopy
-from dino_extinction.blueprints.battles.models import BattleSchema
+from marshmallow import ValidationError
+from dino_extinction.blueprints.battles import scripts
+from dino_extinction.blueprints.battles.models import (BattleSchema,
+                                                       error_message)
+from dino_extinction.blueprints.battles.storage import ConflictError
 from dino_extinction.blueprints.robots.models import RobotSchema
 from . import models
 from . import constants
+from . import ticks
 
 
 def new_robot(battle_id, direction, board_position):
@@ -56,12 +60,79 @@ def new_robot(battle_id, direction, board_position):
     return created_robot.errors, created_robot
 
 
+def new_robots(battle_id, robots):
+    """Create many new robots at once.
+
+    This handler validates a list of robots and creates each valid one,
+    placing all of them on a single state of the battle and writing it only
+    once. A robot that fails does not stop the others.
+
+    ...
+
+    Parameters
+    ----------
+    battle_id : int
+        The ID of your current battle.
+
+    robots : list
+        A list of dicts, each one with the direction and the X and Y
+        positions of a robot.
+
+    Returns
+    -------
+    errors : string
+        An error that prevented every robot from being created (if any).
+
+    results : list
+        A dict for each robot, with its ID (if created), its position,
+        whether it succeeded and a message about it.
+
+    """
+    robot_model = models.RobotSchema(context={'bulk': True})
+    results = list()
+    built = list()
+
+    for robot_data in robots:
+        robot = dict()
+        robot['battle_id'] = battle_id
+        robot['direction'] = robot_data.get('direction')
+        robot['position'] = robot_data.get('position')
+        built_robot = robot_model.load(robot)
+
+        result = dict()
+        result['id'] = None
+        result['position'] = robot_data.get('position')
+        result['success'] = False
+        result['message'] = error_message(built_robot.errors)
+        results.append(result)
+
+        if not built_robot.errors:
+            built.append((result, built_robot.data))
+
+    if not built:
+        return None, results
+
+    try:
+        errors = robot_model.place_robots(battle_id,
+                                          [robot for _, robot in built])
+    except ValidationError as error:
+        return error_message(error.messages), None
+
+    for (result, robot), error in zip(built, errors):
+        result['id'] = None if error else robot.get('id')
+        result['success'] = not error
+        result['message'] = error or 'Robot created'
+
+    return None, results
+
+
 def command_robot(battle_id, robot_id, action):
     """Command a specific robot.
 
     This handler will command an specific robot, at a specific battle, to do
     some given action. It must guarantee that the action is also valid and
-    return any errors if it is not.
+    return any errors if it is not. If the battle is on tick mode, the
+    command will only be queued to the next tick of the battle.
 
     ...
 
@@ -90,28 +161,261 @@ def command_robot(battle_id, robot_id, action):
     def _default_error(msg):
         return msg, None
 
+    if ticks.is_ticking(battle_id):
+        if action not in constants.ACTIONS:
+            return _default_error('This action does not exist')
+
+        command = dict()
+        command['robot'] = robot_id
+        command['action'] = action
+
+        ticks.queue(battle_id, [command])
+        return None, 'Robot command queued'
+
+    if scripts.enabled() and action in scripts.ACTION_SCRIPTS:
+        error = scripts.command_robot(battle_id, robot_id, action)
+        if error:
+            return _default_error(error)
+
+        return None, 'Robot commanded'
+
+    def _command(battle_state_original):
+        if not battle_state_original:
+            return 'This battle does not exist', None
+
+        return _apply_command(battle_model,
+                              battle_state_original,
+                              robot_id,
+                              action)
+
     battle_model = BattleSchema()
-    battle_state_original = battle_model.get_battle(battle_id)
-    if not battle_state_original:
-        return _default_error('This battle does not exist')
+    try:
+        error = battle_model.transaction(battle_id, _command)
+    except ConflictError:
+        return _default_error('This battle is too busy, try again')
 
-    entities = battle_state_original.get('entities')
-    selected_robot = entities.get(robot_id)
-    if not selected_robot:
-        return _default_error('This robot does not exist')
+    if error:
+        return _default_error(error)
+
+    return None, 'Robot commanded'
+
+
+def command_robots(battle_id, commands):
+    """Command many robots at once.
+
+    This handler will apply a list of commands, in order, over a single
+    state of the battle. Each command sees the changes of the previous ones,
+    and the battle is written only once, after every command was applied.
+    A command that fails does not stop the following ones. If the battle is
+    on tick mode, the commands will only be queued, together, to the next
+    tick of the battle.
+
+    ...
+
+    Parameters
+    ----------
+    battle_id : int
+        The ID of your current battle.
+
+    commands : list
+        A list of dicts, each one with the robot that will receive the
+        command and the action that it will do.
+
+    Returns
+    -------
+    errors : string
+        An error that prevented every command from being applied (if any).
+
+    results : list
+        A dict for each command, with its robot, its action, whether it
+        succeeded (or was queued) and a message about it.
+
+    """
+    if ticks.is_ticking(battle_id):
+        return None, _queue_commands(battle_id, commands)
+
+    return apply_commands(battle_id, commands)
+
+
+def apply_commands(battle_id, commands):
+    """Apply many robot commands at once, even on tick mode.
+
+    This handler is the one that applies the queued commands of each tick.
+    The commands are applied just like the ones of command_robots, and the
+    attack-all action, without a robot, attacks with every robot at once.
+
+    ...
+
+    Parameters
+    ----------
+    battle_id : int
+        The ID of your current battle.
+
+    commands : list
+        A list of dicts, each one with the robot that will receive the
+        command and the action that it will do.
+
+    Returns
+    -------
+    errors : string
+        An error that prevented every command from being applied (if any).
+
+    results : list
+        A dict for each command, with its robot, its action, whether it
+        succeeded and a message about it.
+
+    """
+    def _command_all(battle_state_original):
+        if not battle_state_original:
+            return ('This battle does not exist', None), None
+
+        results = list()
+        battle_state = battle_state_original
+        for command in commands:
+            robot_id = command.get('robot')
+            action = command.get('action')
+            if action == constants.ACTION_ATTACK_ALL:
+                error, new_battle_state = _apply_attack_all(battle_model,
+                                                            battle_state)
+            else:
+                error, new_battle_state = _apply_command(battle_model,
+                                                         battle_state,
+                                                         robot_id,
+                                                         action)
+            if new_battle_state:
+                battle_state = new_battle_state
+
+            result = dict()
+            result['robot'] = robot_id
+            result['action'] = action
+            result['success'] = not error
+            result['message'] = error or 'Robot commanded'
+            results.append(result)
+
+        is_changed = battle_state is not battle_state_original
+
+        return (None, results), battle_state if is_changed else None
+
+    battle_model = BattleSchema()
+    try:
+        return battle_model.transaction(battle_id, _command_all)
+    except ConflictError:
+        return 'This battle is too busy, try again', None
+
+
+def attack_all(battle_id):
+    """Attack with every robot of a battle at once.
+
+    This handler will destroy every dinossaur that is close to any robot of
+    the battle, writing the battle only once. If the battle is on tick mode,
+    the attack will only be queued to the next tick of the battle, so it
+    keeps its order with the other commands.
+
+    ...
+
+    Parameters
+    ----------
+    battle_id : int
+        The ID of your current battle.
+
+    Returns
+    -------
+    errors : string
+        An error that happened during the attack (if any).
+
+    destroyed : int
+        How many dinossaurs were destroyed, or None if the attack was
+        queued.
+
+    """
+    if ticks.is_ticking(battle_id):
+        command = dict()
+        command['robot'] = None
+        command['action'] = constants.ACTION_ATTACK_ALL
+
+        ticks.queue(battle_id, [command])
+        return None, None
+
+    def _attack_all(battle_state_original):
+        if not battle_state_original:
+            return ('This battle does not exist', None), None
+
+        destroyed, new_battle_state = battle_model.robots_attack(
+            battle_state_original)
+
+        return (None, destroyed), new_battle_state if destroyed else None
+
+    battle_model = BattleSchema()
+    try:
+        return battle_model.transaction(battle_id, _attack_all)
+    except ConflictError:
+        return 'This battle is too busy, try again', None
+
+
+def set_tick_mode(battle_id, is_ticking):
+    """Put a battle on tick mode, or take it out of it.
+
+    While a battle is on tick mode, the commands of its robots are queued
+    and applied together on each tick. When it leaves the tick mode, the
+    commands that were still queued are applied right away. If they can not
+    be applied, the battle stays on tick mode with its commands queued.
+
+    ...
+
+    Parameters
+    ----------
+    battle_id : int
+        The ID of your current battle.
+
+    is_ticking : bool
+        If the battle must be on tick mode.
+
+    Returns
+    -------
+    errors : string
+        An error that happened while changing the mode (if any).
+
+    message : string
+        A message to the user about the mode of the battle.
+
+    """
+    if not ticks.enabled():
+        return 'The tick mode is disabled', None
+
+    battle_model = BattleSchema()
+    if not battle_model.get_battle(battle_id):
+        return 'This battle does not exist', None
+
+    if is_ticking:
+        ticks.start_ticking(battle_id)
+        return None, 'Tick mode enabled'
+
+    commands = ticks.stop_ticking(battle_id)
+    if commands:
+        errors, _ = apply_commands(battle_id, commands)
+        if errors:
+            ticks.start_ticking(battle_id)
+            ticks.requeue(battle_id, commands)
+            return errors, None
+
+    return None, 'Tick mode disabled'
+
+
+def _apply_command(battle_model, battle_state_original, robot_id, action):
+    selected_robot = battle_state_original.get('entities').get(robot_id)
+    if not selected_robot or selected_robot.get('type') != constants.TYPE:
+        return 'This robot does not exist', None
 
     if action in constants.ACTIONS_TURNED:
         robot_model = RobotSchema()
         previous_direction = selected_robot.get('direction')
         new_robot_direction = robot_model.change_direction(previous_direction,
                                                            action)
-        new_battle_state = deepcopy(battle_state_original)
-        robot = new_battle_state.get('entities').get(robot_id)
+        new_battle_state = battle_model.robot_turn(battle_state_original,
+                                                   robot_id,
+                                                   new_robot_direction)
 
-        new_direction = dict()
-        new_direction.setdefault('direction', new_robot_direction)
-        robot.update(new_direction)
-        battle_model.update_battle(battle_id, new_battle_state)
+        return None, new_battle_state
 
     if action in constants.ACTIONS_MOVED:
         new_battle_state = battle_model.robot_move(battle_state_original,
@@ -119,13 +423,45 @@ def command_robot(battle_id, robot_id, action):
                                                    action)
 
         if not new_battle_state:
-            return _default_error('There is another entity there')
-        battle_model.update_battle(battle_id, new_battle_state)
+            return 'There is another entity there', None
+
+        return None, new_battle_state
 
-    if action == 'attack':
+    if action == constants.ACTION_ATTACK:
         new_battle_state = battle_model.robot_attack(battle_state_original,
                                                      robot_id)
 
-        battle_model.update_battle(battle_id, new_battle_state)
+        return None, new_battle_state
 
-    return None, 'Robot commanded'
+    return 'This action does not exist', None
+
+
+def _queue_commands(battle_id, commands):
+    results = list()
+    queued = list()
+    for command in commands:
+        action = command.get('action')
+        is_valid = action in constants.ACTIONS + [constants.ACTION_ATTACK_ALL]
+
+        result = dict()
+        result['robot'] = command.get('robot')
+        result['action'] = action
+        result['success'] = is_valid
+        result['message'] = ('Robot command queued' if is_valid
+                             else 'This action does not exist')
+        results.append(result)
+
+        if is_valid:
+            queued.append(command)
+
+    if queued:
+        ticks.queue(battle_id, queued)
+
+    return results
+
+
+def _apply_attack_all(battle_model, battle_state_original):
+    destroyed, new_battle_state = battle_model.robots_attack(
+        battle_state_original)
+
+    return None, new_battle_state if destroyed else None
@@ -4,11 +4,9 @@ This module contains all the classes and methods regarding our
 robots blueprint models.
 
 """
-import pickle
-
-from random import randint
 from marshmallow import (Schema, fields, validates, post_load, ValidationError)
-from dino_extinction.infrastructure import redis
+from dino_extinction.infrastructure import ids
+from dino_extinction.blueprints.battles.models import BattleSchema
 from . import constants
 
 
@@ -41,21 +39,19 @@ class RobotSchema(Schema):
         """Validate the length of battle ID.
 
         This validator checks if the number of digits of our current
-        battle ID is 4. If not, it will raise an error.
+        battle ID is between 4 and the ID_DIGITS configuration. If not, it
+        will raise an error.
 
         ...
 
         Raises
         ------
         ValidationError
-            If the number of digits of the ID is different than 4.
+            If the number of digits of the ID is out of that range.
 
         """
-        digits = str(data)
-        number_of_digits = len(digits)
-
-        if number_of_digits != 4:
-            raise ValidationError('The battle ID should be 4 digits long.')
+        if not ids.is_battle_id(data):
+            raise ValidationError(ids.battle_id_error())
 
     @validates('direction')
     def validate_robot_direction(self, data):
@@ -111,6 +107,9 @@ class RobotSchema(Schema):
         This method will create a new robot if you try to dump a new
         data and all the attributes are valid.
 
+        If the schema was created with a "bulk" context, the robot will only
+        be built, so it can be placed together with many others.
+
         ...
 
         Parameters
@@ -123,8 +122,6 @@ class RobotSchema(Schema):
         battle_id = data['battle_id']
         direction = data['direction']
         position = data['position']
-        xPos = position[0] - 1
-        yPos = position[1] - 1
 
         robot_id = self._create_robot_id()
 
@@ -134,25 +131,39 @@ class RobotSchema(Schema):
         robot['direction'] = direction
         robot['position'] = position
 
-        raw_battle = redis.instance.get(battle_id)
-        if not raw_battle:
-            raise ValidationError('Invalid battleId')
+        if self.context.get('bulk'):
+            return robot
 
-        battle = pickle.loads(raw_battle)
-        board = battle['board']['state']
-        if self._is_not_valid_index(xPos, yPos, board):
-            raise ValidationError('This position is out of range')
+        return BattleSchema().create_entity(battle_id, robot)
 
-        if board[xPos][yPos]:
-            raise ValidationError('This position is not empty')
+    def place_robots(self, battle_id, robots):
+        """Place many built robots inside of a battle at once.
 
-        battle.setdefault('entities', {}).update({robot_id: robot})
-        board[xPos][yPos] = robot_id
+        This method will place every robot that was built by a "bulk"
+        schema in a single transaction, writing the battle only once.
 
-        pickled_battle = pickle.dumps(battle)
-        redis.instance.set(battle_id, pickled_battle)
+        ...
 
-        return robot
+        Parameters
+        ----------
+        battle_id : int
+            The ID of the battle that you are handling.
+
+        robots : list
+            The robots that you are placing.
+
+        Returns
+        -------
+        errors : list
+            The error of each robot, or None if it was placed.
+
+        Raises
+        ------
+        ValidationError
+            If the battle does not exist or if it is too busy.
+
+        """
+        return BattleSchema().create_entities(battle_id, robots)
 
     def change_direction(self, previous_direction, action):
         """Change the direction of a robot.
@@ -192,8 +203,4 @@ class RobotSchema(Schema):
         return new_direction
 
     def _create_robot_id(self):
-        r = randint(0000, 9999)
-        return 'R-{0:04d}'.format(r)
-
-    def _is_not_valid_index(self, x, y, board):
-        return x not in range(len(board[0])) or y not in range(len(board))
+        return ids.new_entity_id(constants.ID_PREFIX, constants.ID_COUNTER)
@@ -46,6 +46,38 @@ def set_routes(bp, handlers):
                         status=status,
                         mimetype=mimetype)
 
+    @bp.route('/bulk', methods=['POST'])
+    def route_bulk():
+        mimetype = 'application/json'
+        status = dict()
+        status.setdefault('error', 500)
+        status.setdefault('success', 200)
+
+        data = request.get_json(silent=True) or dict()
+        battle_id = data.get('battleId')
+        robots = data.get('robots')
+
+        is_valid = (battle_id and
+                    isinstance(robots, list) and
+                    all(isinstance(robot, dict) for robot in robots))
+        if not is_valid:
+            return Response(json.dumps(False),
+                            status=status.get('error'),
+                            mimetype=mimetype)
+
+        robots = [{'direction': robot.get('direction'),
+                   'position': (robot.get('yPosition'),
+                                robot.get('xPosition'))}
+                  for robot in robots]
+        errors, results = handlers.new_robots(battle_id=battle_id,
+                                              robots=robots)
+        parsed = json.dumps(False if errors else results)
+        status = status.get('error') if errors else status.get('success')
+
+        return Response(parsed,
+                        status=status,
+                        mimetype=mimetype)
+
     @bp.route('/command', methods=['POST'])
     def route_command():
         mimetype = 'application/json'
@@ -63,12 +95,82 @@ def set_routes(bp, handlers):
                             status=status.get('error'),
                             mimetype=mimetype)
 
-        errors, _ = handlers.command_robot(battle_id=battle_id,
-                                           robot_id=robot_id,
-                                           action=action)
-        parsed = json.dumps(False if errors else 'Robot commanded')
+        errors, message = handlers.command_robot(battle_id=battle_id,
+                                                 robot_id=robot_id,
+                                                 action=action)
+        parsed = json.dumps(False if errors else message)
+        status = status.get('error') if errors else status.get('success')
+
+        return Response(parsed,
+                        status=status,
+                        mimetype=mimetype)
+
+    @bp.route('/commands', methods=['POST'])
+    def route_commands():
+        mimetype = 'application/json'
+        status = dict()
+        status.setdefault('error', 500)
+        status.setdefault('success', 200)
+
+        data = request.get_json(silent=True) or dict()
+        battle_id = data.get('battleId')
+        commands = data.get('commands')
+
+        is_valid = (battle_id and
+                    isinstance(commands, list) and
+                    all(isinstance(command, dict) for command in commands))
+        if not is_valid:
+            return Response(json.dumps(False),
+                            status=status.get('error'),
+                            mimetype=mimetype)
+
+        errors, results = handlers.command_robots(battle_id=battle_id,
+                                                  commands=commands)
+        parsed = json.dumps(False if errors else results)
         status = status.get('error') if errors else status.get('success')
 
         return Response(parsed,
                         status=status,
                         mimetype=mimetype)
+
+    @bp.route('/attack', methods=['POST'])
+    def route_attack():
+        mimetype = 'application/json'
+        battle_id = request.values.get('battleId')
+        if not battle_id:
+            return Response(json.dumps(False),
+                            status=500,
+                            mimetype=mimetype)
+
+        errors, destroyed = handlers.attack_all(battle_id=battle_id)
+        result = {'destroyed': destroyed}
+        if destroyed is None:
+            result = 'Robots attack queued'
+
+        parsed = json.dumps(False if errors else result)
+        status = 500 if errors else 200
+
+        return Response(parsed,
+                        status=status,
+                        mimetype=mimetype)
+
+    @bp.route('/tick-mode', methods=['POST'])
+    def route_tick_mode():
+        mimetype = 'application/json'
+        battle_id = request.values.get('battleId')
+        if not battle_id:
+            return Response(json.dumps(False),
+                            status=500,
+                            mimetype=mimetype)
+
+        is_ticking = request.values.get('enabled', 'true').lower()
+        is_ticking = is_ticking not in ['false', '0']
+
+        errors, message = handlers.set_tick_mode(battle_id=battle_id,
+                                                 is_ticking=is_ticking)
+        parsed = json.dumps(False if errors else message)
+        status = 500 if errors else 200
+
+        return Response(parsed,
+                        status=status,
+                        mimetype=mimetype)
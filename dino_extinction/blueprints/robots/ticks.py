@@ -0,0 +1,226 @@
+"""Robots Ticks.
+
+This module runs the optional tick mode of our battles. While a battle is on
+tick mode, its robot commands are not applied right away: they are queued on
+a Redis list, and a scheduler drains the queue of every ticking battle once
+per tick, applying all of its commands over a single state of the battle and
+writing it only once.
+
+The commands of a tick are applied in the order that they were queued, each
+one over the state left by the previous ones. So when two commands conflict,
+like two robots moving into the same cell, the first one that was queued
+always wins and the other one fails.
+
+The tick mode is only available when the BATTLE_TICK_INTERVAL configuration,
+in milliseconds, is set. Every worker runs a scheduler, but a lock makes
+only one of them tick on each interval. When the commands of a battle fail
+to be applied, they are queued back for the next tick, and the scheduler
+keeps ticking after any error, counting it on battle_tick_errors.
+
+"""
+import json
+
+from threading import (Event, Thread)
+from dino_extinction.infrastructure import (metrics, redis, settings)
+from dino_extinction.blueprints.battles import storage
+
+TICKING_KEY = 'battles:ticking'
+QUEUE_SUFFIX = ':commands'
+LOCK_KEY = 'battles:tick'
+
+
+def enabled():
+    """Check if our battles can run on tick mode."""
+    return bool(_interval())
+
+
+def is_ticking(battle_id):
+    """Check if a battle is on tick mode."""
+    if not enabled():
+        return False
+
+    return bool(redis.instance.sismember(TICKING_KEY, battle_id))
+
+
+def start_ticking(battle_id):
+    """Put a battle on tick mode."""
+    redis.instance.sadd(TICKING_KEY, battle_id)
+
+
+def stop_ticking(battle_id):
+    """Take a battle out of tick mode.
+
+    ...
+
+    Returns
+    -------
+    commands : list
+        The commands that were still queued, so they can be applied right
+        away.
+
+    """
+    redis.instance.srem(TICKING_KEY, battle_id)
+
+    return drain(battle_id)
+
+
+def queue(battle_id, commands):
+    """Queue robot commands to the next tick of a battle.
+
+    The commands are queued as a single entry, so the commands of other
+    requests are never queued between them.
+
+    ...
+
+    Parameters
+    ----------
+    battle_id : int
+        The ID of the battle that you are working on.
+
+    commands : list
+        A list of dicts, each one with the robot that will receive the
+        command and the action that it will do.
+
+    """
+    redis.instance.rpush(_queue_key(battle_id), json.dumps(commands))
+
+
+def drain(battle_id):
+    """Take every queued command of a battle.
+
+    The commands are read and removed in a single Redis transaction, so each
+    one of them is only taken once, even if many workers are draining. The
+    entries queued one command at a time, by the previous versions, are
+    still read.
+
+    ...
+
+    Returns
+    -------
+    commands : list
+        The queued commands, in the order that they were queued.
+
+    """
+    key = _queue_key(battle_id)
+    with redis.instance.pipeline() as pipeline:
+        pipeline.lrange(key, 0, -1)
+        pipeline.delete(key)
+        raw_entries, _ = pipeline.execute()
+
+    commands = list()
+    for raw_entry in raw_entries:
+        entry = json.loads(raw_entry)
+        commands.extend(entry if isinstance(entry, list) else [entry])
+
+    return commands
+
+
+def requeue(battle_id, commands):
+    """Put commands back on the front of the queue of a battle."""
+    redis.instance.lpush(_queue_key(battle_id), json.dumps(commands))
+
+
+def tick(apply):
+    """Apply the queued commands of every ticking battle.
+
+    ...
+
+    Parameters
+    ----------
+    apply : function
+        A function that receives a battle ID and a list of commands, and
+        applies all of them at once, returning an error (if the commands
+        could not be applied) and their results.
+
+    Returns
+    -------
+    ticked : bool
+        If this worker ticked, or another worker already did it on the
+        current interval.
+
+    """
+    client = redis.instance
+    if not client.set(LOCK_KEY, 1, nx=True, px=_interval()):
+        return False
+
+    for raw_battle_id in client.smembers(TICKING_KEY):
+        battle_id = raw_battle_id.decode('utf-8')
+        commands = drain(battle_id)
+        if not commands:
+            continue
+
+        try:
+            errors, _ = apply(battle_id, commands)
+        except Exception:
+            requeue(battle_id, commands)
+            metrics.increment('battle_tick_errors', battle_id)
+            continue
+
+        if errors and storage.get_storage().load_version(battle_id) is None:
+            client.srem(TICKING_KEY, battle_id)
+            continue
+
+        if errors:
+            requeue(battle_id, commands)
+            continue
+
+        metrics.increment('battle_ticks', battle_id)
+        metrics.increment('battle_tick_commands', battle_id, len(commands))
+
+    return True
+
+
+class Scheduler:
+    """Scheduler Class.
+
+    This class runs our ticks on a background thread, once per interval.
+
+    ...
+
+    Attributes
+    ----------
+    apply : function
+        The function that applies the commands of each tick.
+
+    """
+
+    def __init__(self, apply):
+        self.apply = apply
+        self.thread = None
+        self.stopped = Event()
+
+    def start(self, app):
+        """Start ticking, if the tick mode is enabled for the given app."""
+        interval = int(app.config.get('BATTLE_TICK_INTERVAL') or 0)
+        if not interval or self.thread:
+            return
+
+        self.stopped.clear()
+        self.thread = Thread(target=self._run,
+                             args=(app, interval / 1000),
+                             daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop ticking."""
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+
+        self.thread = None
+
+    def _run(self, app, interval):
+        while not self.stopped.wait(interval):
+            with app.app_context():
+                try:
+                    tick(self.apply)
+                except Exception:
+                    metrics.increment('battle_tick_errors')
+
+
+def _queue_key(battle_id):
+    return storage.battle_key(battle_id) + QUEUE_SUFFIX
+
+
+def _interval():
+    return int(settings.get('BATTLE_TICK_INTERVAL', 0) or 0)
@@ -0,0 +1,133 @@
+"""IDs Integration.
+
+This module creates the IDs of our battles and entities from atomic Redis
+counters, so two of them never get the same ID, even on different workers.
+
+Each worker leases a block of IDs at once, with a single INCRBY, and issues
+them from its memory until the block is over, so creating an ID does not need
+a round trip to Redis. The size of each block is set by the ID_BLOCK_SIZE
+configuration. The IDs of a block that was not fully issued when the worker
+stops are never used.
+
+The IDs are ID_DIGITS digits long. Battle IDs are integers starting at the
+smallest number with that many digits, and entity IDs are the prefix of
+their type followed by the counter, padded with zeros:
+
+    battles    : 10000001, 10000002, ...
+    robots     : R-00000001, R-00000002, ...
+    dinossaurs : D-00000001, D-00000002, ...
+
+Battles created before the IDs were allocated by this module are 4 digits
+long, so every battle ID from MIN_DIGITS up to ID_DIGITS digits is valid.
+
+"""
+from threading import Lock
+from dino_extinction.infrastructure import (redis, settings)
+
+COUNTER_PREFIX = 'ids:'
+BATTLES_COUNTER = 'battles'
+MIN_DIGITS = 4
+DEFAULT_DIGITS = 8
+DEFAULT_BLOCK_SIZE = 100
+
+
+class Allocator:
+    """Allocator Class.
+
+    This class issues the IDs of the blocks that were leased by the current
+    worker.
+
+    ...
+
+    Attributes
+    ----------
+    blocks : dict
+        The next ID and the last ID of the leased block of each counter.
+
+    """
+
+    def __init__(self):
+        self.blocks = dict()
+        self.lock = Lock()
+
+    def next(self, name):
+        """Issue the next ID of a counter.
+
+        This method will lease a new block from Redis only if the block of
+        the counter is over.
+
+        ...
+
+        Parameters
+        ----------
+        name : str
+            The name of the counter.
+
+        Returns
+        -------
+        id : int
+            The issued ID, starting at 1.
+
+        """
+        with self.lock:
+            next_id, last_id = self.blocks.get(name, (1, 0))
+            if next_id > last_id:
+                block_size = int(settings.get('ID_BLOCK_SIZE',
+                                              DEFAULT_BLOCK_SIZE))
+                last_id = redis.instance.incrby(COUNTER_PREFIX + name,
+                                                block_size)
+                next_id = last_id - block_size + 1
+
+            self.blocks[name] = (next_id + 1, last_id)
+
+            return next_id
+
+    def reset(self):
+        """Drop every leased block."""
+        with self.lock:
+            self.blocks.clear()
+
+
+instance = Allocator()
+
+
+def digits():
+    """Get the number of digits of our IDs."""
+    return int(settings.get('ID_DIGITS', DEFAULT_DIGITS))
+
+
+def is_battle_id(battle_id):
+    """Check if a battle ID has a valid number of digits."""
+    return MIN_DIGITS <= len(str(battle_id)) <= digits()
+
+
+def battle_id_error():
+    """Describe the valid battle IDs."""
+    return f"The battle ID should be {MIN_DIGITS} to {digits()} digits long."
+
+
+def new_battle_id():
+    """Create a new battle ID."""
+    return 10 ** (digits() - 1) + instance.next(BATTLES_COUNTER)
+
+
+def new_entity_id(prefix, name):
+    """Create a new entity ID.
+
+    ...
+
+    Parameters
+    ----------
+    prefix : str
+        The prefix of the type of the entity, like R for robots.
+
+    name : str
+        The name of the counter of that type.
+
+    Returns
+    -------
+    id : str
+        The new entity ID.
+
+    """
+    return '{0}-{1:0{2}d}'.format(prefix, instance.next(name), digits())
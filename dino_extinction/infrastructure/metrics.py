@@ -0,0 +1,136 @@
+"""Metrics Integration.
+
+This module keeps in-process counters about how our API is behaving. Every
+counter has a name and can be split by a key (the ID of a battle, for
+example), so we can see which battles are the busiest ones.
+
+The counters live in the memory of each worker and are reset when it
+restarts. Each counter keeps up to MAX_KEYS keys, dropping the least
+recently updated ones, and the keys of a battle are forgotten when it
+leaves Redis, so they do not grow with every battle ever played.
+
+"""
+from threading import Lock
+
+TOTAL_KEY = 'total'
+MAX_KEYS = 1000
+
+counters = dict()
+lock = Lock()
+
+
+def increment(name, key=None, amount=1):
+    """Increment a counter.
+
+    This function will increment the total of a counter and, if a key was
+    given, the counter of that key.
+
+    ...
+
+    Parameters
+    ----------
+    name : str
+        The name of the counter.
+
+    key : any
+        The key that splits the counter, like the ID of a battle.
+
+    amount : int
+        How much the counter will be incremented.
+
+    """
+    with lock:
+        counter = counters.setdefault(name, dict())
+        counter[TOTAL_KEY] = counter.get(TOTAL_KEY, 0) + amount
+
+        if key is not None:
+            key = str(key)
+            _set(counter, key, counter.get(key, 0) + amount)
+
+
+def gauge(name, key, value):
+    """Set the value of a gauge.
+
+    Unlike a counter, a gauge holds the last value that was set for each
+    key, like the size of a battle, so it has no total.
+
+    ...
+
+    Parameters
+    ----------
+    name : str
+        The name of the gauge.
+
+    key : any
+        The key that splits the gauge, like the ID of a battle.
+
+    value : number
+        The current value of the gauge.
+
+    """
+    with lock:
+        _set(counters.setdefault(name, dict()), str(key), value)
+
+
+def get(name, key=None):
+    """Get the value of a counter.
+
+    ...
+
+    Parameters
+    ----------
+    name : str
+        The name of the counter.
+
+    key : any
+        The key that splits the counter. If it is not given, the total of
+        the counter will be returned.
+
+    Returns
+    -------
+    value : int
+        The value of the counter, or 0 if it was never incremented.
+
+    """
+    key = TOTAL_KEY if key is None else str(key)
+
+    with lock:
+        return counters.get(name, dict()).get(key, 0)
+
+
+def snapshot():
+    """Take a snapshot of every counter.
+
+    ...
+
+    Returns
+    -------
+    counters : dict
+        A copy of every counter, by name and key.
+
+    """
+    with lock:
+        return {name: dict(counter) for name, counter in counters.items()}
+
+
+def forget(key):
+    """Drop a key, like the ID of a battle, from every counter and gauge."""
+    key = str(key)
+    with lock:
+        for counter in counters.values():
+            counter.pop(key, None)
+
+
+def reset():
+    """Reset every counter."""
+    with lock:
+        counters.clear()
+
+
+def _set(counter, key, value):
+    counter.pop(key, None)
+    counter[key] = value
+
+    while len(counter) - (TOTAL_KEY in counter) > MAX_KEYS:
+        oldest_key = next(name for name in counter if name != TOTAL_KEY)
+        counter.pop(oldest_key)
@@ -1,11 +1,17 @@
 """Redis Integration.
 
-This module integrates with Redis using FlaskRedis.
+This module integrates with Redis using FlaskRedis. It also registers the Lua
+scripts of our scripts folder, so we can run them by their name.
 
 """
+import os
+
 from flask_redis import FlaskRedis
 
+SCRIPTS_PATH = os.path.join(os.path.dirname(__file__), 'scripts')
+
 instance = FlaskRedis()
+scripts = dict()
 
 
 def bind(app):
@@ -13,7 +19,8 @@ def bind(app):
 
     This function binds a FlaskRedis instance with your current app. In
     other to do so, first create your Flask app and them pass it to this
-    function.
+    function. It also registers every Lua script of our scripts folder,
+    computing their SHAs so they can be called with EVALSHA.
 
     ...
 
@@ -24,5 +31,32 @@ def bind(app):
 
     """
     instance.init_app(app)
+    register_scripts()
 
     return True
+
+
+def register_scripts():
+    """Register every Lua script of our scripts folder.
+
+    This function will register each script with the name of its file, without
+    the extension. Redis will load a script the first time that it is called,
+    and again if the server has flushed its script cache.
+
+    ...
+
+    Returns
+    -------
+    scripts : dict
+        The registered scripts, by name.
+
+    """
+    for filename in sorted(os.listdir(SCRIPTS_PATH)):
+        name, extension = os.path.splitext(filename)
+        if extension != '.lua':
+            continue
+
+        with open(os.path.join(SCRIPTS_PATH, filename)) as script_file:
+            scripts[name] = instance.register_script(script_file.read())
+
+    return scripts
@@ -0,0 +1,54 @@
+-- Create a robot or a dinossaur inside a battle stored on the hash layout.
+--
+-- KEYS[1] : the battle key
+-- KEYS[2] : the sorted set of the live battles
+-- ARGV[1] : the battle ID
+-- ARGV[2] : the seconds that the battle takes to expire (0 to never expire)
+-- ARGV[3] : the time when the battle expires (inf to never expire)
+-- ARGV[4] : the entity ID
+-- ARGV[5] : the entity type (ROBOT or DINOSSAUR)
+-- ARGV[6] : the direction of the entity (empty for dinossaurs)
+-- ARGV[7] : the row of the entity
+-- ARGV[8] : the column of the entity
+
+local battle = KEYS[1]
+local battle_id = ARGV[1]
+local ttl = tonumber(ARGV[2])
+local size = redis.call('HGET', battle, 'size')
+if not size then
+  return 'Invalid battleId'
+end
+size = tonumber(size)
+
+redis.call('ZADD', KEYS[2], ARGV[3], battle_id)
+if ttl > 0 then
+  redis.call('EXPIRE', battle, ttl)
+end
+
+local row = tonumber(ARGV[7])
+local col = tonumber(ARGV[8])
+if row < 1 or row > size or col < 1 or col > size then
+  return 'This position is out of range'
+end
+
+local cell = 'c:' .. row .. ':' .. col
+if redis.call('HEXISTS', battle, cell) == 1 then
+  return 'This position is not empty'
+end
+
+redis.call('HSET', battle, cell, ARGV[4])
+redis.call('HSET', battle, 'e:' .. ARGV[4],
+           table.concat({ARGV[5], ARGV[6], row, col}, ','))
+
+local version = redis.call('HINCRBY', battle, 'version', 1)
+redis.call('PUBLISH', 'battles:invalidate', battle_id .. ':' .. version)
+local direction = ''
+if ARGV[6] ~= '' then
+  direction = ',"direction":"' .. ARGV[6] .. '"'
+end
+redis.call('PUBLISH', 'battles:events:' .. battle_id,
+           '{"version":' .. version .. ',"events":[{"event":"created","id":"' ..
+           ARGV[4] .. '","type":"' .. ARGV[5] .. '"' .. direction ..
+           ',"xPosition":' .. col .. ',"yPosition":' .. row .. '}]}')
+
+return 'OK'
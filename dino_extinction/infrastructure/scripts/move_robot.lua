@@ -0,0 +1,67 @@
+-- Move a robot of a battle stored on the hash layout.
+--
+-- KEYS[1] : the battle key
+-- KEYS[2] : the sorted set of the live battles
+-- ARGV[1] : the battle ID
+-- ARGV[2] : the seconds that the battle takes to expire (0 to never expire)
+-- ARGV[3] : the time when the battle expires (inf to never expire)
+-- ARGV[4] : the robot ID
+-- ARGV[5] : the action (move-forward or move-backwards)
+
+local battle = KEYS[1]
+local battle_id = ARGV[1]
+local ttl = tonumber(ARGV[2])
+local size = redis.call('HGET', battle, 'size')
+if not size then
+  return 'This battle does not exist'
+end
+size = tonumber(size)
+
+redis.call('ZADD', KEYS[2], ARGV[3], battle_id)
+if ttl > 0 then
+  redis.call('EXPIRE', battle, ttl)
+end
+
+local entity_field = 'e:' .. ARGV[4]
+local entity = redis.call('HGET', battle, entity_field)
+if not entity then
+  return 'This robot does not exist'
+end
+
+local kind, direction, row, col = string.match(
+  entity, '^([^,]*),([^,]*),([^,]*),([^,]*)$')
+if kind ~= 'ROBOT' then
+  return 'This robot does not exist'
+end
+row = tonumber(row)
+col = tonumber(col)
+
+local steps = {north = {-1, 0}, south = {1, 0}, west = {0, -1},
+               east = {0, 1}}
+local step = steps[direction]
+local sign = ARGV[5] == 'move-forward' and 1 or -1
+local new_row = row + step[1] * sign
+local new_col = col + step[2] * sign
+
+if new_row < 1 or new_row > size or new_col < 1 or new_col > size then
+  return 'There is another entity there'
+end
+
+local new_cell = 'c:' .. new_row .. ':' .. new_col
+if redis.call('HEXISTS', battle, new_cell) == 1 then
+  return 'There is another entity there'
+end
+
+redis.call('HDEL', battle, 'c:' .. row .. ':' .. col)
+redis.call('HSET', battle, new_cell, ARGV[4])
+redis.call('HSET', battle, entity_field,
+           table.concat({kind, direction, new_row, new_col}, ','))
+
+local version = redis.call('HINCRBY', battle, 'version', 1)
+redis.call('PUBLISH', 'battles:invalidate', battle_id .. ':' .. version)
+redis.call('PUBLISH', 'battles:events:' .. battle_id,
+           '{"version":' .. version .. ',"events":[{"event":"moved","id":"' ..
+           ARGV[4] .. '","xPosition":' .. new_col .. ',"yPosition":' ..
+           new_row .. '}]}')
+
+return 'OK'
@@ -0,0 +1,67 @@
+-- Destroy every dinossaur close to a robot of a battle stored on the hash
+-- layout.
+--
+-- KEYS[1] : the battle key
+-- KEYS[2] : the sorted set of the live battles
+-- ARGV[1] : the battle ID
+-- ARGV[2] : the seconds that the battle takes to expire (0 to never expire)
+-- ARGV[3] : the time when the battle expires (inf to never expire)
+-- ARGV[4] : the robot ID
+
+local battle = KEYS[1]
+local battle_id = ARGV[1]
+local ttl = tonumber(ARGV[2])
+local size = redis.call('HGET', battle, 'size')
+if not size then
+  return 'This battle does not exist'
+end
+size = tonumber(size)
+
+redis.call('ZADD', KEYS[2], ARGV[3], battle_id)
+if ttl > 0 then
+  redis.call('EXPIRE', battle, ttl)
+end
+
+local entity = redis.call('HGET', battle, 'e:' .. ARGV[4])
+if not entity then
+  return 'This robot does not exist'
+end
+
+local kind, row, col = string.match(
+  entity, '^([^,]*),[^,]*,([^,]*),([^,]*)$')
+if kind ~= 'ROBOT' then
+  return 'This robot does not exist'
+end
+
+row = tonumber(row)
+col = tonumber(col)
+
+local destroyed = {}
+
+for row_step = -1, 1 do
+  for col_step = -1, 1 do
+    local target_row = row + row_step
+    local target_col = col + col_step
+    local is_inside = target_row >= 1 and target_row <= size and
+                      target_col >= 1 and target_col <= size
+
+    if (row_step ~= 0 or col_step ~= 0) and is_inside then
+      local cell = 'c:' .. target_row .. ':' .. target_col
+      local target = redis.call('HGET', battle, cell)
+
+      if target and string.sub(target, 1, 2) == 'D-' then
+        redis.call('HDEL', battle, cell, 'e:' .. target)
+        table.insert(destroyed, '{"event":"destroyed","id":"' .. target ..
+                                '"}')
+      end
+    end
+  end
+end
+
+local version = redis.call('HINCRBY', battle, 'version', 1)
+redis.call('PUBLISH', 'battles:invalidate', battle_id .. ':' .. version)
+redis.call('PUBLISH', 'battles:events:' .. battle_id,
+           '{"version":' .. version .. ',"events":[' ..
+           table.concat(destroyed, ',') .. ']}')
+
+return 'OK'
@@ -0,0 +1,52 @@
+-- Turn a robot of a battle stored on the hash layout.
+--
+-- KEYS[1] : the battle key
+-- KEYS[2] : the sorted set of the live battles
+-- ARGV[1] : the battle ID
+-- ARGV[2] : the seconds that the battle takes to expire (0 to never expire)
+-- ARGV[3] : the time when the battle expires (inf to never expire)
+-- ARGV[4] : the robot ID
+-- ARGV[5] : the action (turn-left or turn-right)
+
+local battle = KEYS[1]
+local battle_id = ARGV[1]
+local ttl = tonumber(ARGV[2])
+if not redis.call('HGET', battle, 'size') then
+  return 'This battle does not exist'
+end
+
+redis.call('ZADD', KEYS[2], ARGV[3], battle_id)
+if ttl > 0 then
+  redis.call('EXPIRE', battle, ttl)
+end
+
+local entity_field = 'e:' .. ARGV[4]
+local entity = redis.call('HGET', battle, entity_field)
+if not entity then
+  return 'This robot does not exist'
+end
+
+local kind, direction, row, col = string.match(
+  entity, '^([^,]*),([^,]*),([^,]*),([^,]*)$')
+if kind ~= 'ROBOT' then
+  return 'This robot does not exist'
+end
+
+local turns = {
+  ['turn-right'] = {north = 'east', east = 'south', south = 'west',
+                    west = 'north'},
+  ['turn-left'] = {north = 'west', west = 'south', south = 'east',
+                   east = 'north'},
+}
+
+local new_direction = turns[ARGV[5]][direction]
+redis.call('HSET', battle, entity_field,
+           table.concat({kind, new_direction, row, col}, ','))
+
+local version = redis.call('HINCRBY', battle, 'version', 1)
+redis.call('PUBLISH', 'battles:invalidate', battle_id .. ':' .. version)
+redis.call('PUBLISH', 'battles:events:' .. battle_id,
+           '{"version":' .. version .. ',"events":[{"event":"turned","id":"' ..
+           ARGV[4] .. '","direction":"' .. new_direction .. '"}]}')
+
+return 'OK'
@@ -0,0 +1,32 @@
+"""Settings Integration.
+
+This module gives access to the configurations of the current Flask app,
+falling back to a default value when we are running outside of an app
+context (on scripts and unit tests, for example).
+
+"""
+from flask import (current_app, has_app_context)
+
+
+def get(name, default=None):
+    """Get a configuration from the current app.
+
+    This function will return the value of a given configuration from the
+    current app, or the default value if there is no app or the
+    configuration was not set.
+
+    ...
+
+    Parameters
+    ----------
+    name : string
+        The name of the configuration.
+
+    default : any
+        The value that will be returned if the configuration is not set.
+
+    """
+    if not has_app_context():
+        return default
+
+    return current_app.config.get(name, default)
@@ -0,0 +1,247 @@
+"""Battle Replay.
+
+This module replays a recorded log of battle requests against our battle
+models, in-process and as fast as possible, over a FakeRedis instance instead
+of a Redis server. It reports how many robot commands were replayed per
+second, their latency percentiles and a hash of the final state of each
+battle, so we can measure changes to our engines and storage layouts against
+real traffic.
+
+Each line of the log is a JSON object with an event and the same parameters
+of its route:
+
+    {"event": "battle", "battleId": 1234, "size": 50}
+    {"event": "robot", "battleId": 1234, "robot": "R-0001",
+     "direction": "north", "xPosition": 2, "yPosition": 3}
+    {"event": "dinossaur", "battleId": 1234, "xPosition": 3, "yPosition": 2}
+    {"event": "command", "battleId": 1234, "robot": "R-0001",
+     "action": "attack"}
+
+Battles keep their recorded IDs. Robots get new IDs, so the recorded ID of
+each robot is mapped to the one that was created for it. The IDs are issued
+from scratch on every replay, so replaying the same log twice gives the same
+hashes.
+
+It runs over FakeRedis, so it needs our development requirements. FakeRedis
+does not support Redis Streams, so the stream storage layout can only be
+replayed on a Redis server, given by --redis. Use a scratch database for it,
+since the battles keep their recorded IDs.
+
+Usage: python -m dino_extinction.replay LOG [--config KEY=VALUE]
+                                           [--redis URL]
+
+"""
+import argparse
+import hashlib
+import json
+import time
+
+import fakeredis
+import yaml
+
+from redis import StrictRedis
+from redis.exceptions import ResponseError
+from dino_extinction import create_app
+from dino_extinction.infrastructure import (ids, redis)
+from dino_extinction.blueprints.battles import (boards, storage)
+from dino_extinction.blueprints.battles.models import BattleSchema
+from dino_extinction.blueprints.dinossaurs.models import DinossaurSchema
+from dino_extinction.blueprints.robots import handlers
+from dino_extinction.blueprints.robots.models import RobotSchema
+
+PERCENTILES = [50, 90, 99]
+
+
+def read_log(path):
+    """Read the events of a recorded log, skipping its blank lines."""
+    with open(path) as log_file:
+        return [json.loads(line) for line in log_file if line.strip()]
+
+
+def replay(events):
+    """Replay recorded events against our battle models.
+
+    This function must run inside of an app context, with Redis already
+    bound to the storage that the battles will be replayed on. The blocks
+    of IDs that were leased before are dropped, so the IDs are issued from
+    the counters of that storage.
+
+    ...
+
+    Parameters
+    ----------
+    events : list
+        The recorded events, in the order that they happened.
+
+    Returns
+    -------
+    report : dict
+        The number of replayed events and commands, the total time that they
+        took and the latency of each command (both in seconds), the number
+        of commands that failed and the final state hash of each battle.
+
+    """
+    ids.instance.reset()
+    robot_ids = dict()
+    battle_ids = list()
+    latencies = list()
+    failures = 0
+
+    started_at = time.perf_counter()
+    for event in events:
+        battle_id = event.get('battleId')
+        position = (event.get('yPosition'), event.get('xPosition'))
+
+        if event.get('event') == 'battle':
+            battle = dict()
+            battle['id'] = battle_id
+            battle['board_size'] = event.get('size') or 50
+            BattleSchema().dumps(battle)
+            battle_ids.append(battle_id)
+
+        if event.get('event') == 'robot':
+            robot = dict()
+            robot['battle_id'] = battle_id
+            robot['direction'] = event.get('direction')
+            robot['position'] = position
+            created_robot = RobotSchema().load(robot)
+            if not created_robot.errors:
+                robot_ids[event.get('robot')] = created_robot.data.get('id')
+
+        if event.get('event') == 'dinossaur':
+            dinossaur = dict()
+            dinossaur['battle_id'] = battle_id
+            dinossaur['position'] = position
+            DinossaurSchema().load(dinossaur)
+
+        if event.get('event') == 'command':
+            robot_id = robot_ids.get(event.get('robot'), event.get('robot'))
+            command_started_at = time.perf_counter()
+            errors, _ = handlers.command_robot(battle_id,
+                                               robot_id,
+                                               event.get('action'))
+            latencies.append(time.perf_counter() - command_started_at)
+            failures += 1 if errors else 0
+
+    report = dict()
+    report['events'] = len(events)
+    report['commands'] = len(latencies)
+    report['failures'] = failures
+    report['elapsed'] = time.perf_counter() - started_at
+    report['latencies'] = latencies
+    report['hashes'] = {battle_id: state_hash(battle_id)
+                        for battle_id in battle_ids}
+
+    return report
+
+
+def state_hash(battle_id):
+    """Hash the final state of a battle.
+
+    The hash only depends on the entities and on the occupied cells of the
+    battle, so it is the same for every board engine and storage layout.
+
+    """
+    battle = BattleSchema().get_battle(battle_id)
+    if not battle:
+        return None
+
+    state = dict()
+    state['size'] = battle.get('board').get('size')
+    state['entities'] = battle.get('entities')
+    state['cells'] = sorted(
+        [row, col, entity_id]
+        for (row, col), entity_id in boards.occupied_cells(
+            battle.get('board')))
+    raw_state = json.dumps(state, sort_keys=True).encode('utf-8')
+
+    return hashlib.sha256(raw_state).hexdigest()
+
+
+def check_storage(client):
+    """Check that a Redis client supports the storage layout of our app.
+
+    ...
+
+    Parameters
+    ----------
+    client : class
+        The Redis client that the battles will be replayed on.
+
+    Raises
+    ------
+    ValueError
+        If the configured layout needs commands that the client does not
+        support, like the Redis Streams of the stream layout on FakeRedis.
+
+    """
+    layout = storage.get_storage()
+    if layout.name != storage.StreamStorage.name:
+        return
+
+    try:
+        client.xlen(storage.KEY_PREFIX + 'replay')
+    except ResponseError:
+        raise ValueError('The stream storage needs Redis Streams, which this '
+                         'Redis does not support. Replay it on a Redis '
+                         'server with --redis.')
+
+
+def percentile(values, rank):
+    """Get the nearest-rank percentile of a list of values."""
+    if not values:
+        return 0
+
+    ordered = sorted(values)
+    index = max(0, -(-len(ordered) * rank // 100) - 1)
+
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('log')
+    parser.add_argument('--config', action='append', default=list(),
+                        metavar='KEY=VALUE')
+    parser.add_argument('--redis', metavar='URL',
+                        help='replay on a Redis server instead of FakeRedis')
+    args = parser.parse_args()
+
+    app = create_app('TESTING')
+    for override in args.config:
+        key, value = override.split('=', 1)
+        app.config[key] = yaml.safe_load(value)
+
+    if args.redis:
+        redis.instance = StrictRedis.from_url(args.redis)
+    else:
+        redis.instance = fakeredis.FakeStrictRedis()
+
+    events = read_log(args.log)
+    with app.app_context():
+        try:
+            check_storage(redis.instance)
+        except ValueError as error:
+            parser.error(str(error))
+
+        report = replay(events)
+
+    elapsed = report.get('elapsed')
+    latencies = report.get('latencies')
+    commands_per_second = report.get('commands') / elapsed if elapsed else 0
+
+    print('events: {}'.format(report.get('events')))
+    print('commands: {} ({} failed)'.format(report.get('commands'),
+                                            report.get('failures')))
+    print('elapsed: {:.3f} s'.format(elapsed))
+    print('commands/sec: {:.1f}'.format(commands_per_second))
+    for rank in PERCENTILES:
+        print('p{}: {:.3f} ms'.format(rank,
+                                      percentile(latencies, rank) * 1000))
+
+    for battle_id, battle_hash in report.get('hashes').items():
+        print('battle {}: {}'.format(battle_id, battle_hash))
+
+
+if __name__ == '__main__':
+    main()
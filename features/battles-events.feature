@@ -0,0 +1,15 @@
+Feature: watch the events of a battle
+
+  Scenario: be able to watch the changes of a battle
+     Given a fake data provider
+       And a valid new robot request
+       And an existing battle
+      When we start watching the events of the battle
+       And we ask to create a new robot
+      Then we receive a snapshot of the battle
+       And we receive the created robot as a delta event
+
+  Scenario: be able to receive an error when watching an unknown battle
+     Given a battle that was never created
+      When we start watching the events of the battle
+      Then we receive a not found error
@@ -0,0 +1,63 @@
+Feature: get the state of a battle
+
+  Scenario: be able to get the state of a battle as JSON
+     Given a fake data provider
+       And a valid new robot request
+       And an existing battle
+      When we ask to create a new robot
+       And we ask for the state of the battle as JSON
+      Then we receive the robot on the battle state
+
+  Scenario: be able to receive an error for an unknown battle
+     Given a battle that was never created
+      When we ask for the state of the battle as JSON
+      Then we receive a not found error
+
+  Scenario: be able to skip an unchanged battle state
+     Given a fake data provider
+       And a valid new robot request
+       And an existing battle
+      When we ask for the state of the battle as JSON
+       And we ask for the state of the battle again with its ETag
+      Then we receive a not modified state
+
+  Scenario: be able to skip an unchanged battle page
+     Given a fake data provider
+       And a valid new robot request
+       And an existing battle
+      When we ask for the state page of the battle
+       And we ask for the state of the battle again with its ETag
+      Then we receive a not modified state
+
+  Scenario: be able to receive a changed battle state
+     Given a fake data provider
+       And a valid new robot request
+       And an existing battle
+      When we ask for the state of the battle as JSON
+       And we ask to create a new robot
+       And we ask for the state of the battle again with its ETag
+      Then we receive the robot on the battle state
+
+  Scenario: be able to receive a compressed battle page
+     Given a fake data provider
+       And a valid new robot request
+       And an existing battle
+      When we ask for the state page of the battle compressed
+      Then we receive the compressed battle page
+
+  Scenario: be able to get a window of the battle page
+     Given a fake data provider
+       And a valid new robot request
+       And an existing battle
+      When we ask to create a new robot
+       And we ask for a window of the battle page around the robot
+      Then we receive only the window of the battle page
+
+  Scenario: be able to skip an unchanged window of a changed battle
+     Given a fake data provider
+       And a valid new robot request
+       And an existing battle
+      When we ask for a window of the battle page away from the robot
+       And we ask to create a new robot
+       And we ask for the state of the battle again with its ETag
+      Then we receive a not modified state
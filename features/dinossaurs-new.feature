@@ -68,3 +68,14 @@ Scenario Outline: should be able to insert multiple dinossaurs
 Examples: Messages
   |  message          |
   | Dinossaur created |
+
+Scenario: should be able to insert many dinossaurs at once
+   Given a set of new dinossaur requests
+       | battleId | xPosition | yPosition |
+       | 1111     | 5         | 49        |
+       | 1111     | 49        | 50        |
+       | 1111     | 50        | 50        |
+     And an existing battle
+    When we ask to create the dinossaurs in bulk
+    Then every dinossaur of the bulk succeeded
+     And the dinossaur was created
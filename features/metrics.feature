@@ -0,0 +1,7 @@
+Feature: metrics of the server
+
+  Scenario: be able to read the metrics
+     Given a empty request to metrics
+      Then should receive a 200 status
+       And the metrics have the battle conflict rate
+       And the metrics have the live battles
@@ -69,3 +69,13 @@ Scenario: should not move the robot outside of battle area
     When we command the robot
     Then we receive an error
      And the battle state is the same
+
+Scenario: be able to command a robot many times at once
+    Given a fake data provider
+      And an attack command to a robot
+      And an existing battle
+      And an existing robot
+      And an existing dinossaur close to the robot
+     When we command the robot twice in a single batch
+     Then every command of the batch succeeded
+      And the dinossaur was destroyed
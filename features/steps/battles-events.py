@@ -0,0 +1,94 @@
+"""Battles Events Steps.
+
+This module contains every step to test the behaviour of our Events endpoint
+of our Battles service.
+
+"""
+import json
+
+from behave import (when, then)
+
+
+def _read_event(stream):
+    event = dict()
+    for line in next(stream).decode('utf-8').splitlines():
+        name, _, value = line.partition(': ')
+        event[name] = value
+
+    return event
+
+
+@when('we start watching the events of the battle')
+def step_watch_battle_events(context):
+    """Start watching the events of the battles.
+
+    This step will open the events stream of the battle of each request on
+    the current context, without reading any of its events.
+
+    ...
+
+    Parameters
+    ----------
+    context : behave context
+        The behave context of the current feature test.
+
+    """
+    context.responses = [
+        context.client.get('/battles/{}/events'.format(request['battleId']),
+                           buffered=False)
+        for request in context.requests]
+    context.streams = [iter(response.response)
+                       for response in context.responses]
+
+    assert context.responses
+
+
+@then('we receive a snapshot of the battle')
+def step_check_snapshot_event(context):
+    """Check if the events stream starts with a snapshot of the battle.
+
+    ...
+
+    Parameters
+    ----------
+    context : behave context
+        The behave context of the current feature test.
+
+    """
+    for request, stream in zip(context.requests, context.streams):
+        event = _read_event(stream)
+        data = json.loads(event['data'])
+
+        assert event['event'] == 'snapshot'
+        assert data['battleId'] == request['battleId']
+        assert data['entities'] == []
+        assert event['id'] == str(data['version'])
+
+
+@then('we receive the created robot as a delta event')
+def step_check_created_robot_event(context):
+    """Check if the creation of the robot was pushed as a delta event.
+
+    ...
+
+    Parameters
+    ----------
+    context : behave context
+        The behave context of the current feature test.
+
+    """
+    for request, stream in zip(context.requests, context.streams):
+        event = _read_event(stream)
+        data = json.loads(event['data'])
+        created = data['events'][0]
+
+        assert event['event'] == 'delta'
+        assert event['id'] == str(data['version'])
+        assert created['event'] == 'created'
+        assert created['type'] == 'ROBOT'
+        assert created['direction'] == request['direction']
+        assert created['xPosition'] == request['xPosition']
+        assert created['yPosition'] == request['yPosition']
+
+    for response in context.responses:
+        response.close()
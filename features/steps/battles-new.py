@@ -4,12 +4,12 @@ This module contains every step to test the behaviour of our New endpoint
 of our Battles services.
 
 """
-import pickle
 import json
 
 from behave import (given, when, then)
 from mock import patch
 from faker import Faker
+from dino_extinction.blueprints.battles import (codec, storage)
 from dino_extinction.infrastructure import redis
 
 
@@ -83,8 +83,8 @@ def step_create_new_battle(context):
 
 
 @when('we create an invalid battle')
-@patch('dino_extinction.blueprints.battles.handlers.randint')
-def step_handle_error(context, mocked_randint):
+@patch('dino_extinction.blueprints.battles.handlers.ids')
+def step_handle_error(context, mocked_ids):
     """Create a new battle request mocking for an error.
 
     This step will do a post request to our battle service asking
@@ -98,13 +98,13 @@ def step_handle_error(context, mocked_randint):
     context : behave context
         The behave context of the current feature test.
 
-    mocked_randint : magic mock
-        The mocked randint function mocker.
+    mocked_ids : magic mock
+        The mock of our IDs module.
 
     """
     fake = Faker()
     battle_id = fake.word()
-    mocked_randint.return_value = battle_id
+    mocked_ids.new_battle_id.return_value = battle_id
 
     context.battle_ids = [battle_id]
     context.created_battles = len(context.requests)
@@ -158,7 +158,7 @@ def step_assert_battle_was_created(context):
 
     """
     for battle_id in context.battle_ids:
-        assert redis.instance.get(battle_id)
+        assert redis.instance.get(storage.battle_key(battle_id))
 
 
 @then('the battle was not created')
@@ -177,7 +177,7 @@ def step_assert_battle_not_created(context):
 
     """
     for battle_id in context.battle_ids:
-        assert not redis.instance.get(battle_id)
+        assert not redis.instance.get(storage.battle_key(battle_id))
 
 
 @then('we stored a 2x2 battle')
@@ -196,8 +196,8 @@ def step_assert_stored_battle(context):
 
     """
     for battle_id in context.battle_ids:
-        data = redis.instance.get(battle_id)
-        battle = pickle.loads(data)
+        data = redis.instance.get(storage.battle_key(battle_id))
+        battle = codec.decode(data)
         expected_state = [[None, None], [None, None]]
         board = battle['board']
 
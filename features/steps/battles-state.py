@@ -0,0 +1,273 @@
+"""Battles State Steps.
+
+This module contains every step to test the behaviour of our State endpoints
+of our Battles service.
+
+"""
+import gzip
+import json
+
+from behave import (given, when, then)
+
+UNKNOWN_BATTLE_ID = 99999999
+
+
+@given('a battle that was never created')
+def step_generate_unknown_battle_request(context):
+    """Generate a request of an unknown battle.
+
+    This step will generate a request with a battle ID that our counters
+    would take too long to create.
+
+    ...
+
+    Parameters
+    ----------
+    context : behave context
+        The behave context of the current feature test.
+
+    """
+    request = dict()
+    request.setdefault('battleId', UNKNOWN_BATTLE_ID)
+
+    context.requests = [request]
+
+
+@when('we ask for the state of the battle as JSON')
+def step_ask_battle_state(context):
+    """Request the state of the battles as JSON.
+
+    This step will request the JSON state of the battle of each request on
+    the current context.
+
+    ...
+
+    Parameters
+    ----------
+    context : behave context
+        The behave context of the current feature test.
+
+    """
+    context.state_urls = ['/battles/{}/state.json'.format(
+        request['battleId']) for request in context.requests]
+    context.responses = [context.client.get(url)
+                         for url in context.state_urls]
+    context.etags = [response.headers.get('ETag')
+                     for response in context.responses]
+
+    assert context.responses
+
+
+@when('we ask for the state page of the battle')
+def step_ask_battle_page(context):
+    """Request the state page of the battles.
+
+    This step will request the HTML state of the battle of each request on
+    the current context.
+
+    ...
+
+    Parameters
+    ----------
+    context : behave context
+        The behave context of the current feature test.
+
+    """
+    context.state_urls = ['/battles/state?battleId={}'.format(
+        request['battleId']) for request in context.requests]
+    context.responses = [context.client.get(url)
+                         for url in context.state_urls]
+    context.etags = [response.headers.get('ETag')
+                     for response in context.responses]
+
+    assert all(response.status_code == 200
+               for response in context.responses)
+
+
+@when('we ask for the state page of the battle compressed')
+def step_ask_compressed_battle_page(context):
+    """Request the state page of the battles compressed with gzip.
+
+    ...
+
+    Parameters
+    ----------
+    context : behave context
+        The behave context of the current feature test.
+
+    """
+    context.responses = [
+        context.client.get('/battles/state?battleId={}'.format(
+            request['battleId']), headers={'Accept-Encoding': 'gzip'})
+        for request in context.requests]
+
+    assert context.responses
+
+
+@when('we ask for a window of the battle page {placement} the robot')
+def step_ask_battle_window(context, placement):
+    """Request a window of the state page of the battles.
+
+    This step will request a window of 3x3 cells with the requested robot on
+    it, or a window of 5x5 cells far from where it could be.
+
+    ...
+
+    Parameters
+    ----------
+    context : behave context
+        The behave context of the current feature test.
+
+    placement : str
+        Where the window is: around or away from the robot.
+
+    """
+    windows = list()
+    for request in context.requests:
+        window = (max(request['xPosition'] - 1, 1),
+                  max(request['yPosition'] - 1, 1), 3, 3)
+        if placement != 'around':
+            window = (20, 20, 5, 5)
+
+        windows.append(window)
+
+    context.state_urls = [
+        '/battles/state?battleId={}&x0={}&y0={}&w={}&h={}'.format(
+            request['battleId'], *window)
+        for request, window in zip(context.requests, windows)]
+    context.responses = [context.client.get(url)
+                         for url in context.state_urls]
+    context.etags = [response.headers.get('ETag')
+                     for response in context.responses]
+
+    assert all(context.etags)
+
+
+@when('we ask for the state of the battle again with its ETag')
+def step_ask_battle_state_with_etag(context):
+    """Request the state of the battles again, with their ETags.
+
+    This step will request the same state that was requested before,
+    sending back the ETag that was received for it.
+
+    ...
+
+    Parameters
+    ----------
+    context : behave context
+        The behave context of the current feature test.
+
+    """
+    context.responses = [
+        context.client.get(url, headers={'If-None-Match': etag})
+        for url, etag in zip(context.state_urls, context.etags)]
+
+    assert all(context.etags)
+
+
+@then('we receive the robot on the battle state')
+def step_check_robot_on_state(context):
+    """Check if the robot is on the battle state.
+
+    This step will check if the state of each battle has the robot that was
+    requested, on the requested position.
+
+    ...
+
+    Parameters
+    ----------
+    context : behave context
+        The behave context of the current feature test.
+
+    """
+    for request, response in zip(context.requests, context.responses):
+        data = json.loads(response.data.decode('utf-8'))
+        robots = [entity for entity in data['entities']
+                  if entity['type'] == 'ROBOT']
+
+        assert response.status_code == 200
+        assert data['battleId'] == request['battleId']
+        assert data['size'] == context.board_size
+        assert data['version']
+        assert len(robots) == 1
+        assert robots[0]['direction'] == request['direction']
+        assert robots[0]['xPosition'] == request['xPosition']
+        assert robots[0]['yPosition'] == request['yPosition']
+
+
+@then('we receive a not found error')
+def step_check_not_found(context):
+    """Check if we received a not found error.
+
+    ...
+
+    Parameters
+    ----------
+    context : behave context
+        The behave context of the current feature test.
+
+    """
+    for response in context.responses:
+        data = json.loads(response.data.decode('utf-8'))
+
+        assert response.status_code == 404
+        assert not data
+
+
+@then('we receive a not modified state')
+def step_check_not_modified(context):
+    """Check if we received a not modified state.
+
+    ...
+
+    Parameters
+    ----------
+    context : behave context
+        The behave context of the current feature test.
+
+    """
+    for response, etag in zip(context.responses, context.etags):
+        assert response.status_code == 304
+        assert response.headers.get('ETag') == etag
+        assert not response.data
+
+
+@then('we receive the compressed battle page')
+def step_check_compressed_page(context):
+    """Check if we received the battle page compressed with gzip.
+
+    ...
+
+    Parameters
+    ----------
+    context : behave context
+        The behave context of the current feature test.
+
+    """
+    for request, response in zip(context.requests, context.responses):
+        page = gzip.decompress(response.data).decode('utf-8')
+
+        assert response.status_code == 200
+        assert response.headers.get('Content-Encoding') == 'gzip'
+        assert 'Accept-Encoding' in response.headers.get('Vary')
+        assert '#{}'.format(request['battleId']) in page
+
+
+@then('we receive only the window of the battle page')
+def step_check_window_page(context):
+    """Check if we received only the cells of the window of the page.
+
+    ...
+
+    Parameters
+    ----------
+    context : behave context
+        The behave context of the current feature test.
+
+    """
+    for response in context.responses:
+        page = response.data.decode('utf-8')
+
+        assert response.status_code == 200
+        assert page.count('class="col') == 9
+        assert page.count('class="robot"') == 1
@@ -4,11 +4,12 @@ This module contains every step to test the behaviour of our New endpoint
 of our Dinossaurs services.
 
 """
-import pickle
+import json
 
 from behave import (given, when, then)
 from collections import Counter
 from dino_extinction.blueprints.dinossaurs.models import DinossaurSchema
+from dino_extinction.blueprints.battles import (codec, storage)
 from dino_extinction.infrastructure import redis
 
 
@@ -117,6 +118,56 @@ def step_request_new_dinossaur(context):
     assert context.created_dinossaurs
 
 
+@when('we ask to create the dinossaurs in bulk')
+def step_request_bulk_dinossaurs(context):
+    """Request many new dinossaurs at once.
+
+    This step will group the requests by battle and run a single bulk
+    request to create all dinossaurs of each battle.
+
+    ...
+
+    Parameters
+    ----------
+    context : behave context
+        The behave context that is being used in this feature test.
+
+    """
+    bulks = dict()
+    for request in context.requests:
+        dino = dict()
+        dino.setdefault('xPosition', int(request['xPosition']))
+        dino.setdefault('yPosition', int(request['yPosition']))
+        bulks.setdefault(request['battleId'], list()).append(dino)
+
+    context.responses = [context.client.post('/dinossaurs/bulk',
+                                             json={'battleId': battle_id,
+                                                   'dinossaurs': dinos},
+                                             follow_redirects=True)
+                         for battle_id, dinos in bulks.items()]
+
+    assert context.responses
+
+
+@then('every dinossaur of the bulk succeeded')
+def step_check_bulk_succeeded(context):
+    """Check if every dinossaur of the bulk was created.
+
+    ...
+
+    Parameters
+    ----------
+    context : behave context
+        The behave context that is being used in this feature test.
+
+    """
+    for response in context.responses:
+        results = json.loads(response.data)
+
+        assert response.status_code == 200
+        assert all(result.get('success') for result in results)
+
+
 @then('the dinossaur was created')
 def step_check_if_dinossaur_was_created(context):
     """Check if the dinossaur was created.
@@ -134,8 +185,8 @@ def step_check_if_dinossaur_was_created(context):
     """
     for request in context.requests:
         battle_id = request['battleId']
-        raw_battle = redis.instance.get(battle_id)
-        battle = pickle.loads(raw_battle)
+        raw_battle = redis.instance.get(storage.battle_key(battle_id))
+        battle = codec.decode(raw_battle)
         board = battle['board']['state']
         entities = battle['entities']
 
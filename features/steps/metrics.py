@@ -0,0 +1,70 @@
+"""Metrics Steps.
+
+This module contains every step to test the behaviour of our metrics
+services.
+
+"""
+import json
+
+from behave import (given, then)
+
+
+@given('a empty request to metrics')
+def step_given_empty_request(context):
+    """Generate an empty request.
+
+    This step will generate an empty request to our metrics service.
+
+    ...
+
+    Parameters
+    ----------
+    context : behave context
+        The behave context of the current feature test.
+
+    """
+    context.response = context.client.get('/metrics',
+                                          follow_redirects=True)
+
+    assert context.response
+
+
+@then('the metrics have the battle conflict rate')
+def step_check_conflict_rate(context):
+    """Assert the metrics have the conflict rate.
+
+    This step will assert that the metrics have the rate of transactions
+    with conflicts of every battle.
+
+    ...
+
+    Parameters
+    ----------
+    context : behave context
+        The behave context of the current feature test.
+
+    """
+    data = json.loads(context.response.data.decode('utf-8'))
+
+    assert 'battle_conflict_rate' in data
+
+
+@then('the metrics have the live battles')
+def step_check_live_battles(context):
+    """Assert the metrics have the live battles.
+
+    This step will assert that the metrics have how many battles are stored
+    and the bytes that they take.
+
+    ...
+
+    Parameters
+    ----------
+    context : behave context
+        The behave context of the current feature test.
+
+    """
+    data = json.loads(context.response.data.decode('utf-8'))
+
+    assert 'battles_live' in data
+    assert 'battles_live_bytes' in data
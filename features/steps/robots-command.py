@@ -4,9 +4,9 @@ This module contains every step to test the behaviour of our Command endpoint
 of our Robots service.
 
 """
+import json
 import random
 import math
-import pickle
 
 from behave import (given, when, then)
 from mock import patch
@@ -14,6 +14,7 @@ from operator import add, sub
 from dino_extinction.blueprints.robots.models import RobotSchema
 from dino_extinction.blueprints.dinossaurs.models import DinossaurSchema
 from dino_extinction.blueprints.battles.models import BattleSchema
+from dino_extinction.blueprints.battles import (codec, storage)
 from dino_extinction.infrastructure import redis
 
 
@@ -47,8 +48,8 @@ def step_create_command_request(context, command):
 
 
 @given('an existing robot')
-@patch('dino_extinction.blueprints.robots.models.randint')
-def step_create_new_robot(context, mocked_randint):
+@patch.object(RobotSchema, '_create_robot_id')
+def step_create_new_robot(context, mocked_create_robot_id):
     """Create a new robot for each request on context.
 
     This step will create a new robot in each battle for every request that
@@ -61,8 +62,8 @@ def step_create_new_robot(context, mocked_randint):
     context : behave context
         The behave context that is being used in this feature test.
 
-    mocked_randint : magic mock
-        The mocked randint function mocker.
+    mocked_create_robot_id : magic mock
+        The mock of the method that creates our robot IDs.
 
     """
     for request in context.requests:
@@ -70,7 +71,7 @@ def step_create_new_robot(context, mocked_randint):
         robot_id = request['robot']
         allowed_directions = ['north', 'south', 'east', 'west']
         middle_of_board = math.ceil(context.board_size / 2)
-        mocked_randint.return_value = int(robot_id.split('-')[1])
+        mocked_create_robot_id.return_value = robot_id
 
         robot = dict()
         robot.setdefault('battle_id', battle_id)
@@ -80,8 +81,8 @@ def step_create_new_robot(context, mocked_randint):
         model = RobotSchema()
         model.load(robot)
 
-        raw_battle = redis.instance.get(battle_id)
-        battle = pickle.loads(raw_battle)
+        raw_battle = redis.instance.get(storage.battle_key(battle_id))
+        battle = codec.decode(raw_battle)
 
         assert battle['entities'].get(robot_id)
 
@@ -259,7 +260,7 @@ def step_create_new_1x1_battle(context):
         model = BattleSchema()
         model.dumps(battle)
 
-        assert redis.instance.get(battle_id)
+        assert redis.instance.get(storage.battle_key(battle_id))
 
 
 @when('we command the robot')
@@ -383,11 +384,12 @@ def step_check_if_robot_moved(context):
         robot_id = request['robot']
 
         raw_previous_battle_state = context.snapshots.get(battle_id)
-        previous_battle_state = pickle.loads(raw_previous_battle_state)
+        previous_battle_state = codec.decode(raw_previous_battle_state)
         previous_state = previous_battle_state['entities'].get(robot_id)
 
-        raw_current_battle_state = redis.instance.get(battle_id)
-        current_battle_state = pickle.loads(raw_current_battle_state)
+        raw_current_battle_state = redis.instance.get(
+            storage.battle_key(battle_id))
+        current_battle_state = codec.decode(raw_current_battle_state)
         current_state = current_battle_state['entities'].get(robot_id)
 
         action = request.get('action')
@@ -419,3 +421,64 @@ def step_check_dino_was_destroyed(context):
         existing_dinos = [dino for dino in entities if dino[:2] == 'D-']
 
         assert not existing_dinos
+
+
+@when('we command the robot twice in a single batch')
+def step_command_robot_batch(context):
+    """Command a robot twice in a single batch.
+
+    This step will turn the robot of each request and then run its command,
+    sending both commands in a single batch request.
+
+    ...
+
+    Parameters
+    ----------
+    context : behave context
+        The behave context that is being used in this feature test.
+
+    """
+    def batch_template(request):
+        turn = dict()
+        turn.setdefault('robot', request.get('robot'))
+        turn.setdefault('action', 'turn-left')
+
+        command = dict()
+        command.setdefault('robot', request.get('robot'))
+        command.setdefault('action', request.get('action'))
+
+        batch = dict()
+        batch.setdefault('battleId', request.get('battleId'))
+        batch.setdefault('commands', [turn, command])
+
+        return batch
+
+    context.responses = [context.client.post('/robots/commands',
+                                             json=batch_template(request),
+                                             follow_redirects=True)
+                         for request in context.requests]
+
+    assert context.responses
+
+
+@then('every command of the batch succeeded')
+def step_check_batch_succeeded(context):
+    """Check if every command of the batch succeeded.
+
+    This step will check if the batch requests succeeded and if every
+    command on them was applied.
+
+    ...
+
+    Parameters
+    ----------
+    context : behave context
+        The behave context that is being used in this feature test.
+
+    """
+    for response in context.responses:
+        results = json.loads(response.data)
+
+        assert response.status_code == 200
+        assert len(results) == 2
+        assert all(result.get('success') for result in results)
@@ -4,11 +4,10 @@ This module contains every step to test the behaviour of our New endpoint
 of our Robots service.
 
 """
-import pickle
-
 from collections import Counter
 from behave import (given, when, then)
 from dino_extinction.blueprints.robots.models import RobotSchema
+from dino_extinction.blueprints.battles import (codec, storage)
 from dino_extinction.infrastructure import redis
 
 
@@ -136,8 +135,8 @@ def step_check_if_robot_was_created(context):
     """
     for request in context.requests:
         battle_id = request['battleId']
-        raw_battle = redis.instance.get(battle_id)
-        battle = pickle.loads(raw_battle)
+        raw_battle = redis.instance.get(storage.battle_key(battle_id))
+        battle = codec.decode(raw_battle)
         board = battle['board']['state']
         entities = battle['entities']
 
@@ -5,11 +5,11 @@ Beware to build them in a way that multiple features could use them.
 
 """
 import json
-import pickle
 
 from faker import Faker
 from behave import (given, then)
 from dino_extinction.blueprints.battles.models import BattleSchema
+from dino_extinction.blueprints.battles import (codec, storage)
 from dino_extinction.infrastructure import redis
 
 
@@ -66,7 +66,7 @@ def step_create_new_battle(context):
         model = BattleSchema()
         model.dumps(battle)
 
-        assert redis.instance.get(battle_id)
+        assert redis.instance.get(storage.battle_key(battle_id))
 
 
 @given('an non-existing battle')
@@ -91,7 +91,7 @@ def step_create_new_non_existing_battle(context):
     model = BattleSchema()
     model.dumps(battle)
 
-    assert redis.instance.get(9999)
+    assert redis.instance.get(storage.battle_key(9999))
 
 
 @given('a snapshot of all battles')
@@ -113,7 +113,7 @@ def step_take_snapshots(context):
 
     for request in context.requests:
         battle_id = request.get('battleId')
-        snapshot = redis.instance.get(battle_id)
+        snapshot = redis.instance.get(storage.battle_key(battle_id))
 
         context.snapshots.setdefault(battle_id, snapshot)
 
@@ -186,9 +186,9 @@ def step_check_if_nothing_happened(context):
         if not battle_id:
             continue
 
-        snapshot = pickle.loads(context.snapshots[battle_id])
+        snapshot = codec.decode(context.snapshots[battle_id])
 
-        raw_battle = redis.instance.get(battle_id)
-        battle = pickle.loads(raw_battle)
+        raw_battle = redis.instance.get(storage.battle_key(battle_id))
+        battle = codec.decode(raw_battle)
 
         assert battle == snapshot
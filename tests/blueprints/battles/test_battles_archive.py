@@ -0,0 +1,181 @@
+"""Battle Archive Unit Tests.
+
+This test file will ensure that our idle battles are moved to the archive
+and back to Redis as we are expecting. It runs over FakeRedis and over a
+temporary SQLite database.
+
+"""
+import fakeredis
+import pytest
+
+from faker import Faker
+from mock import patch
+from dino_extinction.blueprints.battles import (archive, boards, storage)
+
+
+def _create_battle():
+    board = boards.create(9)
+    boards.put_cell(board, 2, 2, 'R-1111')
+
+    robot = dict()
+    robot.setdefault('id', 'R-1111')
+    robot.setdefault('type', 'ROBOT')
+    robot.setdefault('direction', 'north')
+    robot.setdefault('position', [3, 3])
+
+    battle = dict()
+    battle.setdefault('board', board)
+    battle.setdefault('entities', {'R-1111': robot})
+
+    return battle
+
+
+@pytest.fixture
+def fake_archive(tmp_path):
+    """Archive the battles of a FakeRedis instance on a temporary file."""
+    path = str(tmp_path / 'archive.sqlite3')
+    client = fakeredis.FakeStrictRedis()
+
+    with patch.object(archive, '_path', return_value=path), \
+            patch.object(archive.redis, 'instance', client), \
+            patch.object(storage.redis, 'instance', client), \
+            patch.object(storage, 'ttl', return_value=60):
+        yield client
+
+
+def test_store_and_fetch_battle(fake_archive):
+    """Store a battle on the archive and fetch it back.
+
+    This test will store a battle and it will pass if fetching it returns
+    the same battle, while only discarding its archived version removes it.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    battle = _create_battle()
+    battle['version'] = 3
+
+    # when
+    archive.store(battle_id, battle)
+    archived_battle = archive.fetch(battle_id)
+    archive.discard(battle_id, 2)
+    total_before_discard = archive.count()
+    archive.discard(battle_id, 3)
+
+    # then
+    assert archived_battle == battle
+    assert total_before_discard == 1
+    assert archive.count() == 0
+    assert archive.fetch(battle_id) is None
+
+
+def test_archive_idle_battles(fake_archive):
+    """Archive only the battles that are idle for too long.
+
+    This test will save two battles, one of them close to expire, and it
+    will pass if only that one was moved from Redis to the archive.
+
+    """
+    # given
+    layout = storage.LAYOUTS.get('blob')
+    layout.save(1111, _create_battle())
+    layout.save(2222, _create_battle())
+    fake_archive.expire(storage.battle_key(1111), 10)
+
+    # when
+    with patch.object(storage, 'get_storage', return_value=layout):
+        total_archived = storage.archive_idle(30)
+
+    # then
+    assert total_archived == 1
+    assert not fake_archive.exists(storage.battle_key(1111))
+    assert fake_archive.exists(storage.battle_key(2222))
+    assert archive.fetch(1111) is not None
+    assert archive.fetch(2222) is None
+
+
+@pytest.mark.parametrize('layout_name', ['blob', 'hash'])
+def test_restore_archived_battle_on_load(fake_archive, layout_name):
+    """Restore an archived battle when it is loaded.
+
+    This test will archive a battle and it will pass if loading it returns
+    the battle on its next version, moving it back to Redis.
+
+    ...
+
+    Parameters
+    ----------
+    layout_name : str
+        The storage layout of the battle.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    layout = storage.LAYOUTS.get(layout_name)
+    battle = _create_battle()
+    layout.save(battle_id, battle)
+
+    # when
+    with patch.object(storage, 'get_storage', return_value=layout):
+        is_archived = storage.archive_battle(battle_id)
+        restored_battle = storage.load(battle_id)
+
+    # then
+    assert is_archived
+    assert restored_battle.get('entities') == battle.get('entities')
+    assert restored_battle.get('version') == 2
+    assert layout.load_version(battle_id) == 2
+    assert archive.count() == 0
+
+
+def test_restore_archived_battle_on_transaction(fake_archive):
+    """Restore an archived battle when it is mutated.
+
+    This test will archive a battle and mutate it, and it will pass if the
+    mutation was saved over the archived battle, back on Redis.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    layout = storage.LAYOUTS.get('hash')
+    layout.save(battle_id, _create_battle())
+
+    def mutate(battle):
+        updated_battle = dict(battle)
+        updated_battle['entities'] = dict()
+        return len(battle.get('entities')), updated_battle
+
+    # when
+    with patch.object(storage, 'get_storage', return_value=layout):
+        storage.archive_battle(battle_id)
+        result = storage.transaction(battle_id, mutate)
+
+    # then
+    assert result == 1
+    assert layout.load(battle_id).get('entities') == dict()
+    assert archive.count() == 0
+
+
+def test_archive_once_per_interval(fake_archive):
+    """Archive the idle battles on a single worker per interval.
+
+    This test will run the archivers of two workers and it will pass if
+    only the first one archived the battles.
+
+    """
+    # given
+    archived = list()
+    archiver = archive.Archiver(lambda idle: archived.append(idle) or 0)
+    other_archiver = archive.Archiver(lambda idle: archived.append(idle) or 0)
+
+    # when
+    result = archiver.run_once(60)
+    other_result = other_archiver.run_once(60)
+
+    # then
+    assert result == 0
+    assert other_result is None
+    assert archived == [archive.DEFAULT_IDLE]
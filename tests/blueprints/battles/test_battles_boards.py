@@ -0,0 +1,242 @@
+"""Battle Boards Unit Tests.
+
+This test file will ensure that the most important logic of our Battle
+board engines is working as we are expecting.
+
+"""
+import pytest
+
+from faker import Faker
+from dino_extinction.blueprints.battles import boards
+
+
+def test_create_dense_board():
+    """Create a dense board.
+
+    This test will create a dense board and it will pass if every cell of
+    the board is stored and empty.
+
+    """
+    # given
+    fake = Faker()
+    board_size = fake.random_int(min=1, max=9)
+
+    # when
+    board = boards.create(board_size, 'dense')
+
+    # then
+    assert board.get('size') == board_size
+    assert board.get('state') == [[None] * board_size
+                                  for _ in range(board_size)]
+
+
+def test_create_sparse_board():
+    """Create a sparse board.
+
+    This test will create a sparse board and it will pass if no cell is
+    stored at all.
+
+    """
+    # given
+    fake = Faker()
+    board_size = fake.random_int(min=1, max=9)
+
+    # when
+    board = boards.create(board_size, 'sparse')
+
+    # then
+    assert board.get('size') == board_size
+    assert board.get('state') == dict()
+
+
+def test_refuse_unknown_engine():
+    """Refuse an unknown engine.
+
+    This test will try to create a board with an engine that does not exist
+    and it will pass if it raises an error.
+
+    """
+    # given
+    fake = Faker()
+
+    # when / then
+    with pytest.raises(ValueError):
+        boards.create(9, fake.word())
+
+
+@pytest.mark.parametrize('engine_name', ['dense', 'sparse', 'array'])
+def test_put_and_clear_cells(engine_name):
+    """Put and clear entities on a board.
+
+    This test will put an entity on a board and remove it afterwards. It
+    will pass if every engine finds the entity only while it is there.
+
+    """
+    # given
+    fake = Faker()
+    entity_id = fake.word()
+    board = boards.create(9, engine_name)
+
+    # when
+    boards.put_cell(board, 2, 3, entity_id)
+    found = boards.get_cell(board, 2, 3)
+    occupied = list(boards.occupied_cells(board))
+    boards.clear_cell(board, 2, 3)
+
+    # then
+    assert found == entity_id
+    assert occupied == [((2, 3), entity_id)]
+    assert not boards.get_cell(board, 2, 3)
+    assert not list(boards.occupied_cells(board))
+
+
+def test_check_positions_inside_board():
+    """Check if positions are inside the board.
+
+    This test will check positions around the edges of a board and it will
+    pass if only the ones inside of it are accepted.
+
+    """
+    # given
+    board = boards.create(3, 'sparse')
+
+    # then
+    assert boards.is_inside(board, 0, 0)
+    assert boards.is_inside(board, 2, 2)
+    assert not boards.is_inside(board, -1, 0)
+    assert not boards.is_inside(board, 0, 3)
+
+
+def test_render_sparse_board_as_rows():
+    """Adapt a sparse board into rows.
+
+    This test will adapt a sparse board into rows and it will pass if it is
+    the same as the dense board with the same entities.
+
+    """
+    # given
+    fake = Faker()
+    entity_id = fake.word()
+    sparse_board = boards.create(4, 'sparse')
+    dense_board = boards.create(4, 'dense')
+
+    # when
+    boards.put_cell(sparse_board, 1, 2, entity_id)
+    boards.put_cell(dense_board, 1, 2, entity_id)
+
+    # then
+    assert list(boards.rows(sparse_board)) == dense_board.get('state')
+
+
+@pytest.mark.parametrize('engine_name', ['dense', 'sparse', 'array'])
+def test_find_neighbours(engine_name):
+    """Find the neighbours of a cell.
+
+    This test will put entities around a cell on the edge of a board and it
+    will pass if every engine finds only the adjacent ones.
+
+    """
+    # given
+    board = boards.create(5, engine_name)
+    boards.put_cell(board, 0, 1, 'R-1111')
+    boards.put_cell(board, 0, 0, 'D-1111')
+    boards.put_cell(board, 1, 2, 'D-2222')
+    boards.put_cell(board, 2, 1, 'D-3333')
+    boards.put_cell(board, 4, 4, 'D-4444')
+
+    # when
+    result = boards.neighbours(board, 0, 1)
+
+    # then
+    assert sorted(result) == [((0, 0), 'D-1111'), ((1, 2), 'D-2222')]
+
+
+def test_copy_array_board():
+    """Copy an array board.
+
+    This test will copy an array board and change the copy. It will pass if
+    the original board does not change.
+
+    """
+    # given
+    fake = Faker()
+    entity_id = fake.word()
+    board = boards.create(4, 'array')
+    boards.put_cell(board, 1, 2, entity_id)
+
+    # when
+    copied_board = boards.copy(board, [1])
+    boards.clear_cell(copied_board, 1, 2)
+    boards.put_cell(copied_board, 3, 3, fake.word())
+
+    # then
+    assert boards.get_cell(board, 1, 2) == entity_id
+    assert not boards.get_cell(board, 3, 3)
+    assert not boards.get_cell(copied_board, 1, 2)
+    assert list(boards.rows(board)) == [[None] * 4,
+                                        [None, None, entity_id, None],
+                                        [None] * 4,
+                                        [None] * 4]
+
+
+def test_copy_array_board_on_write():
+    """Copy an array board without copying its grid.
+
+    This test will copy an array board, change the copy and look around
+    its changed cells. It will pass if the copy shares the grid with the
+    original board, only recording its changed cells, until every cell of
+    the copy is read.
+
+    """
+    # given
+    board = boards.create(4, 'array')
+    boards.put_cell(board, 1, 2, 'R-1111')
+    grid = board.get('state').grid
+
+    # when
+    copied_board = boards.copy(board, [1, 2])
+    boards.clear_cell(copied_board, 1, 2)
+    boards.put_cell(copied_board, 2, 2, 'R-1111')
+    boards.put_cell(copied_board, 2, 3, 'D-1111')
+    copied_state = copied_board.get('state')
+    is_shared = copied_state.base is grid
+    neighbours = boards.neighbours(copied_board, 2, 2)
+    cells = list(boards.occupied_cells(copied_board))
+
+    # then
+    assert is_shared
+    assert neighbours == [((2, 3), 'D-1111')]
+    assert cells == [((2, 2), 'R-1111'), ((2, 3), 'D-1111')]
+    assert copied_state.base is not grid
+    assert copied_state.changes == dict()
+    assert grid[1, 2] and not grid[2, 2]
+
+
+@pytest.mark.parametrize('engine_name', ['dense', 'sparse', 'array'])
+def test_find_adjacent_cells(engine_name):
+    """Find every target cell adjacent to a source cell.
+
+    This test will put sources and targets around the board, including on
+    its opposite edges, and it will pass if every engine finds only the
+    targets that are really adjacent to a source.
+
+    """
+    # given
+    board = boards.create(5, engine_name)
+    boards.put_cell(board, 0, 0, 'R-1111')
+    boards.put_cell(board, 3, 3, 'R-2222')
+    boards.put_cell(board, 1, 1, 'D-1111')
+    boards.put_cell(board, 4, 4, 'D-2222')
+    boards.put_cell(board, 4, 0, 'D-3333')
+    boards.put_cell(board, 0, 4, 'D-4444')
+    boards.put_cell(board, 2, 2, 'D-5555')
+
+    # when
+    result = boards.adjacent_cells(board,
+                                   lambda entity: entity[:2] == 'R-',
+                                   lambda entity: entity[:2] == 'D-')
+
+    # then
+    assert result == [((1, 1), 'D-1111'),
+                      ((2, 2), 'D-5555'),
+                      ((4, 4), 'D-2222')]
@@ -0,0 +1,368 @@
+"""Battle Cache Unit Tests.
+
+This test file will ensure that the most important logic of our Battle
+cache is working as we are expecting.
+
+"""
+import time
+import fakeredis
+import pytest
+
+from faker import Faker
+from mock import (patch, MagicMock)
+from flask import Flask
+from redis.exceptions import ConnectionError
+from dino_extinction.blueprints.battles import (boards, cache, storage)
+
+
+def _create_battle(version):
+    battle = dict()
+    battle.setdefault('board', boards.create(3))
+    battle.setdefault('entities', dict())
+    battle.setdefault('version', version)
+
+    return battle
+
+
+def _wait_for(condition):
+    deadline = time.time() + 2
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+
+    return condition()
+
+
+@pytest.fixture
+def battle_cache():
+    """Create a battle cache that holds up to 2 battles."""
+    settings = MagicMock()
+    settings.get.side_effect = lambda name, default=None: 2
+
+    with patch('dino_extinction.blueprints.battles.cache.settings', settings):
+        battle_cache = cache.BattleCache()
+        yield battle_cache
+
+        if battle_cache.listener:
+            battle_cache.listener.stop()
+
+
+@patch('dino_extinction.blueprints.battles.cache.metrics')
+def test_get_cached_battle(mocked_metrics, battle_cache):
+    """Get a cached battle.
+
+    This test will cache a battle and it will pass if getting it returns the
+    very same battle, unless another version of it is asked.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_metrics : magic mock
+        The mock of our metrics module.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    battle = _create_battle(3)
+
+    # when
+    battle_cache.put(battle_id, battle)
+
+    # then
+    assert battle_cache.get(battle_id) is battle
+    assert battle_cache.get(battle_id, 3) is battle
+    assert battle_cache.get(battle_id, 4) is None
+    assert battle_cache.get(battle_id + 1) is None
+    mocked_metrics.increment.assert_any_call('battle_cache_hits', battle_id)
+    mocked_metrics.increment.assert_any_call('battle_cache_misses',
+                                             battle_id + 1)
+
+
+@patch('dino_extinction.blueprints.battles.cache.metrics')
+def test_evict_least_recently_used_battle(mocked_metrics, battle_cache):
+    """Evict the least recently used battle.
+
+    This test will cache more battles than the cache can hold and it will
+    pass if the battle that was used the longest time ago is evicted.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_metrics : magic mock
+        The mock of our metrics module.
+
+    """
+    # given
+    battle_cache.put(1111, _create_battle(1))
+    battle_cache.put(2222, _create_battle(1))
+    battle_cache.get(1111)
+
+    # when
+    battle_cache.put(3333, _create_battle(1))
+
+    # then
+    assert battle_cache.get(1111)
+    assert battle_cache.get(3333)
+    assert battle_cache.get(2222) is None
+    mocked_metrics.increment.assert_any_call('battle_cache_evictions',
+                                             amount=1)
+
+
+@patch('dino_extinction.blueprints.battles.cache.time')
+def test_refuse_battles_older_than_max_age(mocked_time, battle_cache):
+    """Refuse a cached battle that is too old.
+
+    This test will cache a battle and it will pass if it is only returned
+    while it is younger than the asked maximum age.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_time : magic mock
+        The mock of the time module of our cache.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    battle = _create_battle(1)
+    mocked_time.monotonic.return_value = 100
+    battle_cache.put(battle_id, battle)
+
+    # when
+    mocked_time.monotonic.return_value = 130
+    young_battle = battle_cache.get(battle_id, max_age=30)
+    old_battle = battle_cache.get(battle_id, max_age=29)
+
+    # then
+    assert young_battle is battle
+    assert old_battle is None
+    assert battle_cache.get(battle_id) is battle
+
+
+def test_invalidate_older_battles(battle_cache):
+    """Invalidate only older battles.
+
+    This test will publish versions of a cached battle and it will pass if
+    the battle is only dropped when a newer version is published.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    battle_cache.put(battle_id, _create_battle(3))
+
+    # when
+    battle_cache.invalidate(battle_id, 3)
+    kept_battle = battle_cache.get(battle_id)
+    battle_cache.invalidate(battle_id, 4)
+
+    # then
+    assert kept_battle
+    assert battle_cache.get(battle_id) is None
+
+
+def test_refuse_battles_older_than_published(battle_cache):
+    """Refuse to cache a battle older than the published one.
+
+    This test will cache a battle that was loaded right before a newer
+    version of it was published and it will pass if it is not cached.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    battle_cache.invalidate(battle_id, 5)
+
+    # when
+    battle_cache.put(battle_id, _create_battle(4))
+
+    # then
+    assert battle_cache.get(battle_id) is None
+
+
+@patch('dino_extinction.blueprints.battles.cache.redis')
+def test_invalidate_published_battles(mocked_redis, battle_cache):
+    """Invalidate the battles saved by other workers.
+
+    This test will save a cached battle as if it were another worker and it
+    will pass if the invalidation message drops the cached battle.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    mocked_redis.instance = fakeredis.FakeStrictRedis()
+    battle_cache.put(battle_id, _create_battle(1))
+
+    # when
+    is_enabled = battle_cache.enabled()
+    cache.publish(mocked_redis.instance, battle_id, 2)
+
+    # then
+    assert is_enabled
+    assert _wait_for(lambda: battle_cache.get(battle_id) is None)
+
+
+@patch('dino_extinction.blueprints.battles.cache.redis')
+def test_listen_to_invalidations_outside_of_app(mocked_redis):
+    """Keep the published versions received outside of an app context.
+
+    This test will publish a new version of a battle, that is delivered by
+    the listener thread without any app context, and it will pass if an
+    older version of the battle is not cached afterwards.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    mocked_redis.instance = fakeredis.FakeStrictRedis()
+    app = Flask(__name__)
+    app.config['BATTLE_CACHE_SIZE'] = 2
+    battle_cache = cache.BattleCache()
+
+    # when
+    with app.app_context():
+        is_enabled = battle_cache.enabled()
+
+    cache.publish(mocked_redis.instance, battle_id, 6)
+    is_received = _wait_for(
+        lambda: battle_cache.versions.get(str(battle_id)) == 6)
+
+    with app.app_context():
+        battle_cache.put(battle_id, _create_battle(5))
+
+    battle_cache.listener.stop()
+
+    # then
+    assert is_enabled
+    assert is_received
+    assert battle_cache.get(battle_id) is None
+
+
+@patch('dino_extinction.blueprints.battles.cache.redis')
+def test_disable_cache_without_invalidations(mocked_redis, battle_cache):
+    """Disable the cache when we can not listen to invalidations.
+
+    This test will fail to subscribe to the invalidation channel and it will
+    pass if the cache is disabled.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    """
+    # given
+    pubsub = mocked_redis.instance.pubsub.return_value
+    pubsub.subscribe.side_effect = ConnectionError()
+
+    # when
+    result = battle_cache.enabled()
+
+    # then
+    assert not result
+
+
+@patch('dino_extinction.blueprints.battles.storage.redis')
+@patch('dino_extinction.blueprints.battles.cache.redis')
+def test_load_cached_battle(mocked_cache_redis, mocked_storage_redis,
+                            battle_cache):
+    """Load a battle from the cache.
+
+    This test will load the same battle twice and it will pass if the second
+    load does not read the battle from Redis again.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_cache_redis : magic mock
+        The mock of the Redis module of our cache.
+
+    mocked_storage_redis : magic mock
+        The mock of the Redis module of our storage.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    client = fakeredis.FakeStrictRedis()
+    mocked_cache_redis.instance = client
+    mocked_storage_redis.instance = client
+    storage.get_storage().save(battle_id, _create_battle(0))
+
+    # when
+    with patch.object(cache, 'instance', battle_cache):
+        first_battle = storage.load(battle_id)
+        client.delete(battle_id)
+        second_battle = storage.load(battle_id)
+
+    # then
+    assert first_battle.get('version') == 1
+    assert second_battle is first_battle
+
+
+@patch('dino_extinction.blueprints.battles.storage.redis')
+@patch('dino_extinction.blueprints.battles.cache.redis')
+def test_mutate_cached_battle(mocked_cache_redis, mocked_storage_redis,
+                              battle_cache):
+    """Mutate a battle from the cache.
+
+    This test will run two transactions over a battle and it will pass if
+    the second one receives the battle saved by the first one, without
+    loading it again.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_cache_redis : magic mock
+        The mock of the Redis module of our cache.
+
+    mocked_storage_redis : magic mock
+        The mock of the Redis module of our storage.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    client = fakeredis.FakeStrictRedis()
+    mocked_cache_redis.instance = client
+    mocked_storage_redis.instance = client
+    storage.get_storage().save(battle_id, _create_battle(0))
+    received_battles = list()
+
+    def mutate(battle):
+        received_battles.append(battle)
+
+        return None, _create_battle(battle.get('version'))
+
+    # when
+    with patch.object(cache, 'instance', battle_cache):
+        storage.transaction(battle_id, mutate)
+        with patch.object(storage.BlobStorage, 'load') as mocked_load:
+            storage.transaction(battle_id, mutate)
+
+    # then
+    assert [battle.get('version') for battle in received_battles] == [1, 2]
+    mocked_load.assert_not_called()
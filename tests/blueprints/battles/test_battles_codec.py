@@ -0,0 +1,441 @@
+"""Battle Codec Unit Tests.
+
+This test file will ensure that the most important logic of our Battle
+codec is working as we are expecting.
+
+"""
+import pickle
+import pytest
+
+from faker import Faker
+from mock import patch
+from dino_extinction.blueprints.battles import (boards, codec)
+
+
+def _create_battle(board_size, entities):
+    state = [[None] * board_size for _ in range(board_size)]
+    for entity_id, entity in entities.items():
+        row, col = entity.get('position')
+        state[row - 1][col - 1] = entity_id
+
+    board = dict()
+    board.setdefault('size', board_size)
+    board.setdefault('state', state)
+
+    battle = dict()
+    battle.setdefault('board', board)
+    battle.setdefault('entities', entities)
+    battle.setdefault('version', Faker().random_int(min=1, max=9999))
+
+    return battle
+
+
+def test_encode_and_decode_battle():
+    """Encode and decode a battle.
+
+    This test will encode a battle with robots and dinossaurs and it will
+    pass if decoding it returns the very same battle.
+
+    """
+    # given
+    fake = Faker()
+    robot = dict()
+    robot.setdefault('id', 'R-1111')
+    robot.setdefault('type', 'ROBOT')
+    robot.setdefault('direction', fake.random_element(['north', 'west']))
+    robot.setdefault('position', [1, 2])
+
+    dino = dict()
+    dino.setdefault('id', 'D-2222')
+    dino.setdefault('type', 'DINOSSAUR')
+    dino.setdefault('position', [3, 3])
+
+    entities = dict()
+    entities.setdefault('R-1111', robot)
+    entities.setdefault('D-2222', dino)
+    battle = _create_battle(3, entities)
+
+    # when
+    result = codec.decode(codec.encode(battle))
+
+    # then
+    assert result == battle
+
+
+def test_encode_battle_without_entities():
+    """Encode a new battle.
+
+    This test will encode a battle that does not have any entities yet and
+    it will pass if it is decoded with an empty entities dict.
+
+    """
+    # given
+    fake = Faker()
+    board_size = fake.random_int(min=1, max=9)
+    battle = _create_battle(board_size, dict())
+    del battle['entities']
+
+    # when
+    result = codec.decode(codec.encode(battle))
+
+    # then
+    assert result.get('entities') == dict()
+    assert result.get('board') == battle.get('board')
+    assert result.get('version') == battle.get('version')
+
+
+def test_keep_board_only_entities():
+    """Keep entities that only exist on the board.
+
+    This test will encode a board with an ID that has no entity record and
+    it will pass if the board keeps that ID after decoding.
+
+    """
+    # given
+    fake = Faker()
+    entity_id = fake.word()
+    battle = _create_battle(3, dict())
+    battle.get('board').get('state')[1][1] = entity_id
+
+    # when
+    result = codec.decode(codec.encode(battle))
+
+    # then
+    assert result.get('board').get('state')[1][1] == entity_id
+    assert entity_id not in result.get('entities')
+
+
+def test_use_wider_cells_for_big_entity_tables():
+    """Use wider cells when there are many entities.
+
+    This test will encode a battle with more entities than a single byte can
+    index and it will pass if every entity is decoded in the right cell.
+
+    """
+    # given
+    entities = dict()
+    for index in range(300):
+        dino_id = 'D-{0:04d}'.format(index)
+        dino = dict()
+        dino.setdefault('id', dino_id)
+        dino.setdefault('type', 'DINOSSAUR')
+        dino.setdefault('position', [index // 20 + 1, index % 20 + 1])
+        entities.setdefault(dino_id, dino)
+
+    battle = _create_battle(20, entities)
+
+    # when
+    raw_data = codec.encode(battle)
+    result = codec.decode(raw_data)
+
+    # then
+    assert raw_data[5] == 2
+    assert result == battle
+
+
+def test_decode_legacy_pickled_battle():
+    """Decode a battle stored as a pickle.
+
+    This test will decode a battle stored by the previous versions of our
+    API and it will pass if the battle is loaded.
+
+    """
+    # given
+    battle = _create_battle(3, dict())
+    del battle['entities']
+    del battle['version']
+
+    # when
+    result = codec.decode(pickle.dumps(battle))
+
+    # then
+    assert result.get('board') == battle.get('board')
+    assert result.get('entities') == dict()
+    assert result.get('version') == 0
+
+
+def test_decode_battle_without_version():
+    """Decode a battle encoded by the first version of our codec.
+
+    This test will decode a battle whose header does not have its version
+    and it will pass if the battle is loaded on version 0.
+
+    """
+    # given
+    battle = _create_battle(3, dict())
+    battle.get('board').get('state')[0][2] = 'R-1111'
+    raw_data = codec.encode(battle)
+    header = codec.HEADER.unpack_from(raw_data)
+    legacy_header = codec.HEADERS.get(1).pack(header[0], 1, *header[2:5])
+
+    # when
+    result = codec.decode(legacy_header + raw_data[codec.HEADER.size:])
+
+    # then
+    assert result.get('board') == battle.get('board')
+    assert result.get('version') == 0
+
+
+def test_decode_battle_without_compression():
+    """Decode a battle encoded by the second version of our codec.
+
+    This test will decode a battle whose header does not have its
+    compression and it will pass if the battle is loaded with its version.
+
+    """
+    # given
+    battle = _create_battle(3, dict())
+    battle.get('board').get('state')[0][2] = 'R-1111'
+    raw_data = codec.encode(battle)
+    header = codec.HEADER.unpack_from(raw_data)
+    legacy_header = codec.HEADERS.get(2).pack(header[0], 2, *header[2:6])
+
+    # when
+    result = codec.decode(legacy_header + raw_data[codec.HEADER.size:])
+
+    # then
+    assert result.get('board') == battle.get('board')
+    assert result.get('version') == battle.get('version')
+
+
+@pytest.mark.parametrize('engine_name', ['dense', 'sparse', 'array'])
+def test_compress_big_battles(engine_name):
+    """Compress only the battles above a threshold.
+
+    This test will encode a mostly empty battle with a threshold below and
+    above its size, and it will pass if only the first one was compressed,
+    while both of them are decoded back to the same battle.
+
+    ...
+
+    Parameters
+    ----------
+    engine_name : str
+        The board engine of the battle.
+
+    """
+    # given
+    board = boards.create(100, engine_name)
+    boards.put_cell(board, 49, 49, 'D-1111')
+
+    dino = dict()
+    dino.setdefault('id', 'D-1111')
+    dino.setdefault('type', 'DINOSSAUR')
+    dino.setdefault('position', [50, 50])
+
+    battle = dict()
+    battle.setdefault('board', board)
+    battle.setdefault('entities', {'D-1111': dino})
+    battle.setdefault('version', 1)
+    raw_data = codec.encode(battle)
+
+    # when
+    compressed_data = codec.encode(battle, len(raw_data) // 2, 9)
+    uncompressed_data = codec.encode(battle, len(raw_data))
+
+    # then
+    assert codec.decode(compressed_data) == battle
+    assert codec.decode(uncompressed_data) == battle
+    assert uncompressed_data == raw_data
+    assert codec.compression_ratio(uncompressed_data) == 1.0
+    if engine_name != 'sparse':
+        assert len(compressed_data) < len(raw_data) // 10
+        assert codec.compression_ratio(compressed_data) > 10
+
+
+@pytest.mark.parametrize('compress_above', [None, 0])
+def test_decode_battle_state(compress_above):
+    """Decode only the state of a battle.
+
+    This test will decode the state of a big battle and it will pass if it
+    has the size, the version and the entities of the battle.
+
+    ...
+
+    Parameters
+    ----------
+    compress_above : int
+        The compression threshold of the encoded battle.
+
+    """
+    # given
+    robot = dict()
+    robot.setdefault('id', 'R-1111')
+    robot.setdefault('type', 'ROBOT')
+    robot.setdefault('direction', 'west')
+    robot.setdefault('position', [700, 900])
+    battle = _create_battle(1000, {'R-1111': robot})
+    raw_data = codec.encode(battle, compress_above)
+
+    # when
+    result = codec.decode_state(raw_data)
+
+    # then
+    assert result.get('size') == 1000
+    assert result.get('version') == battle.get('version')
+    assert result.get('entities') == battle.get('entities')
+
+
+def test_decode_empty_compressed_battle_state():
+    """Decode the state of a compressed battle without entities.
+
+    This test will decode the state of a big compressed battle without any
+    entity and it will pass if it was decoded from only its header, without
+    decompressing its body.
+
+    """
+    # given
+    battle = _create_battle(1000, dict())
+    raw_data = codec.encode(battle, 0)
+
+    # when
+    with patch.object(codec.zlib, 'decompressobj') as mocked_decompressobj:
+        result = codec.decode_state(raw_data)
+        prefix_result = codec.decode_state_prefix(
+            raw_data[:codec.HEADER.size])
+
+    # then
+    assert codec.HEADER.unpack_from(raw_data)[6] == codec.ZLIB_COMPRESSION
+    assert result.get('size') == 1000
+    assert result.get('entities') == dict()
+    assert prefix_result == result
+    mocked_decompressobj.assert_not_called()
+
+
+@pytest.mark.parametrize('compress_above', [None, 0])
+def test_decode_battle_state_prefix(compress_above):
+    """Decode the state of a battle from only the start of its data.
+
+    This test will decode the state of a big battle from the first bytes of
+    its data and it will pass if they had the whole entity table, and if a
+    shorter start of the data was refused.
+
+    ...
+
+    Parameters
+    ----------
+    compress_above : int
+        The compression threshold of the encoded battle.
+
+    """
+    # given
+    robot = dict()
+    robot.setdefault('id', 'R-1111')
+    robot.setdefault('type', 'ROBOT')
+    robot.setdefault('direction', 'west')
+    robot.setdefault('position', [700, 900])
+    battle = _create_battle(1000, {'R-1111': robot})
+    raw_data = codec.encode(battle, compress_above)
+
+    # when
+    result = codec.decode_state_prefix(raw_data[:256])
+    short_result = codec.decode_state_prefix(
+        raw_data[:codec.HEADER.size + 3])
+
+    # then
+    assert result.get('size') == 1000
+    assert result.get('version') == battle.get('version')
+    assert result.get('entities') == battle.get('entities')
+    assert short_result is None
+
+
+def test_refuse_unknown_data():
+    """Refuse unknown data.
+
+    This test will try to decode some data that was not encoded by our codec
+    and it will pass if it raises an error.
+
+    """
+    # given
+    fake = Faker()
+    raw_data = fake.binary(length=32)
+
+    # when / then
+    with pytest.raises(ValueError):
+        codec.decode(b'MORTY' + raw_data)
+
+
+def test_encode_sparse_battle():
+    """Encode a sparse battle.
+
+    This test will encode a battle with a sparse board and it will pass if
+    the decoded battle is still sparse, with the same occupied cells.
+
+    """
+    # given
+    fake = Faker()
+    dino = dict()
+    dino.setdefault('id', 'D-2222')
+    dino.setdefault('type', 'DINOSSAUR')
+    dino.setdefault('position', [900, 1000])
+
+    board = dict()
+    board.setdefault('size', 1000)
+    board.setdefault('state', {(899, 999): 'D-2222', (0, 0): fake.word()})
+
+    battle = dict()
+    battle.setdefault('board', board)
+    battle.setdefault('entities', {'D-2222': dino})
+    battle.setdefault('version', 1)
+
+    # when
+    raw_data = codec.encode(battle)
+    result = codec.decode(raw_data)
+
+    # then
+    assert result == battle
+    assert len(raw_data) < 100
+
+
+def test_encode_array_battle():
+    """Encode an array battle.
+
+    This test will encode a battle with an array board and it will pass if
+    the decoded battle is still an array battle, loaded without copying its
+    grid, and only the entities that are still on it were encoded.
+
+    """
+    # given
+    board = boards.create(9, 'array')
+    boards.put_cell(board, 0, 0, 'D-1111')
+    boards.put_cell(board, 8, 8, 'D-2222')
+    boards.clear_cell(board, 0, 0)
+
+    dino = dict()
+    dino.setdefault('id', 'D-2222')
+    dino.setdefault('type', 'DINOSSAUR')
+    dino.setdefault('position', [9, 9])
+
+    battle = dict()
+    battle.setdefault('board', board)
+    battle.setdefault('entities', {'D-2222': dino})
+    battle.setdefault('version', 1)
+
+    # when
+    raw_data = codec.encode(battle)
+    result = codec.decode(raw_data)
+
+    # then
+    result_state = result.get('board').get('state')
+    assert result == battle
+    assert boards.engine_for(result.get('board')).name == 'array'
+    assert result_state.ids == [None, 'D-2222']
+    assert not result_state.grid.flags.writeable
+
+
+def test_read_version_from_header():
+    """Read the version of a battle from its header.
+
+    This test will read the version of an encoded battle using only its
+    header and it will pass if it is the version of the battle.
+
+    """
+    # given
+    battle = _create_battle(9, dict())
+    raw_data = codec.encode(battle)
+
+    # when
+    result = codec.read_version(raw_data[:codec.HEADER.size])
+
+    # then
+    assert result == battle.get('version')
@@ -0,0 +1,194 @@
+"""Battle Events Unit Tests.
+
+This test file will ensure that the delta events of our battles are built
+and delivered to their spectators as we are expecting. It runs over
+FakeRedis, so it does not need a Redis server.
+
+"""
+import fakeredis
+import pytest
+
+from faker import Faker
+from mock import patch
+from dino_extinction import create_app
+from dino_extinction.blueprints.battles import (archive, boards, events,
+                                                storage)
+
+
+def _create_battle():
+    robot = dict()
+    robot.setdefault('type', 'ROBOT')
+    robot.setdefault('direction', 'north')
+    robot.setdefault('position', [3, 3])
+
+    dino = dict()
+    dino.setdefault('type', 'DINOSSAUR')
+    dino.setdefault('position', [4, 4])
+
+    battle = dict()
+    battle.setdefault('board', boards.create(9))
+    battle.setdefault('entities', {'R-1111': robot, 'D-2222': dino})
+
+    return battle
+
+
+@pytest.fixture
+def app():
+    """Create a testing app, before Redis is faked."""
+    return create_app('TESTING')
+
+
+@pytest.fixture
+def event_listener():
+    """Listen to the events of the battles of a FakeRedis instance."""
+    event_listener = events.EventListener()
+    with patch.object(events.redis, 'instance', fakeredis.FakeStrictRedis()), \
+            patch.object(events, 'instance', event_listener):
+        yield event_listener
+
+        if event_listener.listener:
+            event_listener.listener.stop()
+
+
+def test_list_delta_events():
+    """List the delta events between two states of a battle.
+
+    This test will move and turn a robot, destroy a dinossaur and create
+    another one, and it will pass if an event was listed for each change.
+
+    """
+    # given
+    battle = _create_battle()
+    robot = dict(battle.get('entities').get('R-1111'))
+    robot['position'] = [2, 3]
+    robot['direction'] = 'east'
+
+    dino = dict()
+    dino.setdefault('type', 'DINOSSAUR')
+    dino.setdefault('position', [9, 9])
+
+    updated_battle = dict(battle)
+    updated_battle['entities'] = {'R-1111': robot, 'D-3333': dino}
+
+    # when
+    result = events.deltas(battle, updated_battle)
+
+    # then
+    assert result == [
+        {'event': 'moved', 'id': 'R-1111', 'xPosition': 3, 'yPosition': 2},
+        {'event': 'turned', 'id': 'R-1111', 'direction': 'east'},
+        {'event': 'created', 'id': 'D-3333', 'type': 'DINOSSAUR',
+         'xPosition': 9, 'yPosition': 9},
+        {'event': 'destroyed', 'id': 'D-2222'},
+    ]
+    assert events.deltas(battle, battle) == []
+
+
+def test_push_saved_changes_to_spectators(event_listener):
+    """Push the changes of a saved mutation to the spectators of a battle.
+
+    This test will watch a battle and mutate it, and it will pass if its
+    spectator received the delta events of the new version of the battle.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    layout = storage.LAYOUTS.get('blob')
+    layout.save(battle_id, _create_battle())
+    subscription = event_listener.subscribe(battle_id)
+
+    def mutate(battle):
+        updated_battle = dict(battle)
+        updated_battle['entities'] = dict(battle.get('entities'))
+        del updated_battle['entities']['D-2222']
+        return None, updated_battle
+
+    # when
+    with patch.object(storage, 'get_storage', return_value=layout):
+        storage.transaction(battle_id, mutate)
+
+    message = events.wait(subscription, 2)
+
+    # then
+    assert message == {'version': 2,
+                       'events': [{'event': 'destroyed', 'id': 'D-2222'}]}
+    assert events.wait(subscription, 0.1) is None
+
+
+def test_mark_lagged_spectators(event_listener):
+    """Mark a spectator that fell too far behind as lagged.
+
+    This test will dispatch more messages than a spectator can keep and it
+    will pass if only the lagged mark was left for it.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    subscription = event_listener.subscribe(battle_id)
+
+    # when
+    for version in range(events.MAX_PENDING + 1):
+        event_listener.dispatch(battle_id, {'version': version,
+                                            'events': list()})
+
+    event_listener.unsubscribe(battle_id, subscription)
+
+    # then
+    assert events.wait(subscription, 0) == events.LAGGED
+    assert events.wait(subscription, 0) is None
+    assert event_listener.spectators == dict()
+
+
+def test_watch_archived_battle(app, event_listener, tmp_path):
+    """Watch the events of an archived battle.
+
+    This test will archive a battle and start watching it, and it will pass
+    if the battle was restored and its stream starts with its snapshot.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    path = str(tmp_path / 'archive.sqlite3')
+
+    with app.app_context(), \
+            patch.object(archive, '_path', return_value=path):
+        storage.get_storage().save(battle_id, _create_battle())
+        is_archived = storage.archive_battle(battle_id)
+
+        # when
+        response = app.test_client().get(
+            '/battles/{}/events'.format(battle_id), buffered=False)
+        first_event = next(iter(response.response)).decode('utf-8')
+        response.close()
+
+    # then
+    assert is_archived
+    assert response.status_code == 200
+    assert first_event.startswith('event: snapshot')
+    assert event_listener.spectators == dict()
+
+
+def test_refuse_watching_without_listener(app, event_listener):
+    """Refuse to watch a battle when the battles can not be listened to.
+
+    This test will start watching a battle while its events can not be
+    subscribed to, and it will pass if it was answered as unavailable.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+
+    with app.app_context():
+        storage.get_storage().save(battle_id, _create_battle())
+
+    # when
+    with patch.object(event_listener, 'subscribe', return_value=None):
+        response = app.test_client().get(
+            '/battles/{}/events'.format(battle_id))
+
+    # then
+    assert response.status_code == 503
@@ -6,11 +6,13 @@ blueprint handlers are working as we are expecting.
 """
 from mock import patch
 from faker import Faker
+from dino_extinction.infrastructure import ids
 from dino_extinction.blueprints.battles import handlers
 
 
+@patch('dino_extinction.blueprints.battles.handlers.ids')
 @patch('dino_extinction.blueprints.battles.handlers.models')
-def test_called_model(mocked_models):
+def test_called_model(mocked_models, mocked_ids):
     """Test the calling of our model.
 
     This test will ensure that our handler is calling our model during the
@@ -23,6 +25,9 @@ def test_called_model(mocked_models):
     mocked_models : magic mock
         The mock of our battle models module.
 
+    mocked_ids : magic mock
+        The mock of our IDs module.
+
     """
     # given
     mocked_instance = mocked_models.BattleSchema.return_value
@@ -35,12 +40,13 @@ def test_called_model(mocked_models):
     assert mocked_instance.dumps.call_count == 1
 
 
+@patch('dino_extinction.infrastructure.ids.redis')
 @patch('dino_extinction.blueprints.battles.handlers.models')
-def test_creating_pin_id_to_battle(mocked_models):
+def test_creating_pin_id_to_battle(mocked_models, mocked_redis):
     """Test the creation of a new battle ID.
 
-    This test will ensure that we are creating a 4 digit long ID every
-    time a new battle is created.
+    This test will ensure that we are creating an ID with the configured
+    number of digits every time a new battle is created.
 
     ...
 
@@ -49,9 +55,14 @@ def test_creating_pin_id_to_battle(mocked_models):
     mocked_models : magic mock
         The mock of our battle models module.
 
+    mocked_redis : magic mock
+        The mock of the Redis module of our IDs.
+
     """
     # given
     mocked_instance = mocked_models.BattleSchema.return_value
+    mocked_redis.instance.incrby.return_value = ids.DEFAULT_BLOCK_SIZE
+    ids.instance.reset()
 
     # when
     handlers.new_battle()
@@ -62,11 +73,11 @@ def test_creating_pin_id_to_battle(mocked_models):
     digits = str(args['id'])
 
     assert type(args['id']) is int
-    assert len(digits) == 4
+    assert len(digits) == ids.DEFAULT_DIGITS
 
 
-@patch('dino_extinction.blueprints.battles.handlers.randint')
-def test_handling_model_error(mocked_randint):
+@patch('dino_extinction.blueprints.battles.handlers.ids')
+def test_handling_model_error(mocked_ids):
     """Test the error handling.
 
     This test will ensure that we are dealing correctly with any error. More
@@ -76,13 +87,13 @@ def test_handling_model_error(mocked_randint):
 
     Parameters
     ----------
-    mocked_randint : magic mock
-        The mock of the randint function, that creates our IDs.
+    mocked_ids : magic mock
+        The mock of our IDs module, that creates our IDs.
 
     """
     # given
     fake = Faker()
-    mocked_randint.return_value = fake.word()
+    mocked_ids.new_battle_id.return_value = fake.word()
 
     # when
     errors = handlers.new_battle(board_size=fake.word())[0]
@@ -90,3 +101,121 @@ def test_handling_model_error(mocked_randint):
     # then
     assert errors['id'] == ['Not a valid integer.']
     assert errors['board_size'] == ['Not a valid integer.']
+
+
+@patch('dino_extinction.blueprints.battles.handlers.models')
+def test_get_battle_state(mocked_models):
+    """Get the state of a battle.
+
+    This test will get the state of a battle with a robot and it will pass
+    if the robot is positioned by xPosition and yPosition.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_models : magic mock
+        The mock of our battle models module.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    robot = dict()
+    robot.setdefault('id', 'R-1111')
+    robot.setdefault('type', 'ROBOT')
+    robot.setdefault('direction', 'north')
+    robot.setdefault('position', [2, 3])
+
+    state = dict()
+    state.setdefault('size', 1000)
+    state.setdefault('version', 7)
+    state.setdefault('entities', {'R-1111': robot})
+    mocked_models.BattleSchema.return_value.get_state.return_value = state
+
+    # when
+    errors, battle = handlers.battle_state(battle_id)
+
+    # then
+    assert not errors
+    assert battle == {'battleId': battle_id,
+                      'size': 1000,
+                      'version': 7,
+                      'entities': [{'id': 'R-1111',
+                                    'type': 'ROBOT',
+                                    'direction': 'north',
+                                    'xPosition': 3,
+                                    'yPosition': 2}]}
+
+
+@patch('dino_extinction.blueprints.battles.handlers.models')
+def test_get_unknown_battle_state(mocked_models):
+    """Refuse the state of an unknown battle.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_models : magic mock
+        The mock of our battle models module.
+
+    """
+    # given
+    fake = Faker()
+    mocked_models.BattleSchema.return_value.get_state.return_value = None
+
+    # when
+    errors, battle = handlers.battle_state(fake.random_int(min=1111,
+                                                           max=9999))
+
+    # then
+    assert errors
+    assert battle is None
+
+
+@patch('dino_extinction.blueprints.battles.handlers.models')
+def test_get_battle_window(mocked_models):
+    """Get a window of the board of a battle.
+
+    This test will get a window that crosses the edge of the board, and it
+    will pass if the window was clipped to the board and only has the cells
+    and the entities inside of it.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_models : magic mock
+        The mock of our battle models module.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    robot = dict()
+    robot.setdefault('type', 'ROBOT')
+    robot.setdefault('direction', 'north')
+    robot.setdefault('position', [5, 4])
+
+    dino = dict()
+    dino.setdefault('type', 'DINOSSAUR')
+    dino.setdefault('position', [1, 1])
+
+    state = dict()
+    state.setdefault('size', 5)
+    state.setdefault('version', 3)
+    state.setdefault('entities', {'R-1111': robot, 'D-2222': dino})
+    mocked_models.BattleSchema.return_value.get_state.return_value = state
+
+    # when
+    errors, window = handlers.battle_window(battle_id, (3, 4, 4, 4))
+    _, battle = handlers.battle_state(battle_id, (3, 4, 4, 4))
+
+    # then
+    assert not errors
+    assert window.get('window') == (3, 4, 3, 2)
+    assert window.get('rows') == [[None, None, None],
+                                  [None, 'R-1111', None]]
+    assert window.get('entities') == {'R-1111': robot}
+    assert [entity.get('id') for entity in battle.get('entities')] == [
+        'R-1111']
@@ -4,13 +4,15 @@ This test file will ensure that the most important logic of our Battle
 blueprint models are working as we are expecting.
 
 """
-import pickle
 import random
+import pytest
 
 from faker import Faker
 from mock import patch
 from copy import deepcopy
-from dino_extinction.blueprints.battles import models
+from dino_extinction.infrastructure import ids
+from dino_extinction.blueprints.battles import (models, codec, boards,
+                                                storage)
 
 
 def test_generate_battle_model():
@@ -63,11 +65,12 @@ def test_id_must_be_int():
     assert result.errors['id'][0] == 'Not a valid integer.'
 
 
-def test_should_refuse_any_id_length_rather_than_4():
+def test_should_refuse_any_id_length_out_of_range():
     """Validate ID length.
 
-    This test will try to insert an integer ID, but with a length different
-    from 4 and check if our model refuses it.
+    This test will try to insert an integer ID, but with a length shorter
+    than 4 or longer than the configured digits, and check if our model
+    refuses it.
 
     """
     # given
@@ -77,7 +80,7 @@ def test_should_refuse_any_id_length_rather_than_4():
     a_digits = [str(fake.random_int(min=1, max=9)) for _ in range(3)]
     a_id = int(''.join(a_digits))
 
-    b_digits = [str(fake.random_int(min=1, max=9)) for _ in range(5)]
+    b_digits = [str(fake.random_int(min=1, max=9)) for _ in range(9)]
     b_id = int(''.join(b_digits))
 
     a_battle = dict()
@@ -99,11 +102,11 @@ def test_should_refuse_any_id_length_rather_than_4():
     assert 'id' not in a_result.data
     assert 'id' not in b_result.data
 
-    assert a_result.errors['id'][0] == 'The battle ID should be 4 digits long.'
-    assert b_result.errors['id'][0] == 'The battle ID should be 4 digits long.'
+    assert a_result.errors['id'][0] == ids.battle_id_error()
+    assert b_result.errors['id'][0] == ids.battle_id_error()
 
 
-@patch('dino_extinction.blueprints.battles.models.redis')
+@patch('dino_extinction.blueprints.battles.storage.redis')
 def test_create_new_battle(mocked_redis):
     """New battle creation.
 
@@ -141,16 +144,20 @@ def test_create_new_battle(mocked_redis):
 
     expected_battle = dict()
     expected_battle['board'] = expected_board
+    expected_battle['version'] = 1
 
-    pickled_expected_battle = pickle.dumps(expected_battle)
+    raw_expected_battle = codec.encode(expected_battle)
 
-    assert mocked_redis.instance.set.call_count == 1
-    mocked_redis.instance.set.assert_called_with(id, pickled_expected_battle)
+    pipeline = mocked_redis.instance.pipeline.return_value
+    assert pipeline.set.call_count == 1
+    pipeline.set.assert_called_with(storage.battle_key(id),
+                                    raw_expected_battle)
+    pipeline.publish.assert_called_once_with('battles:invalidate', f"{id}:1")
 
 
-@patch('dino_extinction.blueprints.battles.models.redis')
-@patch('dino_extinction.blueprints.battles.models.pickle')
-def test_get_battle(mocked_pickle, mocked_redis):
+@patch('dino_extinction.blueprints.battles.storage.redis')
+@patch('dino_extinction.blueprints.battles.storage.codec')
+def test_get_battle(mocked_codec, mocked_redis):
     """Get an existing battle.
 
     This test will try to get an existing battle and it will pass if our model
@@ -160,8 +167,8 @@ def test_get_battle(mocked_pickle, mocked_redis):
 
     Parameters
     ----------
-    mocked_pickle: magic mock
-        The mock of the Pickle library.
+    mocked_codec: magic mock
+        The mock of our battle codec.
 
     mocked_redis : magic mock
         The mock of our Redis module.
@@ -172,7 +179,7 @@ def test_get_battle(mocked_pickle, mocked_redis):
     battle_id = fake.word()
     expected_return = fake.word()
     mocked_redis.instance.get.return_value = expected_return
-    mocked_pickle.loads.return_value = expected_return
+    mocked_codec.decode.return_value = expected_return
 
     # when
     model = models.BattleSchema()
@@ -181,12 +188,13 @@ def test_get_battle(mocked_pickle, mocked_redis):
     # then
     assert result == expected_return
     assert mocked_redis.instance.get.call_count == 1
-    mocked_redis.instance.get.assert_called_with(battle_id)
+    mocked_redis.instance.get.assert_called_with(
+        storage.battle_key(battle_id))
 
 
-@patch('dino_extinction.blueprints.battles.models.redis')
-@patch('dino_extinction.blueprints.battles.models.pickle')
-def test_not_get_unknow_battle(mocked_pickle, mocked_redis):
+@patch('dino_extinction.blueprints.battles.storage.redis')
+@patch('dino_extinction.blueprints.battles.storage.codec')
+def test_not_get_unknow_battle(mocked_codec, mocked_redis):
     """Ignore an unknow battle.
 
     This test will try to get an unknow battle and it should pass if the
@@ -196,8 +204,8 @@ def test_not_get_unknow_battle(mocked_pickle, mocked_redis):
 
     Parameters
     ----------
-    mocked_pickle: magic mock
-        The mock of the Pickle library.
+    mocked_codec: magic mock
+        The mock of our battle codec.
 
     mocked_redis : magic mock
         The mock of our Redis module.
@@ -212,26 +220,26 @@ def test_not_get_unknow_battle(mocked_pickle, mocked_redis):
     result = model.get_battle(fake.word())
 
     # then
-    mocked_pickle.loads.assert_not_called()
+    mocked_codec.decode.assert_not_called()
 
     assert not result
     assert mocked_redis.instance.get.call_count == 1
 
 
-@patch('dino_extinction.blueprints.battles.models.redis')
-@patch('dino_extinction.blueprints.battles.models.pickle')
-def test_get_battle_serializing_pickle_data(mocked_pickle, mocked_redis):
+@patch('dino_extinction.blueprints.battles.storage.redis')
+@patch('dino_extinction.blueprints.battles.storage.codec')
+def test_get_battle_decoding_data(mocked_codec, mocked_redis):
     """Normalize battle data.
 
     This test will try to get an existing battle and it should pass if it
-    send the right data to pickle and return to us the loaded pickle data.
+    send the right data to our codec and return to us the decoded data.
 
     ...
 
     Parameters
     ----------
-    mocked_pickle: magic mock
-        The mock of the Pickle library.
+    mocked_codec: magic mock
+        The mock of our battle codec.
 
     mocked_redis : magic mock
         The mock of our Redis module.
@@ -243,7 +251,7 @@ def test_get_battle_serializing_pickle_data(mocked_pickle, mocked_redis):
     raw_data = fake.word()
     expected_return = fake.word()
     mocked_redis.instance.get.return_value = raw_data
-    mocked_pickle.loads.return_value = expected_return
+    mocked_codec.decode.return_value = expected_return
 
     # when
     model = models.BattleSchema()
@@ -252,16 +260,16 @@ def test_get_battle_serializing_pickle_data(mocked_pickle, mocked_redis):
     # then
     assert result == expected_return
     assert result != raw_data
-    assert mocked_pickle.loads.call_count == 1
-    mocked_pickle.loads.assert_called_with(raw_data)
+    assert mocked_codec.decode.call_count == 1
+    mocked_codec.decode.assert_called_with(raw_data)
 
 
-@patch('dino_extinction.blueprints.battles.models.redis')
+@patch('dino_extinction.blueprints.battles.storage.redis')
 def test_update_battle(mocked_redis):
     """Update a battle data.
 
     This test will try to update a battle with a new data and it will pass
-    if it sends the data pickled to Redis.
+    if it sends the data encoded to Redis.
 
     ...
 
@@ -274,16 +282,25 @@ def test_update_battle(mocked_redis):
     # given
     fake = Faker()
     battle_id = fake.word()
-    new_clean_data = fake.word()
-    new_raw_data = pickle.dumps(new_clean_data)
+    new_clean_data = dict()
+    new_clean_data.setdefault('board', {'size': 1, 'state': [[None]]})
+    new_clean_data.setdefault('entities', {})
+    new_clean_data.setdefault('version', fake.random_int(min=1, max=9))
 
     # when
     model = models.BattleSchema()
+    previous_version = new_clean_data.get('version')
     model.update_battle(battle_id, new_clean_data)
 
     # then
-    assert mocked_redis.instance.set.call_count == 1
-    mocked_redis.instance.set.assert_called_with(battle_id, new_raw_data)
+    new_raw_data = codec.encode(new_clean_data)
+
+    pipeline = mocked_redis.instance.pipeline.return_value
+    assert new_clean_data.get('version') == previous_version + 1
+    assert pipeline.set.call_count == 1
+    pipeline.set.assert_called_with(storage.battle_key(battle_id),
+                                    new_raw_data)
+    assert pipeline.execute.call_count == 1
 
 
 def test_robot_move():
@@ -488,3 +505,321 @@ def test_avoid_friendly_fire():
     # then
     assert result == battle
     assert 'R-1111' in result.get('entities')
+
+
+def test_robot_move_on_sparse_board():
+    """Move a robot inside a sparse battlefield.
+
+    This test will try to move a robot in a battlefield that only stores its
+    occupied cells. It should pass if the robot leaves its old cell and
+    takes the new one.
+
+    """
+    # given
+    fake = Faker()
+    robot_id = fake.word()
+
+    robot = dict()
+    robot.setdefault('direction', 'east')
+    robot.setdefault('position', (3, 3))
+
+    board = boards.create(9, 'sparse')
+    boards.put_cell(board, 2, 2, robot_id)
+
+    battle = dict()
+    battle.setdefault('entities', {robot_id: robot})
+    battle.setdefault('board', board)
+
+    # when
+    model = models.BattleSchema()
+    result = model.robot_move(battle, robot_id, 'move-forward')
+
+    # then
+    assert result.get('board').get('state') == {(2, 3): robot_id}
+    assert result.get('entities').get(robot_id).get('position') == (3, 4)
+    assert battle.get('board').get('state') == {(2, 2): robot_id}
+
+
+def test_robot_attack_on_sparse_board():
+    """Attack with a robot inside a sparse battlefield.
+
+    This test will try to attack with a robot in a battlefield that only
+    stores its occupied cells. It should pass if the dinossaurs close to it
+    are destroyed.
+
+    """
+    # given
+    fake = Faker()
+    robot_id = fake.word()
+
+    robot = dict()
+    robot.setdefault('direction', 'north')
+    robot.setdefault('position', (3, 3))
+
+    board = boards.create(9, 'sparse')
+    boards.put_cell(board, 2, 2, robot_id)
+    boards.put_cell(board, 1, 3, 'D-1111')
+    boards.put_cell(board, 5, 5, 'D-2222')
+
+    entities = dict()
+    entities.setdefault(robot_id, robot)
+    entities.setdefault('D-1111', dict())
+    entities.setdefault('D-2222', dict())
+
+    battle = dict()
+    battle.setdefault('entities', entities)
+    battle.setdefault('board', board)
+
+    # when
+    model = models.BattleSchema()
+    result = model.robot_attack(battle, robot_id)
+
+    # then
+    assert result.get('board').get('state') == {(2, 2): robot_id,
+                                                (5, 5): 'D-2222'}
+    assert 'D-1111' not in result.get('entities')
+    assert 'D-2222' in result.get('entities')
+
+
+def test_robot_move_and_attack_on_array_board():
+    """Move and attack with a robot inside an array battlefield.
+
+    This test will move a robot next to a dinossaur in a battlefield that
+    stores its grid as an array, and attack with it. It should pass if the
+    dinossaur is destroyed without changing the original battle.
+
+    """
+    # given
+    fake = Faker()
+    robot_id = fake.word()
+
+    robot = dict()
+    robot.setdefault('direction', 'east')
+    robot.setdefault('position', (3, 3))
+
+    board = boards.create(9, 'array')
+    boards.put_cell(board, 2, 2, robot_id)
+    boards.put_cell(board, 1, 4, 'D-1111')
+    boards.put_cell(board, 1, 1, 'D-2222')
+
+    entities = dict()
+    entities.setdefault(robot_id, robot)
+    entities.setdefault('D-1111', dict())
+    entities.setdefault('D-2222', dict())
+
+    battle = dict()
+    battle.setdefault('entities', entities)
+    battle.setdefault('board', board)
+    original_battle = deepcopy(battle)
+
+    # when
+    model = models.BattleSchema()
+    moved_battle = model.robot_move(battle, robot_id, 'move-forward')
+    result = model.robot_attack(moved_battle, robot_id)
+
+    # then
+    assert list(boards.occupied_cells(result.get('board'))) == [
+        ((1, 1), 'D-2222'),
+        ((2, 3), robot_id)]
+    assert 'D-1111' not in result.get('entities')
+    assert 'D-2222' in result.get('entities')
+    assert battle == original_battle
+
+
+def test_robot_attack_respects_board_edges():
+    """Attack with a robot at the corner of the battlefield.
+
+    This test will try to attack with a robot at the corner of the
+    battlefield and it will pass if the dinossaurs at the opposite side of
+    the board are not attacked.
+
+    """
+    # given
+    fake = Faker()
+    robot_id = fake.word()
+
+    robot = dict()
+    robot.setdefault('direction', 'north')
+    robot.setdefault('position', (1, 1))
+
+    board = boards.create(9, 'dense')
+    boards.put_cell(board, 0, 0, robot_id)
+    boards.put_cell(board, 8, 8, 'D-1111')
+    boards.put_cell(board, 0, 8, 'D-2222')
+
+    entities = dict()
+    entities.setdefault(robot_id, robot)
+    entities.setdefault('D-1111', dict())
+    entities.setdefault('D-2222', dict())
+
+    battle = dict()
+    battle.setdefault('entities', entities)
+    battle.setdefault('board', board)
+
+    # when
+    model = models.BattleSchema()
+    result = model.robot_attack(battle, robot_id)
+
+    # then
+    assert 'D-1111' in result.get('entities')
+    assert 'D-2222' in result.get('entities')
+
+
+def test_robot_turn():
+    """Turn a robot inside the battlefield.
+
+    This test will turn a robot and it will pass if only the direction of
+    that robot was changed, without changing the original battle.
+
+    """
+    # given
+    fake = Faker()
+    robot_id = fake.word()
+    new_direction = random.choice(['east', 'south', 'west'])
+    board = boards.create(9)
+    boards.put_cell(board, 2, 2, robot_id)
+
+    robot = dict()
+    robot.setdefault('direction', 'north')
+    robot.setdefault('position', [3, 3])
+
+    battle = dict()
+    battle.setdefault('entities', {robot_id: robot})
+    battle.setdefault('board', board)
+    original_battle = deepcopy(battle)
+
+    # when
+    model = models.BattleSchema()
+    result = model.robot_turn(battle, robot_id, new_direction)
+
+    # then
+    assert result.get('entities').get(robot_id).get('direction') == \
+        new_direction
+    assert result.get('board') == battle.get('board')
+    assert battle == original_battle
+
+
+@pytest.mark.parametrize('engine_name', ['dense', 'sparse', 'array'])
+def test_share_unchanged_state_on_move(engine_name):
+    """Share the unchanged state of a battle when moving a robot.
+
+    This test will move a robot and it will pass if the original battle is
+    not changed and the new battle shares every row and entity that did not
+    change with it.
+
+    """
+    # given
+    board = boards.create(9, engine_name)
+    boards.put_cell(board, 2, 2, 'R-1111')
+    boards.put_cell(board, 7, 7, 'D-2222')
+
+    robot = dict()
+    robot.setdefault('id', 'R-1111')
+    robot.setdefault('type', 'ROBOT')
+    robot.setdefault('direction', 'east')
+    robot.setdefault('position', [3, 3])
+
+    dino = dict()
+    dino.setdefault('id', 'D-2222')
+    dino.setdefault('type', 'DINOSSAUR')
+    dino.setdefault('position', [8, 8])
+
+    battle = dict()
+    battle.setdefault('entities', {'R-1111': robot, 'D-2222': dino})
+    battle.setdefault('board', board)
+    original_battle = deepcopy(battle)
+
+    # when
+    model = models.BattleSchema()
+    result = model.robot_move(battle, 'R-1111', 'move-forward')
+
+    # then
+    assert battle == original_battle
+    assert boards.get_cell(result.get('board'), 2, 3) == 'R-1111'
+    assert result.get('entities').get('D-2222') is dino
+    assert result.get('entities').get('R-1111') is not robot
+    if engine_name == 'dense':
+        result_state = result.get('board').get('state')
+        assert result_state[7] is board.get('state')[7]
+        assert result_state[2] is not board.get('state')[2]
+
+
+def test_place_entities():
+    """Place many entities inside the battlefield at once.
+
+    This test will place a list of entities and it will pass if only the
+    valid ones were placed, reporting an error for each invalid one.
+
+    """
+    # given
+    board = boards.create(9)
+    boards.put_cell(board, 0, 0, 'D-1111')
+
+    battle = dict()
+    battle.setdefault('entities', {'D-1111': {'position': [1, 1]}})
+    battle.setdefault('board', board)
+    original_battle = deepcopy(battle)
+
+    entities = list()
+    entities.append({'id': 'D-6666', 'position': [2, 2]})
+    entities.append({'id': 'D-2222', 'position': [2, 2]})
+    entities.append({'id': 'D-3333', 'position': [1, 1]})
+    entities.append({'id': 'D-4444', 'position': [10, 1]})
+    entities.append({'id': 'D-5555', 'position': [9, 9]})
+
+    # when
+    model = models.BattleSchema()
+    errors, result = model.place_entities(battle, entities)
+
+    # then
+    assert errors == [None,
+                      'This position is not empty',
+                      'This position is not empty',
+                      'This position is out of range',
+                      None]
+    assert boards.get_cell(result.get('board'), 1, 1) == 'D-6666'
+    assert boards.get_cell(result.get('board'), 8, 8) == 'D-5555'
+    assert set(result.get('entities')) == {'D-1111', 'D-5555', 'D-6666'}
+    assert battle == original_battle
+
+
+@pytest.mark.parametrize('engine_name', ['dense', 'sparse', 'array'])
+def test_robots_attack(engine_name):
+    """Attack with every robot of the battlefield at once.
+
+    This test will attack with every robot of a battlefield and it will pass
+    if only the dinossaurs close to any robot were destroyed, respecting the
+    edges of the board, without changing the original battle.
+
+    """
+    # given
+    board = boards.create(9, engine_name)
+    boards.put_cell(board, 0, 0, 'R-1111')
+    boards.put_cell(board, 4, 4, 'R-2222')
+    boards.put_cell(board, 1, 0, 'D-1111')
+    boards.put_cell(board, 5, 5, 'D-2222')
+    boards.put_cell(board, 8, 8, 'D-3333')
+    boards.put_cell(board, 0, 8, 'D-4444')
+    boards.put_cell(board, 4, 5, 'R-3333')
+
+    entities = {entity_id: dict() for entity_id in
+                ['R-1111', 'R-2222', 'R-3333', 'D-1111', 'D-2222', 'D-3333',
+                 'D-4444']}
+
+    battle = dict()
+    battle.setdefault('entities', entities)
+    battle.setdefault('board', board)
+    original_battle = deepcopy(battle)
+
+    # when
+    model = models.BattleSchema()
+    destroyed, result = model.robots_attack(battle)
+
+    # then
+    assert destroyed == 2
+    assert sorted(result.get('entities')) == ['D-3333', 'D-4444', 'R-1111',
+                                              'R-2222', 'R-3333']
+    assert not boards.get_cell(result.get('board'), 1, 0)
+    assert not boards.get_cell(result.get('board'), 5, 5)
+    assert boards.get_cell(result.get('board'), 4, 5) == 'R-3333'
+    assert battle == original_battle
@@ -0,0 +1,288 @@
+"""Battle Renders Unit Tests.
+
+This test file will ensure that our rendered state pages are cached by the
+version of their battles as we are expecting.
+
+"""
+import fakeredis
+import gzip
+import pytest
+
+from faker import Faker
+from mock import patch
+from dino_extinction import create_app
+from dino_extinction.blueprints.battles import handlers, renders
+from dino_extinction.infrastructure import redis
+
+
+@pytest.fixture
+def render_cache():
+    """Create a render cache of 4KB."""
+    with patch.object(renders, 'settings') as mocked_settings:
+        mocked_settings.get.return_value = 4096
+        yield renders.RenderCache()
+
+
+def test_cache_page_by_version(render_cache):
+    """Cache a page by the version of its battle.
+
+    This test will cache a page and it will pass if it is only returned for
+    the version that it was rendered from.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    html = fake.text(max_nb_chars=200)
+
+    # when
+    page = render_cache.put(battle_id, 2, html)
+
+    # then
+    assert page == html.encode('utf-8')
+    assert render_cache.get(battle_id, 2) == page
+    assert render_cache.get(battle_id, 3) is None
+    assert render_cache.get(battle_id, None) is None
+
+
+def test_compress_cached_page(render_cache):
+    """Compress a cached page.
+
+    This test will cache a page and ask for it compressed, and it will pass
+    if the compressed page has the same content.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    html = fake.text(max_nb_chars=200)
+    render_cache.put(battle_id, 1, html)
+
+    # when
+    page = render_cache.get(battle_id, 1, renders.GZIP)
+
+    # then
+    assert gzip.decompress(page) == html.encode('utf-8')
+    assert render_cache.get(battle_id, 1, renders.GZIP) == page
+
+
+def test_replace_page_of_older_version(render_cache):
+    """Keep only the page of the latest version of a battle.
+
+    This test will cache the pages of two versions of a battle, and it will
+    pass if only the newest one is kept, even if the oldest one is cached
+    again after it.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+
+    # when
+    render_cache.put(battle_id, 1, 'a' * 100)
+    render_cache.put(battle_id, 2, 'b' * 100)
+    render_cache.put(battle_id, 1, 'a' * 100)
+
+    # then
+    assert render_cache.get(battle_id, 1) is None
+    assert render_cache.get(battle_id, 2) == b'b' * 100
+    assert render_cache.total_bytes == 100
+
+
+def test_evict_least_recently_used_pages(render_cache):
+    """Evict the least recently used pages when the cache is full.
+
+    This test will cache pages beyond the size of the cache, and it will
+    pass if the least recently used ones were evicted.
+
+    """
+    # given
+    render_cache.put(1111, 1, 'a' * 1000)
+    render_cache.put(2222, 1, 'b' * 1000)
+    render_cache.get(1111, 1)
+
+    # when
+    render_cache.put(3333, 1, 'c' * 1000)
+    render_cache.put(4444, 1, 'd' * 1000)
+    render_cache.put(5555, 1, 'e' * 1000)
+
+    # then
+    assert render_cache.get(1111, 1)
+    assert render_cache.get(2222, 1) is None
+    assert render_cache.get(3333, 1)
+    assert render_cache.get(4444, 1)
+    assert render_cache.get(5555, 1)
+    assert render_cache.total_bytes == 4000
+
+
+def test_stream_page_in_chunks(render_cache):
+    """Stream a page in chunks while it is rendered.
+
+    This test will stream a compressed page from many small parts and it
+    will pass if it was sent in more than one chunk, which are decompressed
+    to the whole page, and the page was cached once it was over.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    parts = [fake.text(max_nb_chars=100) for _ in range(8)]
+
+    # when
+    with patch.object(renders, 'CHUNK_SIZE', 128):
+        chunks = list(render_cache.stream(battle_id, 1, parts,
+                                          renders.GZIP))
+
+    # then
+    assert len(chunks) > 1
+    assert gzip.decompress(b''.join(chunks)) == ''.join(parts).encode('utf-8')
+    assert render_cache.get(battle_id, 1, renders.GZIP) == b''.join(chunks)
+    assert render_cache.get(battle_id, 1) == ''.join(parts).encode('utf-8')
+
+
+def test_skip_caching_big_pages(render_cache):
+    """Stream a page without caching it when it is too big.
+
+    This test will stream a page bigger than the share of the cache that a
+    single page may take, and it will pass if the whole page was streamed,
+    but it was not cached.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    parts = ['a' * 100] * 20
+
+    # when
+    with patch.object(renders, 'CHUNK_SIZE', 256):
+        chunks = list(render_cache.stream(battle_id, 1, parts))
+
+    # then
+    assert b''.join(chunks) == b'a' * 2000
+    assert render_cache.get(battle_id, 1) is None
+    assert render_cache.total_bytes == 0
+
+
+def test_cache_tiles_by_digest(render_cache):
+    """Cache the tiles of a battle by the digest of their entities.
+
+    This test will cache two tiles of a battle, and a newer one of the
+    first tile, and it will pass if each tile only keeps its latest page,
+    whatever the order of their digests.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+
+    # when
+    render_cache.put(battle_id, 'wb', 'a' * 100, tile=(1, 1))
+    render_cache.put(battle_id, 'wb', 'b' * 100, tile=(65, 1))
+    render_cache.put(battle_id, 'wa', 'c' * 100, tile=(1, 1))
+
+    # then
+    assert render_cache.get(battle_id, 'wb', tile=(1, 1)) is None
+    assert render_cache.get(battle_id, 'wa', tile=(1, 1)) == b'c' * 100
+    assert render_cache.get(battle_id, 'wb', tile=(65, 1)) == b'b' * 100
+    assert render_cache.get(battle_id, 'wa') is None
+    assert render_cache.total_bytes == 200
+
+
+def test_keep_window_digest_by_version(render_cache):
+    """Keep the digest of a window by the version of its battle.
+
+    This test will keep the digest of a window and it will pass if it is
+    only returned for the version of the battle that it was kept for.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    window = (1, 1, 5, 5)
+
+    # when
+    render_cache.put_digest(battle_id, window, 2, 'wa')
+
+    # then
+    assert render_cache.get_digest(battle_id, window, 2) == 'wa'
+    assert render_cache.get_digest(battle_id, window, 3) is None
+    assert render_cache.get_digest(battle_id, window, None) is None
+    assert render_cache.get_digest(battle_id, (1, 1, 4, 4), 2) is None
+
+
+def test_check_window_without_loading_battle():
+    """Check a known window without loading its battle.
+
+    This test will ask for the same window of a battle three times, the
+    last one with its ETag, and it will pass if the battle was only loaded
+    for the first time while it did not change.
+
+    """
+    # given
+    app = create_app('TESTING')
+    app.config['BATTLE_TILE_SIZE'] = 5
+    client = app.test_client()
+    url = '/battles/state?battleId={}&x0=1&y0=1&w=5&h=5'
+
+    with patch.object(redis, 'instance', fakeredis.FakeStrictRedis()), \
+            patch.object(renders, 'tiles', renders.RenderCache()), \
+            patch.object(handlers, 'battle_window',
+                         wraps=handlers.battle_window) as battle_window:
+        with app.app_context():
+            _, battle = handlers.new_battle(board_size=10)
+
+        # when
+        first = client.get(url.format(battle.get('id')))
+        page = first.get_data()
+        second = client.get(url.format(battle.get('id')))
+        third = client.get(url.format(battle.get('id')),
+                           headers={'If-None-Match': first.headers['ETag']})
+
+    # then
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert second.get_data() == page
+    assert third.status_code == 304
+    assert battle_window.call_count == 1
+
+
+def test_render_only_entities():
+    """Render a board with an element for each entity only.
+
+    This test will render a window of a huge board on the entities mode,
+    and it will pass if the page has the size of the window and an element
+    for each entity, positioned inside of the window, and no cells.
+
+    """
+    # given
+    robot = dict()
+    robot.setdefault('type', 'ROBOT')
+    robot.setdefault('direction', 'east')
+    robot.setdefault('position', [22, 13])
+
+    dino = dict()
+    dino.setdefault('type', 'DINOSSAUR')
+    dino.setdefault('position', [21, 11])
+
+    app = create_app('TESTING')
+    app.config['BATTLE_RENDER_MODE'] = renders.ENTITIES
+
+    # when
+    with app.test_request_context():
+        render_mode = renders.mode()
+        page = ''.join(renders.render_entities(1111,
+                                               {'R-1111': robot,
+                                                'D-2222': dino},
+                                               1000,
+                                               1000,
+                                               10,
+                                               20))
+
+    # then
+    assert render_mode == renders.ENTITIES
+    assert '--cols: 1000; --rows: 1000' in page
+    assert page.count('class="placed') == 2
+    assert '--col: 2; --row: 1' in page
+    assert '--col: 0; --row: 0' in page
+    assert 'arrow east' in page
+    assert 'class="col' not in page
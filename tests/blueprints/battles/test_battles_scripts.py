@@ -0,0 +1,389 @@
+"""Battle Scripts Unit Tests.
+
+This test file will ensure that the Lua scripts of our battles are changing
+the hash layout of a battle as we are expecting. They run over FakeRedis, so
+they do not need a Redis server.
+
+"""
+import json
+import time
+import fakeredis
+import pytest
+
+from faker import Faker
+from mock import patch
+from dino_extinction.infrastructure import redis
+from dino_extinction.blueprints.battles import (boards, events, scripts,
+                                                storage)
+
+
+@pytest.fixture
+def battle_id():
+    """Store a battle as a hash on a FakeRedis instance.
+
+    The battle has a 9x9 board, with a robot facing north on (3, 3), a
+    dinossaur close to it on (4, 4) and another one far from it on (9, 9).
+
+    """
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+
+    board = boards.create(9)
+    boards.put_cell(board, 2, 2, 'R-1111')
+    boards.put_cell(board, 3, 3, 'D-2222')
+    boards.put_cell(board, 8, 8, 'D-3333')
+
+    robot = dict()
+    robot.setdefault('id', 'R-1111')
+    robot.setdefault('type', 'ROBOT')
+    robot.setdefault('direction', 'north')
+    robot.setdefault('position', [3, 3])
+
+    close_dino = dict()
+    close_dino.setdefault('id', 'D-2222')
+    close_dino.setdefault('type', 'DINOSSAUR')
+    close_dino.setdefault('position', [4, 4])
+
+    far_dino = dict()
+    far_dino.setdefault('id', 'D-3333')
+    far_dino.setdefault('type', 'DINOSSAUR')
+    far_dino.setdefault('position', [9, 9])
+
+    entities = dict()
+    entities.setdefault('R-1111', robot)
+    entities.setdefault('D-2222', close_dino)
+    entities.setdefault('D-3333', far_dino)
+
+    battle = dict()
+    battle.setdefault('board', board)
+    battle.setdefault('entities', entities)
+
+    with patch.object(redis, 'instance', fakeredis.FakeStrictRedis()), \
+            patch.object(redis, 'scripts', dict()):
+        redis.register_scripts()
+        storage.HashStorage().save(battle_id, battle)
+
+        yield battle_id
+
+
+def _load(battle_id):
+    return storage.HashStorage().load(battle_id)
+
+
+def test_turn_robot(battle_id):
+    """Turn a robot.
+
+    This test will turn a robot to the right and it will pass if its new
+    direction was stored on the next version of the battle.
+
+    """
+    # when
+    error = scripts.command_robot(battle_id, 'R-1111', 'turn-right')
+
+    # then
+    battle = _load(battle_id)
+    robot = battle.get('entities').get('R-1111')
+    assert error is None
+    assert robot.get('direction') == 'east'
+    assert battle.get('version') == 2
+
+
+@pytest.mark.parametrize('action, position', [('move-forward', [2, 3]),
+                                              ('move-backwards', [4, 3])])
+def test_move_robot(battle_id, action, position):
+    """Move a robot.
+
+    This test will move a robot and it will pass if both its entity and the
+    board were changed.
+
+    """
+    # when
+    error = scripts.command_robot(battle_id, 'R-1111', action)
+
+    # then
+    battle = _load(battle_id)
+    row, col = position
+    assert error is None
+    assert battle.get('entities').get('R-1111').get('position') == position
+    assert boards.get_cell(battle.get('board'), row - 1, col - 1) == 'R-1111'
+    assert not boards.get_cell(battle.get('board'), 2, 2)
+
+
+def test_do_not_move_robot_over_another_entity(battle_id):
+    """Avoid moving a robot over another entity.
+
+    This test will try to move a robot into an occupied cell and it will
+    pass if the battle was not changed.
+
+    """
+    # given
+    scripts.command_robot(battle_id, 'R-1111', 'turn-right')
+    scripts.command_robot(battle_id, 'R-1111', 'move-forward')
+    scripts.command_robot(battle_id, 'R-1111', 'turn-right')
+    battle = _load(battle_id)
+
+    # when
+    error = scripts.command_robot(battle_id, 'R-1111', 'move-forward')
+
+    # then
+    assert error == 'There is another entity there'
+    assert _load(battle_id) == battle
+
+
+def test_do_not_move_robot_out_of_the_board(battle_id):
+    """Avoid moving a robot out of the board.
+
+    This test will try to move a robot beyond the edge of the board and it
+    will pass if the robot stays on its last position.
+
+    """
+    # given
+    scripts.command_robot(battle_id, 'R-1111', 'move-forward')
+    scripts.command_robot(battle_id, 'R-1111', 'move-forward')
+
+    # when
+    error = scripts.command_robot(battle_id, 'R-1111', 'move-forward')
+
+    # then
+    robot = _load(battle_id).get('entities').get('R-1111')
+    assert error == 'There is another entity there'
+    assert robot.get('position') == [1, 3]
+
+
+def test_robot_attack(battle_id):
+    """Attack with a robot.
+
+    This test will attack with a robot and it will pass if only the
+    dinossaur close to it was destroyed.
+
+    """
+    # when
+    error = scripts.command_robot(battle_id, 'R-1111', 'attack')
+
+    # then
+    battle = _load(battle_id)
+    assert error is None
+    assert 'D-2222' not in battle.get('entities')
+    assert 'D-3333' in battle.get('entities')
+    assert not boards.get_cell(battle.get('board'), 3, 3)
+
+
+@pytest.mark.parametrize('action', ['turn-right', 'move-forward', 'attack'])
+def test_publish_delta_events(battle_id, action):
+    """Publish the delta events of a commanded robot.
+
+    This test will command a robot while watching its battle and it will
+    pass if the script published the same delta events that a saved
+    transaction would publish.
+
+    ...
+
+    Parameters
+    ----------
+    action : str
+        The action of the robot.
+
+    """
+    # given
+    pubsub = redis.instance.pubsub()
+    pubsub.subscribe(events.channel(battle_id))
+    subscribed = pubsub.get_message()
+    battle = _load(battle_id)
+
+    # when
+    error = scripts.command_robot(battle_id, 'R-1111', action)
+
+    # then
+    updated_battle = _load(battle_id)
+    message = json.loads(pubsub.get_message().get('data'))
+    assert subscribed.get('type') == 'subscribe'
+    assert error is None
+    assert message.get('version') == updated_battle.get('version')
+    assert message.get('events') == events.deltas(battle, updated_battle)
+
+
+def test_command_unknown_robot(battle_id):
+    """Command a robot that does not exist.
+
+    This test will command an unknown robot and it will pass if the script
+    returns an error.
+
+    """
+    # given
+    fake = Faker()
+
+    # when
+    error = scripts.command_robot(battle_id, fake.word(), 'attack')
+
+    # then
+    assert error == 'This robot does not exist'
+
+
+@pytest.mark.parametrize('action', ['move-forward', 'turn-left', 'attack'])
+def test_command_dinossaur(battle_id, action):
+    """Command a dinossaur as if it were a robot.
+
+    This test will command a dinossaur and it will pass if the script
+    returns an error, without changing the battle.
+
+    ...
+
+    Parameters
+    ----------
+    action : str
+        The action of the command.
+
+    """
+    # given
+    battle = _load(battle_id)
+
+    # when
+    error = scripts.command_robot(battle_id, 'D-2222', action)
+
+    # then
+    assert error == 'This robot does not exist'
+    assert _load(battle_id) == battle
+
+
+def test_command_unknown_battle(battle_id):
+    """Command a robot of a battle that does not exist.
+
+    This test will command a robot of an unknown battle and it will pass if
+    the script returns an error.
+
+    """
+    # when
+    error = scripts.command_robot(battle_id + 1, 'R-1111', 'turn-left')
+
+    # then
+    assert error == 'This battle does not exist'
+
+
+@patch('dino_extinction.blueprints.battles.storage.ttl', return_value=60)
+def test_refresh_battle_expiration(mocked_ttl, battle_id):
+    """Refresh the expiration of a commanded battle.
+
+    This test will command a robot while the battles expire and it will pass
+    if the script refreshed the expiration of the battle.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_ttl : magic mock
+        The mock of the function that returns the expiration of battles.
+
+    """
+    # when
+    error = scripts.command_robot(battle_id, 'R-1111', 'turn-left')
+
+    # then
+    assert error is None
+    assert redis.instance.ttl(storage.battle_key(battle_id)) == 60
+
+
+@pytest.mark.parametrize('seconds', [60, 0])
+def test_refresh_live_battle(battle_id, seconds):
+    """Refresh the score of a commanded battle on the live battles.
+
+    This test will command a robot of a battle that looks expired on the
+    live battles, and it will pass if the script moved its score to when
+    the battle expires now, or to inf if the battles never expire.
+
+    ...
+
+    Parameters
+    ----------
+    seconds : int
+        The seconds that the battles take to expire.
+
+    """
+    # given
+    redis.instance.zadd(storage.LIVE_KEY, {str(battle_id): 1})
+
+    # when
+    with patch.object(storage, 'ttl', return_value=seconds):
+        started_at = time.time()
+        error = scripts.command_robot(battle_id, 'R-1111', 'turn-left')
+
+    # then
+    score = redis.instance.zscore(storage.LIVE_KEY, str(battle_id))
+    assert error is None
+    if seconds:
+        assert started_at + seconds <= score <= time.time() + seconds
+    else:
+        assert score == float('inf')
+
+
+def test_create_entity(battle_id):
+    """Create a new entity.
+
+    This test will create a robot on an empty cell and it will pass if both
+    the entity and its cell were stored.
+
+    """
+    # given
+    robot = dict()
+    robot.setdefault('id', 'R-4444')
+    robot.setdefault('type', 'ROBOT')
+    robot.setdefault('direction', 'west')
+    robot.setdefault('position', [5, 6])
+
+    # when
+    error = scripts.create_entity(battle_id, robot)
+
+    # then
+    battle = _load(battle_id)
+    assert error is None
+    assert battle.get('entities').get('R-4444') == robot
+    assert boards.get_cell(battle.get('board'), 4, 5) == 'R-4444'
+
+
+@pytest.mark.parametrize('position, expected_error', [
+    ([4, 4], 'This position is not empty'),
+    ([10, 1], 'This position is out of range'),
+    ([0, 1], 'This position is out of range'),
+])
+def test_refuse_invalid_entity(battle_id, position, expected_error):
+    """Refuse an entity on an invalid position.
+
+    This test will try to create a dinossaur on an invalid position and it
+    will pass if the script returns the reason.
+
+    """
+    # given
+    dino = dict()
+    dino.setdefault('id', 'D-4444')
+    dino.setdefault('type', 'DINOSSAUR')
+    dino.setdefault('position', position)
+
+    # when
+    error = scripts.create_entity(battle_id, dino)
+
+    # then
+    assert error == expected_error
+    assert 'D-4444' not in _load(battle_id).get('entities')
+
+
+@pytest.mark.parametrize('configs, expected', [
+    ({'BATTLE_SCRIPTS': True, 'BATTLE_STORAGE': 'hash'}, True),
+    ({'BATTLE_SCRIPTS': True, 'BATTLE_STORAGE': 'blob'}, False),
+    ({'BATTLE_SCRIPTS': False, 'BATTLE_STORAGE': 'hash'}, False),
+])
+def test_enable_scripts(configs, expected):
+    """Enable the scripts.
+
+    This test will ensure that the scripts are only enabled when they are
+    configured and the battles are stored as hashes.
+
+    """
+    # given
+    def get(name, default=None):
+        return configs.get(name, default)
+
+    # when
+    with patch('dino_extinction.infrastructure.settings.get', get):
+        result = scripts.enabled()
+
+    # then
+    assert result == expected
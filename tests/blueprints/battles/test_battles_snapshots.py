@@ -0,0 +1,111 @@
+"""Battle Snapshots Unit Tests.
+
+This test file will ensure that the snapshots of our battles are checked on
+the background, as we are expecting.
+
+"""
+from threading import Event
+from faker import Faker
+from flask import Flask
+from mock import patch
+from dino_extinction.blueprints.battles import (boards, codec, snapshots,
+                                                storage)
+
+
+def test_check_pending_battle_once():
+    """Check a battle only once while its check is pending.
+
+    This test will request many checks of the same battle while its first
+    check is still waiting, and it will pass if the battle is checked only
+    twice: once for the first request and once for all the others.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    started = Event()
+    released = Event()
+    finished = Event()
+    calls = list()
+
+    def check(checked_id, max_events, max_bytes):
+        calls.append((checked_id, max_events, max_bytes))
+        started.set()
+        released.wait(1)
+        if len(calls) == 2:
+            finished.set()
+
+        return False
+
+    snapshotter = snapshots.Snapshotter(check)
+
+    # when
+    snapshotter.request(battle_id)
+    started.wait(1)
+    for _ in range(3):
+        snapshotter.request(battle_id)
+
+    released.set()
+    finished.wait(1)
+
+    # then
+    expected_call = (str(battle_id),
+                     snapshots.DEFAULT_MAX_EVENTS,
+                     snapshots.DEFAULT_MAX_BYTES)
+    assert calls == [expected_call, expected_call]
+    assert not snapshotter.pending
+
+
+@patch('dino_extinction.blueprints.battles.storage.redis')
+def test_snapshot_inside_app_context(mocked_redis):
+    """Take a snapshot on the background with the configurations of the app.
+
+    This test will request the snapshot of a stream battle inside an app
+    context and it will pass if the snapshot taken by the background thread
+    still expires after the configured TTL and is compressed above the
+    configured threshold.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    battle = dict()
+    battle.setdefault('board', boards.create(9))
+    battle.setdefault('entities', dict())
+    battle.setdefault('version', 1)
+
+    pipeline = mocked_redis.instance.pipeline.return_value.__enter__()
+    pipeline.xlen.return_value = 1
+    pipeline.get.return_value = codec.encode(battle)
+    pipeline.xrange.return_value = [(b'1-0', {b'version': b'2'})]
+    executed = Event()
+    pipeline.execute.side_effect = lambda: executed.set()
+
+    app = Flask(__name__)
+    app.config['BATTLE_TTL'] = 60
+    app.config['BATTLE_SNAPSHOT_EVENTS'] = 1
+    app.config['BATTLE_COMPRESSION_THRESHOLD'] = 0
+
+    layout = storage.StreamStorage()
+
+    # when
+    with app.app_context():
+        layout.snapshotter.request(battle_id)
+
+    is_taken = executed.wait(2)
+
+    # then
+    assert is_taken
+    pipeline.expire.assert_called_once_with(f"battle:{battle_id}", 60)
+
+    key, raw_data = pipeline.set.call_args[0]
+    compression = codec.HEADER.unpack_from(raw_data)[6]
+    assert key == f"battle:{battle_id}"
+    assert compression == codec.ZLIB_COMPRESSION
@@ -0,0 +1,942 @@
+"""Battle Storage Unit Tests.
+
+This test file will ensure that the most important logic of our Battle
+storage layouts is working as we are expecting.
+
+"""
+import os
+import fakeredis
+import pytest
+
+from copy import deepcopy
+from faker import Faker
+from mock import (patch, MagicMock)
+from redis import StrictRedis
+from redis.exceptions import (ConnectionError, ResponseError)
+from dino_extinction.blueprints.battles import (boards, codec, storage)
+
+TEST_REDIS_URL = os.environ.get('TEST_REDIS_URL', 'redis://localhost:6379/15')
+
+
+def _create_battle(engine_name='dense'):
+    board = boards.create(9, engine_name)
+    boards.put_cell(board, 2, 2, 'R-1111')
+    boards.put_cell(board, 3, 3, 'D-2222')
+
+    robot = dict()
+    robot.setdefault('id', 'R-1111')
+    robot.setdefault('type', 'ROBOT')
+    robot.setdefault('direction', 'north')
+    robot.setdefault('position', [3, 3])
+
+    dino = dict()
+    dino.setdefault('id', 'D-2222')
+    dino.setdefault('type', 'DINOSSAUR')
+    dino.setdefault('position', [4, 4])
+
+    battle = dict()
+    battle.setdefault('board', board)
+    battle.setdefault('entities', {'R-1111': robot, 'D-2222': dino})
+
+    return battle
+
+
+@pytest.mark.parametrize('engine_name', ['dense', 'sparse', 'array'])
+@patch('dino_extinction.blueprints.battles.storage.redis')
+def test_save_and_load_hash_battle(mocked_redis, engine_name):
+    """Save and load a battle as a hash.
+
+    This test will save a battle using the hash layout and it will pass if
+    loading it returns the very same battle.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    battle = _create_battle(engine_name)
+    mocked_redis.instance = fakeredis.FakeStrictRedis()
+
+    # when
+    layout = storage.HashStorage()
+    layout.save(battle_id, battle)
+    result = layout.load(battle_id)
+
+    # then
+    assert result == battle
+    assert mocked_redis.instance.hget(storage.battle_key(battle_id),
+                                      'c:3:3') == b'R-1111'
+
+
+@patch('dino_extinction.blueprints.battles.storage.metrics')
+@patch('dino_extinction.blueprints.battles.storage.settings')
+@patch('dino_extinction.blueprints.battles.storage.redis')
+def test_save_compressed_blob_battle(mocked_redis, mocked_settings,
+                                     mocked_metrics):
+    """Save a big battle compressed.
+
+    This test will save a battle bigger than the compression threshold and
+    it will pass if it was stored compressed, its stored size and ratio were
+    measured, and loading it returns the very same battle.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    mocked_settings : magic mock
+        The mock of our settings module.
+
+    mocked_metrics : magic mock
+        The mock of our metrics module.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    battle = _create_battle()
+    config = {'BATTLE_COMPRESSION_THRESHOLD': 0, 'BATTLE_TTL': 0}
+    mocked_settings.get.side_effect = lambda name, default=None: config.get(
+        name, default)
+    mocked_redis.instance = fakeredis.FakeStrictRedis()
+
+    # when
+    layout = storage.BlobStorage()
+    layout.save(battle_id, battle)
+    raw_data = mocked_redis.instance.get(storage.battle_key(battle_id))
+    result = layout.load(battle_id)
+
+    # then
+    assert result == battle
+    assert codec.compression_ratio(raw_data) > 1
+    mocked_metrics.gauge.assert_any_call('battle_stored_bytes',
+                                         battle_id,
+                                         len(raw_data))
+    mocked_metrics.gauge.assert_any_call('battle_compression_ratio',
+                                         battle_id,
+                                         codec.compression_ratio(raw_data))
+
+
+@patch('dino_extinction.blueprints.battles.storage.redis')
+def test_load_unknown_hash_battle(mocked_redis):
+    """Ignore an unknown battle.
+
+    This test will try to load a battle that does not exist and it will
+    pass if the result is None.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    """
+    # given
+    fake = Faker()
+    mocked_redis.instance = fakeredis.FakeStrictRedis()
+
+    # when
+    result = storage.HashStorage().load(fake.word())
+
+    # then
+    assert result is None
+
+
+@patch('dino_extinction.blueprints.battles.storage.redis')
+def test_save_only_changed_direction(mocked_redis):
+    """Write only the direction of a turned robot.
+
+    This test will save a battle where a robot has turned and it will pass
+    if only the field of that robot and the version of the battle are
+    written.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.word()
+    previous_battle = _create_battle()
+    battle = deepcopy(previous_battle)
+    battle.get('entities').get('R-1111').update({'direction': 'east'})
+    pipeline = mocked_redis.instance.pipeline.return_value
+
+    # when
+    storage.HashStorage().save(battle_id, battle, previous_battle)
+
+    # then
+    pipeline.hdel.assert_not_called()
+    expected_fields = dict()
+    expected_fields.setdefault('e:R-1111', 'ROBOT,east,3,3')
+    expected_fields.setdefault('version', '1')
+
+    pipeline.hmset.assert_called_once_with(storage.battle_key(battle_id),
+                                           expected_fields)
+    assert pipeline.execute.call_count == 1
+
+
+@patch('dino_extinction.blueprints.battles.storage.redis')
+def test_save_only_moved_cells(mocked_redis):
+    """Write only the cells of a moved robot.
+
+    This test will save a battle where a robot has moved and it will pass
+    if only its entity and its old and new cells are written.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.word()
+    previous_battle = _create_battle()
+    battle = deepcopy(previous_battle)
+    battle.get('entities').get('R-1111').update({'position': [2, 3]})
+    boards.clear_cell(battle.get('board'), 2, 2)
+    boards.put_cell(battle.get('board'), 1, 2, 'R-1111')
+    pipeline = mocked_redis.instance.pipeline.return_value
+
+    # when
+    storage.HashStorage().save(battle_id, battle, previous_battle)
+
+    # then
+    expected_fields = dict()
+    expected_fields.setdefault('e:R-1111', 'ROBOT,north,2,3')
+    expected_fields.setdefault('c:2:3', 'R-1111')
+    expected_fields.setdefault('version', '1')
+
+    pipeline.hdel.assert_called_once_with(storage.battle_key(battle_id),
+                                          'c:3:3')
+    pipeline.hmset.assert_called_once_with(storage.battle_key(battle_id),
+                                           expected_fields)
+
+
+@patch('dino_extinction.blueprints.battles.storage.redis')
+def test_delete_only_destroyed_entities(mocked_redis):
+    """Delete only the fields of destroyed dinossaurs.
+
+    This test will save a battle where a dinossaur was destroyed and it
+    will pass if only the fields of that dinossaur are deleted, besides the
+    version of the battle.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.word()
+    previous_battle = _create_battle('sparse')
+    battle = deepcopy(previous_battle)
+    del battle.get('entities')['D-2222']
+    boards.clear_cell(battle.get('board'), 3, 3)
+    pipeline = mocked_redis.instance.pipeline.return_value
+
+    # when
+    storage.HashStorage().save(battle_id, battle, previous_battle)
+
+    # then
+    pipeline.hdel.assert_called_once_with(storage.battle_key(battle_id),
+                                          'e:D-2222', 'c:4:4')
+    pipeline.hmset.assert_called_once_with(storage.battle_key(battle_id),
+                                           {'version': '1'})
+
+
+@patch('dino_extinction.blueprints.battles.storage.redis')
+def test_append_stream_event(mocked_redis):
+    """Append only what changed to the stream of a battle.
+
+    This test will save a battle where a robot has moved, using the stream
+    layout, and it will pass if a single event with the moved robot, its
+    cells and the new version is appended, without a new snapshot.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    previous_battle = _create_battle()
+    battle = deepcopy(previous_battle)
+    battle.get('entities').get('R-1111').update({'position': [2, 3]})
+    boards.clear_cell(battle.get('board'), 2, 2)
+    boards.put_cell(battle.get('board'), 1, 2, 'R-1111')
+    pipeline = mocked_redis.instance.pipeline.return_value
+    layout = storage.StreamStorage()
+    layout.snapshotter = MagicMock()
+
+    # when
+    layout.save(battle_id, battle, previous_battle)
+
+    # then
+    expected_event = dict()
+    expected_event.setdefault('e:R-1111', 'ROBOT,north,2,3')
+    expected_event.setdefault('c:2:3', 'R-1111')
+    expected_event.setdefault('c:3:3', '')
+    expected_event.setdefault('version', '1')
+
+    pipeline.xadd.assert_called_once_with(f"battle:{battle_id}:events",
+                                          expected_event)
+    pipeline.set.assert_not_called()
+    layout.snapshotter.request.assert_called_once_with(battle_id)
+
+
+@pytest.mark.parametrize('engine_name', ['dense', 'sparse', 'array'])
+@patch('dino_extinction.blueprints.battles.storage.redis')
+def test_load_stream_battle(mocked_redis, engine_name):
+    """Load a battle from its snapshot and its events.
+
+    This test will load a battle whose stream has an event that is older
+    than its snapshot and another one that destroyed a dinossaur. It will
+    pass if only the newer event is applied over the snapshot.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    battle = _create_battle(engine_name)
+    battle['version'] = 2
+    raw_events = list()
+    raw_events.append((b'1-0', {b'e:D-2222': b'', b'version': b'2'}))
+    raw_events.append((b'2-0', {b'e:D-2222': b'', b'c:4:4': b'',
+                                b'version': b'3'}))
+    pipeline = mocked_redis.instance.pipeline.return_value.__enter__()
+    pipeline.execute.return_value = [codec.encode(battle), raw_events]
+
+    # when
+    result = storage.StreamStorage().load(battle_id)
+
+    # then
+    expected_battle = _create_battle(engine_name)
+    expected_battle.get('entities').pop('D-2222')
+    boards.clear_cell(expected_battle.get('board'), 3, 3)
+    expected_battle['version'] = 3
+
+    assert result == expected_battle
+
+
+@pytest.fixture
+def stream_redis():
+    """Connect to a Redis server that supports Redis Streams.
+
+    The server is given by the TEST_REDIS_URL environment variable, and the
+    tests that use it are skipped when it is not running or does not
+    support streams, since FakeRedis does not.
+
+    """
+    client = StrictRedis.from_url(TEST_REDIS_URL)
+    try:
+        client.xlen(storage.KEY_PREFIX + 'test')
+    except (ConnectionError, ResponseError):
+        pytest.skip(f"No Redis with streams on {TEST_REDIS_URL}")
+
+    yield client
+
+    client.connection_pool.disconnect()
+
+
+@patch('dino_extinction.blueprints.battles.storage.ttl', return_value=60)
+@patch('dino_extinction.blueprints.battles.storage.redis')
+def test_round_trip_stream_battle(mocked_redis, mocked_ttl, stream_redis):
+    """Save, load and snapshot a stream battle on a Redis server.
+
+    This test will save a battle and a move of its robot using the stream
+    layout, and then take a new snapshot of it. It will pass if the battle
+    is loaded the same way before and after the snapshot, and if its keys
+    keep expiring.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    mocked_ttl : magic mock
+        The mock of the function that returns the TTL of our battles.
+
+    stream_redis : class
+        A Redis client that supports streams.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    mocked_redis.instance = stream_redis
+    layout = storage.StreamStorage()
+    layout.snapshotter = MagicMock()
+    key, events_key = layout.keys(battle_id)
+    stream_redis.delete(key, events_key)
+
+    previous_battle = _create_battle()
+    layout.save(battle_id, previous_battle)
+    battle = deepcopy(previous_battle)
+    battle.get('entities').get('R-1111').update({'position': [2, 3]})
+    boards.clear_cell(battle.get('board'), 2, 2)
+    boards.put_cell(battle.get('board'), 1, 2, 'R-1111')
+
+    # when
+    layout.save(battle_id, battle, previous_battle)
+    events_ttl = stream_redis.ttl(events_key)
+    total_events = stream_redis.xlen(events_key)
+    loaded_battle = layout.load(battle_id)
+    loaded_version = layout.load_version(battle_id)
+
+    is_taken = layout.snapshot_if_needed(battle_id, 1, 1024 * 1024)
+    snapshot_ttl = stream_redis.ttl(key)
+    is_trimmed = not stream_redis.exists(events_key)
+    snapshot_battle = layout.load(battle_id)
+    stream_redis.delete(key, events_key)
+
+    # then
+    assert loaded_battle == battle
+    assert loaded_version == 2
+    assert total_events == 1
+    assert 0 < events_ttl <= 60
+    assert is_taken
+    assert is_trimmed
+    assert 0 < snapshot_ttl <= 60
+    assert snapshot_battle == battle
+
+
+@pytest.mark.parametrize('total_events,is_taken', [(3, False),
+                                                   (1000, True)])
+@patch('dino_extinction.blueprints.battles.storage.redis')
+def test_snapshot_stream_battle(mocked_redis, total_events, is_taken):
+    """Take a new snapshot of a battle when its stream is too big.
+
+    This test will check the stream of a battle and it will pass if a new
+    snapshot replaces its events only when the stream reached the maximum
+    number of events.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    total_events : int
+        The number of events on the stream.
+
+    is_taken : bool
+        If the snapshot should be taken.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    battle = _create_battle()
+    battle['version'] = 1
+    pipeline = mocked_redis.instance.pipeline.return_value.__enter__()
+    pipeline.xlen.return_value = total_events
+    pipeline.memory_usage.return_value = 64
+    pipeline.get.return_value = codec.encode(battle)
+    pipeline.xrange.return_value = [(b'1-0', {b'version': b'2'})]
+
+    # when
+    result = storage.StreamStorage().snapshot_if_needed(battle_id, 1000,
+                                                        1024)
+
+    # then
+    assert result == is_taken
+    pipeline.watch.assert_called_once_with(f"battle:{battle_id}",
+                                           f"battle:{battle_id}:events")
+    if not is_taken:
+        pipeline.set.assert_not_called()
+        return
+
+    battle['version'] = 2
+    pipeline.set.assert_called_once_with(f"battle:{battle_id}",
+                                         codec.encode(battle))
+    pipeline.delete.assert_called_once_with(f"battle:{battle_id}:events")
+
+
+@pytest.mark.parametrize('layout', [storage.BlobStorage(),
+                                    storage.HashStorage()])
+@patch('dino_extinction.blueprints.battles.storage.ttl', return_value=60)
+@patch('dino_extinction.blueprints.battles.storage.redis')
+def test_refresh_battle_expiration(mocked_redis, mocked_ttl, layout):
+    """Refresh the expiration of a battle on every save and load.
+
+    This test will save a battle and load it when it was close to expire,
+    and it will pass if both of them have set its whole expiration again.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    mocked_ttl : magic mock
+        The mock of the function that returns the expiration of battles.
+
+    layout : class
+        The storage layout that will store the battle.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    key = storage.battle_key(battle_id)
+    mocked_redis.instance = fakeredis.FakeStrictRedis()
+
+    # when
+    layout.save(battle_id, _create_battle())
+    saved_ttl = mocked_redis.instance.ttl(key)
+    mocked_redis.instance.expire(key, 1)
+    battle = layout.load(battle_id)
+
+    # then
+    assert battle
+    assert saved_ttl == 60
+    assert mocked_redis.instance.ttl(key) == 60
+
+
+@patch('dino_extinction.blueprints.battles.storage.redis')
+def test_measure_battles_usage(mocked_redis):
+    """Measure how many battles are stored and their size.
+
+    This test will save two battles, archive one of them and let another
+    one expire, and it will pass if only the live battle is counted,
+    without scanning the keys of the battles.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    """
+    # given
+    client = fakeredis.FakeStrictRedis()
+    mocked_redis.instance = client
+    layout = storage.BlobStorage()
+
+    with patch.object(storage, 'ttl', return_value=60), \
+            patch.object(storage.archive, 'store', return_value=10), \
+            patch.object(storage, 'get_storage', return_value=layout):
+        layout.save(1111, _create_battle())
+        layout.save(2222, _create_battle())
+        storage.archive_battle(2222)
+
+    client.zadd(storage.LIVE_KEY, {'3333': 1})
+
+    # when
+    with patch.object(client, 'scan') as mocked_scan:
+        total_battles, total_bytes = storage.usage()
+
+    # then
+    assert total_battles == 1
+    assert total_bytes is None
+    assert client.zrange(storage.LIVE_KEY, 0, -1) == [b'1111']
+    mocked_scan.assert_not_called()
+
+
+@pytest.mark.parametrize('layout', [storage.BlobStorage(),
+                                    storage.HashStorage()])
+@patch('dino_extinction.blueprints.battles.storage.redis')
+def test_load_battle_state(mocked_redis, layout):
+    """Load only the state of a battle.
+
+    This test will save a battle and it will pass if loading its state
+    returns its size, its version and its entities.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    layout : class
+        The storage layout of the battle.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    battle = _create_battle()
+    mocked_redis.instance = fakeredis.FakeStrictRedis()
+    layout.save(battle_id, battle)
+
+    # when
+    result = layout.load_state(battle_id)
+
+    # then
+    assert result.get('size') == 9
+    assert result.get('version') == 1
+    assert result.get('entities') == battle.get('entities')
+    assert layout.load_state(fake.random_int(min=1111, max=9999)) is None
+
+
+@pytest.mark.parametrize('threshold', [None, 0])
+@patch('dino_extinction.blueprints.battles.storage.redis')
+def test_load_big_battle_state_by_range(mocked_redis, threshold):
+    """Load the state of a big battle without reading its grid.
+
+    This test will save a battle with a big board and many entities and it
+    will pass if its state was loaded by growing ranges of its data, without
+    reading the whole battle.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    threshold : int
+        The compression threshold of the saved battle.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    battle = dict()
+    battle.setdefault('board', boards.create(300))
+    battle.setdefault('entities', dict())
+    for index in range(100):
+        entity_id = f"D-{index:04}"
+        boards.put_cell(battle.get('board'), index, index, entity_id)
+        dino = dict()
+        dino.setdefault('id', entity_id)
+        dino.setdefault('type', 'DINOSSAUR')
+        dino.setdefault('position', [index + 1, index + 1])
+        battle.get('entities')[entity_id] = dino
+
+    client = fakeredis.FakeStrictRedis()
+    mocked_redis.instance = client
+    layout = storage.BlobStorage()
+    config = {'BATTLE_COMPRESSION_THRESHOLD': threshold}
+    with patch.object(storage.settings, 'get',
+                      side_effect=lambda name, default=None: config.get(
+                          name, default)):
+        layout.save(battle_id, battle)
+
+    # when
+    with patch.object(client, 'get') as mocked_get, \
+            patch.object(client, 'getrange',
+                         wraps=client.getrange) as mocked_getrange, \
+            patch.object(storage, 'STATE_RANGE', 64):
+        result = layout.load_state(battle_id)
+
+    # then
+    assert result.get('size') == 300
+    assert result.get('entities') == battle.get('entities')
+    assert mocked_getrange.call_count > 1
+    assert (mocked_getrange.call_args[0][2] + 1 <
+            len(client.get(storage.battle_key(battle_id))))
+    mocked_get.assert_not_called()
+
+
+def test_apply_events_to_battle_state():
+    """Apply the events of a stream to the state of a battle.
+
+    This test will apply a turn and a destruction to the state of a battle
+    and it will pass if only the events after its version were applied.
+
+    """
+    # given
+    battle = _create_battle()
+    battle['version'] = 2
+    state = codec.decode_state(codec.encode(battle))
+    raw_events = list()
+    raw_events.append((b'1-0', {b'version': b'2',
+                                b'e:D-2222': b''}))
+    raw_events.append((b'2-0', {b'version': b'3',
+                                b'e:R-1111': b'ROBOT,south,3,3'}))
+
+    # when
+    result = storage._apply_state_events(state, raw_events)
+
+    # then
+    assert result.get('version') == 3
+    assert set(result.get('entities')) == {'R-1111', 'D-2222'}
+    assert result.get('entities').get('R-1111').get('direction') == 'south'
+
+
+def test_refuse_unknown_storage():
+    """Refuse an unknown storage layout.
+
+    This test will configure a storage layout that does not exist and it
+    will pass if asking for it raises an error.
+
+    """
+    # given
+    fake = Faker()
+    settings = MagicMock()
+    settings.get.return_value = fake.word()
+
+    # when / then
+    with patch('dino_extinction.blueprints.battles.storage.settings',
+               settings):
+        with pytest.raises(ValueError):
+            storage.get_storage()
+
+
+@pytest.mark.parametrize('layout', [storage.BlobStorage(),
+                                    storage.HashStorage()])
+@patch('dino_extinction.blueprints.battles.storage.metrics')
+@patch('dino_extinction.blueprints.battles.storage.get_storage')
+@patch('dino_extinction.blueprints.battles.storage.redis')
+def test_save_transaction(mocked_redis, mocked_get_storage, mocked_metrics,
+                          layout):
+    """Save a mutation of a battle.
+
+    This test will mutate a battle inside of a transaction and it will pass
+    if the mutated battle is saved on its next version.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    mocked_get_storage : magic mock
+        The mock of the function that returns our storage layout.
+
+    mocked_metrics : magic mock
+        The mock of our metrics module.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    result = fake.word()
+    mocked_redis.instance = fakeredis.FakeStrictRedis()
+    mocked_get_storage.return_value = layout
+    layout.save(battle_id, _create_battle())
+
+    def mutate(battle):
+        updated_battle = deepcopy(battle)
+        updated_battle.get('entities').get('R-1111').update(
+            {'direction': 'south'})
+
+        return result, updated_battle
+
+    # when
+    transaction_result = storage.transaction(battle_id, mutate)
+
+    # then
+    battle = layout.load(battle_id)
+    assert transaction_result == result
+    assert battle.get('version') == 2
+    assert battle.get('entities').get('R-1111').get('direction') == 'south'
+    mocked_metrics.increment.assert_called_once_with('battle_transactions',
+                                                     battle_id)
+
+
+@pytest.mark.parametrize('layout', [storage.BlobStorage(),
+                                    storage.HashStorage()])
+@patch('dino_extinction.blueprints.battles.storage.ttl', return_value=60)
+@patch('dino_extinction.blueprints.battles.storage.get_storage')
+@patch('dino_extinction.blueprints.battles.storage.redis')
+def test_migrate_legacy_battle(mocked_redis, mocked_get_storage, mocked_ttl,
+                               layout):
+    """Migrate a battle stored under its legacy key.
+
+    This test will store a battle under its bare ID, as the previous
+    versions did, and it will pass if loading and mutating it moves it to
+    its namespaced key, with an expiration.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    mocked_get_storage : magic mock
+        The mock of the function that returns our storage layout.
+
+    mocked_ttl : magic mock
+        The mock of the function that returns the TTL of our battles.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    client = fakeredis.FakeStrictRedis()
+    mocked_redis.instance = client
+    mocked_get_storage.return_value = layout
+    layout.save(battle_id, _create_battle())
+    client.rename(storage.battle_key(battle_id), str(battle_id))
+    client.persist(str(battle_id))
+
+    def mutate(battle):
+        updated_battle = deepcopy(battle)
+        updated_battle.get('entities').pop('D-2222')
+
+        return None, updated_battle
+
+    # when
+    loaded_battle = storage.load(battle_id)
+    client.rename(storage.battle_key(battle_id), str(battle_id))
+    storage.transaction(battle_id, mutate)
+
+    # then
+    battle = layout.load(battle_id)
+    assert loaded_battle.get('version') == 1
+    assert battle.get('version') == 2
+    assert list(battle.get('entities')) == ['R-1111']
+    assert not client.exists(str(battle_id))
+    assert 0 < client.ttl(storage.battle_key(battle_id)) <= 60
+
+
+@patch('dino_extinction.blueprints.battles.storage.metrics')
+@patch('dino_extinction.blueprints.battles.storage.redis')
+def test_retry_transaction_on_conflict(mocked_redis, mocked_metrics):
+    """Retry a mutation when the battle changes.
+
+    This test will change a battle while a transaction is mutating it and it
+    will pass if the mutation runs again over the new battle, keeping both
+    changes.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    mocked_metrics : magic mock
+        The mock of our metrics module.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    mocked_redis.instance = fakeredis.FakeStrictRedis()
+    layout = storage.get_storage()
+    layout.save(battle_id, _create_battle())
+    runs = list()
+
+    def mutate(battle):
+        runs.append(battle.get('version'))
+        if len(runs) == 1:
+            concurrent_battle = deepcopy(battle)
+            del concurrent_battle.get('entities')['D-2222']
+            boards.clear_cell(concurrent_battle.get('board'), 3, 3)
+            layout.save(battle_id, concurrent_battle)
+
+        updated_battle = deepcopy(battle)
+        updated_battle.get('entities').get('R-1111').update(
+            {'direction': 'west'})
+
+        return None, updated_battle
+
+    # when
+    storage.transaction(battle_id, mutate)
+
+    # then
+    battle = layout.load(battle_id)
+    assert runs == [1, 2]
+    assert battle.get('version') == 3
+    assert 'D-2222' not in battle.get('entities')
+    assert battle.get('entities').get('R-1111').get('direction') == 'west'
+    mocked_metrics.increment.assert_any_call('battle_conflicts', battle_id)
+    mocked_metrics.increment.assert_any_call('battle_retries', battle_id)
+
+
+@patch('dino_extinction.blueprints.battles.storage.redis')
+def test_give_up_transaction_after_retries(mocked_redis):
+    """Give up a mutation when the battle never stops changing.
+
+    This test will change a battle every time that a transaction tries to
+    mutate it and it will pass if the transaction raises a conflict.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    mocked_redis.instance = fakeredis.FakeStrictRedis()
+    layout = storage.get_storage()
+    layout.save(battle_id, _create_battle())
+
+    def mutate(battle):
+        layout.save(battle_id, deepcopy(battle))
+
+        return None, deepcopy(battle)
+
+    # when / then
+    with pytest.raises(storage.ConflictError):
+        storage.transaction(battle_id, mutate)
+
+    expected_version = storage.DEFAULT_TRANSACTION_RETRIES + 2
+    assert layout.load(battle_id).get('version') == expected_version
+
+
+@patch('dino_extinction.blueprints.battles.storage.redis')
+def test_skip_transaction_without_changes(mocked_redis):
+    """Skip saving a mutation that changed nothing.
+
+    This test will run a transaction that does not return an updated battle
+    and it will pass if the battle keeps its version.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    error = fake.sentence()
+    mocked_redis.instance = fakeredis.FakeStrictRedis()
+    layout = storage.get_storage()
+    layout.save(battle_id, _create_battle())
+
+    # when
+    result = storage.transaction(battle_id, lambda battle: (error, None))
+
+    # then
+    assert result == error
+    assert layout.load(battle_id).get('version') == 1
@@ -4,7 +4,8 @@ This test file will ensure that the most important logic of our Dinossaur
 blueprint handlers are working as we are expecting.
 
 """
-from mock import patch
+from mock import (patch, MagicMock)
+from marshmallow import ValidationError
 from faker import Faker
 from dino_extinction.blueprints.dinossaurs import handlers
 
@@ -40,3 +41,81 @@ def test_called_model(mocked_models):
 
     assert mocked_models.DinossaurSchema.call_count == 1
     mocked_instance.load.assert_called_once_with(expected_load)
+
+
+@patch('dino_extinction.blueprints.dinossaurs.handlers.models')
+def test_create_many_dinossaurs(mocked_models):
+    """Create many dinossaurs at once.
+
+    This test will ensure that our handler places every valid dinossaur in a
+    single call of our model and reports the result of each one of them.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_models : magic mock
+        The mock of our dinossaur models module.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    board_positions = [(1, 1), (2, 2), (3, 3)]
+    mocked_instance = mocked_models.DinossaurSchema.return_value
+
+    built_dinossaurs = [{'id': 'D-1111'}, {'id': 'D-3333'}]
+    loaded = list()
+    loaded.append(MagicMock(errors=dict(), data=built_dinossaurs[0]))
+    loaded.append(MagicMock(errors={'position': ['Invalid position']}))
+    loaded.append(MagicMock(errors=dict(), data=built_dinossaurs[1]))
+    mocked_instance.load.side_effect = loaded
+    mocked_instance.place_dinossaurs.return_value = [
+        None,
+        'This position is not empty']
+
+    # when
+    errors, results = handlers.new_dinossaurs(battle_id, board_positions)
+
+    # then
+    mocked_models.DinossaurSchema.assert_called_once_with(
+        context={'bulk': True})
+    mocked_instance.place_dinossaurs.assert_called_once_with(
+        battle_id,
+        built_dinossaurs)
+    assert not errors
+    assert [result['id'] for result in results] == ['D-1111', None, None]
+    assert [result['message'] for result in results] == [
+        'Dinossaur created',
+        'Invalid position',
+        'This position is not empty']
+
+
+@patch('dino_extinction.blueprints.dinossaurs.handlers.models')
+def test_create_many_dinossaurs_on_invalid_battle(mocked_models):
+    """Create many dinossaurs on a battle that does not exist.
+
+    This test will ensure that our handler returns a single error if the
+    battle of the dinossaurs does not exist.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_models : magic mock
+        The mock of our dinossaur models module.
+
+    """
+    # given
+    fake = Faker()
+    mocked_instance = mocked_models.DinossaurSchema.return_value
+    mocked_instance.load.return_value = MagicMock(errors=dict(), data=dict())
+    mocked_instance.place_dinossaurs.side_effect = ValidationError(
+        'Invalid battleId')
+
+    # when
+    errors, results = handlers.new_dinossaurs(fake.word(), [(1, 1)])
+
+    # then
+    assert errors == 'Invalid battleId'
+    assert not results
@@ -4,14 +4,15 @@ This test file will ensure that the most important logic of our Dinossaurs
 blueprint models are working as we are expecting.
 
 """
-import pickle
-
 from faker import Faker
 from mock import patch
+from dino_extinction.infrastructure import ids
+from dino_extinction.blueprints.battles import (codec, storage)
 from dino_extinction.blueprints.dinossaurs import models
 
 
-@patch('dino_extinction.blueprints.dinossaurs.models.redis')
+@patch.object(ids.instance, 'next', lambda name: 1)
+@patch('dino_extinction.blueprints.battles.storage.redis')
 def test_generate_dinossaur_model(mocked_redis):
     """Create a new dinossaur.
 
@@ -35,13 +36,16 @@ def test_generate_dinossaur_model(mocked_redis):
     state = [[None] * 9 for _ in range(9)]
 
     board = dict()
+    board.setdefault('size', 9)
     board.setdefault('state', state)
 
     battle = dict()
     battle.setdefault('board', board)
 
-    pickled_battle = pickle.dumps(battle)
-    mocked_redis.instance.get.return_value = pickled_battle
+    raw_battle = codec.encode(battle)
+    mocked_pipeline = mocked_redis.instance.pipeline.return_value
+    pipeline = mocked_pipeline.__enter__.return_value
+    pipeline.get.return_value = raw_battle
 
     dinossaur = dict()
     dinossaur['battle_id'] = id
@@ -52,16 +56,17 @@ def test_generate_dinossaur_model(mocked_redis):
     model.load(dinossaur)
 
     # then
-    called_id, raw_args = mocked_redis.instance.set.call_args_list[0][0]
-    args = pickle.loads(raw_args)
+    called_id, raw_args = pipeline.set.call_args_list[0][0]
+    args = codec.decode(raw_args)
     dino_id = next(iter(args['entities']))
     created_dino = args['entities'][dino_id]
 
-    assert called_id == id
+    assert called_id == storage.battle_key(id)
     assert len(args['entities']) == 1
     assert created_dino['type'] == 'DINOSSAUR'
     assert created_dino['position'] == position
-    mocked_redis.instance.get.assert_called_once_with(id)
+    pipeline.watch.assert_called_once_with(storage.battle_key(id))
+    pipeline.get.assert_called_once_with(storage.battle_key(id))
 
 
 def test_id_must_be_int():
@@ -110,11 +115,12 @@ def test_position_must_be_a_list():
     assert result.errors['position'][0] == 'Not a valid list.'
 
 
-def test_should_refuse_any_id_length_rather_than_4():
+def test_should_refuse_any_id_length_out_of_range():
     """Validate ID length.
 
-    This test will try to insert an integer ID, but with a length different
-    from 4 and check if our model refuses it.
+    This test will try to insert an integer ID, but with a length shorter
+    than 4 or longer than the configured digits, and check if our model
+    refuses it.
 
     """
     # given
@@ -124,7 +130,7 @@ def test_should_refuse_any_id_length_rather_than_4():
     a_digits = [str(fake.random_int(min=1, max=9)) for _ in range(3)]
     a_id = int(''.join(a_digits))
 
-    b_digits = [str(fake.random_int(min=1, max=9)) for _ in range(5)]
+    b_digits = [str(fake.random_int(min=1, max=9)) for _ in range(9)]
     b_id = int(''.join(b_digits))
 
     a_dinossaur = dict()
@@ -146,13 +152,12 @@ def test_should_refuse_any_id_length_rather_than_4():
     assert 'battle_id' not in a_result.data
     assert 'battle_id' not in b_result.data
 
-    assert a_result.errors['battle_id'][0] == (f"The battle ID should be "
-                                               f"4 digits long.")
-    assert b_result.errors['battle_id'][0] == (f"The battle ID should be "
-                                               f"4 digits long.")
+    assert a_result.errors['battle_id'][0] == ids.battle_id_error()
+    assert b_result.errors['battle_id'][0] == ids.battle_id_error()
 
 
-@patch('dino_extinction.blueprints.dinossaurs.models.redis')
+@patch.object(ids.instance, 'next', lambda name: 1)
+@patch('dino_extinction.blueprints.battles.storage.redis')
 def test_raise_error_if_position_isnt_empty(mocked_redis):
     """Refuse taken places.
 
@@ -174,17 +179,20 @@ def test_raise_error_if_position_isnt_empty(mocked_redis):
     id = int(''.join(digits))
     position = [fake.random_int(min=1, max=9), fake.random_int(min=1, max=9)]
 
-    state = [[None] * 9 for _ in range(10)]
+    state = [[None] * 9 for _ in range(9)]
     state[position[0] - 1][position[1] - 1] = fake.word()
 
     board = dict()
+    board.setdefault('size', 9)
     board.setdefault('state', state)
 
     battle = dict()
     battle.setdefault('board', board)
 
-    pickled_battle = pickle.dumps(battle)
-    mocked_redis.instance.get.return_value = pickled_battle
+    raw_battle = codec.encode(battle)
+    mocked_pipeline = mocked_redis.instance.pipeline.return_value
+    pipeline = mocked_pipeline.__enter__.return_value
+    pipeline.get.return_value = raw_battle
 
     dinossaur = dict()
     dinossaur['battle_id'] = id
@@ -196,10 +204,11 @@ def test_raise_error_if_position_isnt_empty(mocked_redis):
 
     # then
     assert result.errors['_schema'][0] == 'This position is not empty'
-    mocked_redis.instance.set.assert_not_called()
+    pipeline.set.assert_not_called()
 
 
-@patch('dino_extinction.blueprints.dinossaurs.models.redis')
+@patch.object(ids.instance, 'next', lambda name: 1)
+@patch('dino_extinction.blueprints.battles.storage.redis')
 def test_raise_error_if_position_is_out_of_range(mocked_redis):
     """Refuse positions that is out of range.
 
@@ -224,13 +233,16 @@ def test_raise_error_if_position_is_out_of_range(mocked_redis):
     state = [[None] * 9 for _ in range(9)]
 
     board = dict()
+    board.setdefault('size', 9)
     board.setdefault('state', state)
 
     battle = dict()
     battle.setdefault('board', board)
 
-    pickled_battle = pickle.dumps(battle)
-    mocked_redis.instance.get.return_value = pickled_battle
+    raw_battle = codec.encode(battle)
+    mocked_pipeline = mocked_redis.instance.pipeline.return_value
+    pipeline = mocked_pipeline.__enter__.return_value
+    pipeline.get.return_value = raw_battle
 
     dinossaur = dict()
     dinossaur['battle_id'] = id
@@ -242,10 +254,10 @@ def test_raise_error_if_position_is_out_of_range(mocked_redis):
 
     # then
     assert result.errors['_schema'][0] == 'This position is out of range'
-    mocked_redis.instance.set.assert_not_called()
+    pipeline.set.assert_not_called()
 
 
-@patch('dino_extinction.blueprints.dinossaurs.models.redis')
+@patch('dino_extinction.blueprints.battles.storage.redis')
 def test_raise_error_if_position_misses_x_or_y(mocked_redis):
     """Refuse positions X or Y is missing.
 
@@ -267,13 +279,14 @@ def test_raise_error_if_position_misses_x_or_y(mocked_redis):
     state = [[None] * 9 for _ in range(9)]
 
     board = dict()
+    board.setdefault('size', 9)
     board.setdefault('state', state)
 
     battle = dict()
     battle.setdefault('board', board)
 
-    pickled_battle = pickle.dumps(battle)
-    mocked_redis.instance.get.return_value = pickled_battle
+    raw_battle = codec.encode(battle)
+    mocked_redis.instance.get.return_value = raw_battle
 
     dinossaur = dict()
     dinossaur['battle_id'] = id
@@ -286,3 +299,46 @@ def test_raise_error_if_position_misses_x_or_y(mocked_redis):
     # then
     assert result.errors['position'][0] == 'You must provide xPos and yPos'
     mocked_redis.instance.set.assert_not_called()
+
+
+@patch.object(ids.instance, 'next', lambda name: 1)
+@patch('dino_extinction.blueprints.battles.models.scripts')
+@patch('dino_extinction.blueprints.battles.storage.redis')
+def test_create_dinossaur_with_scripts(mocked_redis, mocked_scripts):
+    """Create a new dinossaur with our Lua scripts.
+
+    This test will ensure that the dinossaur is created inside of Redis when
+    the scripts are enabled, and that the error of the script is returned.
+
+    Parameters
+    ----------
+    mocked_redis : magic mock
+        The mock of our Redis module.
+
+    mocked_scripts : magic mock
+        The mock of our battle scripts.
+
+    """
+    # given
+    fake = Faker()
+    id = fake.random_int(min=1111, max=9999)
+    position = [fake.random_int(min=1, max=9), fake.random_int(min=1, max=9)]
+    error = 'This position is not empty'
+
+    mocked_scripts.enabled.return_value = True
+    mocked_scripts.create_entity.return_value = error
+
+    dinossaur = dict()
+    dinossaur['battle_id'] = id
+    dinossaur['position'] = position
+
+    # when
+    model = models.DinossaurSchema()
+    result = model.load(dinossaur)
+
+    # then
+    battle_id, created_dinossaur = mocked_scripts.create_entity.call_args[0]
+    assert battle_id == id
+    assert created_dinossaur.get('position') == position
+    assert result.errors['_schema'][0] == error
+    mocked_redis.instance.get.assert_not_called()
@@ -9,9 +9,20 @@ import random
 from copy import deepcopy
 from mock import (patch, MagicMock)
 from faker import Faker
+from dino_extinction.blueprints.battles.storage import ConflictError
 from dino_extinction.blueprints.robots import handlers
 
 
+def _run_transaction(battle, saved_battles):
+    def transaction(battle_id, mutate):
+        result, updated_battle = mutate(battle)
+        saved_battles.append(updated_battle)
+
+        return result
+
+    return transaction
+
+
 @patch('dino_extinction.blueprints.robots.handlers.models')
 def test_called_model(mocked_models):
     """Call of our model.
@@ -72,7 +83,9 @@ def test_get_battle_state(mocked_battle_schema):
     handlers.command_robot(battle_id, fake.word(), fake.word())
 
     # then
-    mocked_battle_models.get_battle.assert_called_once_with(battle_id)
+    called_id, _ = mocked_battle_models.transaction.call_args[0]
+    assert mocked_battle_models.transaction.call_count == 1
+    assert called_id == battle_id
 
 
 @patch('dino_extinction.blueprints.robots.handlers.BattleSchema')
@@ -93,14 +106,18 @@ def test_battle_does_not_exist(mocked_battle_schema):
     # given
     fake = Faker()
     mocked_battle_models = MagicMock()
-    mocked_battle_models.get_battle.return_value = None
+    saved_battles = list()
+    mocked_battle_models.transaction.side_effect = _run_transaction(
+        None,
+        saved_battles)
     mocked_battle_schema.return_value = mocked_battle_models
 
     # when
     errors, _ = handlers.command_robot(fake.word(), fake.word(), fake.word())
 
     # then
-    mocked_battle_models.get_battle.assert_called_once()
+    mocked_battle_models.transaction.assert_called_once()
+    assert saved_battles == [None]
     assert errors
 
 
@@ -126,14 +143,18 @@ import random
     battle.setdefault('entities', dict())
 
     mocked_battle_models = MagicMock()
-    mocked_battle_models.get_battle.return_value = battle
+    saved_battles = list()
+    mocked_battle_models.transaction.side_effect = _run_transaction(
+        battle,
+        saved_battles)
     mocked_battle_schema.return_value = mocked_battle_models
 
     # when
     errors, _ = handlers.command_robot(fake.word(), fake.word(), fake.word())
 
     # then
-    mocked_battle_models.get_battle.assert_called_once()
+    mocked_battle_models.transaction.assert_called_once()
+    assert saved_battles == [None]
     assert errors
 
 
@@ -161,10 +182,12 @@ def test_robot_update_direction(mocked_battle_schema, mocked_robot_schema):
     battle_id = fake.word()
     robot_id = fake.word()
     new_direction = fake.word()
+    turned_battle = fake.word()
     options = ['turn-left', 'turn-right']
     action = random.choice(options)
 
     robot = dict()
+    robot.setdefault('type', 'ROBOT')
     robot.setdefault('direction', 'north')
 
     entities = dict()
@@ -174,9 +197,14 @@ def test_robot_update_direction(mocked_battle_schema, mocked_robot_schema):
     battle.setdefault('entities', entities)
 
     mocked_battle_models = MagicMock()
-    mocked_battle_models.get_battle.return_value = battle
+    saved_battles = list()
+    mocked_battle_models.transaction.side_effect = _run_transaction(
+        battle,
+        saved_battles)
     mocked_battle_schema.return_value = mocked_battle_models
 
+    mocked_battle_models.robot_turn.return_value = turned_battle
+
     mocked_robot_models = MagicMock()
     mocked_robot_models.change_direction.return_value = new_direction
     mocked_robot_schema.return_value = mocked_robot_models
@@ -185,20 +213,13 @@ def test_robot_update_direction(mocked_battle_schema, mocked_robot_schema):
     errors, result = handlers.command_robot(battle_id, robot_id, action)
 
     # then
-    expected_robot = dict()
-    expected_robot.setdefault('direction', new_direction)
-
-    expected_entities = dict()
-    expected_entities.setdefault(robot_id, expected_robot)
-
-    expected_battle = dict()
-    expected_battle.setdefault('entities', expected_entities)
-
     mocked_robot_models.change_direction.assert_called_once_with(
         robot.get('direction'),
         action)
-    mocked_battle_models.update_battle.assert_called_once_with(battle_id,
-                                                               expected_battle)
+    mocked_battle_models.robot_turn.assert_called_once_with(battle,
+                                                            robot_id,
+                                                            new_direction)
+    assert saved_battles == [turned_battle]
     assert not errors
     assert result
 
@@ -227,13 +248,16 @@ def test_robot_move(mocked_battle_schema):
     action = random.choice(options)
 
     entities = dict()
-    entities.setdefault(robot_id, fake.word())
+    entities.setdefault(robot_id, {'type': 'ROBOT'})
 
     original_battle = dict()
     original_battle.setdefault('entities', entities)
 
     mocked_battle_models = MagicMock()
-    mocked_battle_models.get_battle.return_value = original_battle
+    saved_battles = list()
+    mocked_battle_models.transaction.side_effect = _run_transaction(
+        original_battle,
+        saved_battles)
     mocked_battle_models.robot_move.return_value = moved_battle
     mocked_battle_schema.return_value = mocked_battle_models
 
@@ -244,8 +268,7 @@ def test_robot_move(mocked_battle_schema):
     mocked_battle_models.robot_move.assert_called_once_with(original_battle,
                                                             robot_id,
                                                             action)
-    mocked_battle_models.update_battle.assert_called_once_with(battle_id,
-                                                               moved_battle)
+    assert saved_battles == [moved_battle]
     assert not errors
     assert result
 
@@ -274,13 +297,16 @@ def test_robot_attack(mocked_battle_schema):
     action = 'attack'
 
     entities = dict()
-    entities.setdefault(robot_id, fake.word())
+    entities.setdefault(robot_id, {'type': 'ROBOT'})
 
     original_battle = dict()
     original_battle.setdefault('entities', entities)
 
     mocked_battle_models = MagicMock()
-    mocked_battle_models.get_battle.return_value = original_battle
+    saved_battles = list()
+    mocked_battle_models.transaction.side_effect = _run_transaction(
+        original_battle,
+        saved_battles)
     mocked_battle_models.robot_attack.return_value = attacked_battle
     mocked_battle_schema.return_value = mocked_battle_models
 
@@ -290,7 +316,462 @@ def test_robot_attack(mocked_battle_schema):
     # then
     mocked_battle_models.robot_attack.assert_called_once_with(original_battle,
                                                               robot_id)
-    mocked_battle_models.update_battle.assert_called_once_with(battle_id,
-                                                               attacked_battle)
+    assert saved_battles == [attacked_battle]
     assert not errors
     assert result
+
+
+@patch('dino_extinction.blueprints.robots.handlers.scripts')
+@patch('dino_extinction.blueprints.robots.handlers.BattleSchema')
+def test_robot_command_with_scripts(mocked_battle_schema, mocked_scripts):
+    """Command a robot with our Lua scripts.
+
+    This test will ensure that our handler runs the command inside of Redis
+    when the scripts are enabled, without loading the battle.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_battle_schema : magic mock
+        The mock of the models from our battles service.
+
+    mocked_scripts : magic mock
+        The mock of our battle scripts.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.word()
+    robot_id = fake.word()
+    action = random.choice(['turn-left', 'move-forward', 'attack'])
+    error = fake.sentence()
+
+    mocked_scripts.enabled.return_value = True
+    mocked_scripts.ACTION_SCRIPTS = [action]
+    mocked_scripts.command_robot.return_value = error
+
+    # when
+    errors, result = handlers.command_robot(battle_id, robot_id, action)
+
+    # then
+    mocked_scripts.command_robot.assert_called_once_with(battle_id,
+                                                         robot_id,
+                                                         action)
+    assert mocked_battle_schema.call_count == 0
+    assert errors == error
+    assert not result
+
+
+@patch('dino_extinction.blueprints.robots.handlers.BattleSchema')
+def test_robot_command_conflict(mocked_battle_schema):
+    """Command a robot of a battle that keeps changing.
+
+    This test will ensure that our handler returns an error when the battle
+    changed on every retry of its transaction.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_battle_schema : magic mock
+        The mock of the models from our battles service.
+
+    """
+    # given
+    fake = Faker()
+    mocked_battle_models = MagicMock()
+    mocked_battle_models.transaction.side_effect = ConflictError()
+    mocked_battle_schema.return_value = mocked_battle_models
+
+    # when
+    errors, result = handlers.command_robot(fake.word(), fake.word(), 'attack')
+
+    # then
+    assert errors == 'This battle is too busy, try again'
+    assert not result
+
+
+@patch('dino_extinction.blueprints.robots.handlers.BattleSchema')
+def test_robot_commands_in_one_transaction(mocked_battle_schema):
+    """Command many robots in a single transaction.
+
+    This test will ensure that our handler applies every command, in order,
+    over the state left by the previous ones, saves the battle only once and
+    does not stop on the commands that fail.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_battle_schema : magic mock
+        The mock of the models from our battles service.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.word()
+    robot_id = fake.word()
+    missing_robot_id = fake.word()
+    turned_battle = {'entities': {robot_id: {'type': 'ROBOT'}}}
+    attacked_battle = fake.word()
+
+    entities = dict()
+    entities.setdefault(robot_id, {'type': 'ROBOT', 'direction': 'north'})
+
+    original_battle = dict()
+    original_battle.setdefault('entities', entities)
+
+    commands = list()
+    commands.append({'robot': robot_id, 'action': 'turn-right'})
+    commands.append({'robot': missing_robot_id, 'action': 'attack'})
+    commands.append({'robot': robot_id, 'action': 'attack'})
+
+    mocked_battle_models = MagicMock()
+    saved_battles = list()
+    mocked_battle_models.transaction.side_effect = _run_transaction(
+        original_battle,
+        saved_battles)
+    mocked_battle_models.robot_turn.return_value = turned_battle
+    mocked_battle_models.robot_attack.return_value = attacked_battle
+    mocked_battle_schema.return_value = mocked_battle_models
+
+    # when
+    errors, results = handlers.command_robots(battle_id, commands)
+
+    # then
+    mocked_battle_models.robot_turn.assert_called_once_with(original_battle,
+                                                            robot_id,
+                                                            'east')
+    mocked_battle_models.robot_attack.assert_called_once_with(turned_battle,
+                                                              robot_id)
+    assert mocked_battle_models.transaction.call_count == 1
+    assert saved_battles == [attacked_battle]
+    assert not errors
+    assert [result['success'] for result in results] == [True, False, True]
+    assert results[1]['robot'] == missing_robot_id
+    assert results[1]['message'] == 'This robot does not exist'
+
+
+@patch('dino_extinction.blueprints.robots.handlers.BattleSchema')
+def test_robot_commands_battle_does_not_exist(mocked_battle_schema):
+    """Command many robots of a battle that does not exist.
+
+    This test will ensure that our handler returns an error and saves
+    nothing if the battle does not exist.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_battle_schema : magic mock
+        The mock of the models from our battles service.
+
+    """
+    # given
+    fake = Faker()
+    commands = [{'robot': fake.word(), 'action': 'attack'}]
+
+    mocked_battle_models = MagicMock()
+    saved_battles = list()
+    mocked_battle_models.transaction.side_effect = _run_transaction(
+        None,
+        saved_battles)
+    mocked_battle_schema.return_value = mocked_battle_models
+
+    # when
+    errors, results = handlers.command_robots(fake.word(), commands)
+
+    # then
+    assert errors == 'This battle does not exist'
+    assert not results
+    assert saved_battles == [None]
+
+
+@patch('dino_extinction.blueprints.robots.handlers.models')
+def test_create_many_robots(mocked_models):
+    """Create many robots at once.
+
+    This test will ensure that our handler validates each robot and places
+    the valid ones in a single call of our model.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_models : magic mock
+        The mock of our robot models module.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    robots = list()
+    robots.append({'direction': 'north', 'position': (1, 1)})
+    robots.append({'direction': fake.word(), 'position': (2, 2)})
+    mocked_instance = mocked_models.RobotSchema.return_value
+
+    built_robot = {'id': 'R-1111'}
+    loaded = list()
+    loaded.append(MagicMock(errors=dict(), data=built_robot))
+    loaded.append(MagicMock(errors={'direction': ['Invalid direction']}))
+    mocked_instance.load.side_effect = loaded
+    mocked_instance.place_robots.return_value = [None]
+
+    # when
+    errors, results = handlers.new_robots(battle_id, robots)
+
+    # then
+    mocked_instance.load.assert_any_call({'battle_id': battle_id,
+                                          'direction': 'north',
+                                          'position': (1, 1)})
+    mocked_instance.place_robots.assert_called_once_with(battle_id,
+                                                         [built_robot])
+    assert not errors
+    assert [result['success'] for result in results] == [True, False]
+    assert results[0]['id'] == 'R-1111'
+    assert results[1]['message'] == 'Invalid direction'
+
+
+@patch('dino_extinction.blueprints.robots.handlers.BattleSchema')
+def test_attack_with_all_robots(mocked_battle_schema):
+    """Attack with every robot of a battle.
+
+    This test will ensure that our handler attacks with every robot of the
+    battle in a single transaction and saves the attacked battle.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_battle_schema : magic mock
+        The mock of the models from our battles service.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.word()
+    original_battle = {'entities': dict()}
+    attacked_battle = fake.word()
+    destroyed = fake.random_int(min=1, max=9)
+
+    mocked_battle_models = MagicMock()
+    saved_battles = list()
+    mocked_battle_models.transaction.side_effect = _run_transaction(
+        original_battle,
+        saved_battles)
+    mocked_battle_models.robots_attack.return_value = (destroyed,
+                                                       attacked_battle)
+    mocked_battle_schema.return_value = mocked_battle_models
+
+    # when
+    errors, result = handlers.attack_all(battle_id)
+
+    # then
+    mocked_battle_models.robots_attack.assert_called_once_with(
+        original_battle)
+    assert saved_battles == [attacked_battle]
+    assert not errors
+    assert result == destroyed
+
+
+@patch('dino_extinction.blueprints.robots.handlers.BattleSchema')
+def test_attack_with_all_robots_without_targets(mocked_battle_schema):
+    """Attack with every robot of a battle without any dinossaur close.
+
+    This test will ensure that our handler does not save the battle when no
+    dinossaur was destroyed.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_battle_schema : magic mock
+        The mock of the models from our battles service.
+
+    """
+    # given
+    fake = Faker()
+    mocked_battle_models = MagicMock()
+    saved_battles = list()
+    mocked_battle_models.transaction.side_effect = _run_transaction(
+        {'entities': dict()},
+        saved_battles)
+    mocked_battle_models.robots_attack.return_value = (0, fake.word())
+    mocked_battle_schema.return_value = mocked_battle_models
+
+    # when
+    errors, result = handlers.attack_all(fake.word())
+
+    # then
+    assert saved_battles == [None]
+    assert not errors
+    assert result == 0
+
+
+@patch('dino_extinction.blueprints.robots.handlers.ticks')
+@patch('dino_extinction.blueprints.robots.handlers.BattleSchema')
+def test_queue_command_on_tick_mode(mocked_battle_schema, mocked_ticks):
+    """Queue the command of a battle on tick mode.
+
+    This test will ensure that our handler only queues the commands of a
+    battle that is on tick mode, without loading the battle.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_battle_schema : magic mock
+        The mock of the models from our battles service.
+
+    mocked_ticks : magic mock
+        The mock of our tick mode module.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.word()
+    robot_id = fake.word()
+    mocked_ticks.is_ticking.return_value = True
+
+    # when
+    errors, result = handlers.command_robot(battle_id, robot_id, 'attack')
+    invalid_errors, _ = handlers.command_robot(battle_id, robot_id,
+                                               fake.word())
+
+    # then
+    mocked_ticks.queue.assert_called_once_with(
+        battle_id, [{'robot': robot_id, 'action': 'attack'}])
+    assert mocked_battle_schema.call_count == 0
+    assert not errors
+    assert result == 'Robot command queued'
+    assert invalid_errors == 'This action does not exist'
+
+
+@patch('dino_extinction.blueprints.robots.handlers.ticks')
+@patch('dino_extinction.blueprints.robots.handlers.BattleSchema')
+def test_queue_attack_on_tick_mode(mocked_battle_schema, mocked_ticks):
+    """Queue the attack of every robot of a battle on tick mode.
+
+    This test will ensure that our handler only queues the attack of a
+    battle that is on tick mode, and that the queued attack is applied with
+    the other commands of its tick.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_battle_schema : magic mock
+        The mock of the models from our battles service.
+
+    mocked_ticks : magic mock
+        The mock of our tick mode module.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.word()
+    original_battle = {'entities': dict()}
+    attacked_battle = {'entities': dict()}
+    saved_battles = list()
+    mocked_ticks.is_ticking.return_value = True
+    mocked_battle_models = MagicMock()
+    mocked_battle_models.transaction.side_effect = _run_transaction(
+        original_battle,
+        saved_battles)
+    mocked_battle_models.robots_attack.return_value = (1, attacked_battle)
+    mocked_battle_schema.return_value = mocked_battle_models
+
+    # when
+    errors, result = handlers.attack_all(battle_id)
+    queued_command = {'robot': None, 'action': 'attack-all'}
+    _, results = handlers.apply_commands(battle_id, [queued_command])
+
+    # then
+    mocked_ticks.queue.assert_called_once_with(battle_id, [queued_command])
+    assert not errors
+    assert result is None
+    assert saved_battles == [attacked_battle]
+    assert results[0].get('success')
+
+
+@patch('dino_extinction.blueprints.robots.handlers.ticks')
+@patch('dino_extinction.blueprints.robots.handlers.BattleSchema')
+def test_keep_tick_mode_when_drain_fails(mocked_battle_schema, mocked_ticks):
+    """Keep a battle on tick mode when its queued commands fail.
+
+    This test will take a busy battle out of tick mode and it will pass if
+    the error is returned, and the battle is back on tick mode with its
+    commands queued.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_battle_schema : magic mock
+        The mock of the models from our battles service.
+
+    mocked_ticks : magic mock
+        The mock of our tick mode module.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.word()
+    commands = [{'robot': fake.word(), 'action': 'attack'}]
+    mocked_ticks.stop_ticking.return_value = commands
+    mocked_battle_models = MagicMock()
+    mocked_battle_models.transaction.side_effect = ConflictError()
+    mocked_battle_schema.return_value = mocked_battle_models
+
+    # when
+    errors, result = handlers.set_tick_mode(battle_id, False)
+
+    # then
+    assert errors == 'This battle is too busy, try again'
+    assert result is None
+    mocked_ticks.start_ticking.assert_called_once_with(battle_id)
+    mocked_ticks.requeue.assert_called_once_with(battle_id, commands)
+
+
+@patch('dino_extinction.blueprints.robots.handlers.ticks')
+@patch('dino_extinction.blueprints.robots.handlers.BattleSchema')
+def test_queue_commands_on_tick_mode(mocked_battle_schema, mocked_ticks):
+    """Queue a batch of commands of a battle on tick mode.
+
+    This test will ensure that our handler queues the valid commands of a
+    batch together, as a single entry, without loading the battle.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_battle_schema : magic mock
+        The mock of the models from our battles service.
+
+    mocked_ticks : magic mock
+        The mock of our tick mode module.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.word()
+    commands = list()
+    commands.append({'robot': 'R-1111', 'action': 'turn-left'})
+    commands.append({'robot': 'R-1111', 'action': fake.word()})
+    commands.append({'robot': 'R-2222', 'action': 'attack'})
+    mocked_ticks.is_ticking.return_value = True
+
+    # when
+    errors, results = handlers.command_robots(battle_id, commands)
+
+    # then
+    mocked_ticks.queue.assert_called_once_with(battle_id,
+                                               [commands[0], commands[2]])
+    assert mocked_battle_schema.call_count == 0
+    assert not errors
+    assert [result.get('success') for result in results] == [True,
+                                                             False,
+                                                             True]
+    assert results[0].get('message') == 'Robot command queued'
+    assert results[1].get('message') == 'This action does not exist'
@@ -4,15 +4,17 @@ This test file will ensure that the most important logic of our Robots
 blueprint models are working as we are expecting.
 
 """
-import pickle
 import random
 
 from faker import Faker
 from mock import patch
+from dino_extinction.infrastructure import ids
+from dino_extinction.blueprints.battles import (codec, storage)
 from dino_extinction.blueprints.robots import models
 
 
-@patch('dino_extinction.blueprints.robots.models.redis')
+@patch.object(ids.instance, 'next', lambda name: 1)
+@patch('dino_extinction.blueprints.battles.storage.redis')
 def test_generate_robot_model(mocked_redis):
     """Create a new robot.
 
@@ -38,13 +40,16 @@ def test_generate_robot_model(mocked_redis):
     state = [[None] * 9 for _ in range(9)]
 
     board = dict()
+    board.setdefault('size', 9)
     board.setdefault('state', state)
 
     battle = dict()
     battle.setdefault('board', board)
 
-    pickled_battle = pickle.dumps(battle)
-    mocked_redis.instance.get.return_value = pickled_battle
+    raw_battle = codec.encode(battle)
+    mocked_pipeline = mocked_redis.instance.pipeline.return_value
+    pipeline = mocked_pipeline.__enter__.return_value
+    pipeline.get.return_value = raw_battle
 
     robot = dict()
     robot['battle_id'] = id
@@ -56,17 +61,18 @@ def test_generate_robot_model(mocked_redis):
     model.load(robot)
 
     # then
-    called_id, raw_args = mocked_redis.instance.set.call_args_list[0][0]
-    args = pickle.loads(raw_args)
+    called_id, raw_args = pipeline.set.call_args_list[0][0]
+    args = codec.decode(raw_args)
     robot_id = next(iter(args['entities']))
     created_robot = args['entities'][robot_id]
 
-    assert called_id == id
+    assert called_id == storage.battle_key(id)
     assert len(args['entities']) == 1
     assert created_robot['type'] == 'ROBOT'
     assert created_robot['direction'] == direction
     assert created_robot['position'] == position
-    mocked_redis.instance.get.assert_called_once_with(id)
+    pipeline.watch.assert_called_once_with(storage.battle_key(id))
+    pipeline.get.assert_called_once_with(storage.battle_key(id))
 
 
 def test_id_must_be_int():
@@ -119,11 +125,12 @@ def test_position_must_be_a_list():
     assert result.errors['position'][0] == 'Not a valid list.'
 
 
-def test_should_refuse_any_id_length_rather_than_4():
+def test_should_refuse_any_id_length_out_of_range():
     """Validate ID length.
 
-    This test will try to insert an integer ID, but with a length different
-    from 4 and check if our model refuses it.
+    This test will try to insert an integer ID, but with a length shorter
+    than 4 or longer than the configured digits, and check if our model
+    refuses it.
 
     """
     # given
@@ -132,7 +139,7 @@ def test_should_refuse_any_id_length_rather_than_4():
     allowed_directions = ['north', 'south', 'west', 'east']
 
     a_id = fake.random_int(min=111, max=999)
-    b_id = fake.random_int(min=11111, max=99999)
+    b_id = fake.random_int(min=111111111, max=999999999)
 
     a_robot = dict()
     a_robot['battle_id'] = a_id
@@ -155,13 +162,12 @@ def test_should_refuse_any_id_length_rather_than_4():
     assert 'battle_id' not in a_result.data
     assert 'battle_id' not in b_result.data
 
-    assert a_result.errors['battle_id'][0] == (f"The battle ID should be "
-                                               f"4 digits long.")
-    assert b_result.errors['battle_id'][0] == (f"The battle ID should be "
-                                               f"4 digits long.")
+    assert a_result.errors['battle_id'][0] == ids.battle_id_error()
+    assert b_result.errors['battle_id'][0] == ids.battle_id_error()
 
 
-@patch('dino_extinction.blueprints.robots.models.redis')
+@patch.object(ids.instance, 'next', lambda name: 1)
+@patch('dino_extinction.blueprints.battles.storage.redis')
 def test_raise_error_if_position_isnt_empty(mocked_redis):
     """Refuse taken places.
 
@@ -184,17 +190,20 @@ def test_raise_error_if_position_isnt_empty(mocked_redis):
     direction = allowed_directions[fake.random_int(min=0, max=3)]
     position = [fake.random_int(min=1, max=9), fake.random_int(min=1, max=9)]
 
-    state = [[None] * 9 for _ in range(10)]
+    state = [[None] * 9 for _ in range(9)]
     state[position[0] - 1][position[1] - 1] = fake.word()
 
     board = dict()
+    board.setdefault('size', 9)
     board.setdefault('state', state)
 
     battle = dict()
     battle.setdefault('board', board)
 
-    pickled_battle = pickle.dumps(battle)
-    mocked_redis.instance.get.return_value = pickled_battle
+    raw_battle = codec.encode(battle)
+    mocked_pipeline = mocked_redis.instance.pipeline.return_value
+    pipeline = mocked_pipeline.__enter__.return_value
+    pipeline.get.return_value = raw_battle
 
     robot = dict()
     robot['battle_id'] = id
@@ -207,10 +216,11 @@ def test_raise_error_if_position_isnt_empty(mocked_redis):
 
     # then
     assert result.errors['_schema'][0] == 'This position is not empty'
-    mocked_redis.instance.set.assert_not_called()
+    pipeline.set.assert_not_called()
 
 
-@patch('dino_extinction.blueprints.robots.models.redis')
+@patch.object(ids.instance, 'next', lambda name: 1)
+@patch('dino_extinction.blueprints.battles.storage.redis')
 def test_raise_error_if_position_is_out_of_range(mocked_redis):
     """Refuse positions that is out of range.
 
@@ -236,13 +246,16 @@ def test_raise_error_if_position_is_out_of_range(mocked_redis):
     state = [[None] * 9 for _ in range(9)]
 
     board = dict()
+    board.setdefault('size', 9)
     board.setdefault('state', state)
 
     battle = dict()
     battle.setdefault('board', board)
 
-    pickled_battle = pickle.dumps(battle)
-    mocked_redis.instance.get.return_value = pickled_battle
+    raw_battle = codec.encode(battle)
+    mocked_pipeline = mocked_redis.instance.pipeline.return_value
+    pipeline = mocked_pipeline.__enter__.return_value
+    pipeline.get.return_value = raw_battle
 
     robot = dict()
     robot['battle_id'] = id
@@ -255,10 +268,10 @@ def test_raise_error_if_position_is_out_of_range(mocked_redis):
 
     # then
     assert result.errors['_schema'][0] == 'This position is out of range'
-    mocked_redis.instance.set.assert_not_called()
+    pipeline.set.assert_not_called()
 
 
-@patch('dino_extinction.blueprints.robots.models.redis')
+@patch('dino_extinction.blueprints.battles.storage.redis')
 def test_raise_error_if_position_misses_x_or_y(mocked_redis):
     """Refuse positions X or Y is missing.
 
@@ -282,13 +295,14 @@ def test_raise_error_if_position_misses_x_or_y(mocked_redis):
     state = [[None] * 9 for _ in range(9)]
 
     board = dict()
+    board.setdefault('size', 9)
     board.setdefault('state', state)
 
     battle = dict()
     battle.setdefault('board', board)
 
-    pickled_battle = pickle.dumps(battle)
-    mocked_redis.instance.get.return_value = pickled_battle
+    raw_battle = codec.encode(battle)
+    mocked_redis.instance.get.return_value = raw_battle
 
     robot = dict()
     robot['battle_id'] = id
@@ -304,7 +318,7 @@ def test_raise_error_if_position_misses_x_or_y(mocked_redis):
     mocked_redis.instance.set.assert_not_called()
 
 
-@patch('dino_extinction.blueprints.robots.models.redis')
+@patch('dino_extinction.blueprints.battles.storage.redis')
 def test_raise_if_direction_is_not_allowed(mocked_redis):
     """Refuse not allowed directions.
 
@@ -327,13 +341,14 @@ def test_raise_if_direction_is_not_allowed(mocked_redis):
     state = [[None] * 9 for _ in range(9)]
 
     board = dict()
+    board.setdefault('size', 9)
     board.setdefault('state', state)
 
     battle = dict()
     battle.setdefault('board', board)
 
-    pickled_battle = pickle.dumps(battle)
-    mocked_redis.instance.get.return_value = pickled_battle
+    raw_battle = codec.encode(battle)
+    mocked_redis.instance.get.return_value = raw_battle
 
     robot = dict()
     robot['battle_id'] = id
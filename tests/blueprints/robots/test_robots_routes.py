@@ -56,3 +56,101 @@ def test_invalid_robot_id(mocked_request, mocked_response):
     mocked_response.assert_called_once_with(json.dumps(False),
                                             status=500,
                                             mimetype='application/json')
+
+
+@patch('dino_extinction.blueprints.robots.routes.Response')
+@patch('dino_extinction.blueprints.robots.routes.request')
+def test_invalid_batch_commands(mocked_request, mocked_response):
+    """Refuse invalid batches of commands.
+
+    This test will ensure that if we provide a batch of commands that is not
+    a list of commands our route will refuse it.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_request : magic mock
+        The mock of our Flask request object.
+
+    mocked_response : magic mock
+        The mock of our Flask response Class.
+
+    """
+    class FakeDecorator:
+        def route(route, methods=[]):
+            def wrapper(fnc):
+                if route == '/commands':
+                    fnc()
+
+            return wrapper
+
+    # given
+    fake = Faker()
+    data = dict()
+    data.setdefault('battleId', fake.random_int(min=1111, max=9999))
+    data.setdefault('commands', fake.word())
+    mocked_request.get_json.return_value = data
+
+    mocked_handlers = MagicMock()
+
+    # when
+    routes.set_routes(FakeDecorator, mocked_handlers)
+
+    # then
+    mocked_handlers.command_robots.assert_not_called()
+    mocked_response.assert_called_once_with(json.dumps(False),
+                                            status=500,
+                                            mimetype='application/json')
+
+
+@patch('dino_extinction.blueprints.robots.routes.Response')
+@patch('dino_extinction.blueprints.robots.routes.request')
+def test_batch_commands_results(mocked_request, mocked_response):
+    """Answer the results of a batch of commands.
+
+    This test will ensure that our route answers the result of each command
+    of a batch.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_request : magic mock
+        The mock of our Flask request object.
+
+    mocked_response : magic mock
+        The mock of our Flask response Class.
+
+    """
+    class FakeDecorator:
+        def route(route, methods=[]):
+            def wrapper(fnc):
+                if route == '/commands':
+                    fnc()
+
+            return wrapper
+
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    commands = [{'robot': f"R-{fake.word()}", 'action': 'attack'}]
+    results = [{'robot': fake.word(), 'success': True}]
+
+    data = dict()
+    data.setdefault('battleId', battle_id)
+    data.setdefault('commands', commands)
+    mocked_request.get_json.return_value = data
+
+    mocked_handlers = MagicMock()
+    mocked_handlers.command_robots.return_value = (None, results)
+
+    # when
+    routes.set_routes(FakeDecorator, mocked_handlers)
+
+    # then
+    mocked_handlers.command_robots.assert_called_once_with(battle_id=battle_id,
+                                                           commands=commands)
+    mocked_response.assert_called_once_with(json.dumps(results),
+                                            status=200,
+                                            mimetype='application/json')
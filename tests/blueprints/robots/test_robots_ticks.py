@@ -0,0 +1,217 @@
+"""Robots Ticks Unit Tests.
+
+This test file will ensure that the tick mode of our Robots blueprint is
+queueing and applying the commands as we are expecting. It runs over
+FakeRedis, so it does not need a Redis server.
+
+"""
+import json
+import fakeredis
+import pytest
+
+from faker import Faker
+from flask import Flask
+from mock import (patch, MagicMock)
+from dino_extinction.infrastructure import (metrics, redis)
+from dino_extinction.blueprints.robots import ticks
+
+
+@pytest.fixture
+def fake_redis():
+    """Enable the tick mode over a FakeRedis instance."""
+    with patch.object(redis, 'instance', fakeredis.FakeStrictRedis()), \
+            patch.object(ticks, '_interval', return_value=100):
+        yield redis.instance
+
+
+def test_drain_commands_in_order(fake_redis):
+    """Drain the queued commands of a battle.
+
+    This test will queue some commands, one of them as a single command
+    queued by the previous versions, and it will pass if draining them
+    returns every command in the order they were queued, only once.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    actions = [fake.word() for _ in range(3)]
+    ticks.queue(battle_id, [{'robot': 'R-1111', 'action': action}
+                            for action in actions[:2]])
+    fake_redis.rpush(ticks._queue_key(battle_id),
+                     json.dumps({'robot': 'R-1111', 'action': actions[2]}))
+
+    # when
+    commands = ticks.drain(battle_id)
+    drained_again = ticks.drain(battle_id)
+
+    # then
+    assert [command['action'] for command in commands] == actions
+    assert all(command['robot'] == 'R-1111' for command in commands)
+    assert drained_again == list()
+
+
+def test_tick_applies_queued_commands(fake_redis):
+    """Apply the queued commands of every ticking battle.
+
+    This test will queue commands on a ticking battle and on a battle that
+    is not on tick mode. It will pass if only the commands of the ticking
+    battle were applied, all at once.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = str(fake.random_int(min=1111, max=5555))
+    other_battle_id = str(fake.random_int(min=5556, max=9999))
+    ticks.start_ticking(battle_id)
+    ticks.queue(battle_id, [{'robot': 'R-1111', 'action': 'attack'}])
+    ticks.queue(battle_id, [{'robot': 'R-2222', 'action': 'turn-left'}])
+    ticks.queue(other_battle_id, [{'robot': 'R-3333', 'action': 'attack'}])
+    apply = MagicMock(return_value=(None, list()))
+
+    # when
+    ticked = ticks.tick(apply)
+
+    # then
+    assert ticked
+    apply.assert_called_once_with(battle_id,
+                                  [{'robot': 'R-1111', 'action': 'attack'},
+                                   {'robot': 'R-2222', 'action': 'turn-left'}])
+    assert ticks.is_ticking(battle_id)
+    assert not ticks.is_ticking(other_battle_id)
+    assert len(ticks.drain(other_battle_id)) == 1
+
+
+def test_tick_only_once_per_interval(fake_redis):
+    """Tick only once per interval.
+
+    This test will tick twice in a row and it will pass if the second tick
+    is skipped, as if it ran on another worker.
+
+    """
+    # given
+    apply = MagicMock(return_value=(None, list()))
+
+    # when
+    first_tick = ticks.tick(apply)
+    second_tick = ticks.tick(apply)
+
+    # then
+    assert first_tick
+    assert not second_tick
+
+
+@patch('dino_extinction.blueprints.battles.storage.get_storage')
+def test_requeue_commands_of_busy_battles(mocked_get_storage, fake_redis):
+    """Keep the commands of a battle that could not be changed.
+
+    This test will tick a battle whose commands could not be applied and it
+    will pass if its commands are back on the front of its queue.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_get_storage : magic mock
+        The mock of the function that returns our battle storage layout.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = str(fake.random_int(min=1111, max=9999))
+    ticks.start_ticking(battle_id)
+    ticks.queue(battle_id, [{'robot': 'R-1111', 'action': 'attack'}])
+    apply = MagicMock(return_value=(fake.sentence(), None))
+    mocked_get_storage.return_value.load_version.return_value = 1
+
+    # when
+    ticks.tick(apply)
+    ticks.queue(battle_id, [{'robot': 'R-2222', 'action': 'attack'}])
+
+    # then
+    assert [command['robot'] for command in ticks.drain(battle_id)] == [
+        'R-1111',
+        'R-2222']
+    assert ticks.is_ticking(battle_id)
+
+
+def test_requeue_commands_of_failed_battles(fake_redis):
+    """Keep the commands of a battle whose tick failed.
+
+    This test will tick two battles, applying the first one with an error,
+    and it will pass if the commands of the first battle are back on its
+    queue while the second battle was still applied.
+
+    """
+    # given
+    ticks.start_ticking('1111')
+    ticks.start_ticking('2222')
+    ticks.queue('1111', [{'robot': 'R-1111', 'action': 'attack'}])
+    ticks.queue('2222', [{'robot': 'R-2222', 'action': 'attack'}])
+
+    def _apply(battle_id, commands):
+        if battle_id == '1111':
+            raise ValueError('This battle is corrupted')
+
+        return None, list()
+
+    apply = MagicMock(side_effect=_apply)
+
+    # when
+    ticked = ticks.tick(apply)
+
+    # then
+    assert ticked
+    assert apply.call_count == 2
+    assert ticks.drain('1111') == [{'robot': 'R-1111', 'action': 'attack'}]
+    assert ticks.drain('2222') == list()
+
+
+def test_keep_ticking_after_errors():
+    """Keep the scheduler running after a tick fails.
+
+    This test will run a scheduler whose first tick fails and it will pass
+    if it ticked again, counting the error.
+
+    """
+    # given
+    app = Flask(__name__)
+    app.config['BATTLE_TICK_INTERVAL'] = 1
+    scheduler = ticks.Scheduler(MagicMock())
+    errors = metrics.get('battle_tick_errors')
+
+    def _tick(apply):
+        if tick.call_count == 1:
+            raise ValueError('This queue is corrupted')
+
+        scheduler.stopped.set()
+
+    # when
+    with patch.object(ticks, 'tick', side_effect=_tick) as tick:
+        scheduler.start(app)
+        scheduler.thread.join(5)
+        scheduler.stop()
+
+    # then
+    assert tick.call_count == 2
+    assert metrics.get('battle_tick_errors') == errors + 1
+
+
+def test_ticks_are_disabled_without_interval():
+    """Refuse the tick mode without an interval.
+
+    This test will ensure that no battle is on tick mode when the tick
+    interval is not configured, without asking Redis about it.
+
+    """
+    # given
+    fake = Faker()
+
+    # when
+    with patch.object(redis, 'instance') as mocked_instance:
+        result = ticks.is_ticking(fake.random_int(min=1111, max=9999))
+
+    # then
+    assert not ticks.enabled()
+    assert not result
+    mocked_instance.sismember.assert_not_called()
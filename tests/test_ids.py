@@ -0,0 +1,88 @@
+"""IDs Unit Tests.
+
+This test file will ensure that the most important logic of our IDs module
+is working as we are expecting. It runs over FakeRedis, so it does not need
+a Redis server.
+
+"""
+import fakeredis
+import pytest
+
+from faker import Faker
+from mock import patch
+from dino_extinction.infrastructure import (ids, redis)
+
+
+@pytest.fixture
+def fake_redis():
+    """Issue IDs over a FakeRedis instance, from a new allocator."""
+    with patch.object(redis, 'instance', fakeredis.FakeStrictRedis()), \
+            patch.object(ids, 'instance', ids.Allocator()):
+        yield redis.instance
+
+
+def test_lease_ids_in_blocks(fake_redis):
+    """Lease a whole block of IDs at once.
+
+    This test will issue more IDs than a single block has and it will pass
+    if they are sequential, while Redis was only asked for two blocks.
+
+    """
+    # given
+    fake = Faker()
+    name = fake.word()
+    total_ids = ids.DEFAULT_BLOCK_SIZE + 1
+
+    # when
+    issued_ids = [ids.instance.next(name) for _ in range(total_ids)]
+
+    # then
+    assert issued_ids == list(range(1, total_ids + 1))
+    assert int(fake_redis.get(ids.COUNTER_PREFIX + name)) == (
+        2 * ids.DEFAULT_BLOCK_SIZE)
+
+
+def test_never_repeat_ids_between_workers(fake_redis):
+    """Issue different IDs on each worker.
+
+    This test will issue IDs from two allocators, as if they were running
+    on different workers, and it will pass if no ID was issued twice.
+
+    """
+    # given
+    fake = Faker()
+    name = fake.word()
+    other_allocator = ids.Allocator()
+
+    # when
+    issued_ids = list()
+    for _ in range(ids.DEFAULT_BLOCK_SIZE):
+        issued_ids.append(ids.instance.next(name))
+        issued_ids.append(other_allocator.next(name))
+
+    # then
+    assert len(set(issued_ids)) == len(issued_ids)
+
+
+def test_create_ids_with_configured_digits(fake_redis):
+    """Create battle and entity IDs with the configured digits.
+
+    This test will create a battle ID and an entity ID and it will pass if
+    both of them have the default number of digits and are valid.
+
+    """
+    # given
+    fake = Faker()
+    prefix = fake.random_letter()
+
+    # when
+    battle_id = ids.new_battle_id()
+    entity_id = ids.new_entity_id(prefix, fake.word())
+
+    # then
+    assert battle_id == 10 ** (ids.DEFAULT_DIGITS - 1) + 1
+    assert entity_id == '{0}-{1}1'.format(prefix,
+                                          '0' * (ids.DEFAULT_DIGITS - 1))
+    assert ids.is_battle_id(battle_id)
+    assert ids.is_battle_id(fake.random_int(min=1111, max=9999))
+    assert not ids.is_battle_id(fake.random_int(min=111, max=999))
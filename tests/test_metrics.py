@@ -0,0 +1,142 @@
+"""Metrics Unit Tests.
+
+This test file will ensure that the most important logic of our Metrics
+module is working as we are expecting.
+
+"""
+import pytest
+
+from faker import Faker
+from mock import patch
+from dino_extinction.infrastructure import metrics
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    """Start every test without any counters."""
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_increment_counter():
+    """Increment a counter.
+
+    This test will increment a counter by key and it will pass if both the
+    counter of the key and the total were incremented.
+
+    """
+    # given
+    fake = Faker()
+    name = fake.word()
+    battle_id = fake.random_int(min=1111, max=9999)
+
+    # when
+    metrics.increment(name, battle_id)
+    metrics.increment(name, battle_id, 2)
+    metrics.increment(name)
+
+    # then
+    assert metrics.get(name, battle_id) == 3
+    assert metrics.get(name) == 4
+
+
+def test_get_unknown_counter():
+    """Get a counter that was never incremented.
+
+    This test will get an unknown counter and it will pass if it is 0.
+
+    """
+    # given
+    fake = Faker()
+
+    # when
+    result = metrics.get(fake.word(), fake.word())
+
+    # then
+    assert result == 0
+
+
+def test_set_gauge():
+    """Set a gauge.
+
+    This test will set a gauge twice and it will pass if it holds the last
+    value that was set.
+
+    """
+    # given
+    fake = Faker()
+    name = fake.word()
+    battle_id = fake.random_int(min=1111, max=9999)
+
+    # when
+    metrics.gauge(name, battle_id, 3)
+    metrics.gauge(name, battle_id, 2.5)
+
+    # then
+    assert metrics.get(name, battle_id) == 2.5
+    assert metrics.get(name) == 0
+
+
+def test_take_snapshot():
+    """Take a snapshot of the counters.
+
+    This test will take a snapshot of the counters and it will pass if the
+    snapshot does not change when the counters do.
+
+    """
+    # given
+    fake = Faker()
+    name = fake.word()
+    metrics.increment(name, 'A')
+
+    # when
+    snapshot = metrics.snapshot()
+    metrics.increment(name, 'A')
+
+    # then
+    assert snapshot == {name: {'total': 1, 'A': 1}}
+
+
+def test_bound_counter_keys():
+    """Bound how many keys each counter keeps.
+
+    This test will increment a counter on more keys than it can keep and
+    it will pass if only the least recently updated key was dropped, while
+    the total still counts every key.
+
+    """
+    # given
+    fake = Faker()
+    name = fake.word()
+
+    # when
+    with patch.object(metrics, 'MAX_KEYS', 2):
+        metrics.increment(name, 'A')
+        metrics.increment(name, 'B')
+        metrics.increment(name, 'A')
+        metrics.increment(name, 'C')
+
+    # then
+    assert metrics.snapshot() == {name: {'total': 4, 'A': 2, 'C': 1}}
+
+
+def test_forget_key():
+    """Forget a key of every counter and gauge.
+
+    This test will count and gauge a battle and forget it, and it will pass
+    if only the totals were kept.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    metrics.increment('transactions', battle_id)
+    metrics.gauge('stored_bytes', battle_id, 10)
+
+    # when
+    metrics.forget(battle_id)
+
+    # then
+    assert metrics.snapshot() == {'transactions': {'total': 1},
+                                  'stored_bytes': dict()}
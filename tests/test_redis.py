@@ -34,3 +34,36 @@ def test_new_redis_instance(mocked_instance):
     # then
     assert mocked_instance.init_app.call_count == 1
     mocked_instance.init_app.assert_called_with(app)
+
+
+@patch('dino_extinction.infrastructure.redis.scripts', dict())
+@patch('dino_extinction.infrastructure.redis.instance')
+def test_register_scripts(mocked_instance):
+    """Test scripts registration.
+
+    This test will ensure that we're registering every Lua script of our
+    scripts folder when binding Redis to our Flask app.
+
+    ...
+
+    Parameters
+    ----------
+    mocked_instance: magic mock
+        The mock of the instance in our redis.
+
+    """
+    # given
+    fake = Faker()
+    app = fake.word()
+
+    # when
+    redis.bind(app)
+
+    # then
+    expected_scripts = ['create_entity',
+                        'move_robot',
+                        'robot_attack',
+                        'turn_robot']
+
+    assert sorted(redis.scripts) == expected_scripts
+    assert mocked_instance.register_script.call_count == len(expected_scripts)
@@ -0,0 +1,137 @@
+"""Replay Unit Tests.
+
+This test file will ensure that our battle replay is running the recorded
+events as we are expecting. It runs over FakeRedis, so it does not need a
+Redis server.
+
+"""
+import fakeredis
+import pytest
+
+from faker import Faker
+from flask import Flask
+from mock import patch
+from dino_extinction import replay
+from dino_extinction.infrastructure import redis
+
+
+def _create_events(battle_id):
+    events = list()
+    events.append({'event': 'battle', 'battleId': battle_id, 'size': 5})
+    events.append({'event': 'robot', 'battleId': battle_id,
+                   'robot': 'R-1111', 'direction': 'north',
+                   'xPosition': 2, 'yPosition': 2})
+    events.append({'event': 'dinossaur', 'battleId': battle_id,
+                   'xPosition': 3, 'yPosition': 2})
+    events.append({'event': 'command', 'battleId': battle_id,
+                   'robot': 'R-1111', 'action': 'attack'})
+    events.append({'event': 'command', 'battleId': battle_id,
+                   'robot': 'R-1111', 'action': 'turn-right'})
+    events.append({'event': 'command', 'battleId': battle_id,
+                   'robot': 'R-1111', 'action': 'fly'})
+
+    return events
+
+
+def test_replay_recorded_events():
+    """Replay the recorded events of a battle.
+
+    This test will replay the same events twice and it will pass if every
+    command reached the replayed robot, even though it got a new ID, and
+    both replays ended on the same state.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    events = _create_events(battle_id)
+
+    # when
+    with patch.object(redis, 'instance', fakeredis.FakeStrictRedis()):
+        report = replay.replay(events)
+
+    with patch.object(redis, 'instance', fakeredis.FakeStrictRedis()):
+        other_report = replay.replay(events)
+
+    # then
+    assert report.get('events') == 6
+    assert report.get('commands') == 3
+    assert report.get('failures') == 1
+    assert len(report.get('latencies')) == 3
+    assert report.get('hashes').get(battle_id)
+    assert report.get('hashes') == other_report.get('hashes')
+
+
+@pytest.mark.parametrize('rank,expected', [(50, 2), (90, 4), (99, 4)])
+def test_latency_percentile(rank, expected):
+    """Get the nearest-rank percentile of the latencies.
+
+    ...
+
+    Parameters
+    ----------
+    rank : int
+        The percentile that will be calculated.
+
+    expected : int
+        The expected percentile.
+
+    """
+    # given
+    latencies = [4, 1, 3, 2]
+
+    # when
+    result = replay.percentile(latencies, rank)
+
+    # then
+    assert result == expected
+
+
+@pytest.mark.parametrize('config', [
+    {'BATTLE_STORAGE': 'blob'},
+    {'BATTLE_STORAGE': 'hash'},
+    {'BATTLE_STORAGE': 'hash', 'BATTLE_SCRIPTS': True},
+    {'BATTLE_STORAGE': 'stream'},
+])
+def test_replay_on_every_layout(config):
+    """Replay the recorded events of a battle on every storage layout.
+
+    This test will replay the same events on each storage layout and it
+    will pass if they end on the same state of the default layout, or if
+    the layout is refused because FakeRedis does not support it.
+
+    ...
+
+    Parameters
+    ----------
+    config : dict
+        The configurations of the storage layout.
+
+    """
+    # given
+    fake = Faker()
+    battle_id = fake.random_int(min=1111, max=9999)
+    events = _create_events(battle_id)
+    app = Flask(__name__)
+    app.config.update(config)
+
+    with patch.object(redis, 'instance', fakeredis.FakeStrictRedis()):
+        expected_hashes = replay.replay(events).get('hashes')
+
+    # when
+    with patch.object(redis, 'instance', fakeredis.FakeStrictRedis()), \
+            app.app_context():
+        redis.register_scripts()
+        try:
+            replay.check_storage(redis.instance)
+        except ValueError:
+            is_supported = False
+        else:
+            is_supported = True
+            report = replay.replay(events)
+
+    # then
+    assert is_supported == (config.get('BATTLE_STORAGE') != 'stream')
+    if is_supported:
+        assert report.get('failures') == 1
+        assert report.get('hashes') == expected_hashes
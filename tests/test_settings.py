@@ -0,0 +1,48 @@
+"""Settings Unit Tests.
+
+This test file will ensure that the most important logic of our Settings
+module are working as we are expecting.
+
+"""
+from faker import Faker
+from flask import Flask
+from dino_extinction.infrastructure import settings
+
+
+def test_get_app_configuration():
+    """Get a configuration from the current app.
+
+    This test will ensure that we are reading the configurations of the
+    current Flask app when there is one.
+
+    """
+    # given
+    fake = Faker()
+    expected = fake.word()
+    app = Flask(__name__)
+    app.config['MORTY'] = expected
+
+    # when
+    with app.app_context():
+        result = settings.get('MORTY', fake.word())
+
+    # then
+    assert result == expected
+
+
+def test_get_default_outside_of_app():
+    """Get a default configuration outside of an app.
+
+    This test will ensure that we are returning the default value when
+    there is no Flask app running.
+
+    """
+    # given
+    fake = Faker()
+    expected = fake.word()
+
+    # when
+    result = settings.get('MORTY', expected)
+
+    # then
+    assert result == expected
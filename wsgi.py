@@ -3,10 +3,17 @@
 This package is responsible for importing all required dependencies to start
 a new Dino Extinction server and them doing so.
 
+The standard library is patched by gevent before anything else is imported,
+so the long-lived streams of our spectators, waiting for the events of their
+battles, do not block the other requests.
+
 """
-from os import environ
-from gevent.pywsgi import WSGIServer
-from dino_extinction import create_app
+from gevent import monkey
+monkey.patch_all()
+
+from os import environ  # noqa: E402
+from gevent.pywsgi import WSGIServer  # noqa: E402
+from dino_extinction import create_app  # noqa: E402
 
 if __name__ == '__main__':
     current_env = environ.get('FLASK_ENV')